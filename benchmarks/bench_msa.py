@@ -0,0 +1,59 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import os
+
+import pytest
+
+from generators import random_mask, random_msa, scaled, write_marker_list
+from gtdbtk.markers import Markers
+from gtdbtk.trim_msa import TrimMSA
+
+MSA_WIDTH = 5040
+
+
+@pytest.fixture(scope='module')
+def msa(scale):
+    return random_msa(scaled(500, scale), MSA_WIDTH)
+
+
+@pytest.fixture(scope='module')
+def marker_list(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('markers') / 'markers.tsv')
+    write_marker_list(path, MSA_WIDTH)
+    return path
+
+
+def test_trim_msa(benchmark, tmp_path, msa, marker_list):
+    trim = TrimMSA(cols_per_gene=42, min_perc_aa=0.5, min_consensus=0.25,
+                   max_consensus=0.95, min_perc_taxa=0.5, rnd_seed=1,
+                   out_dir=str(tmp_path))
+    filtered, _pruned = benchmark(trim.trim, msa, marker_list)
+    assert len(filtered) > 0
+
+
+@pytest.mark.parametrize('n_user', [10, 1000])
+def test_apply_mask(benchmark, tmp_path, reference_data, scale, n_user):
+    gtdb_msa = random_msa(scaled(500, scale), MSA_WIDTH, prefix='RS_GCF_')
+    user_msa = random_msa(scaled(n_user, scale), MSA_WIDTH, seed=2)
+    mask_path = os.path.join(str(tmp_path), 'mask.txt')
+    with open(mask_path, 'w') as fh:
+        fh.write(random_mask(MSA_WIDTH))
+
+    markers = Markers()
+    output_seqs, pruned_seqs = benchmark(markers._apply_mask, gtdb_msa, user_msa, mask_path, 0.1)
+    assert len(output_seqs) + len(pruned_seqs) == len(gtdb_msa) + len(user_msa)
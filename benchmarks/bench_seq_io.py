@@ -0,0 +1,88 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import gzip
+import os
+
+import pytest
+
+from generators import random_msa, random_proteins, random_tophit_rows, scaled, write_fasta, \
+    write_tophit_file
+from gtdbtk.biolib_lite.seq_io import read_fasta, read_seq
+from gtdbtk.files.marker.tophit import TopHitTigrFile
+
+
+@pytest.fixture(scope='module')
+def protein_file(tmp_path_factory, scale):
+    path = str(tmp_path_factory.mktemp('proteins') / 'genome_protein.faa')
+    write_fasta(path, random_proteins(scaled(5000, scale)))
+    return path
+
+
+@pytest.fixture(scope='module')
+def msa_file(tmp_path_factory, scale):
+    path = str(tmp_path_factory.mktemp('msa') / 'msa.faa')
+    write_fasta(path, random_msa(scaled(500, scale), 5000))
+    with open(path, 'rb') as f_in, gzip.open(path + '.gz', 'wb') as f_out:
+        f_out.write(f_in.read())
+    return path
+
+
+def test_read_fasta_proteins(benchmark, protein_file):
+    seqs = benchmark(read_fasta, protein_file)
+    assert len(seqs) > 0
+
+
+def test_read_fasta_msa(benchmark, msa_file):
+    seqs = benchmark(read_fasta, msa_file)
+    assert len(seqs) > 0
+
+
+def test_read_fasta_msa_gzip(benchmark, msa_file):
+    seqs = benchmark(read_fasta, msa_file + '.gz')
+    assert len(seqs) > 0
+
+
+def test_read_seq_msa(benchmark, msa_file):
+    n = benchmark(lambda: sum(1 for _ in read_seq(msa_file)))
+    assert n > 0
+
+
+@pytest.fixture(scope='module')
+def tophit_dir(tmp_path_factory, scale):
+    out_dir = str(tmp_path_factory.mktemp('tophit'))
+    tophit = TopHitTigrFile(out_dir, 'genome_0')
+    os.makedirs(os.path.dirname(tophit.path), exist_ok=True)
+    write_tophit_file(tophit.path, random_tophit_rows(scaled(5000, scale)))
+    return out_dir
+
+
+def test_tophit_read(benchmark, tophit_dir):
+    def read():
+        tophit = TopHitTigrFile(tophit_dir, 'genome_0')
+        tophit.read()
+        return tophit
+
+    tophit = benchmark(read)
+    assert len(tophit.hits) > 0
+
+
+def test_tophit_top_hits(benchmark, tophit_dir):
+    tophit = TopHitTigrFile(tophit_dir, 'genome_0')
+    tophit.read()
+    hits = benchmark(lambda: [tophit.get_top_hit(gene_id) for gene_id in tophit.hits])
+    assert all(hits)
@@ -0,0 +1,66 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+"""End-to-end timings of the stages which do not use third-party software."""
+
+import os
+
+import pytest
+
+from generators import random_mask, random_msa, scaled, write_fasta
+from gtdbtk.decorate import Decorate
+from gtdbtk.infer_ranks import InferRanks
+from gtdbtk.misc import Misc
+from gtdbtk.reroot_tree import RerootTree
+
+
+@pytest.fixture
+def tree_file(tmp_path, reference_tree):
+    path = str(tmp_path / 'input.tree')
+    reference_tree.write_to_path(path, schema='newick', suppress_rooting=True,
+                                 unquoted_underscores=True)
+    return path
+
+
+def test_decorate(benchmark, tmp_path, tree_file, reference_taxonomy):
+    output_tree = str(tmp_path / 'decorated.tree')
+    benchmark(Decorate().run, tree_file, reference_taxonomy, output_tree)
+    assert os.path.isfile(output_tree)
+
+
+def test_root(benchmark, tmp_path, tree_file, reference_taxonomy):
+    outgroup = {gid for gid, taxa in reference_taxonomy.items() if taxa[1] == 'p__P0'}
+    output_tree = str(tmp_path / 'rooted.tree')
+    benchmark(RerootTree().root_with_outgroup, tree_file, output_tree, outgroup)
+    assert os.path.isfile(output_tree)
+
+
+def test_infer_ranks(benchmark, tmp_path, reference_data, tree_file):
+    output_tree = str(tmp_path / 'ranks.tree')
+    benchmark(InferRanks().run, tree_file, 'p__P0', output_tree)
+    assert os.path.isfile(output_tree)
+
+
+def test_trim_msa(benchmark, tmp_path, scale):
+    width = 10000
+    msa_file, mask_file = str(tmp_path / 'msa.faa'), str(tmp_path / 'mask.txt')
+    write_fasta(msa_file, random_msa(scaled(500, scale), width))
+    with open(mask_file, 'w') as fh:
+        fh.write(random_mask(width))
+    output_file = str(tmp_path / 'trimmed.faa')
+    benchmark(Misc().trim_msa, msa_file, 'file', mask_file, output_file)
+    assert os.path.getsize(output_file) > 0
@@ -0,0 +1,62 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import copy
+
+import pytest
+
+from generators import place_user_genomes, scaled, write_fasta
+from gtdbtk.biolib_lite.taxonomy import Taxonomy
+from gtdbtk.decorate import Decorate
+from gtdbtk.relative_distance import RelativeDistance
+from gtdbtk.split import Split
+
+
+def test_decorate_rel_dist(benchmark, reference_tree):
+    red = RelativeDistance()
+    benchmark(red.decorate_rel_dist, reference_tree.seed_node)
+    assert reference_tree.seed_node.rel_dist == 0.0
+
+
+def test_fmeasure(benchmark, reference_tree, reference_taxonomy):
+    decorate = Decorate()
+    decorate._strip_taxon_labels(reference_tree)
+    fmeasure = benchmark(decorate._fmeasure, reference_tree, reference_taxonomy)
+    assert len(fmeasure) > 0
+
+
+def test_named_lineages_at_rank(benchmark, reference_taxonomy):
+    taxa = benchmark(Taxonomy().named_lineages_at_rank, reference_taxonomy)
+    assert len(taxa) == len(Taxonomy.rank_prefixes)
+
+
+@pytest.mark.parametrize('n_user', [10, 200])
+def test_get_high_pplacer_taxonomy(benchmark, tmp_path, reference_data, reference_tree,
+                                   reference_taxonomy, scale, n_user):
+    user_ids = place_user_genomes(reference_tree, scaled(n_user, scale))
+    user_msa_file = str(tmp_path / 'user_msa.fasta')
+    write_fasta(user_msa_file, {gid: 'A' for gid in user_ids})
+
+    reference_ids = set(reference_taxonomy)
+    split = Split(['d__', 'p__', 'c__', 'o__', 'f__', 'g__', 's__'], reference_taxonomy, reference_ids)
+
+    def run():
+        tree = copy.deepcopy(reference_tree)
+        return split.get_high_pplacer_taxonomy(str(tmp_path), 'bac120', 'gtdbtk', user_msa_file, tree)
+
+    results = benchmark(run)
+    assert set(results) == set(user_ids)
@@ -0,0 +1,79 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import copy
+import os
+import sys
+
+import pytest
+
+# Benchmark the gtdbtk package in this repository, even if it is not installed.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generators import random_taxonomy, random_reference_tree, write_reference_data
+
+
+def pytest_report_header(config):
+    return f'gtdbtk benchmark scale: {bench_scale()}'
+
+
+def bench_scale() -> float:
+    """The multiplier applied to all benchmark sizes (GTDBTK_BENCH_SCALE)."""
+    return float(os.environ.get('GTDBTK_BENCH_SCALE', '1'))
+
+
+@pytest.fixture(scope='session')
+def scale():
+    return bench_scale()
+
+
+@pytest.fixture(scope='session')
+def reference_taxonomy(scale):
+    """A synthetic reference taxonomy."""
+    return random_taxonomy(int(2000 * scale))
+
+
+@pytest.fixture(scope='session')
+def reference_tree_template(reference_taxonomy):
+    return random_reference_tree(reference_taxonomy)
+
+
+@pytest.fixture
+def reference_tree(reference_tree_template):
+    """A RED-annotated reference tree, which may be modified by the test."""
+    return copy.deepcopy(reference_tree_template)
+
+
+@pytest.fixture(scope='session')
+def reference_data(tmp_path_factory, reference_taxonomy, reference_tree_template):
+    """Point GTDBTK_DATA_PATH to a synthetic reference data package."""
+    from gtdbtk.config.common import CONFIG
+
+    path = str(tmp_path_factory.mktemp('gtdbtk_data'))
+    write_reference_data(path, reference_taxonomy, reference_tree_template)
+
+    previous = os.environ.get('GTDBTK_DATA_PATH')
+    os.environ['GTDBTK_DATA_PATH'] = path
+    CONFIG._generic_path = None
+    CONFIG._red_dist_bac_dict = CONFIG._red_dist_arc_dict = CONFIG._version_data = None
+    yield path
+    if previous is None:
+        del os.environ['GTDBTK_DATA_PATH']
+    else:
+        os.environ['GTDBTK_DATA_PATH'] = previous
+    CONFIG._generic_path = None
+    CONFIG._red_dist_bac_dict = CONFIG._red_dist_arc_dict = CONFIG._version_data = None
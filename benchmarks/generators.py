@@ -0,0 +1,261 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+"""Generators of synthetic inputs shaped like the GTDB-Tk reference data."""
+
+import json
+import math
+import os
+import random
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import dendropy
+
+from gtdbtk.biolib_lite.newick import create_label, parse_label
+from gtdbtk.biolib_lite.taxonomy import Taxonomy
+from gtdbtk.relative_distance import RelativeDistance
+
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+NUCLEOTIDES = 'ACGT'
+
+# Median RED values of each rank, similar to those of the GTDB.
+MEDIAN_REDS = {'p__': 0.33, 'c__': 0.46, 'o__': 0.63, 'f__': 0.77, 'g__': 0.93}
+
+
+def random_genome(length: int, gc: float = 0.5, seed: int = 1) -> str:
+    """Returns a random nucleotide sequence with the given GC content."""
+    rng = random.Random(seed)
+    weights = [(1 - gc) / 2, gc / 2, gc / 2, (1 - gc) / 2]
+    return ''.join(rng.choices(NUCLEOTIDES, weights=weights, k=length))
+
+
+def random_proteins(n_genes: int, mean_length: int = 300, seed: int = 1) -> Dict[str, str]:
+    """Returns a random protein set (gene id -> amino acid sequence)."""
+    rng = random.Random(seed)
+    out = dict()
+    for idx in range(n_genes):
+        length = max(30, int(rng.gauss(mean_length, mean_length / 4)))
+        out[f'gene_{idx}'] = 'M' + ''.join(rng.choices(AMINO_ACIDS, k=length - 1))
+    return out
+
+
+def random_msa(height: int, width: int, gap_fraction: float = 0.1,
+               seed: int = 1, prefix: str = 'genome_') -> Dict[str, str]:
+    """Returns a random MSA of height sequences by width columns.
+
+    Columns are sampled from a per-column consensus residue so that they
+    have a realistic spread of conservation (used by the trimming filters).
+    """
+    rng = random.Random(seed)
+    consensus = rng.choices(AMINO_ACIDS, k=width)
+    conservation = [rng.random() for _ in range(width)]
+    out = dict()
+    for idx in range(height):
+        seq = list()
+        for col in range(width):
+            r = rng.random()
+            if r < gap_fraction:
+                seq.append('-')
+            elif r < gap_fraction + (1 - gap_fraction) * conservation[col]:
+                seq.append(consensus[col])
+            else:
+                seq.append(rng.choice(AMINO_ACIDS))
+        out[f'{prefix}{idx}'] = ''.join(seq)
+    return out
+
+
+def random_mask(width: int, fraction: float = 0.5, seed: int = 1) -> str:
+    """Returns a random MSA mask string of 0 and 1."""
+    rng = random.Random(seed)
+    return ''.join('1' if rng.random() < fraction else '0' for _ in range(width))
+
+
+def random_taxonomy(n_genomes: int, branching: Optional[int] = None, seed: int = 1,
+                    domain: str = 'd__Bacteria') -> Dict[str, List[str]]:
+    """Returns a random GTDB-style taxonomy of n_genomes reference genomes.
+
+    Each taxon has branching child taxa (by default, so that there are about
+    as many phyla as children per taxon), and each species has on average
+    two genomes.
+    """
+    rng = random.Random(seed)
+    n_species = max(1, n_genomes // 2)
+    if branching is None:
+        branching = max(2, int(round(n_species ** (1 / 6))))
+    taxonomy = dict()
+    for idx in range(n_genomes):
+        species = idx if idx < n_species else rng.randrange(n_species)
+        lineage = [domain]
+        for rank_idx in range(1, 6):
+            taxon_idx = species // branching ** (6 - rank_idx)
+            prefix = Taxonomy.rank_prefixes[rank_idx]
+            lineage.append(f'{prefix}{prefix[0].upper()}{taxon_idx}')
+        lineage.append(f's__{lineage[-1][3:]} sp{species}')
+        accession = f'{idx + 1:09d}'
+        gid = f'RS_GCF_{accession}.1' if idx % 2 == 0 else f'GB_GCA_{accession}.1'
+        taxonomy[gid] = lineage
+    return taxonomy
+
+
+def _join_randomly(nodes: List[dendropy.Node], rng: random.Random) -> dendropy.Node:
+    """Join nodes into a random binary subtree, returning its root."""
+    nodes = list(nodes)
+    while len(nodes) > 1:
+        a = nodes.pop(rng.randrange(len(nodes)))
+        b = nodes.pop(rng.randrange(len(nodes)))
+        parent = dendropy.Node()
+        for child in (a, b):
+            parent.add_child(child)
+            child.edge.length = rng.uniform(0.01, 0.2)
+        nodes.append(parent)
+    return nodes[0]
+
+
+def random_reference_tree(taxonomy: Dict[str, List[str]], seed: int = 1,
+                          support: float = 100.0, red: bool = True) -> dendropy.Tree:
+    """Returns a random rooted tree consistent with the taxonomy.
+
+    Internal nodes are labelled with taxa above the species rank (e.g.
+    '100:c__C1; o__O1') as in the GTDB reference trees, and annotated with
+    relative evolutionary divergence (rel_dist) if red is True.
+    """
+    rng = random.Random(seed)
+    tree = dendropy.Tree(is_rooted=True)
+    tree.taxon_namespace = dendropy.TaxonNamespace()
+
+    def build(gids, rank_idx):
+        if rank_idx == len(Taxonomy.rank_prefixes):
+            nodes = list()
+            for gid in gids:
+                leaf = dendropy.Node(taxon=tree.taxon_namespace.require_taxon(label=gid))
+                nodes.append(leaf)
+            return _join_randomly(nodes, rng)
+
+        groups = defaultdict(list)
+        for gid in gids:
+            groups[taxonomy[gid][rank_idx]].append(gid)
+        nodes = list()
+        for taxon in sorted(groups):
+            node = build(groups[taxon], rank_idx + 1)
+            if not node.is_leaf() and rank_idx < Taxonomy.SPECIES_IDX:
+                _support, child_taxa, _aux = parse_label(node.label)
+                taxa = f'{taxon}; {child_taxa}' if child_taxa else taxon
+                node.label = create_label(support, taxa, None)
+            nodes.append(node)
+        return _join_randomly(nodes, rng)
+
+    tree.seed_node = build(sorted(taxonomy), 0)
+    if red:
+        RelativeDistance().decorate_rel_dist(tree.seed_node)
+    return tree
+
+
+def place_user_genomes(tree: dendropy.Tree, n_genomes: int, seed: int = 1,
+                       prefix: str = 'user_') -> List[str]:
+    """Insert user genomes on random edges of the tree, as pplacer does.
+
+    The tree is re-annotated with relative evolutionary divergence.
+    """
+    rng = random.Random(seed)
+    edges = [nd for nd in tree.preorder_node_iter() if nd.parent_node is not None]
+    user_ids = list()
+    for idx in range(n_genomes):
+        node = rng.choice(edges)
+        parent = node.parent_node
+        length = node.edge.length or 0.1
+        parent.remove_child(node)
+        new_parent = dendropy.Node()
+        parent.add_child(new_parent)
+        new_parent.edge.length = length / 2
+        new_parent.add_child(node)
+        node.edge.length = length / 2
+        gid = f'{prefix}{idx}'
+        leaf = dendropy.Node(taxon=tree.taxon_namespace.require_taxon(label=gid))
+        new_parent.add_child(leaf)
+        leaf.edge.length = rng.uniform(0.01, 0.2)
+        user_ids.append(gid)
+    RelativeDistance().decorate_rel_dist(tree.seed_node)
+    return user_ids
+
+
+def random_tophit_rows(n_genes: int, n_hits: int = 3, n_families: int = 120,
+                       seed: int = 1) -> List[str]:
+    """Returns the rows of a random top hit file (without the header)."""
+    rng = random.Random(seed)
+    rows = list()
+    for idx in range(n_genes):
+        hits = list()
+        for hmm_idx in rng.sample(range(n_families), min(n_hits, n_families)):
+            hits.append(f'TIGR{hmm_idx:05d},{rng.uniform(1e-100, 1e-5):.2e},{rng.uniform(10, 900):.1f}')
+        rows.append(f'gene_{idx}\t{";".join(hits)}')
+    return rows
+
+
+def write_fasta(path: str, seqs: Dict[str, str]):
+    """Write sequences to a FASTA file."""
+    with open(path, 'w') as fh:
+        for seq_id, seq in seqs.items():
+            fh.write(f'>{seq_id}\n{seq}\n')
+
+
+def write_marker_list(path: str, width: int, n_markers: int = 120):
+    """Write a marker info file for an MSA of width columns."""
+    lengths = [width // n_markers] * n_markers
+    lengths[-1] += width - sum(lengths)
+    with open(path, 'w') as fh:
+        fh.write('Marker Id\tName\tDescription\tLength (bp)\n')
+        for idx, length in enumerate(lengths):
+            fh.write(f'TIGR{idx:05d}\tmarker_{idx}\tsynthetic marker\t{length}\n')
+
+
+def write_tophit_file(path: str, rows: List[str]):
+    """Write a top hit file."""
+    with open(path, 'w') as fh:
+        fh.write('Gene Id\tTop hits (Family id,e-value,bitscore)\n')
+        for row in rows:
+            fh.write(row + '\n')
+
+
+def write_reference_data(path: str, taxonomy: Dict[str, List[str]],
+                         tree: Optional[dendropy.Tree] = None,
+                         median_reds: Optional[Dict[str, float]] = None):
+    """Write the subset of a reference data package needed by the benchmarks
+    (the GTDB taxonomy, metadata and, if a RED annotated tree is given, the
+    RED of each node) to a directory."""
+    median_reds = median_reds or MEDIAN_REDS
+    for directory in ('taxonomy', 'metadata', 'mrca_red'):
+        os.makedirs(os.path.join(path, directory), exist_ok=True)
+    Taxonomy().write(taxonomy, os.path.join(path, 'taxonomy', 'gtdb_taxonomy.tsv'))
+    with open(os.path.join(path, 'metadata', 'metadata.txt'), 'w') as fh:
+        fh.write('VERSION_DATA=r0\n')
+        fh.write(f'RED_DIST_BAC_DICT={json.dumps(median_reds)}\n')
+        fh.write(f'RED_DIST_ARC_DICT={json.dumps(median_reds)}\n')
+    if tree is not None:
+        with open(os.path.join(path, 'mrca_red', 'gtdbtk_r0_bac120.tsv'), 'w') as fh:
+            for node in tree.postorder_node_iter():
+                if node.is_leaf():
+                    fh.write(f'{node.taxon.label}\t{node.rel_dist}\n')
+                else:
+                    children = node.child_nodes()
+                    labels = [next(children[i].leaf_iter()).taxon.label for i in (0, -1)]
+                    fh.write(f'{labels[0]}|{labels[1]}\t{node.rel_dist}\n')
+
+
+def scaled(n: int, scale: float) -> int:
+    """Scale a benchmark size, keeping it at least one."""
+    return max(1, int(math.ceil(n * scale)))
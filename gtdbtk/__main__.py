@@ -23,9 +23,9 @@ from gtdbtk import __author__, __copyright__, __version__
 from gtdbtk.cli import get_main_parser
 from gtdbtk.biolib_lite.exceptions import BioLibError
 from gtdbtk.biolib_lite.logger import logger_setup
+from gtdbtk.config.common import CONFIG
 from gtdbtk.exceptions import *
-from gtdbtk.files.stage_logger import StageLogger
-from gtdbtk.main import OptionsParser
+from gtdbtk.telemetry import write_chrome_trace
 from gtdbtk.tools import get_gtdbtk_latest_version
 
 
@@ -51,6 +51,8 @@ def print_help():
   Tools:
     infer_ranks        -> Establish taxonomic ranks of internal nodes using RED
     ani_rep            -> Calculates ANI to GTDB representative genomes
+    serve              -> Keep the reference data loaded and run classify_wf jobs
+    merge              -> Merge the output of classify_wf run on shards of the genomes
     trim_msa           -> Trim an untrimmed MSA file based on a mask
     export_msa         -> Export the untrimmed archaeal or bacterial MSA file
     remove_labels      -> Remove labels (bootstrap values, node labels) from an Newick tree
@@ -86,10 +88,22 @@ def main():
         sys.exit(0)
     else:
         args = get_main_parser().parse_args()
+    run(args)
 
+
+def run(args, silent=False):
+    """Run a GTDB-Tk command, exiting with a non-zero status on error.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The parsed command line arguments.
+    silent : bool
+        Only log errors to the console (e.g. jobs run by gtdbtk serve).
+    """
     # setup logger
     logger_setup(args.out_dir if hasattr(args, 'out_dir') and args.out_dir else None,
-                 "gtdbtk.log", "GTDB-Tk", __version__, False,
+                 "gtdbtk.log", "GTDB-Tk", __version__, silent,
                  hasattr(args, 'debug') and args.debug)
     logger = logging.getLogger('timestamp')
 
@@ -97,6 +111,7 @@ def main():
     # -------------------------------------------------
     # do what we came here to do
     try:
+        from gtdbtk.main import OptionsParser
         gt_parser = OptionsParser(__version__,
                                   args.out_dir if hasattr(args, 'out_dir') and args.out_dir else None)
         gt_parser.parse_options(args)
@@ -133,8 +148,12 @@ def main():
         sys.exit(1)
     finally:
         # if stageLogger instance is defined, write out the stage log file
-        if StageLogger.instance:
-            StageLogger().write()
+        # (it is only imported by the commands which use it)
+        stage_logger = sys.modules.get('gtdbtk.files.stage_logger')
+        if stage_logger and stage_logger.StageLogger.instance:
+            stage_logger.StageLogger().write()
+        if CONFIG.TRACE_FILE:
+            write_chrome_trace(CONFIG.TRACE_FILE)
 
 
 
@@ -0,0 +1,219 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.files.columnar import get_table_format, table_path, write_table
+
+CLUSTER_METHODS = ('greedy', 'single')
+
+
+class ANIGraph(object):
+    """The ANI between pairs of genomes, stored as a sparse (COO) matrix.
+
+    Only the pairs which were compared are stored, so the memory used grows
+    with the number of candidate pairs rather than the square of the number
+    of genomes. Each pair is stored once, with the lower index first.
+    """
+
+    def __init__(self, genome_ids: List[str], row: np.ndarray, col: np.ndarray,
+                 ani: np.ndarray, af: np.ndarray, mash_dist: np.ndarray):
+        self.genome_ids = genome_ids
+        self.row = row
+        self.col = col
+        self.ani = ani
+        self.af = af
+        self.mash_dist = mash_dist
+
+    @classmethod
+    def from_results(cls, genome_ids: List[str],
+                     fastani_results: Dict[str, Dict[str, Dict[str, float]]],
+                     mash_dists: Optional[Dict[Tuple[str, str], float]] = None) -> 'ANIGraph':
+        """Create the graph from the FastANI (and Mash) results.
+
+        Parameters
+        ----------
+        genome_ids : List[str]
+            The id of every genome (the nodes of the graph).
+        fastani_results : Dict[str, Dict[str, Dict[str, float]]]
+            The ANI/AF of each compared pair, as returned by FastANI.run.
+        mash_dists : Optional[Dict[Tuple[str, str], float]]
+            The Mash distance of each candidate pair, if Mash was run.
+        """
+        idx = {gid: i for i, gid in enumerate(genome_ids)}
+        edges = dict()
+        for gid_a, hits in fastani_results.items():
+            for gid_b, hit in hits.items():
+                i, j = sorted((idx[gid_a], idx[gid_b]))
+                if i == j:
+                    continue
+                ani, af = edges.get((i, j), (0.0, 0.0))
+                edges[(i, j)] = (max(ani, hit['ani']), max(af, hit['af']))
+
+        pairs = sorted(edges)
+        row = np.array([i for i, _ in pairs], dtype=np.int64)
+        col = np.array([j for _, j in pairs], dtype=np.int64)
+        ani = np.array([edges[pair][0] for pair in pairs], dtype=np.float64)
+        af = np.array([edges[pair][1] for pair in pairs], dtype=np.float64)
+        mash_dist = np.full(len(pairs), np.nan)
+        if mash_dists:
+            for k, (i, j) in enumerate(pairs):
+                gid_a, gid_b = sorted((genome_ids[i], genome_ids[j]))
+                mash_dist[k] = mash_dists.get((gid_a, gid_b), np.nan)
+        return cls(genome_ids, row, col, ani, af, mash_dist)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.row)
+
+    def _adjacency(self, min_ani: float, min_af: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the symmetric adjacency (CSR index pointer and column
+        indices) of the pairs which satisfy both thresholds."""
+        keep = (self.ani >= min_ani) & (self.af >= min_af)
+        src = np.concatenate([self.row[keep], self.col[keep]])
+        dst = np.concatenate([self.col[keep], self.row[keep]])
+        order = np.lexsort((dst, src))
+        indptr = np.zeros(len(self.genome_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(self.genome_ids)), out=indptr[1:])
+        return indptr, dst[order]
+
+    def cluster(self, min_ani: float, min_af: float, method: str = 'greedy') -> np.ndarray:
+        """Cluster the genomes by the pairs which satisfy the ANI and AF thresholds.
+
+        Representatives are chosen in order of the number of genomes they are
+        linked to (ties are broken by the genome id).
+
+        Parameters
+        ----------
+        min_ani : float
+            The minimum ANI for two genomes to be linked.
+        min_af : float
+            The minimum AF for two genomes to be linked.
+        method : str
+            greedy: each representative takes all unassigned genomes it is linked to.
+            single: the connected components of the linked genomes (single-linkage).
+
+        Returns
+        -------
+        np.ndarray
+            The index of the representative of each genome.
+        """
+        if method not in CLUSTER_METHODS:
+            raise GTDBTkExit(f'Unknown clustering method: {method}')
+        indptr, indices = self._adjacency(min_ani, min_af)
+        degree = np.diff(indptr)
+        order = sorted(range(len(self.genome_ids)),
+                       key=lambda i: (-degree[i], self.genome_ids[i]))
+
+        rep = np.full(len(self.genome_ids), -1, dtype=np.int64)
+        if method == 'greedy':
+            for i in order:
+                if rep[i] >= 0:
+                    continue
+                rep[i] = i
+                neighbours = indices[indptr[i]:indptr[i + 1]]
+                rep[neighbours[rep[neighbours] < 0]] = i
+        else:
+            for i in order:
+                if rep[i] >= 0:
+                    continue
+                rep[i] = i
+                stack = [i]
+                while stack:
+                    j = stack.pop()
+                    neighbours = indices[indptr[j]:indptr[j + 1]]
+                    neighbours = neighbours[rep[neighbours] < 0]
+                    rep[neighbours] = i
+                    stack.extend(neighbours.tolist())
+        return rep
+
+    def get_edge(self, i: int, j: int) -> Optional[Tuple[float, float]]:
+        """Returns the ANI and AF between two genomes, if they were compared."""
+        i, j = sorted((i, j))
+        lo = np.searchsorted(self.row, i, side='left')
+        hi = np.searchsorted(self.row, i, side='right')
+        k = lo + np.searchsorted(self.col[lo:hi], j)
+        if k < hi and self.col[k] == j:
+            return float(self.ani[k]), float(self.af[k])
+        return None
+
+
+class ANIEdgeFile(object):
+    """The ANI of each pair of genomes which were compared."""
+    name = 'ani_edges.tsv'
+
+    def __init__(self, root: str, prefix: str, graph: ANIGraph):
+        self.logger = logging.getLogger('timestamp')
+        self.path = os.path.join(root, table_path(f'{prefix}.{self.name}'))
+        self.graph = graph
+
+    def write(self):
+        ids = self.graph.genome_ids
+        if get_table_format() != 'tsv':
+            mash_dist = self.graph.mash_dist
+            write_table(self.path, {'genome_a': [ids[i] for i in self.graph.row],
+                                    'genome_b': [ids[j] for j in self.graph.col],
+                                    'mash_distance': [None if np.isnan(x) else x for x in mash_dist.tolist()],
+                                    'fastani_ani': self.graph.ani.tolist(),
+                                    'fastani_af': self.graph.af.tolist()},
+                        dictionary_columns=('genome_a', 'genome_b'))
+            self.logger.info(f'ANI between {self.graph.n_edges:,} pairs of genomes saved to: {self.path}')
+            return
+        with open(self.path, 'w') as fh:
+            fh.write('genome_a\tgenome_b\tmash_distance\tfastani_ani\tfastani_af\n')
+            for i, j, dist, ani, af in zip(self.graph.row, self.graph.col, self.graph.mash_dist,
+                                           self.graph.ani, self.graph.af):
+                dist = 'N/A' if np.isnan(dist) else dist
+                fh.write(f'{ids[i]}\t{ids[j]}\t{dist}\t{ani}\t{af}\n')
+        self.logger.info(f'ANI between {self.graph.n_edges:,} pairs of genomes saved to: {self.path}')
+
+
+class ANIClusterFile(object):
+    """The cluster and representative of each genome."""
+    name = 'ani_clusters.tsv'
+
+    def __init__(self, root: str, prefix: str, graph: ANIGraph, rep: np.ndarray):
+        self.logger = logging.getLogger('timestamp')
+        self.path = os.path.join(root, f'{prefix}.{self.name}')
+        self.graph = graph
+        self.rep = rep
+
+    def write(self):
+        ids = self.graph.genome_ids
+
+        # Clusters are numbered from largest to smallest.
+        members = dict()
+        for i, rep in enumerate(self.rep.tolist()):
+            members.setdefault(rep, list()).append(i)
+        clusters = sorted(members.items(), key=lambda x: (-len(x[1]), ids[x[0]]))
+
+        with open(self.path, 'w') as fh:
+            fh.write('user_genome\tcluster_id\trepresentative\tcluster_size\t'
+                     'ani_to_representative\taf_to_representative\n')
+            for cluster_id, (rep, cur_members) in enumerate(clusters):
+                for i in sorted(cur_members, key=lambda x: (x != rep, ids[x])):
+                    if i == rep:
+                        ani, af = 100.0, 1.0
+                    else:
+                        ani, af = self.graph.get_edge(i, rep) or ('N/A', 'N/A')
+                    fh.write(f'{ids[i]}\t{cluster_id}\t{ids[rep]}\t{len(cur_members)}\t{ani}\t{af}\n')
+        self.logger.info(f'{len(ids):,} genomes in {len(clusters):,} clusters saved to: {self.path}')
@@ -3,6 +3,7 @@ import os
 from collections import defaultdict
 from typing import List
 
+from gtdbtk.ani_cluster import ANIClusterFile, ANIEdgeFile, ANIGraph
 from gtdbtk.biolib_lite.common import canonical_gid
 from gtdbtk.biolib_lite.execute import check_dependencies
 from gtdbtk.biolib_lite.taxonomy import Taxonomy
@@ -11,7 +12,9 @@ from gtdbtk.config.output import DIR_ANI_REP_INT_MASH
 from gtdbtk.exceptions import GTDBTkExit
 from gtdbtk.external.fastani import FastANI
 from gtdbtk.external.mash import Mash
+from gtdbtk.files.columnar import detect_format, get_table_format, read_table, table_path, write_table
 from gtdbtk.files.gtdb_radii import GTDBRadiiFile
+from gtdbtk.telemetry import span
 from gtdbtk.tools import get_ref_genomes
 
 
@@ -85,6 +88,72 @@ class ANIRep(object):
                        min_af,
                        taxonomy)
 
+    def run_cluster(self, genomes, no_mash, mash_d, out_dir, prefix, mash_k, mash_v, mash_s,
+                    min_af, min_ani, method):
+        """Clusters the user genomes by the ANI between them.
+
+        Mash is used to find the candidate pairs of genomes, FastANI is only
+        run between these pairs, and the genomes are clustered from the
+        resulting sparse graph.
+
+        Parameters
+        ----------
+        genomes : dict[str, str]
+            Dict[genome_id] = fasta_path
+        no_mash : bool
+            True if all pairs of genomes should be compared, False to use Mash.
+        mash_d : float
+             maximum distance to keep [0-1]
+        out_dir : str
+            The directory to write the output files to.
+        prefix : str
+            The prefix to use when writing output files.
+        mash_k : int
+            k-mer size [1-32]
+        mash_v : float
+            maximum p-value to keep [0-1]
+        mash_s : int
+            maximum number of non-redundant hashes
+        min_af : float
+            minimum alignment fraction for two genomes to be clustered
+        min_ani : float
+            minimum ANI for two genomes to be clustered
+        method : str
+            The clustering method (greedy or single).
+        """
+        self.check_dependencies(no_mash)
+        if len(genomes) < 2:
+            raise GTDBTkExit('At least two genomes are required for clustering.')
+
+        d_compare = defaultdict(set)
+        mash_dists = None
+        if not no_mash:
+            dir_mash = os.path.join(out_dir, DIR_ANI_REP_INT_MASH)
+            mash = Mash(self.cpus, dir_mash, prefix)
+            self.logger.info(f'Using Mash version {mash.version()}')
+            with span('mash', genomes=len(genomes)):
+                mash_dists = mash.run_pairwise(genomes, mash_d, mash_k, mash_v, mash_s)
+            for gid_a, gid_b in mash_dists:
+                d_compare[gid_a].add(gid_b)
+        else:
+            self.logger.warning('All pairs of genomes will be compared as Mash '
+                                'is not being used, this may take a long time.')
+            gids = sorted(genomes)
+            for idx, gid_a in enumerate(gids[:-1]):
+                d_compare[gid_a] = set(gids[idx + 1:])
+
+        n_pairs = sum(len(x) for x in d_compare.values())
+        self.logger.info(f'Calculating ANI between {n_pairs:,} pairs of genomes '
+                         f'with FastANI v{FastANI._get_version()}.')
+        fastani = FastANI(self.cpus, force_single=False)
+        with span('fastani', pairs=n_pairs):
+            fastani_results = fastani.run(d_compare, genomes)
+
+        graph = ANIGraph.from_results(sorted(genomes), fastani_results, mash_dists)
+        rep = graph.cluster(min_ani, min_af, method)
+        ANIEdgeFile(out_dir, prefix, graph).write()
+        ANIClusterFile(out_dir, prefix, graph, rep).write()
+
     def run_mash_fastani(self,genomes, no_mash, max_d, out_dir, prefix, mash_k, mash_v, mash_s, mash_max_dist=100, mash_db=None):
         """Runs the mash and fastani pipeline.
         This step is separated from the run function because it is called from 2 different
@@ -127,7 +196,8 @@ class ANIRep(object):
 
             mash = Mash(self.cpus, dir_mash, prefix)
             self.logger.info(f'Using Mash version {mash.version()}')
-            mash_results = mash.run(genomes, ref_genomes, max_d, mash_k, mash_v, mash_s, mash_max_dist, mash_db)
+            with span('mash', genomes=len(genomes)):
+                mash_results = mash.run(genomes, ref_genomes, max_d, mash_k, mash_v, mash_s, mash_max_dist, mash_db)
             for qry_gid, ref_hits in mash_results.items():
                 d_compare[qry_gid] = d_compare[qry_gid].union(set(ref_hits.keys()))
 
@@ -138,7 +208,8 @@ class ANIRep(object):
 
         self.logger.info(f'Calculating ANI with FastANI v{FastANI._get_version()}.')
         fastani = FastANI(self.cpus, force_single=True)
-        fastani_results = fastani.run(d_compare, d_paths)
+        with span('fastani', genomes=len(d_compare)):
+            fastani_results = fastani.run(d_compare, d_paths)
         return fastani_results
 
 class ANISummaryFile(object):
@@ -163,7 +234,7 @@ class ANISummaryFile(object):
         if prefix is None:
             self.path = root
         else:
-            self.path = os.path.join(root, f'{prefix}.{self.name}')
+            self.path = os.path.join(root, table_path(f'{prefix}.{self.name}'))
         self.results = results
         self.taxonomy = taxonomy
         self.logger = logging.getLogger('timestamp')
@@ -182,26 +253,42 @@ class ANISummaryFile(object):
             cols += ['other_related_references(genome_id,species_name,radius,ANI,AF)']
         return cols
 
+    def _iter_rows(self, ani_screen_step=False):
+        """Yields the values of each row, in column order."""
+        for qry_gid, ref_hits in sorted(self.results.items()):
+            for ref_gid, ref_hit in sorted(ref_hits.items(), key=lambda x: (-x[1]['af'], -x[1]['ani'], x[0])):
+                taxonomy_str = ';'.join(self.taxonomy[canonical_gid(ref_gid)])
+                row = [qry_gid, ref_gid, ref_hit['ani'], ref_hit['af'], taxonomy_str]
+                if ani_screen_step:
+                    row.append(ref_hit.get('other_related_refs', '') or '')
+                yield row
+
+    def _write_columnar(self, ani_screen_step=False):
+        cols = self.get_col_order(ani_screen_step=ani_screen_step)
+        columns = {col: list() for col in cols}
+        for row in self._iter_rows(ani_screen_step):
+            for col, value in zip(cols, row):
+                columns[col].append(value)
+        write_table(self.path, columns, dictionary_columns=('reference_genome', 'reference_taxonomy'))
+        self.logger.info(f'Summary of results saved to: {self.path}')
+
     def write(self,ani_screen_step=False):
+        if get_table_format() != 'tsv':
+            self._write_columnar(ani_screen_step)
+            return
         with open(self.path, 'w') as fh:
             cols = self.get_col_order(ani_screen_step=ani_screen_step)
             fh.write(f'\t'.join(cols) + '\n')
-            for qry_gid, ref_hits in sorted(self.results.items()):
-                for ref_gid, ref_hit in sorted(ref_hits.items(), key=lambda x: (-x[1]['af'], -x[1]['ani'], x[0])):
-                    canonical_rid = canonical_gid(ref_gid)
-                    taxonomy_str = ';'.join(self.taxonomy[canonical_rid])
-                    fh.write(f'{qry_gid}\t{ref_gid}')
-                    fh.write(f'\t{ref_hit["ani"]}\t{ref_hit["af"]}')
-                    fh.write(f'\t{taxonomy_str}')
-                    if ani_screen_step:
-                        fh.write(f'\t{ref_hit.get("other_related_refs","") or ""}')
-                    fh.write(f'\n')
+            for row in self._iter_rows(ani_screen_step):
+                fh.write('\t'.join(map(str, row)) + '\n')
         self.logger.info(f'Summary of results saved to: {self.path}')
 
     def read(self):
         """Read the ani_summary from disk."""
         if not os.path.isfile(self.path):
             raise GTDBTkExit(f'Error, ANI summary file not found: {self.path}')
+        if detect_format(self.path) != 'tsv':
+            return self._read_columnar()
         with open(self.path) as fh:
 
             # Load and verify the columns match the expected order.
@@ -217,6 +304,21 @@ class ANISummaryFile(object):
                 results[qry_gid]={ref_gid:{'ani': float(ani), 'af': float(af), 'taxonomy': taxonomy_str,'other_refs':other_refs}}
         return results
 
+    def _read_columnar(self):
+        """Read a Parquet/Arrow ANI summary file, written with or without the
+        other related references column (ani_screen or ani_rep)."""
+        columns = read_table(self.path)
+        if list(columns) not in (self.get_col_order(True), self.get_col_order(False)):
+            raise GTDBTkExit(f'The ANI summary file columns are inconsistent: {list(columns)}')
+        other_refs = columns.get(self.get_col_order(True)[-1], [''] * len(columns['user_genome']))
+        results = {}
+        for qry_gid, ref_gid, ani, af, taxonomy_str, cur_other_refs in zip(
+                columns['user_genome'], columns['reference_genome'], columns['fastani_ani'],
+                columns['fastani_af'], columns['reference_taxonomy'], other_refs):
+            results[qry_gid] = {ref_gid: {'ani': float(ani), 'af': float(af), 'taxonomy': taxonomy_str,
+                                          'other_refs': cur_other_refs}}
+        return results
+
 
 class ANIClosestFile(object):
     name = 'ani_closest.tsv'
@@ -59,7 +59,7 @@ class ANIScreener(object):
             for domain,results in mash_classified_user_genomes.items():
                 ani_summary_file = ANISummaryFile(os.path.join(out_dir,DIR_ANISCREEN),prefix,results,taxonomy,domain)
                 ani_summary_file.write(ani_screen_step=True)
-                reports[domain] = os.path.join(out_dir,DIR_ANISCREEN,prefix + '.' + domain + '.ani_summary.tsv')
+                reports[domain] = ani_summary_file.path
         len_mash_classified_bac120 = len(mash_classified_user_genomes['bac120']) \
             if 'bac120' in mash_classified_user_genomes else 0
 
@@ -21,8 +21,6 @@ import os
 import re
 import sys
 
-from tqdm import tqdm
-
 from gtdbtk.config.common import CONFIG
 from .common import make_sure_path_exists
 
@@ -238,12 +236,15 @@ class TqdmStream(object):
         https://github.com/tqdm/tqdm/issues/313
     """
 
-    def __init__(self):
-        tqdm(disable=True, total=0)  # initialise internal lock
-
     @classmethod
     def write(cls, msg):
-        tqdm.write(msg, end='')
+        # tqdm is only loaded once a progress bar is shown, until then there
+        # is no progress bar to write around (and no need to load it).
+        tqdm = sys.modules.get('tqdm')
+        if tqdm is None:
+            sys.stdout.write(msg)
+        else:
+            tqdm.tqdm.write(msg, end='')
 
     # is this required?
     # @classmethod
@@ -132,7 +132,7 @@ def read_fasta_seq(fasta_file, keep_annotation=False):
         seq = None
         with open_file(fasta_file, mode) as f:
 
-            for line in f.readlines():
+            for line in f:
                 if isinstance(line, bytes):
                     line = line.decode()
                 # skip blank lines
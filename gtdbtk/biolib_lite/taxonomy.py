@@ -23,6 +23,7 @@ __maintainer__ = 'Donovan Parks'
 __email__ = 'donovan.parks@gmail.com'
 
 import logging
+import os
 import re
 from collections import defaultdict
 from typing import Dict, List
@@ -31,6 +32,7 @@ import dendropy
 
 from gtdbtk.biolib_lite.common import canonical_gid, is_float
 from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.files.taxonomy_index import TaxonomyIndex
 
 """
 To do:
@@ -38,6 +40,15 @@ To do:
      requires the viral and plasmid phylogenies to be taxonomically consistent.
 """
 
+# Taxonomy files kept in memory by a long-running process (gtdbtk serve),
+# keyed by (path, canonical_ids) with the size and mtime of the file read.
+_resident = dict()
+
+
+def _file_key(taxonomy_file):
+    st = os.stat(taxonomy_file)
+    return st.st_size, st.st_mtime_ns
+
 
 class Taxonomy(object):
     """Manipulation of Greengenes-style taxonomy files and strings.
@@ -566,6 +577,9 @@ class Taxonomy(object):
             All children taxa for of each named taxonomic group.
         """
 
+        if isinstance(taxonomy, TaxonomyIndex):
+            return defaultdict(set, taxonomy.taxon_children())
+
         taxon_children = defaultdict(set)
         for taxon_id, taxa in taxonomy.items():
             for i, taxon in enumerate(taxa):
@@ -602,6 +616,9 @@ class Taxonomy(object):
             All children taxa for the named taxonomic group.
         """
 
+        if isinstance(taxonomy, TaxonomyIndex):
+            return taxonomy.children(taxon)
+
         c = set()
         for taxon_id, taxa in taxonomy.items():
             if taxon in taxa:
@@ -677,6 +694,9 @@ class Taxonomy(object):
 
         assert (rank_label in Taxonomy.rank_labels)
 
+        if isinstance(taxonomy, TaxonomyIndex):
+            return defaultdict(set, taxonomy.extant_taxa_for_rank(Taxonomy.rank_labels.index(rank_label)))
+
         d = defaultdict(set)
         rank_index = Taxonomy.rank_labels.index(rank_label)
         for taxon_id, taxa in taxonomy.items():
@@ -699,6 +719,9 @@ class Taxonomy(object):
             Taxa at each taxonomic rank.
         """
 
+        if isinstance(taxonomy, TaxonomyIndex):
+            return defaultdict(set, taxonomy.named_lineages_at_rank())
+
         named_lineages = defaultdict(set)
         for taxa in taxonomy.values():
             for i, taxon in enumerate(taxa):
@@ -810,10 +833,15 @@ class Taxonomy(object):
             True if to use the canonical ID format, False otherwise.
         """
 
+        resident = _resident.get((os.path.abspath(taxonomy_file), canonical_ids))
+        if resident is not None and resident[0] == _file_key(taxonomy_file):
+            # Copied, as callers may modify the taxonomy they are given.
+            return {k: list(v) for k, v in resident[1].items()}
+
         try:
             d = {}
             with open(taxonomy_file, 'r') as f:
-                for row, line in enumerate(f.readlines()):
+                for row, line in enumerate(f):
                     line_split = line.split('\t')
 
                     if len(line_split) != 2:
@@ -837,6 +865,14 @@ class Taxonomy(object):
 
         return d
 
+    def keep_resident(self, taxonomy_file: str, canonical_ids: bool = False):
+        """Keep a taxonomy file in memory, later reads of the unchanged file
+        return a copy rather than parsing the file again."""
+        key = (os.path.abspath(taxonomy_file), canonical_ids)
+        _resident.pop(key, None)
+        file_key = _file_key(taxonomy_file)
+        _resident[key] = (file_key, self.read(taxonomy_file, canonical_ids))
+
     def write(self, taxonomy, output_file):
         """Write Greengenes-style taxonomy file.
 
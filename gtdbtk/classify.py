@@ -16,13 +16,14 @@
 ###############################################################################
 
 
+import json
 import logging
 import os
-import random
 import shutil
 import sys
 from collections import defaultdict
 from operator import itemgetter
+from typing import Optional
 
 import dendropy
 
@@ -33,7 +34,7 @@ from gtdbtk.ani_rep import ANIRep, ANISummaryFile
 from gtdbtk.biolib_lite.common import make_sure_path_exists,canonical_gid
 from gtdbtk.biolib_lite.execute import check_dependencies
 from gtdbtk.biolib_lite.newick import parse_label
-from gtdbtk.biolib_lite.seq_io import read_seq, read_fasta
+from gtdbtk.biolib_lite.seq_io import read_seq
 from gtdbtk.biolib_lite.taxonomy import Taxonomy
 from gtdbtk.config.output import *
 from gtdbtk.exceptions import GenomeMarkerSetUnknown, GTDBTkExit
@@ -41,19 +42,27 @@ from gtdbtk.external.fastani import FastANI
 from gtdbtk.external.pplacer import Pplacer
 
 from gtdbtk.files.classify_summary import ClassifySummaryFileAR53, ClassifySummaryFileBAC120, ClassifySummaryFileRow
+from gtdbtk.files.columnar import table_path
 from gtdbtk.files.marker.copy_number import CopyNumberFileAR53, CopyNumberFileBAC120
+from gtdbtk.files.rank_authority import RankAuthorityIndex
+from gtdbtk.files.stage_logger import StageLogger, input_fingerprint
 from gtdbtk.files.pplacer_classification import PplacerClassifyFileBAC120, PplacerClassifyFileAR53, \
     PplacerLowClassifyFileBAC120
 from gtdbtk.files.prodigal.tln_table_summary import TlnTableSummaryFile
 from gtdbtk.files.red_dict import REDDictFileAR53, REDDictFileBAC120
 from gtdbtk.files.gtdb_radii import GTDBRadiiFile
+from gtdbtk.files.msa_stats import MSAStats
 from gtdbtk.files.missing_genomes import DisappearingGenomesFileAR53, DisappearingGenomesFileBAC120
 from gtdbtk.files.tree_mapping import GenomeMappingFile, GenomeMappingFileRow
+from gtdbtk.governor import get_governor
 from gtdbtk.markers import Markers
 from gtdbtk.relative_distance import RelativeDistance
+from gtdbtk.reroot_tree import LeafIndex, OutgroupPlacement, reroot_on_edge
 from gtdbtk.split import Split
-from gtdbtk.tools import add_ncbi_prefix, symlink_f, get_memory_gb, get_reference_ids, TreeTraversal, \
-    calculate_patristic_distance, tqdm_log, standardise_taxonomy, limit_rank, aa_percent_msa
+from gtdbtk.telemetry import span, traced
+from gtdbtk.tools import add_ncbi_prefix, symlink_f, get_reference_ids, TreeTraversal, \
+    calculate_patristic_distance, tqdm_log, standardise_taxonomy, limit_rank, \
+    get_gtdb_taxonomy_index, get_reference_manifest
 
 
 sys.setrecursionlimit(15000)
@@ -62,7 +71,8 @@ sys.setrecursionlimit(15000)
 class Classify(object):
     """Determine taxonomic classification of genomes by ML placement."""
 
-    def __init__(self, cpus=1, pplacer_cpus=None, af_threshold=None,skip_pplacer=False):
+    def __init__(self, cpus=1, pplacer_cpus=None, af_threshold=None,skip_pplacer=False,
+                 pplacer_max_memory=None):
         """Initialize."""
 
         check_dependencies(['pplacer', 'guppy', 'fastANI'])
@@ -71,7 +81,7 @@ class Classify(object):
 
         self.taxonomy_file = CONFIG.TAXONOMY_FILE
         self.af_threshold = af_threshold if af_threshold else CONFIG.AF_THRESHOLD
-        self.gtdb_taxonomy = Taxonomy().read(self.taxonomy_file)
+        self.gtdb_taxonomy = get_gtdb_taxonomy_index()
 
         self.order_rank = ["d__", "p__", "c__", "o__", 'f__', 'g__', 's__']
 
@@ -85,6 +95,7 @@ class Classify(object):
 
         self.cpus = max(cpus, 1)
         self.pplacer_cpus = max(pplacer_cpus if pplacer_cpus else cpus, 1)
+        self.pplacer_max_memory = pplacer_max_memory
 
         self.gtdb_radii = GTDBRadiiFile()
 
@@ -102,6 +113,7 @@ class Classify(object):
 
         self.species_radius = self.parse_radius_file()
         self.reference_ids = get_reference_ids()
+        self.rank_authority = None
 
         # rank_of_interest determine the rank in the tree_mapping file for
         # lower classification
@@ -109,15 +121,9 @@ class Classify(object):
 
     @staticmethod
     def parse_radius_file():
-        results = {}
-        with open(CONFIG.RADII_FILE) as f:
-            for line in f:
-                infos = line.strip().split('\t')
-                gid = infos[1]
-                if infos[1].startswith('GB_') or infos[1].startswith('RS_'):
-                    gid = gid[3:]
-                results[gid] = float(infos[2])
-        return results
+        """Returns the species ANI radius of each representative genome
+        (without the GB_/RS_ prefix), read once from the reference manifest."""
+        return get_reference_manifest().species_radius
 
     def parse_leaf_to_dir_path(self, genome_id):
         """ Convert a genome id to a path.
@@ -151,27 +157,6 @@ class Classify(object):
                       idx_tree=None):
         """Place genomes into reference tree using pplacer."""
 
-        # Warn if the memory is insufficient
-        mem_warning = 'pplacer requires ~{req_gb} GB of RAM to fully load the ' \
-                      '{domain} tree into memory. However, {cur_gb:,} GB was ' \
-                      'detected. This may affect pplacer performance, or fail' \
-                      ' if there is insufficient swap space.'
-        mem_gb = get_memory_gb()
-        if mem_gb is not None:
-            mem_total = mem_gb['MemTotal']
-            if marker_set_id == 'bac120' and levelopt is None and mem_total < CONFIG.PPLACER_MIN_RAM_BAC_FULL:
-                self.logger.warning(mem_warning.format(req_gb=CONFIG.PPLACER_MIN_RAM_BAC_FULL,
-                                                       domain='bacterial',
-                                                       cur_gb=mem_total))
-            if marker_set_id == 'bac120' and levelopt == 'high' and mem_total < CONFIG.PPLACER_MIN_RAM_BAC_SPLIT:
-                self.logger.warning(mem_warning.format(req_gb=CONFIG.PPLACER_MIN_RAM_BAC_SPLIT,
-                                                       domain='bacterial',
-                                                       cur_gb=mem_total))
-            elif marker_set_id == 'ar53' and mem_total < CONFIG.PPLACER_MIN_RAM_ARC:
-                self.logger.warning(mem_warning.format(req_gb=CONFIG.PPLACER_MIN_RAM_ARC,
-                                                       domain='archaeal',
-                                                       cur_gb=mem_total))
-
         # rename user MSA file for compatibility with pplacer
         if not user_msa_file.endswith('.fasta') and not user_msa_file.endswith('.gz'):
             if marker_set_id == 'bac120':
@@ -187,15 +172,6 @@ class Classify(object):
         # run pplacer to place bins in reference genome tree
         num_genomes = sum([1 for _seq_id, _seq in read_seq(user_msa_file)])
 
-        # check if a scratch file is to be created
-        pplacer_mmap_file = None
-        if scratch_dir:
-            self.logger.info('Using a scratch file for pplacer allocations. '
-                             'This decreases memory usage and performance.')
-            pplacer_mmap_file = os.path.join(
-                scratch_dir, prefix + ".pplacer.scratch")
-            make_sure_path_exists(scratch_dir)
-
         # get path to pplacer reference package
         pplacer_ref_pkg = None
         if marker_set_id == 'bac120':
@@ -261,18 +237,7 @@ class Classify(object):
             self.logger.error('There was an error determining the marker set.')
             raise GenomeMarkerSetUnknown
 
-        pplacer = Pplacer()
-        if levelopt is None or levelopt == 'high':
-            self.logger.info(f'pplacer version: {pplacer.version}')
-        # #DEBUG: Skip pplacer
-        #run_pplacer = True
-        if not self.skip_pplacer:
-            pplacer.run(self.pplacer_cpus, 'wag', pplacer_ref_pkg, pplacer_json_out,
-                        user_msa_file, pplacer_out, pplacer_mmap_file)
-        else:
-            self.logger.warning('Skipping pplacer for debug purposes.')
-
-        # extract tree
+        # path to the tree extracted from the placements
         tree_file = None
         if marker_set_id == 'bac120':
             if levelopt is None:
@@ -291,7 +256,69 @@ class Classify(object):
             self.logger.error('There was an error determining the marker set.')
             raise GenomeMarkerSetUnknown
 
+        # placements which were completed by a previous run are resumed
+        stage_logger = StageLogger()
+        checkpoint_key = '/'.join(str(x) for x in ('pplacer', marker_set_id, levelopt or 'full', tree_iter)
+                                  if x is not None)
+        fingerprint = input_fingerprint([CONFIG.VERSION_DATA, pplacer_ref_pkg, pplacer_json_out, tree_file],
+                                        hash_paths=[user_msa_file])
+        if not self.skip_pplacer and stage_logger.get_checkpoint(checkpoint_key, fingerprint):
+            self.logger.info(f'Using the placements of a previous run: {tree_file}')
+            return tree_file
+
+        # select the threads, scratch file, and batches to fit into memory
+        if marker_set_id == 'bac120' and levelopt is None:
+            min_ram_gb, domain = CONFIG.PPLACER_MIN_RAM_BAC_FULL, 'bacterial'
+        elif marker_set_id == 'bac120' and levelopt == 'high':
+            min_ram_gb, domain = CONFIG.PPLACER_MIN_RAM_BAC_SPLIT, 'bacterial'
+        elif marker_set_id == 'ar53':
+            min_ram_gb, domain = CONFIG.PPLACER_MIN_RAM_ARC, 'archaeal'
+        else:
+            min_ram_gb, domain = None, 'bacterial'
+        plan = Pplacer.plan(pplacer_ref_pkg, num_genomes, self.pplacer_cpus,
+                            max_memory_gb=self.pplacer_max_memory,
+                            min_ram_gb=min_ram_gb,
+                            force_mmap=scratch_dir is not None)
+        if not plan.fits:
+            self.logger.warning(f'pplacer requires ~{min_ram_gb or plan.estimate_gb:,.0f} GB '
+                                f'of RAM to fully load the {domain} tree into memory. '
+                                f'However, {plan.limit_gb:,} GB was detected. This may '
+                                f'affect pplacer performance, or fail if there is '
+                                f'insufficient swap space.')
+        if plan.cpus != self.pplacer_cpus or plan.use_mmap or plan.n_batches > 1:
+            self.logger.info(f'Running pplacer with {plan.cpus} CPUs in '
+                             f'{plan.n_batches:,} batch(es) to stay within the '
+                             f'memory limit (~{plan.estimate_gb:,.1f} GB estimated).')
+
+        # check if a scratch file is to be created
+        pplacer_mmap_file = None
+        if plan.use_mmap:
+            self.logger.info('Using a scratch file for pplacer allocations. '
+                             'This decreases memory usage and performance.')
+            mmap_dir = scratch_dir if scratch_dir else pplacer_out_dir
+            pplacer_mmap_file = os.path.join(
+                mmap_dir, prefix + ".pplacer.scratch")
+            make_sure_path_exists(mmap_dir)
+
+        pplacer = Pplacer()
+        if levelopt is None or levelopt == 'high':
+            self.logger.info(f'pplacer version: {pplacer.version}')
+        # #DEBUG: Skip pplacer
+        #run_pplacer = True
+        if not self.skip_pplacer:
+            with span('pplacer', marker_set=marker_set_id, level=levelopt, tree=tree_iter,
+                      genomes=num_genomes, cpus=plan.cpus, batches=plan.n_batches), \
+                    get_governor().reserve(plan.cpus, plan.estimate_gb):
+                pplacer.run_batches(plan.cpus, 'wag', pplacer_ref_pkg, pplacer_json_out,
+                                    user_msa_file, pplacer_out, plan.n_batches,
+                                    pplacer_mmap_file)
+        else:
+            self.logger.warning('Skipping pplacer for debug purposes.')
+
         pplacer.tog(pplacer_json_out, tree_file)
+        if not self.skip_pplacer:
+            stage_logger.add_checkpoint(checkpoint_key, fingerprint,
+                                        output_files=[pplacer_json_out, tree_file])
         return tree_file
 
     def _parse_red_dict(self, red_dist_dict):
@@ -341,6 +368,11 @@ class Classify(object):
             ani_summary_files=None,
             all_classified_ani=False):
         """Classify genomes based on position in reference tree."""
+        # The rows classified by a previous run are only resumed with the same inputs.
+        summary_fingerprint = input_fingerprint([CONFIG.VERSION_DATA, sorted(genomes), fulltreeopt,
+                                                 skip_ani_screen, genes, no_mash, mash_k, mash_v, mash_s,
+                                                 mash_max_dist, mash_db, self.af_threshold, self.skip_pplacer],
+                                                stat_paths=[genomes[gid] for gid in sorted(genomes)])
         if not all_classified_ani:
             _bac_gids, _ar_gids, bac_ar_diff = Markers().genome_domain(align_dir, prefix)
 
@@ -400,6 +432,7 @@ class Classify(object):
                     summary_file = ClassifySummaryFileAR53(out_dir, prefix)
                 elif marker_set_id == 'bac120':
                     summary_file = ClassifySummaryFileBAC120(out_dir, prefix)
+                summary_file.resume(summary_fingerprint, genomes)
                 if mash_classified_user_genomes and marker_set_id in mash_classified_user_genomes:
                     list_summary_rows = mash_classified_user_genomes.get(marker_set_id)
                     for row in list_summary_rows:
@@ -408,12 +441,12 @@ class Classify(object):
                 # Symlink to the summary file from the root
                 if summary_file.has_row():
                     if marker_set_id == 'bac120':
-                        symlink_f(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix),
+                        symlink_f(table_path(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix)),
                                   os.path.join(out_dir,
-                                               os.path.basename(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix))))
+                                               os.path.basename(table_path(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix)))))
                     elif marker_set_id == 'ar53':
-                        symlink_f(PATH_AR53_SUMMARY_OUT.format(prefix=prefix),
-                                  os.path.join(out_dir, os.path.basename(PATH_AR53_SUMMARY_OUT.format(prefix=prefix))))
+                        symlink_f(table_path(PATH_AR53_SUMMARY_OUT.format(prefix=prefix)),
+                                  os.path.join(out_dir, os.path.basename(table_path(PATH_AR53_SUMMARY_OUT.format(prefix=prefix)))))
                     output_files.setdefault(marker_set_id, []).append(summary_file.path)
             return output_files
         else:
@@ -430,6 +463,7 @@ class Classify(object):
                         user_msa_file = os.path.join(align_dir,
                                                      PATH_AR53_USER_MSA.format(prefix=prefix) + '.gz')
                     summary_file = ClassifySummaryFileAR53(out_dir, prefix)
+                    summary_file.resume(summary_fingerprint, genomes)
                     red_dict_file = REDDictFileAR53(out_dir, prefix)
                     disappearing_genomes_file = DisappearingGenomesFileAR53(out_dir, prefix)
                     pplacer_classify_file = PplacerClassifyFileAR53(out_dir, prefix)
@@ -444,6 +478,7 @@ class Classify(object):
                         user_msa_file = os.path.join(align_dir,
                                                      PATH_BAC120_USER_MSA.format(prefix=prefix) + '.gz')
                     summary_file = ClassifySummaryFileBAC120(out_dir, prefix)
+                    summary_file.resume(summary_fingerprint, genomes)
                     red_dict_file = REDDictFileBAC120(out_dir, prefix)
                     disappearing_genomes_file = DisappearingGenomesFileBAC120(out_dir, prefix)
                     pplacer_classify_file = PplacerClassifyFileBAC120(out_dir, prefix)
@@ -484,11 +519,11 @@ class Classify(object):
                         output_files.setdefault(marker_set_id, []).append(summary_file.path)
                         # Symlink to the summary file from the root
                         if marker_set_id == 'ar53':
-                            symlink_f(PATH_AR53_SUMMARY_OUT.format(prefix=prefix),
-                                      os.path.join(out_dir, os.path.basename(PATH_AR53_SUMMARY_OUT.format(prefix=prefix))))
+                            symlink_f(table_path(PATH_AR53_SUMMARY_OUT.format(prefix=prefix)),
+                                      os.path.join(out_dir, os.path.basename(table_path(PATH_AR53_SUMMARY_OUT.format(prefix=prefix)))))
                         elif marker_set_id == 'bac120':
-                            symlink_f(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix),
-                                      os.path.join(out_dir, os.path.basename(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix))))
+                            symlink_f(table_path(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix)),
+                                      os.path.join(out_dir, os.path.basename(table_path(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix)))))
                         if prodigal_failed_counter > 0:
                             self.logger.warning(f"{prodigal_failed_counter} of {len(genomes)} "
                                                 f"genome{'' if prodigal_failed_counter == 1 else 's'} "
@@ -497,7 +532,7 @@ class Classify(object):
 
                     continue
 
-                msa_dict = read_fasta(user_msa_file)
+                msa_stats = MSAStats(user_msa_file)
 
                 # Read the translation table summary file (identify).
                 tln_table_summary_file = TlnTableSummaryFile(align_dir, prefix)
@@ -506,7 +541,7 @@ class Classify(object):
                 percent_multihit_dict = self.parser_marker_summary_file(marker_summary_fh)
 
                 # run pplacer to place bins in reference genome tree
-                genomes_to_process = [seq_id for seq_id, _seq in read_seq(user_msa_file)]
+                genomes_to_process = msa_stats.genome_ids
 
                 # if mash_classified_user_genomes is has key marker_set_id, we
                 # need to add those genomes to the summary file and remove those genomes to the list of genomes
@@ -515,7 +550,7 @@ class Classify(object):
                     list_summary_rows = mash_classified_user_genomes.get(marker_set_id)
                     for row in list_summary_rows:
                         row,warning_counter = self._add_warning_to_row(row,
-                                                       msa_dict,
+                                                       msa_stats,
                                                        tln_table_summary_file.genomes,
                                                        percent_multihit_dict,
                                                        warning_counter)
@@ -529,11 +564,7 @@ class Classify(object):
                     #makes sure the path exists
                     make_sure_path_exists(os.path.dirname(prescreened_msa_file_path))
 
-                    prescreened_msa_file = open(prescreened_msa_file_path, 'w')
-
-                    for gid in genomes_to_process:
-                        prescreened_msa_file.write('>{}\n{}\n'.format(gid, msa_dict.get(gid)))
-                    prescreened_msa_file.close()
+                    msa_stats.write_subset(genomes_to_process, prescreened_msa_file_path)
                     user_msa_file = prescreened_msa_file_path
 
 
@@ -546,12 +577,12 @@ class Classify(object):
                         summary_file.write()
                         # Symlink to the summary file from the root
                         if marker_set_id == 'bac120':
-                            symlink_f(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix),
+                            symlink_f(table_path(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix)),
                                       os.path.join(out_dir,
-                                                   os.path.basename(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix))))
+                                                   os.path.basename(table_path(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix)))))
                         elif marker_set_id == 'ar53':
-                            symlink_f(PATH_AR53_SUMMARY_OUT.format(prefix=prefix),
-                                      os.path.join(out_dir, os.path.basename(PATH_AR53_SUMMARY_OUT.format(prefix=prefix))))
+                            symlink_f(table_path(PATH_AR53_SUMMARY_OUT.format(prefix=prefix)),
+                                      os.path.join(out_dir, os.path.basename(table_path(PATH_AR53_SUMMARY_OUT.format(prefix=prefix)))))
                     continue
 
 
@@ -590,7 +621,7 @@ class Classify(object):
 
                     splitter = Split(self.order_rank, self.gtdb_taxonomy, self.reference_ids)
                     sorted_high_taxonomy,warning_counter, len_sorted_genomes, high_taxonomy_used = splitter.map_high_taxonomy(
-                        high_classification, tree_mapping_dict, summary_file, tree_mapping_file,msa_dict,
+                        high_classification, tree_mapping_dict, summary_file, tree_mapping_file,msa_stats,
                         tln_table_summary_file.genomes,percent_multihit_dict,bac_ar_diff,warning_counter)
 
                     if debugopt:
@@ -606,7 +637,7 @@ class Classify(object):
                             sorted(sorted_high_taxonomy, key=lambda z: len(sorted_high_taxonomy[z]), reverse=True)):
                         listg = sorted_high_taxonomy.get(tree_iter)
                         low_classify_tree, submsa_file_path = self._place_in_low_tree(
-                            tree_iter, len(sorted_high_taxonomy), idx + 1, listg, msa_dict, marker_set_id, prefix,
+                            tree_iter, len(sorted_high_taxonomy), idx + 1, listg, msa_stats, marker_set_id, prefix,
                             scratch_dir, out_dir)
                         output_files.setdefault(marker_set_id, []).append(low_classify_tree)
                         genomes_to_process_subtree = [seq_id for seq_id, _seq in read_seq(submsa_file_path)]
@@ -628,14 +659,15 @@ class Classify(object):
                                 disappearing_genomes_file.add_genome(disappearing_genome, tree_iter)
 
                         class_level_classification, classified_user_genomes,warning_counter = self._parse_tree(mrca_lowtree, genomes,
-                                                                                                               msa_dict,percent_multihit_dict,
+                                                                                                               msa_stats,percent_multihit_dict,
                                                                                                                genes, tln_table_summary_file.genomes,
                                                                                                                bac_ar_diff, submsa_file_path,
                                                                                                                red_dict_file.data,summary_file,
                                                                                                                pplacer_taxonomy_dict,warning_counter,
                                                                                                                high_classification, debug_file,
                                                                                                                debugopt,tree_mapping_file,
-                                                                                                               tree_iter,tree_mapping_dict_reverse)
+                                                                                                               tree_iter,tree_mapping_dict_reverse,
+                                                                                                               out_dir, prefix)
 
                         if debugopt:
                             with open(out_dir + '/' + prefix + '_class_level_classification.txt', 'a') as olf:
@@ -656,8 +688,8 @@ class Classify(object):
                     warning_counter = warning_counter + prodigal_failed_counter
 
                     # Symlink to the summary file from the root
-                    symlink_f(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix),
-                              os.path.join(out_dir, os.path.basename(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix))))
+                    symlink_f(table_path(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix)),
+                              os.path.join(out_dir, os.path.basename(table_path(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix)))))
 
                     if debugopt:
                         debug_file.close()
@@ -683,14 +715,15 @@ class Classify(object):
 
                     disappearing_genomes = [seq_id for seq_id in genomes_to_process if seq_id not in pplacer_taxonomy_dict]
                     class_level_classification, classified_user_genomes,warning_counter = self._parse_tree(tree_to_process, genomes,
-                                                                                                           msa_dict, percent_multihit_dict,
+                                                                                                           msa_stats, percent_multihit_dict,
                                                                                                            genes,tln_table_summary_file.genomes,
                                                                                                            bac_ar_diff, user_msa_file,
                                                                                                            red_dict_file.data, summary_file,
                                                                                                            pplacer_taxonomy_dict,warning_counter,
                                                                                                            None,debug_file,
                                                                                                            debugopt,None,
-                                                                                                           None, None)
+                                                                                                           None, None,
+                                                                                                           out_dir, prefix)
                     # add filtered genomes to the summary file
                     warning_counter = self.add_filtered_genomes_to_summary(align_dir,warning_counter, summary_file, marker_set_id, prefix)
 
@@ -703,11 +736,11 @@ class Classify(object):
 
                     # Symlink to the summary file from the root
                     if marker_set_id == 'bac120':
-                        symlink_f(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix),
-                                  os.path.join(out_dir, os.path.basename(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix))))
+                        symlink_f(table_path(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix)),
+                                  os.path.join(out_dir, os.path.basename(table_path(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix)))))
                     elif marker_set_id == 'ar53':
-                        symlink_f(PATH_AR53_SUMMARY_OUT.format(prefix=prefix),
-                                  os.path.join(out_dir, os.path.basename(PATH_AR53_SUMMARY_OUT.format(prefix=prefix))))
+                        symlink_f(table_path(PATH_AR53_SUMMARY_OUT.format(prefix=prefix)),
+                                  os.path.join(out_dir, os.path.basename(table_path(PATH_AR53_SUMMARY_OUT.format(prefix=prefix)))))
                     else:
                         raise GenomeMarkerSetUnknown('There was an error determining the marker set.')
 
@@ -739,13 +772,13 @@ class Classify(object):
                 output_files.setdefault(marker_set_id, []).append(summary_file.path)
         return output_files
 
-    def _add_warning_to_row(self,row,msa_dict,
+    def _add_warning_to_row(self,row,msa_stats,
                             trans_table_dict,
                             percent_multihit_dict,
                             warning_counter):
 
-        if row.gid in msa_dict:
-            row.msa_percent = aa_percent_msa(msa_dict.get(row.gid))
+        if row.gid in msa_stats:
+            row.msa_percent = msa_stats.get_aa_percent(row.gid)
             row.tln_table = trans_table_dict.get(row.gid)
 
         warnings = row.warnings
@@ -772,18 +805,14 @@ class Classify(object):
                 "User genome\tRed value\tHigher rank\tHigher value\tLower rank\tLower value\tcase\tclosest_rank\ttool\n")
         return debug_file
 
-    def _place_in_low_tree(self, tree_iter, number_low_trees, idx_tree, listg, msa_dict, marker_set_id, prefix,
+    def _place_in_low_tree(self, tree_iter, number_low_trees, idx_tree, listg, msa_stats, marker_set_id, prefix,
                            scratch_dir, out_dir):
         make_sure_path_exists(os.path.join(
             out_dir, DIR_CLASS_LEVEL_PPLACER.format(iter=tree_iter)))
         submsa_file_path = os.path.join(
             out_dir, PATH_CLASS_LEVEL_BAC120_SUBMSA.format(iter=tree_iter))
 
-        submsa_file = open(submsa_file_path, 'w')
-
-        for gid in listg:
-            submsa_file.write('>{}\n{}\n'.format(gid, msa_dict.get(gid)))
-        submsa_file.close()
+        msa_stats.write_subset(listg, submsa_file_path)
         low_classify_tree = self.place_genomes(submsa_file_path,
                                                marker_set_id,
                                                out_dir,
@@ -871,11 +900,11 @@ class Classify(object):
 
         return out, qry_nodes
 
-    def _classify_red_topology(self, tree, msa_dict, percent_multihit_dict, trans_table_dict, bac_ar_diff,
+    def _classify_red_topology(self, tree, msa_stats, percent_multihit_dict, trans_table_dict, bac_ar_diff,
                                user_msa_file, red_dict,warning_counter, summary_file, pplacer_taxonomy_dict,
                                high_classification, debug_file, debugopt, classified_user_genomes,
                                unclassified_user_genomes, tt,tree_iter,tree_mapping_file, valid_classes,valid_phyla):
-        user_genome_ids = set(read_fasta(user_msa_file).keys())
+        user_genome_ids = {seq_id for seq_id, _seq in read_seq(user_msa_file)}
         user_genome_ids = user_genome_ids.difference(set(classified_user_genomes.keys()))
         class_level_classification = dict()
         for leaf in tree.leaf_node_iter(filter_fn=lambda x: x.taxon.label in user_genome_ids):
@@ -1127,7 +1156,7 @@ class Classify(object):
                 summary_row.red_value = red_value_to_report
                 if summary_row.classification_method is None:
                     summary_row.classification_method = detection
-                summary_row.msa_percent = aa_percent_msa(msa_dict.get(summary_row.gid))
+                summary_row.msa_percent = msa_stats.get_aa_percent(summary_row.gid)
                 summary_row.tln_table = trans_table_dict.get(summary_row.gid)
 
                 tree_mapping_file.add_row(mapping_row)
@@ -1144,7 +1173,7 @@ class Classify(object):
                 summary_row.pplacer_tax = pplacer_taxonomy_dict.get(leaf.taxon.label)
                 if summary_row.classification_method is None:
                     summary_row.classification_method = detection
-                summary_row.msa_percent = aa_percent_msa(msa_dict.get(summary_row.gid))
+                summary_row.msa_percent = msa_stats.get_aa_percent(summary_row.gid)
                 summary_row.tln_table = trans_table_dict.get(summary_row.gid)
                 summary_row.red_value = current_rel_list
 
@@ -1174,9 +1203,10 @@ class Classify(object):
 
         return class_level_classification,warning_counter
 
-    def _parse_tree(self, tree, genomes, msa_dict, percent_multihit_dict,genes, trans_table_dict, bac_ar_diff,
+    def _parse_tree(self, tree, genomes, msa_stats, percent_multihit_dict,genes, trans_table_dict, bac_ar_diff,
                     user_msa_file, red_dict, summary_file, pplacer_taxonomy_dict,warning_counter, high_classification,
-                    debug_file, debugopt, tree_mapping_file, tree_iter, tree_mapping_dict_reverse):
+                    debug_file, debugopt, tree_mapping_file, tree_iter, tree_mapping_dict_reverse,
+                    out_dir, prefix):
         # Genomes can be classified by using FastANI or RED values
         # We go through all leaves of the tree. if the leaf is a user
         # genome we take its parent node and look at all the leaves
@@ -1204,12 +1234,14 @@ class Classify(object):
             self.logger.log(CONFIG.LOG_TASK,
                             f'Calculating average nucleotide identity using '
                             f'FastANI (v{fastani.version}).')
-            all_fastani_dict = fastani.run(d_ani_compare, d_paths)
+            with span('fastani', tree=tree_iter, genomes=len(d_ani_compare)):
+                all_fastani_dict = self._run_fastani_batches(fastani, d_ani_compare, d_paths,
+                                                             tree_iter or 'full', out_dir, prefix)
         else:
             all_fastani_dict = {}
 
         classified_user_genomes, unclassified_user_genomes,warning_counter = self._sort_fastani_results(
-            fastani_verification, pplacer_taxonomy_dict, all_fastani_dict, msa_dict, percent_multihit_dict,
+            fastani_verification, pplacer_taxonomy_dict, all_fastani_dict, msa_stats, percent_multihit_dict,
             trans_table_dict, bac_ar_diff,warning_counter, summary_file)
         #if not prescreening:
         if not genes:
@@ -1232,19 +1264,77 @@ class Classify(object):
         phyla_in_spe_tree = None
         if tree_mapping_dict_reverse:
             class_in_spe_tree = tree_mapping_dict_reverse.get(tree_iter)
-            phyla_in_spe_tree = self.get_authorised_rank(class_in_spe_tree,self.PHYLUM_IDX)
+            # The valid phyla of every class-level tree are computed once.
+            if self.rank_authority is None:
+                self.rank_authority = RankAuthorityIndex(self.gtdb_taxonomy, tree_mapping_dict_reverse,
+                                                         self.CLASS_IDX)
+            phyla_in_spe_tree = list(self.rank_authority.authorised(tree_iter, self.PHYLUM_IDX))
+
+
+        with span('rules', tree=tree_iter):
+            class_level_classification,warning_counter = self._classify_red_topology(tree, msa_stats, percent_multihit_dict,
+                                                                     trans_table_dict, bac_ar_diff, user_msa_file,
+                                                                     red_dict,warning_counter, summary_file,
+                                                                     pplacer_taxonomy_dict, high_classification,
+                                                                     debug_file, debugopt, classified_user_genomes,
+                                                                     unclassified_user_genomes, tt,tree_iter,tree_mapping_file,
+                                                                     class_in_spe_tree, phyla_in_spe_tree)
 
+        return class_level_classification,classified_user_genomes,warning_counter
 
-        class_level_classification,warning_counter = self._classify_red_topology(tree, msa_dict, percent_multihit_dict,
-                                                                 trans_table_dict, bac_ar_diff, user_msa_file,
-                                                                 red_dict,warning_counter, summary_file,
-                                                                 pplacer_taxonomy_dict, high_classification,
-                                                                 debug_file, debugopt, classified_user_genomes,
-                                                                 unclassified_user_genomes, tt,tree_iter,tree_mapping_file,
-                                                                 class_in_spe_tree, phyla_in_spe_tree)
+    def _run_fastani_batches(self, fastani, d_ani_compare, d_paths, unit, out_dir, prefix):
+        """Run FastANI in batches of query genomes, each batch is checkpointed
+        so that only the incomplete batches are run when resuming.
 
-        return class_level_classification,classified_user_genomes,warning_counter
+        The results of each batch are written to their own file, the stage
+        log only records the fingerprint of the batch and the path.
 
+        Parameters
+        ----------
+        fastani : FastANI
+            The FastANI wrapper to run.
+        d_ani_compare : dict[str, set[str]]
+            All query to reference comparisons to be made.
+        d_paths : dict[str, str]
+            The path for each genome id being compared.
+        unit : str
+            The name of the set of comparisons (e.g. the class-level tree).
+        out_dir : str
+            The output directory of the classify step.
+        prefix : str
+            The prefix of the output files.
+
+        Returns
+        -------
+        dict[str, dict[str, dict[str, float]]]
+            The ANI and AF for each comparison.
+        """
+        stage_logger = StageLogger()
+        qry_gids = sorted(d_ani_compare)
+        batch_size = max(CONFIG.FASTANI_CHECKPOINT_GENOMES, self.cpus)
+        out = dict()
+        for start in range(0, len(qry_gids), batch_size):
+            batch = {gid: d_ani_compare[gid] for gid in qry_gids[start:start + batch_size]}
+            batch_gids = set(batch).union(*batch.values())
+            checkpoint_key = f'fastani/{unit}/{qry_gids[start]}'
+            path_batch = os.path.join(out_dir, PATH_FASTANI_BATCH.format(
+                prefix=prefix, unit=unit, gid=qry_gids[start]))
+            fingerprint = input_fingerprint([path_batch] + [[gid, sorted(refs)] for gid, refs in batch.items()],
+                                            stat_paths=[d_paths[gid] for gid in sorted(batch_gids)])
+            if stage_logger.get_checkpoint(checkpoint_key, fingerprint):
+                with open(path_batch) as fh:
+                    result = json.load(fh)
+            else:
+                result = fastani.run(batch, {gid: d_paths[gid] for gid in batch_gids})
+                make_sure_path_exists(os.path.dirname(path_batch))
+                with open(path_batch + '.tmp', 'w') as fh:
+                    json.dump(result, fh)
+                os.replace(path_batch + '.tmp', path_batch)
+                stage_logger.add_checkpoint(checkpoint_key, fingerprint, output_files=[path_batch])
+            out.update(result)
+        return out
+
+    @traced('red')
     def _assign_mrca_red(self, input_tree, marker_set_id, levelopt=None, tree_iter=None):
         """Parse the pplacer tree and write the partial taxonomy for each user genome based on their placements
 
@@ -1277,6 +1367,17 @@ class Classify(object):
         if marker_set_id == 'ar53':
             red_file = CONFIG.MRCA_RED_AR53
 
+        # RED values which were assigned by a previous run are resumed
+        stage_logger = StageLogger()
+        red_values_file = input_tree + '.red'
+        checkpoint_key = '/'.join(str(x) for x in ('red', marker_set_id, levelopt or 'full', tree_iter)
+                                  if x is not None)
+        fingerprint = input_fingerprint([red_values_file], stat_paths=[red_file],
+                                        hash_paths=[input_tree])
+        if stage_logger.get_checkpoint(checkpoint_key, fingerprint):
+            self._read_red_values(tree, red_values_file)
+            return tree
+
         # create map from leave labels to tree nodes
         leaf_node_map = {}
         for leaf in tree.leaf_node_iter():
@@ -1345,8 +1446,30 @@ class Classify(object):
 
                 pplacer_node.rel_dist = branch_rel_dist
 
+        self._write_red_values(tree, red_values_file)
+        stage_logger.add_checkpoint(checkpoint_key, fingerprint, output_files=[red_values_file])
         return tree
 
+    @staticmethod
+    def _write_red_values(tree, path):
+        """Write the RED value of each node (in pre-order) assigned to the tree."""
+        with open(path, 'w') as fh:
+            for node in tree.preorder_node_iter():
+                rel_dist = getattr(node, 'rel_dist', None)
+                fh.write(f'{"" if rel_dist is None else repr(rel_dist)}\n')
+
+    @staticmethod
+    def _read_red_values(tree, path):
+        """Assign the RED values written by _write_red_values to the same tree."""
+        with open(path) as fh:
+            values = fh.read().splitlines()
+        nodes = list(tree.preorder_node_iter())
+        if len(values) != len(nodes):
+            raise GTDBTkExit(f'The RED values do not match the tree: {path}')
+        for node, value in zip(nodes, values):
+            if value:
+                node.rel_dist = float(value)
+
     def _get_pplacer_taxonomy(self, pplacer_classify_file, marker_set_id, user_msa_file, tree):
         """Parse the pplacer tree and write the partial taxonomy for each user genome based on their placements
 
@@ -1364,7 +1487,7 @@ class Classify(object):
         """
 
         # We get the pplacer taxonomy for comparison
-        user_genome_ids = set(read_fasta(user_msa_file).keys())
+        user_genome_ids = {seq_id for seq_id, _seq in read_seq(user_msa_file)}
         for leaf in tree.leaf_node_iter():
             if leaf.taxon.label in user_genome_ids:
                 taxa = []
@@ -1520,7 +1643,7 @@ class Classify(object):
 
 
     def _sort_fastani_results(self, fastani_verification, pplacer_taxonomy_dict,
-                              all_fastani_dict, msa_dict, percent_multihit_dict,
+                              all_fastani_dict, msa_stats, percent_multihit_dict,
                               trans_table_dict, bac_ar_diff,warning_counter, summary_file):
         """Format the note field by concatenating all information in a sorted dictionary
 
@@ -1592,8 +1715,7 @@ class Classify(object):
 
                     summary_row.pplacer_tax = pplacer_taxonomy_dict.get(userleaf.taxon.label)
                     summary_row.classification_method = 'taxonomic classification defined by topology and ANI'
-                    summary_row.msa_percent = aa_percent_msa(
-                        msa_dict.get(summary_row.gid))
+                    summary_row.msa_percent = msa_stats.get_aa_percent(summary_row.gid)
                     summary_row.tln_table = trans_table_dict.get(summary_row.gid)
                     if len(warnings) > 0:
                         summary_row.warnings = ';'.join(warnings)
@@ -1685,8 +1807,7 @@ class Classify(object):
                 summary_row.pplacer_tax = pplacer_taxonomy_dict.get(
                     userleaf.taxon.label)
                 summary_row.classification_method = 'ANI'
-                summary_row.msa_percent = aa_percent_msa(
-                    msa_dict.get(summary_row.gid))
+                summary_row.msa_percent = msa_stats.get_aa_percent(summary_row.gid)
                 summary_row.tln_table = trans_table_dict.get(summary_row.gid)
 
                 exception_genomes = []
@@ -1830,7 +1951,7 @@ class Classify(object):
                                            preserve_underscores=True)
 
         self.logger.info('Reading taxonomy from file.')
-        taxonomy = Taxonomy().read(CONFIG.TAXONOMY_FILE)
+        taxonomy = get_gtdb_taxonomy_index()
 
         # determine taxa to be used for inferring distribution
         trusted_taxa = None
@@ -2006,6 +2127,14 @@ class Classify(object):
         for i, n in enumerate(tree.preorder_node_iter()):
             n.id = i
 
+        # find the root edge of every phylum in a single pass over the tree
+        outgroups = {p: set() for p in phyla}
+        for genome_id, taxa in taxonomy.items():
+            for taxon in taxa:
+                if taxon in outgroups:
+                    outgroups[taxon].add(genome_id)
+        placements = LeafIndex(tree).place(outgroups)
+
         # calculate relative divergence for tree rooted on each phylum
         phylum_rel_dists = {}
         rel_node_dists = defaultdict(list)
@@ -2017,7 +2146,7 @@ class Classify(object):
             sys.stdout.write('\r{}'.format(status_msg))
             sys.stdout.flush()
 
-            cur_tree = self.root_with_outgroup(tree, taxonomy, p)
+            cur_tree = self.root_with_outgroup(tree, placements[p])
 
             # calculate relative distance to taxa
             rel_dists = rd.rel_dist_to_named_clades(cur_tree)
@@ -2083,86 +2212,40 @@ class Classify(object):
 
         return phyla
 
-    def root_with_outgroup(self, input_tree, taxonomy, outgroup_taxa):
+    def root_with_outgroup(self, input_tree, placement: Optional[OutgroupPlacement]):
         """Reroot the tree using the given outgroup.
 
         Parameters
         ----------
         input_tree : Dendropy Tree
           Tree to rerooted.
-        taxonomy : dict
-            Taxonomy for taxa.
-        outgroup_taxa : iterable
-          Labels of taxa in outgroup.
+        placement : Optional[OutgroupPlacement]
+            The root edge of the outgroup in the tree (see LeafIndex.place).
 
         Returns
         -------
         Dendropy Tree
             Deep-copy of original tree rerooted on outgroup.
         """
-
-        new_tree = input_tree.clone()
-
-        outgroup = set()
-        for genome_id, taxa in taxonomy.items():
-            if outgroup_taxa in taxa:
-                outgroup.add(genome_id)
-
-        outgroup_in_tree = set()
-        ingroup_in_tree = set()
-        for n in new_tree.leaf_node_iter():
-            if n.taxon.label in outgroup:
-                outgroup_in_tree.add(n.taxon)
-            else:
-                ingroup_in_tree.add(n)
-
-        if len(outgroup_in_tree) == 0:
+        if placement is None:
             self.logger.warning('No outgroup taxa identified in the tree.')
             self.logger.warning('Tree was not rerooted.')
             sys.exit(0)
 
-        # There is a complication here. We wish to find the MRCA of the outgroup
-        # taxa. Finding the MRCA requires a rooted tree and we have no guarantee
-        # that the tree isn't currently rooted within the outgroup clade. There is
-        # also no way to identify a node that is guaranteed to be outside the outgroup
-        # clade. As such, the tree is randomly rooted on a leaf node not in the outgroup.
-        # This random re-rooting is performed until the MRCA does not spans all taxa in
-        # the tree.
-
-        leaves_in_tree = sum([1 for _ in new_tree.leaf_node_iter()])
-        while True:
-            rnd_ingroup_leaf = random.sample(ingroup_in_tree, 1)[0]
-            new_tree.reroot_at_edge(rnd_ingroup_leaf.edge,
-                                    length1=0.5 * rnd_ingroup_leaf.edge_length,
-                                    length2=0.5 * rnd_ingroup_leaf.edge_length)
-
-            mrca = new_tree.mrca(taxa=outgroup_in_tree)
-            leaves_in_mrca = sum([1 for _ in mrca.leaf_iter()])
-            if leaves_in_mrca != leaves_in_tree:
+        # The copy has the same preorder as the original, so the root edge is
+        # found by its index rather than by searching for the MRCA again.
+        new_tree = input_tree.clone()
+        for i, node in enumerate(new_tree.preorder_node_iter()):
+            if i == placement.node_idx:
+                reroot_on_edge(new_tree, node)
                 break
-
-        if leaves_in_mrca == leaves_in_tree:
-            self.logger.error('The MRCA spans all taxa in the tree.')
-            self.logger.error(
-                'This indicating the selected outgroup is likely polyphyletic in the current tree.')
-            self.logger.error(
-                'This should never occur. Please report this as a bug.')
-            sys.exit(-1)
-
-        if mrca.edge_length is None:
-            # self.logger.info('Tree appears to already be rooted on this outgroup.')
-            pass
-        else:
-            new_tree.reroot_at_edge(mrca.edge,
-                                    length1=0.5 * mrca.edge_length,
-                                    length2=0.5 * mrca.edge_length)
-
         return new_tree
 
     def _get_fastani_genome_path(self, fastani_verification, genomes):
         """Generates a queue of comparisons to be made and the paths to
         the corresponding genome id."""
         dict_compare, dict_paths = dict(), dict()
+        manifest = get_reference_manifest()
 
         for qry_node, qry_dict in fastani_verification.items():
             user_label = qry_node.taxon.label
@@ -2173,19 +2256,20 @@ class Classify(object):
                 shortleaf = leafnode.taxon.label
                 if leafnode.taxon.label.startswith('GB_') or leafnode.taxon.label.startswith('RS_'):
                     shortleaf = leafnode.taxon.label[3:]
+                ref_path = manifest.get_path(shortleaf)
                 # TODEL UBA genomes
-                if shortleaf.startswith("UBA"):
+                if ref_path is None and shortleaf.startswith("UBA"):
                     ref_path = os.path.join(
                         CONFIG.FASTANI_GENOMES,
                         'UBA',
                         shortleaf + CONFIG.FASTANI_GENOMES_EXT)
-                else:
+                elif ref_path is None:
                     ref_path = os.path.join(
                         CONFIG.FASTANI_GENOMES,
                         self.parse_leaf_to_dir_path(shortleaf),
                         shortleaf + CONFIG.FASTANI_GENOMES_EXT)
 
-                if not os.path.isfile(ref_path):
+                if not manifest.exists(ref_path):
                     raise GTDBTkExit(f'Reference genome missing from FastANI database: {ref_path}')
 
                 dict_compare[user_label].add(shortleaf)
@@ -2193,13 +2277,6 @@ class Classify(object):
 
         return dict_compare, dict_paths
 
-    def get_authorised_rank(self, order_in_spe_tree,rank_index):
-        results = []
-        for k, v in self.gtdb_taxonomy.items():
-            if v[self.order_rank.index(self.rank_of_interest)] in order_in_spe_tree:
-                results.append(v[rank_index])
-        return list(set(results))
-
     def load_fastani_results_pre_pplacer(self,ani_summary_files):
         """Load the FastANI results for the genomes classified with ANI Screen."""
         fastani_results={}
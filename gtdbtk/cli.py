@@ -65,6 +65,13 @@ def __outgroup_taxon(group, required):
                             "``p__Patescibacteria`` or ``p__Altiarchaeota``)")
 
 
+def __root_outgroup_taxon(group, required):
+    group.add_argument('--outgroup_taxon', type=str, default=None, required=required,
+                       help="taxon to use as outgroup (e.g., ``p__Patescibacteria``), or "
+                            "a comma separated list of candidate taxa of which the "
+                            "best is used (e.g., ``p__Altiarchaeota,p__Iainarchaeota``)")
+
+
 def __out_dir(group, required):
     group.add_argument('--out_dir', type=str, default=None, required=required,
                        help="directory to output files")
@@ -145,6 +152,24 @@ def __gamma(group):
                        help="rescale branch lengths to optimize the Gamma20 likelihood")
 
 
+def __start_tree(group):
+    group.add_argument('--start_tree', type=str, default=None,
+                       help='a previous tree of the taxa to start from, only the new or '
+                            'changed taxa are placed and the topology is refined locally')
+
+
+def __start_msa(group):
+    group.add_argument('--start_msa', type=str, default=None,
+                       help='the MSA used to infer --start_tree (or the msa_digests.tsv '
+                            'file of that run), used to identify changed taxa')
+
+
+def __constraint_tree(group):
+    group.add_argument('--constraint_tree', type=str, default=None,
+                       help='a decorated reference tree (e.g. the GTDB reference tree) whose '
+                            'phylum, class, and order splits are kept in the inferred tree')
+
+
 def __gtdbtk_classification_file(group):
     group.add_argument('--gtdbtk_classification_file', type=str, default=None,
                        help="file with GTDB-Tk classifications produced by the `classify` command")
@@ -191,6 +216,13 @@ def __pplacer_cpus(group):
                        help='number of CPUs to use during pplacer placement')
 
 
+def __pplacer_max_memory(group):
+    group.add_argument('--pplacer_max_memory', type=float, default=None,
+                       help='maximum memory (GB) for pplacer placement, the number of '
+                            'CPUs, scratch file use, and batches are chosen to stay '
+                            'within this (default: detect the available memory)')
+
+
 def __scratch_dir(group):
     group.add_argument('--scratch_dir', type=str, default=None,
                        help='reduce pplacer memory usage by writing to disk (slower).')
@@ -287,6 +319,50 @@ def __min_af(group):
                        help='minimum alignment fraction to assign genome to a species cluster')
 
 
+def __cluster(group):
+    group.add_argument('--cluster', default=False, action='store_true',
+                       help='cluster the user genomes by the ANI between them, '
+                            'rather than calculating ANI to GTDB representatives')
+
+
+def __cluster_method(group):
+    group.add_argument('--cluster_method', choices=['greedy', 'single'], default='greedy',
+                       help='greedy: representatives take all unclustered genomes within '
+                            'the thresholds, single: single-linkage clustering')
+
+
+def __cluster_ani(group):
+    group.add_argument('--cluster_ani', type=float, default=CONFIG.FASTANI_SPECIES_THRESHOLD,
+                       help='minimum ANI for two genomes to be clustered')
+
+
+def __table_format(group):
+    group.add_argument('--table_format', choices=['tsv', 'parquet', 'arrow'], default='tsv',
+                       help='format of the summary tables, parquet and arrow require pyarrow')
+
+
+def __shard(group):
+    group.add_argument('--shard', type=str, default=None,
+                       help='only process shard i of N of the genomes (e.g. ``2/10``), '
+                            'the output of each shard is combined with the merge command')
+
+
+def __shard_dirs(group, required):
+    group.add_argument('--shard_dirs', type=str, nargs='+', default=None, required=required,
+                       help='output directories of classify_wf for each shard')
+
+
+def __socket(group, required):
+    group.add_argument('--socket', type=str, default=None, required=required,
+                       help='path of the Unix socket to listen on for jobs')
+
+
+def __max_jobs(group):
+    group.add_argument('--max_jobs', type=int, default=1,
+                       help='maximum number of jobs to run at the same time, '
+                            'the third-party programs of all jobs share --cpus CPUs')
+
+
 def __untrimmed_msa(group, required):
     group.add_argument('--untrimmed_msa', type=str, default=None, required=required,
                        help="path to the untrimmed MSA file")
@@ -313,6 +389,16 @@ def __reference_mask(group):
                        help="reference mask already present in GTDB-Tk")
 
 
+def __genome_list(group):
+    group.add_argument('--genome_list', type=str, default=None,
+                       help='file with the genome ids to export, one per line')
+
+
+def __apply_reference_mask(group):
+    group.add_argument('--apply_reference_mask', default=False, action='store_true',
+                       help='mask the columns of the MSA using the reference mask of the domain')
+
+
 def __domain(group, required):
     group.add_argument('--domain', required=required, choices=['arc', 'bac'],
                        help="domain to export")
@@ -361,6 +447,9 @@ def get_main_parser():
             __prot_model(grp)
             __no_support(grp)
             __gamma(grp)
+            __start_tree(grp)
+            __start_msa(grp)
+            __constraint_tree(grp)
             __gtdbtk_classification_file(grp)
             __custom_taxonomy_file(grp)
             __write_single_copy_genes(grp)
@@ -397,16 +486,43 @@ def get_main_parser():
             __genes(grp)
             __cpus(grp)
             __pplacer_cpus(grp)
+            __pplacer_max_memory(grp)
             __force(grp)
             __scratch_dir(grp)
             __write_single_copy_genes(grp)
             __keep_intermediates(grp)
             __min_af(grp)
+            __table_format(grp)
+            __shard(grp)
             __temp_dir(grp)
             __debug(grp)
             __skip_pplacer(grp)
             __help(grp)
 
+    # Run classify_wf jobs with the reference data loaded once.
+    with subparser(sub_parsers, 'serve', 'Keep the reference data loaded and run the classify_wf '
+                                         'jobs sent to a Unix socket.') as parser:
+        with arg_group(parser, 'required named arguments') as grp:
+            __socket(grp, required=True)
+        with arg_group(parser, 'optional arguments') as grp:
+            __max_jobs(grp)
+            __cpus(grp)
+            __mash_db(grp)
+            __temp_dir(grp)
+            __debug(grp)
+            __help(grp)
+
+    # Merge the shards of classify_wf.
+    with subparser(sub_parsers, 'merge', 'Merge the output of classify_wf run on each shard of the genomes.') as parser:
+        with arg_group(parser, 'required named arguments') as grp:
+            __shard_dirs(grp, required=True)
+            __out_dir(grp, required=True)
+        with arg_group(parser, 'optional arguments') as grp:
+            __prefix(grp)
+            __table_format(grp)
+            __debug(grp)
+            __help(grp)
+
     # Identify marker genes in genomes.
     with subparser(sub_parsers, 'identify', 'Identify marker genes in genomes.') as parser:
         with mutex_group(parser, required=True) as grp:
@@ -457,6 +573,9 @@ def get_main_parser():
             __prot_model(grp)
             __no_support(grp)
             __gamma(grp)
+            __start_tree(grp)
+            __start_msa(grp)
+            __constraint_tree(grp)
             __prefix(grp)
             __cpus(grp)
             __temp_dir(grp)
@@ -485,10 +604,12 @@ def get_main_parser():
             __prefix(grp)
             __cpus(grp)
             __pplacer_cpus(grp)
+            __pplacer_max_memory(grp)
             __scratch_dir(grp)
             __genes(grp)
             __full_tree(grp)
             __min_af(grp)
+            __table_format(grp)
             __temp_dir(grp)
             __debug(grp)
             __skip_pplacer(grp)
@@ -498,7 +619,7 @@ def get_main_parser():
     with subparser(sub_parsers, 'root', 'Root tree using an outgroup.') as parser:
         with arg_group(parser, 'required named arguments') as grp:
             __input_tree(grp, required=True)
-            __outgroup_taxon(grp, required=True)
+            __root_outgroup_taxon(grp, required=True)
             __output_tree(grp, required=True)
         with arg_group(parser, 'optional arguments') as grp:
             __gtdbtk_classification_file(grp)
@@ -546,10 +667,15 @@ def get_main_parser():
             __mash_db(grp)
         with arg_group(parser, 'optional FastANI arguments') as grp:
             __min_af(grp)
+        with arg_group(parser, 'optional clustering arguments') as grp:
+            __cluster(grp)
+            __cluster_method(grp)
+            __cluster_ani(grp)
         with arg_group(parser, 'optional arguments') as grp:
             __extension(grp)
             __prefix(grp)
             __cpus(grp)
+            __table_format(grp)
             __temp_dir(grp)
             __debug(grp)
             __help(grp)
@@ -610,6 +736,11 @@ def get_main_parser():
             __domain(grp, required=True)
             __output(grp, required=True)
         with arg_group(parser, 'optional arguments') as grp:
+            __taxa_filter(grp)
+            __genome_list(grp)
+            __mask_file(grp)
+            __apply_reference_mask(grp)
+            __cpus(grp)
             __debug(grp)
             __help(grp)
 
@@ -618,6 +749,7 @@ def get_main_parser():
                                                  'GTDB reference package.') as parser:
         with arg_group(parser, 'optional arguments') as grp:
             __db_version(grp)
+            __cpus(grp)
             __debug(grp)
             __help(grp)
 
@@ -95,8 +95,27 @@ class __GTDBTkCommonConfig:
     PPLACER_MIN_RAM_BAC_SPLIT = 55
     PPLACER_MIN_RAM_ARC = 40
 
+    # Heuristic model of pplacer memory usage, used to select the number of
+    # threads, whether to use a scratch file, and the number of batches.
+    # The memory to load a tree without a known requirement (PPLACER_MIN_RAM_*)
+    # is estimated from the size of its reference package, see
+    # PPLACER_MEM_PER_REFPKG_GB.
+    PPLACER_MEM_PER_THREAD_GB = 0.5
+    PPLACER_MEM_PER_GENOME_GB = 0.002
+    PPLACER_MMAP_RESIDENT_FRACTION = 0.2
+    PPLACER_MIN_BATCH_SIZE = 100
+
     FASTANI_SPECIES_THRESHOLD = 95.0
     FASTANI_GENOMES_EXT = "_genomic.fna.gz"
+    FASTANI_CHECKPOINT_GENOMES = 100  # query genomes per resumable FastANI batch
+
+    # Rows sorted in memory at once when writing the classify summary file.
+    SUMMARY_SORT_CHUNK_ROWS = 100000
+
+    # Incremental tree inference
+    FASTTREE_LOCAL_REFINE_ARGS = ['-nni', '4', '-spr', '0', '-mlnni', '2']
+    INFER_CONSTRAINT_RANKS = ('p__', 'c__', 'o__')
+    INFER_NEAREST_CHUNK_ROWS = 4096
 
     # Mash configuration
     MASH_SKETCH_FILE = 'gtdb_ref_sketch.msh'
@@ -108,7 +127,10 @@ class __GTDBTkCommonConfig:
 
     # Config values for checking GTDB-Tk on startup.
     GTDBTK_VER_CHECK = True
-    GTDBTK_VER_TIMEOUT = 3  # seconds
+    GTDBTK_VER_TIMEOUT = 3  # seconds, for the request
+    GTDBTK_VER_DEADLINE = 0.5  # seconds, to wait for the request before continuing
+    GTDBTK_VER_CACHE_TTL = 24 * 3600  # seconds, to keep the latest version
+    GTDBTK_VER_RETRY_TTL = 3600  # seconds, to wait after a failed request
 
     # Internal settings used for logging.
     LOG_TASK = 21
@@ -137,6 +159,37 @@ class __GTDBTkCommonConfig:
                 sys.exit(1)
         return self._generic_path
 
+    @property
+    def CACHE_DIR(self):
+        """Directory for indices derived from the reference data. This is kept
+        outside of GTDBTK_DATA_PATH so the reference data checksums are not
+        affected, and can be set using the 'GTDBTK_CACHE_PATH' variable."""
+        path = os.environ.get('GTDBTK_CACHE_PATH')
+        if path:
+            return os.path.expandvars(path)
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+        return os.path.join(cache_home, 'gtdbtk')
+
+    @property
+    def TRACE_FILE(self):
+        """Path to write a Chrome trace of the resource usage of each stage
+        to, set using the 'GTDBTK_TRACE_FILE' variable (default: not written)."""
+        path = os.environ.get('GTDBTK_TRACE_FILE')
+        return os.path.expandvars(path) if path else None
+
+    @property
+    def PPLACER_MEM_PER_REFPKG_GB(self):
+        """GB of RAM used by pplacer per GB of reference package, can be set
+        using the 'GTDBTK_PPLACER_MEM_PER_REFPKG_GB' variable (default: 1000).
+
+        The reference package is mostly the alignment, one byte per site of
+        each reference genome. pplacer holds ~3 likelihood vectors for each
+        of the ~2 nodes per reference genome, with 20 amino acids as 8 byte
+        doubles per site: 3 * 2 * 20 * 8 = 960 bytes per byte of alignment.
+        """
+        value = os.environ.get('GTDBTK_PPLACER_MEM_PER_REFPKG_GB')
+        return float(value) if value else 1000
+
     @property
     def MSA_FOLDER(self):
         return os.path.join(self.GENERIC_PATH, 'msa/')
@@ -59,6 +59,7 @@ PATH_BAC120_BACKBONE_PPLACER_CLASS = join(DIR_CLASSIFY_INTERMEDIATE, '{prefix}.b
 PATH_BAC120_CLASS_LEVEL_PPLACER_CLASS = join(DIR_CLASSIFY_INTERMEDIATE, '{prefix}.bac120.class_level.classification_pplacer_tree_{iter}.tsv')
 PATH_BAC120_PRESCREEN_MSA = join(DIR_CLASSIFY_INTERMEDIATE, '{prefix}.bac120.prescreened.msa.fasta')
 PATH_AR53_PRESCREEN_MSA = join(DIR_CLASSIFY_INTERMEDIATE, '{prefix}.ar53.prescreened.msa.fasta')
+PATH_FASTANI_BATCH = join(DIR_CLASSIFY_INTERMEDIATE, 'fastani', '{prefix}.{unit}.{gid}.json')
 
 #Command: ani_screen
 DIR_ANISCREEN = join(DIR_CLASSIFY, 'ani_screen')
@@ -90,6 +91,12 @@ PATH_MARKER_TREE_LOG = join(DIR_INFER_INTERMEDIATE, '{prefix}.{marker}.tree.log'
 PATH_TREE_LOG = join(DIR_INFER_INTERMEDIATE, '{prefix}.tree.log')
 PATH_MARKER_FASTTREE_LOG = join(DIR_INFER_INTERMEDIATE, '{prefix}.{marker}.fasttree.log')
 PATH_FASTTREE_LOG = join(DIR_INFER_INTERMEDIATE, '{prefix}.fasttree.log')
+PATH_MARKER_MSA_DIGESTS = join(DIR_INFER_INTERMEDIATE, '{prefix}.{marker}.msa_digests.tsv')
+PATH_MSA_DIGESTS = join(DIR_INFER_INTERMEDIATE, '{prefix}.msa_digests.tsv')
+PATH_MARKER_START_TREE = join(DIR_INFER_INTERMEDIATE, '{prefix}.{marker}.start.tree')
+PATH_START_TREE = join(DIR_INFER_INTERMEDIATE, '{prefix}.start.tree')
+PATH_MARKER_CONSTRAINTS = join(DIR_INFER_INTERMEDIATE, '{prefix}.{marker}.constraints.fasta')
+PATH_CONSTRAINTS = join(DIR_INFER_INTERMEDIATE, '{prefix}.constraints.fasta')
 
 PATH_BAC120_UNROOTED_TREE = join(DIR_INFER_INTERMEDIATE, '{prefix}.bac120.unrooted.tree')
 PATH_AR53_UNROOTED_TREE = join(DIR_INFER_INTERMEDIATE, '{prefix}.ar53.unrooted.tree')
@@ -0,0 +1,282 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+"""Run many third-party programs concurrently from a single event loop.
+
+Rather than a Python worker process for each program being run, the
+ToolExecutor launches and monitors the programs from an asyncio event loop
+in a background thread. The results are returned as each program finishes,
+so they can be processed while the others run:
+
+    jobs = [ToolJob(['hmmalign', marker_path, genes_path], data=marker_id)]
+    for result in ToolExecutor().run(jobs):
+        result.check('hmmalign')
+        ...
+
+Each program reserves its CPUs from the resource governor before it is
+launched, so programs are only started as CPUs become free.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.governor import ResourceGovernor, get_governor
+
+# The longest line which can be read from the output of a program.
+_STREAM_LIMIT = 2 ** 26
+
+
+class ToolJob(object):
+    """A third-party program to be run by the ToolExecutor."""
+
+    def __init__(self, args: List[Any], cpus: int = 1, memory_gb: float = 0.0,
+                 timeout: Optional[float] = None, stdout_path: Optional[str] = None,
+                 env: Optional[Dict[str, str]] = None, data: Any = None):
+        """Describe a program to run.
+
+        Parameters
+        ----------
+        args : List[Any]
+            The program and its arguments.
+        cpus : int
+            The number of CPUs the program uses.
+        memory_gb : float
+            The memory the program uses.
+        timeout : Optional[float]
+            The maximum seconds to run for before the program is killed.
+        stdout_path : Optional[str]
+            A file to write stdout to, rather than returning it.
+        env : Optional[Dict[str, str]]
+            The environment of the program, by default that of GTDB-Tk.
+        data : Any
+            Anything to be returned with the result (e.g. the genome id).
+        """
+        self.args = [str(x) for x in args]
+        self.cpus = cpus
+        self.memory_gb = memory_gb
+        self.timeout = timeout
+        self.stdout_path = stdout_path
+        self.env = env
+        self.data = data
+
+
+class ToolResult(object):
+    """The outcome of a ToolJob."""
+
+    def __init__(self, job: ToolJob, returncode: Optional[int], stdout: Optional[str],
+                 stderr: str, timed_out: bool, wall_s: float):
+        self.job = job
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timed_out = timed_out
+        self.wall_s = wall_s
+
+    @property
+    def ok(self) -> bool:
+        """True if the program finished in time with a zero exit code."""
+        return not self.timed_out and self.returncode == 0
+
+    def check(self, name: Optional[str] = None) -> 'ToolResult':
+        """Raise an exception if the program did not succeed.
+
+        Parameters
+        ----------
+        name : Optional[str]
+            The name of the program to report, by default the first argument.
+
+        Raises
+        ------
+        GTDBTkExit
+            If the program timed out or returned a non-zero exit code.
+        """
+        if self.ok:
+            return self
+        name = name or self.job.args[0]
+        if self.timed_out:
+            msg = f'{name} did not finish within {self.job.timeout} seconds'
+        else:
+            msg = f'{name} returned a non-zero exit code ({self.returncode})'
+        logging.getLogger('timestamp').error(f'{msg}: {" ".join(self.job.args)}\n{self.stderr}')
+        raise GTDBTkExit(f'{msg}.')
+
+
+class _Failure(object):
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_DONE = object()
+
+
+class ToolExecutor(object):
+    """Runs third-party programs concurrently from a single event loop."""
+
+    def __init__(self, max_running: Optional[int] = None,
+                 governor: Optional[ResourceGovernor] = None,
+                 on_line: Optional[Callable[[ToolJob, str, str], None]] = None):
+        """Create an executor.
+
+        Parameters
+        ----------
+        max_running : Optional[int]
+            The maximum number of programs to run at once, by default the
+            number of CPUs of the governor.
+        governor : Optional[ResourceGovernor]
+            The governor to reserve CPUs from, by default the process-wide one.
+        on_line : Optional[Callable[[ToolJob, str, str], None]]
+            Called (from the event loop thread) with the job, the stream name
+            (stdout/stderr) and each line of output as it is written.
+        """
+        self.governor = governor or get_governor()
+        self.max_running = max(1, max_running or self.governor.cpus)
+        self.on_line = on_line
+
+    def run(self, jobs: Iterable[ToolJob]) -> Iterator[ToolResult]:
+        """Run each job, returning the results in the order they finish.
+
+        Programs which are still running are killed if the iterator is closed
+        before it is exhausted (e.g. due to an exception).
+
+        Parameters
+        ----------
+        jobs : Iterable[ToolJob]
+            The programs to run, these are started in order.
+        """
+        results = queue.Queue()
+        stop = threading.Event()
+
+        def run_loop():
+            try:
+                asyncio.run(self._run_all(iter(jobs), results, stop))
+            except BaseException as e:
+                results.put(_Failure(e))
+            finally:
+                results.put(_DONE)
+
+        thread = threading.Thread(target=run_loop, name='gtdbtk-executor', daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+    async def _run_all(self, jobs: Iterator[ToolJob], results: queue.Queue,
+                       stop: threading.Event):
+        """Run the jobs with at most max_running at once."""
+        loop = asyncio.get_running_loop()
+
+        # Reservations are granted in order, so one thread waits on them.
+        with ThreadPoolExecutor(max_workers=1) as pool:
+
+            def release_late(future):
+                if not future.cancelled() and future.exception() is None:
+                    self.governor.release(*future.result())
+
+            async def worker():
+                for job in jobs:
+                    if stop.is_set():
+                        return
+                    future = pool.submit(self.governor.acquire, job.cpus, job.memory_gb)
+                    try:
+                        cpus, memory_gb = await asyncio.wrap_future(future, loop=loop)
+                    except asyncio.CancelledError:
+                        # The reservation may be granted after cancellation.
+                        future.add_done_callback(release_late)
+                        raise
+                    try:
+                        results.put(await self._run_job(job))
+                    finally:
+                        self.governor.release(cpus, memory_gb)
+
+            async def watch_stop(tasks):
+                while not stop.is_set():
+                    await asyncio.sleep(0.1)
+                for task in tasks:
+                    task.cancel()
+
+            workers = [asyncio.ensure_future(worker()) for _ in range(self.max_running)]
+            watcher = asyncio.ensure_future(watch_stop(workers))
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                raise
+            finally:
+                watcher.cancel()
+
+    async def _read_stream(self, job: ToolJob, name: str, stream: asyncio.StreamReader,
+                           lines: List[bytes]):
+        """Collect the lines of an output stream as they are written."""
+        while True:
+            line = await stream.readline()
+            if not line:
+                return
+            lines.append(line)
+            if self.on_line is not None:
+                self.on_line(job, name, line.decode('utf-8', errors='replace'))
+
+    async def _run_job(self, job: ToolJob) -> ToolResult:
+        """Run a single program, killing it if it exceeds the timeout."""
+        start = time.perf_counter()
+        stdout_lines, stderr_lines = list(), list()
+        stdout_fh = open(job.stdout_path, 'wb') if job.stdout_path else None
+        try:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *job.args, stdout=stdout_fh or asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE, env=job.env, limit=_STREAM_LIMIT)
+            except OSError as e:
+                raise GTDBTkExit(f'Unable to run {job.args[0]}: {e}')
+
+            readers = [self._read_stream(job, 'stderr', proc.stderr, stderr_lines)]
+            if stdout_fh is None:
+                readers.append(self._read_stream(job, 'stdout', proc.stdout, stdout_lines))
+            timed_out = False
+            try:
+                await asyncio.wait_for(asyncio.gather(proc.wait(), *readers), job.timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                proc.kill()
+                await proc.wait()
+            except asyncio.CancelledError:
+                proc.kill()
+                await proc.wait()
+                raise
+        finally:
+            if stdout_fh is not None:
+                stdout_fh.close()
+
+        stdout = None if stdout_fh else b''.join(stdout_lines).decode('utf-8', errors='replace')
+        return ToolResult(job, proc.returncode, stdout,
+                          b''.join(stderr_lines).decode('utf-8', errors='replace'),
+                          timed_out, time.perf_counter() - start)
@@ -19,13 +19,76 @@ import logging
 import multiprocessing as mp
 import os
 import re
-import shutil
 import subprocess
 import tempfile
 
 from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.executor import ToolExecutor, ToolJob
+from gtdbtk.files.result_spool import ResultSpool
+from gtdbtk.governor import get_governor
 from gtdbtk.tools import tqdm_log
 
+# The spool and genome index of each path, set in each parser process.
+_parser_spool = None
+_parser_path_idx = None
+
+
+def _init_parser(spool, path_idx):
+    global _parser_spool, _parser_path_idx
+    _parser_spool = spool
+    _parser_path_idx = path_idx
+
+
+def _read_output_file(path_out):
+    """Parses the output file of FastANI.
+
+    Returns
+    -------
+    tuple[dict[str, dict[str, tuple[float, float]]], bool]
+        The ANI/AF of the query genomes to the reference genomes, and True if
+        the output was written by FastANI v1.0.
+    """
+    out, is_v1 = dict(), False
+    if os.path.isfile(path_out):
+        with open(path_out, 'r') as fh:
+            for line in fh.readlines():
+                """FastANI version >=1.1 uses tabs instead of spaces to separate columns.
+                Preferentially try split with tabs first instead of split() in-case of 
+                spaces in the file path."""
+                try:
+                    try:
+                        path_qry, path_ref, ani, frac1, frac2 = line.strip().split('\t')
+                    except ValueError:
+                        path_qry, path_ref, ani, frac1, frac2 = line.strip().split(' ')
+                        is_v1 = True
+                    af = float(frac1) / float(frac2)
+                    if path_qry not in out:
+                        out[path_qry] = {path_ref: (float(ani), af)}
+                    elif path_ref not in out[path_qry]:
+                        out[path_qry][path_ref] = (float(ani), af)
+                except Exception as e:
+                    logging.getLogger('timestamp').error(f'Exception reading FastANI output: {repr(e)}')
+                    raise GTDBTkExit(f'Unable to read line "{line}"')
+    return out, is_v1
+
+
+def _spool_output_file(qry_idx, path_out):
+    """Parses a FastANI output file in a parser process, writing each
+    (query, genome A, genome B, ANI, AF) record to the spool.
+
+    Returns
+    -------
+    bool
+        True if the output was written by FastANI v1.0.
+    """
+    result, is_v1 = _read_output_file(path_out)
+    with _parser_spool.writer() as out:
+        for path_a, dict_b in result.items():
+            for path_b, (ani, af) in dict_b.items():
+                out.write(qry_idx, _parser_path_idx[path_a], _parser_path_idx[path_b], ani, af)
+    os.remove(path_out)
+    return is_v1
+
 
 class FastANI(object):
     """Python wrapper for FastANI (https://github.com/ParBLiSS/FastANI)"""
@@ -101,145 +164,87 @@ class FastANI(object):
         dict[str, dict[str, dict[str, float]]]
             A dictionary containing the ANI and AF for each comparison."""
 
-        # Create the multiprocessing items.
-        manager = mp.Manager()
-        q_worker = manager.Queue()
-        q_writer = manager.Queue()
-        q_results = manager.Queue()
-
-        # Populate the queue of comparisons in forwards and reverse direction.
-        n_total = 0
+        # Comparisons are made in the forwards and reverse direction.
+        comparisons = list()
         if self.force_single:
             for qry_gid, ref_set in dict_compare.items():
-                qry_path = dict_paths[qry_gid]
-
                 for ref_gid in ref_set:
-                    ref_path = dict_paths[ref_gid]
-
-                    fwd_dict = {'q': dict(), 'r': dict(), 'qry': qry_gid}
-                    rev_dict = {'q': dict(), 'r': dict(), 'qry': qry_gid}
-
-                    fwd_dict['q'][qry_gid] = qry_path
-                    fwd_dict['r'][ref_gid] = ref_path
-
-                    rev_dict['q'][ref_gid] = ref_path
-                    rev_dict['r'][qry_gid] = qry_path
-
-                    q_worker.put(fwd_dict)
-                    q_worker.put(rev_dict)
-                    n_total += 2
+                    comparisons.append({'q': dict_paths[qry_gid], 'r': dict_paths[ref_gid],
+                                        'qry': qry_gid})
+                    comparisons.append({'q': dict_paths[ref_gid], 'r': dict_paths[qry_gid],
+                                        'qry': qry_gid})
         else:
             for qry_gid, ref_set in dict_compare.items():
-                fwd_dict = {'ql': dict(), 'rl': dict(), 'qry': qry_gid}
-                rev_dict = {'ql': dict(), 'rl': dict(), 'qry': qry_gid}
-
                 qry_path = dict_paths[qry_gid]
-                fwd_dict['ql'][qry_gid] = qry_path
-                rev_dict['rl'][qry_gid] = qry_path
-
-                for ref_gid in ref_set:
-                    ref_path = dict_paths[ref_gid]
-                    fwd_dict['rl'][ref_gid] = ref_path
-                    rev_dict['ql'][ref_gid] = ref_path
-
-                q_worker.put(fwd_dict)
-                q_worker.put(rev_dict)
-                n_total += 2
-
-        # Set the terminate condition for each worker thread.
-        [q_worker.put(None) for _ in range(self.cpus)]
-
-        # Create each of the processes
-        p_workers = [mp.Process(target=self._worker,
-                                args=(q_worker, q_writer, q_results))
-                     for _ in range(self.cpus)]
-
-        p_writer = mp.Process(target=self._writer, args=(q_writer, n_total))
-
-        # Start each of the threads.
-        try:
-            # Start the writer and each processing thread.
-            p_writer.start()
-            for p_worker in p_workers:
-                p_worker.start()
-
-            # Wait until each worker has finished.
-            for p_worker in p_workers:
-                p_worker.join()
-
-                # Gracefully terminate the program.
-                if p_worker.exitcode != 0:
-                    raise GTDBTkExit('FastANI returned a non-zero exit code.')
-
-            # Stop the writer thread.
-            q_writer.put(None)
-            p_writer.join()
-
-        except Exception:
-            for p in p_workers:
-                p.terminate()
-            p_writer.terminate()
-            raise
-
-        # Process and return each of the results obtained
-        path_to_gid = {v: k for k, v in dict_paths.items()}
-        q_results.put(None)
-        return self._parse_result_queue(q_results, path_to_gid)
-
-    def _worker(self, q_worker, q_writer, q_results):
-        """Operates FastANI in list mode.
-
-        Parameters
-        ----------
-        q_worker : mp.Queue
-            A multiprocessing queue containing the available jobs.
-        q_writer : mp.Queue
-            A multiprocessing queue to track progress.
-        q_results : mp.Queue
-            A multiprocessing queue containing raw results.
-        """
-        while True:
-            # Retrieve the next item, stop if the sentinel is found.
-            job = q_worker.get(block=True)
-            if job is None:
-                break
-
-            # Extract the values
-            q = list(job.get('q').values())[0] if job.get('q') is not None else None
-            r = list(job.get('r').values())[0] if job.get('r') is not None else None
-            ql = job.get('ql')
-            rl = job.get('rl')
-
-            # Create a temporary directory to write the lists to.
-            with tempfile.TemporaryDirectory(prefix='gtdbtk_fastani_tmp') as dir_tmp:
-                path_qry = os.path.join(dir_tmp, 'ql.txt') if ql is not None else None
-                path_ref = os.path.join(dir_tmp, 'rl.txt') if rl is not None else None
-                path_out = os.path.join(dir_tmp, 'output.txt')
-
-                # Write to the query and reference lists
-                self._maybe_write_list(ql, path_qry)
-                self._maybe_write_list(rl, path_ref)
-
-                # Run FastANI
-                result = self.run_proc(q, r, path_qry, path_ref, path_out)
-                q_results.put((job, result))
-                q_writer.put(True)
-
-        return True
-
-    def _writer(self, q_writer, n_total):
-        """The writer function, which reports the progress of the workers.
+                ref_paths = [dict_paths[ref_gid] for ref_gid in ref_set]
+                comparisons.append({'ql': [qry_path], 'rl': ref_paths, 'qry': qry_gid})
+                comparisons.append({'ql': ref_paths, 'rl': [qry_path], 'qry': qry_gid})
+
+        # Each FastANI process is run from a single thread. As each process
+        # finishes its output is parsed by a pool of parser processes, which
+        # return (query, genome A, genome B, ANI, AF) records using the index
+        # of each genome. The pool is started before any thread is.
+        gids = list(dict_paths)
+        gid_idx = {gid: idx for idx, gid in enumerate(gids)}
+        path_idx = {path: gid_idx[gid] for gid, path in dict_paths.items()}
+        with tempfile.TemporaryDirectory(prefix='gtdbtk_fastani_tmp') as dir_tmp, \
+                ResultSpool('<iiidd', tmp_dir=dir_tmp) as spool:
+            with mp.Pool(self.cpus, initializer=_init_parser, initargs=(spool, path_idx)) as pool:
+                parsed = list()
+                jobs = self._create_jobs(comparisons, dir_tmp)
+                with tqdm_log(unit='comparison', total=len(comparisons)) as p_bar:
+                    for result in ToolExecutor(max_running=self.cpus).run(jobs):
+                        if not result.ok:
+                            self.logger.error('STDOUT:\n' + (result.stdout or ''))
+                            self.logger.error('STDERR:\n' + result.stderr)
+                            raise GTDBTkExit('FastANI returned a non-zero exit code.')
+                        qry_gid, path_out = result.job.data
+                        parsed.append(pool.apply_async(_spool_output_file,
+                                                       (gid_idx[qry_gid], path_out)))
+                        p_bar.update()
+                pool.close()
+                if any([x.get() for x in parsed]):
+                    self._warn_v1()
+                pool.join()
+            return self._parse_result_spool(spool, gids)
+
+    def _create_jobs(self, comparisons, dir_tmp):
+        """Yields a FastANI job for each comparison, writing any lists to disk.
 
         Parameters
         ----------
-        q_writer : mp.Queue
-            A queue of genome ids which have been processed.
-        n_total : int
-            The total number of items to be processed.
+        comparisons : list[dict]
+            The q/r paths or ql/rl lists of paths and the query genome id.
+        dir_tmp : str
+            The directory to write the lists and output files to.
         """
-        with tqdm_log(unit='comparison', total=n_total) as p_bar:
-            for _ in iter(q_writer.get, None):
-                p_bar.update()
+        for idx, comparison in enumerate(comparisons):
+            path_qry, path_ref = None, None
+            if 'ql' in comparison:
+                path_qry = os.path.join(dir_tmp, f'{idx}_ql.txt')
+                path_ref = os.path.join(dir_tmp, f'{idx}_rl.txt')
+                self._maybe_write_list(comparison['ql'], path_qry)
+                self._maybe_write_list(comparison['rl'], path_ref)
+            path_out = os.path.join(dir_tmp, f'{idx}_output.txt')
+            args = self._get_args(comparison.get('q'), comparison.get('r'),
+                                  path_qry, path_ref, path_out)
+            yield ToolJob(args, data=(comparison['qry'], path_out))
+
+    def _get_args(self, q, r, ql, rl, output):
+        """Returns the FastANI command for a comparison."""
+        args = ['fastANI']
+        if self.minFrac:
+            args.extend(['--minFraction', '0'])
+        if q is not None:
+            args.extend(['-q', q])
+        if r is not None:
+            args.extend(['-r', r])
+        if ql is not None:
+            args.extend(['--ql', ql])
+        if rl is not None:
+            args.extend(['--rl', rl])
+        args.extend(['-o', output])
+        return args
 
     def run_proc(self, q, r, ql, rl, output):
         """Runs the FastANI process.
@@ -262,22 +267,11 @@ class FastANI(object):
         dict[str, dict[str, float]]
             The ANI/AF of the query genomes to the reference genomes.
         """
-        args = ['fastANI']
-        if self.minFrac:
-            args.extend(['--minFraction', '0'])
-        if q is not None:
-            args.extend(['-q', q])
-        if r is not None:
-            args.extend(['-r', r])
-        if ql is not None:
-            args.extend(['--ql', ql])
-        if rl is not None:
-            args.extend(['--rl', rl])
-        args.extend(['-o', output])
-        #self.logger.debug(' '.join(args))
-        proc = subprocess.Popen(args, stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE, encoding='utf-8')
-        stdout, stderr = proc.communicate()
+        args = self._get_args(q, r, ql, rl, output)
+        with get_governor().reserve(1):
+            proc = subprocess.Popen(args, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, encoding='utf-8')
+            stdout, stderr = proc.communicate()
 
         if proc.returncode != 0:
             self.logger.error('STDOUT:\n' + stdout)
@@ -287,6 +281,12 @@ class FastANI(object):
         # Parse the output
         return self.parse_output_file(output)
 
+    def _warn_v1(self):
+        if not self._suppress_v1_warning:
+            self.logger.warning('You are using FastANI v1.0, it is recommended '
+                                'that you update to a more recent version.')
+            self._suppress_v1_warning = True
+
     def parse_output_file(self, path_out):
         """Parses the resulting output file from FastANI.
 
@@ -300,57 +300,36 @@ class FastANI(object):
         dict[str, dict[str, tuple[float, float]]]
             The ANI/AF of the query genomes to the reference genomes.
         """
-        out = dict()
-        if os.path.isfile(path_out):
-            with open(path_out, 'r') as fh:
-                for line in fh.readlines():
-                    """FastANI version >=1.1 uses tabs instead of spaces to separate columns.
-                    Preferentially try split with tabs first instead of split() in-case of 
-                    spaces in the file path."""
-                    try:
-                        try:
-                            path_qry, path_ref, ani, frac1, frac2 = line.strip().split('\t')
-                        except ValueError:
-                            path_qry, path_ref, ani, frac1, frac2 = line.strip().split(' ')
-                            if not self._suppress_v1_warning:
-                                self.logger.warning('You are using FastANI v1.0, it is recommended '
-                                                    'that you update to a more recent version.')
-                                self._suppress_v1_warning = True
-                        af = float(frac1) / float(frac2)
-                        if path_qry not in out:
-                            out[path_qry] = {path_ref: (float(ani), af)}
-                        elif path_ref not in out[path_qry]:
-                            out[path_qry][path_ref] = (float(ani), af)
-                    except Exception as e:
-                        self.logger.error(f'Exception reading FastANI output: {repr(e)}')
-                        raise GTDBTkExit(f'Unable to read line "{line}"')
+        out, is_v1 = _read_output_file(path_out)
+        if is_v1:
+            self._warn_v1()
         return out
 
-    def _maybe_write_list(self, d_genomes, path):
+    def _maybe_write_list(self, genome_paths, path):
         """Writes a query/reference list to disk.
 
         Parameters
         ----------
-        d_genomes : dict[str, str]
-            A dictionary containing the key as the accession and value as path.
+        genome_paths : list[str]
+            The path of each genome.
         path : str
             The path to write the file to.
         """
-        if d_genomes is None or path is None:
+        if genome_paths is None or path is None:
             return
         with open(path, 'w') as fh:
-            for gid, gid_path in d_genomes.items():
-                fh.write(f'{gid_path}\n')
+            for genome_path in genome_paths:
+                fh.write(f'{genome_path}\n')
 
-    def _parse_result_queue(self, q_results, path_to_gid):
+    def _parse_result_spool(self, spool, gids):
         """Creates the output dictionary given the results from FastANI
 
         Parameters
         ----------
-        q_results : mp.Queue
-            A multiprocessing queue containing raw results.
-        path_to_gid : dict[str ,str]
-            A dictionary containing the file path to genome id.
+        spool : ResultSpool
+            The (query, genome A, genome B, ANI, AF) results of each job.
+        gids : list[str]
+            The genome id of each index.
 
         Returns
         -------
@@ -358,36 +337,27 @@ class FastANI(object):
             The ANI/AF of the query genome to all reference genomes.
         """
         out = dict()
-        while True:
-            q_item = q_results.get(block=True)
-            if q_item is None:
-                break
-
-            job, result = q_item
-            qry_gid = job['qry']
-
-            for path_a, dict_b in result.items():
-                for path_b, (ani, af) in dict_b.items():
-                    gid_a, gid_b = path_to_gid[path_a], path_to_gid[path_b]
-
-                    # This was done in the forward direction.
-                    if gid_a == qry_gid:
-                        ref_gid = gid_b
-                    # This was done in the reverse direction.
-                    elif gid_b == qry_gid:
-                        ref_gid = gid_a
-                    else:
-                        raise GTDBTkExit('FastANI results are malformed.')
-
-                    # Take the largest ANI / AF from either pass.
-                    if qry_gid not in out:
-                        out[qry_gid] = {ref_gid: {'ani': ani, 'af': af}}
-                    elif ref_gid not in out[qry_gid]:
-                        out[qry_gid][ref_gid] = {'ani': ani, 'af': af}
-                    else:
-                        out[qry_gid][ref_gid]['ani'] = max(
-                            out[qry_gid][ref_gid]['ani'], ani)
-                        out[qry_gid][ref_gid]['af'] = max(
-                            out[qry_gid][ref_gid]['af'], af)
+        for qry_idx, idx_a, idx_b, ani, af in spool:
+
+            # This was done in the forward direction.
+            if idx_a == qry_idx:
+                ref_idx = idx_b
+            # This was done in the reverse direction.
+            elif idx_b == qry_idx:
+                ref_idx = idx_a
+            else:
+                raise GTDBTkExit('FastANI results are malformed.')
+            qry_gid, ref_gid = gids[qry_idx], gids[ref_idx]
+
+            # Take the largest ANI / AF from either pass.
+            if qry_gid not in out:
+                out[qry_gid] = {ref_gid: {'ani': ani, 'af': af}}
+            elif ref_gid not in out[qry_gid]:
+                out[qry_gid][ref_gid] = {'ani': ani, 'af': af}
+            else:
+                out[qry_gid][ref_gid]['ani'] = max(
+                    out[qry_gid][ref_gid]['ani'], ani)
+                out[qry_gid][ref_gid]['af'] = max(
+                    out[qry_gid][ref_gid]['af'], af)
 
         return out
@@ -20,11 +20,13 @@ import logging
 import os
 import shutil
 import subprocess
-import tempfile
+import threading
 
 from gtdbtk.biolib_lite.common import make_sure_path_exists
 from gtdbtk.biolib_lite.execute import check_dependencies
+from gtdbtk.config.common import CONFIG
 from gtdbtk.exceptions import FastTreeException
+from gtdbtk.governor import get_governor
 
 
 class FastTree(object):
@@ -47,7 +49,32 @@ class FastTree(object):
         except:
             return "(version unavailable)"
 
-    def run(self, output_tree, tree_log, fasttree_log, prot_model, no_support, gamma, msa_file, cpus=1):
+    @staticmethod
+    def _get_decompress_cmd():
+        """Returns the command to decompress a gzip file to stdout, if any."""
+        for cmd in ('pigz', 'gzip'):
+            if shutil.which(cmd):
+                return [cmd, '-dc']
+        return None
+
+    @staticmethod
+    def _write_gzip_to_pipe(msa_file, pipe, errors):
+        """Decompress a gzip file into a pipe, used if gzip is not available."""
+        try:
+            with gzip.open(msa_file, 'rb') as f_in:
+                shutil.copyfileobj(f_in, pipe, 1048576)
+        except BrokenPipeError:
+            pass
+        except (OSError, EOFError) as e:
+            errors.append(e)
+        finally:
+            try:
+                pipe.close()
+            except BrokenPipeError:
+                pass
+
+    def run(self, output_tree, tree_log, fasttree_log, prot_model, no_support, gamma, msa_file, cpus=1,
+            start_tree=None, constraints=None, refine_local=False):
         """Run FastTree.
 
         Parameters
@@ -65,9 +92,16 @@ class FastTree(object):
         gamma : bool
             True if Gamma20 should be used, False otherwise.
         msa_file : str
-            The path to the input MSA.
+            The path to the input MSA, a gzipped MSA is streamed to FastTree.
         cpus : int
             The maximum number of CPUs for FastTree to use.
+        start_tree : Optional[str]
+            The path to a tree containing every taxon in the MSA to start from.
+        constraints : Optional[str]
+            The path to a FastTree constraint alignment of the splits to keep.
+        refine_local : bool
+            True if only a few rounds of topology refinement should be done
+            (see CONFIG.FASTTREE_LOCAL_REFINE_ARGS), e.g. from a start tree.
 
         Raises
         ------
@@ -104,30 +138,58 @@ class FastTree(object):
         else:
             model_out.append('SH support values')
 
+        if start_tree:
+            args.extend(['-intree', start_tree])
+        if constraints:
+            args.extend(['-constraints', constraints])
+        if refine_local:
+            args.extend(CONFIG.FASTTREE_LOCAL_REFINE_ARGS)
+
         args.append('-log')
         args.append(tree_log)
 
         self.logger.info('Inferring FastTree ({}) using a maximum of {} CPUs.'.format(
             ', '.join(model_out), cpus))
 
-        # Use a temporary directory if the input file is gzipped
-        with tempfile.TemporaryDirectory(prefix='gtdbtk_') as tmp_dir:
-
-            # Uncompress the archive if it's compressed
-            if msa_file.endswith('.gz'):
-                msa_path = os.path.join(tmp_dir, os.path.basename(msa_file[0:-3]))
-                with gzip.open(msa_file, 'rb') as f_in:
-                    with open(msa_path, 'wb') as f_out:
-                        shutil.copyfileobj(f_in, f_out)
-            else:
-                msa_path = msa_file
-            args.append(msa_path)
-
-            with open(output_tree, 'w') as f_out_tree:
-                with open(fasttree_log, 'w') as f_out_err:
-                    proc = subprocess.Popen(
-                        args, stdout=f_out_tree, stderr=f_out_err, env=env)
-                    proc.communicate()
+        # A gzipped MSA is decompressed while it is read from stdin by FastTree,
+        # so that no temporary copy is needed.
+        is_gzip = msa_file.endswith('.gz')
+        decompress_cmd = self._get_decompress_cmd() if is_gzip else None
+        decompress_proc, decompress_thread, decompress_errors = None, None, list()
+        if not is_gzip:
+            args.append(msa_file)
+
+        with open(output_tree, 'w') as f_out_tree:
+            with open(fasttree_log, 'w') as f_out_err, get_governor().reserve(cpus):
+                if decompress_cmd:
+                    decompress_proc = subprocess.Popen(decompress_cmd + [msa_file],
+                                                       stdout=subprocess.PIPE,
+                                                       stderr=subprocess.DEVNULL)
+                    stdin = decompress_proc.stdout
+                else:
+                    stdin = subprocess.PIPE if is_gzip else subprocess.DEVNULL
+                proc = subprocess.Popen(args, stdin=stdin, stdout=f_out_tree,
+                                        stderr=f_out_err, env=env)
+
+                if decompress_proc is not None:
+                    # Allow the decompression to stop if FastTree exits.
+                    decompress_proc.stdout.close()
+                elif is_gzip:
+                    decompress_thread = threading.Thread(
+                        target=self._write_gzip_to_pipe,
+                        args=(msa_file, proc.stdin, decompress_errors), daemon=True)
+                    decompress_thread.start()
+
+                proc.wait()
+                if decompress_thread is not None:
+                    decompress_thread.join()
+                if decompress_proc is not None and decompress_proc.wait() != 0:
+                    decompress_errors.append(decompress_proc.returncode)
+
+        # A truncated MSA would otherwise be silently accepted.
+        if decompress_errors and proc.returncode == 0:
+            self.logger.error(f'Unable to decompress the MSA: {msa_file}')
+            raise FastTreeException('The MSA could not be decompressed.')
 
         # Validate results
         if proc.returncode != 0:
@@ -26,6 +26,8 @@ from gtdbtk.biolib_lite.execute import check_dependencies
 from gtdbtk.exceptions import GTDBTkException
 from gtdbtk.files.marker.copy_number import CopyNumberFileAR53, CopyNumberFileBAC120
 from gtdbtk.files.marker.tophit import TopHitPfamFile, TopHitTigrFile
+from gtdbtk.files.result_spool import ResultSpool
+from gtdbtk.governor import get_governor
 from gtdbtk.tools import tqdm_log
 
 
@@ -119,15 +121,16 @@ class HmmAligner(object):
         q_worker = mp.Queue()
         q_writer = mp.Queue()
 
-        for gid, gid_dict in db_genome_ids.items():
-            q_worker.put((gid, gid_dict.get('aa_gene_path'), marker_set_id))
+        gids = list(db_genome_ids)
+        for gid_idx, gid in enumerate(gids):
+            q_worker.put((gid_idx, gid, db_genome_ids[gid].get('aa_gene_path'), marker_set_id))
         [q_worker.put(None) for _ in range(self.threads)]
 
-        manager = mp.Manager()
-        out_dict = manager.dict()
+        # The (genome index, alignment) of each genome.
+        spool = ResultSpool('<i', has_payload=True)
 
         p_workers = [mp.Process(target=self._worker,
-                                args=(q_worker, q_writer, out_dict))
+                                args=(q_worker, q_writer, spool))
                      for _ in range(self.threads)]
 
         p_writer = mp.Process(target=self._writer,
@@ -154,30 +157,34 @@ class HmmAligner(object):
                 p.terminate()
 
             p_writer.terminate()
+            spool.cleanup()
             raise
 
-        return {k: v for k, v in out_dict.items()}
+        with spool:
+            return {gids[gid_idx]: aln.decode('ascii') for gid_idx, aln in spool}
 
-    def _worker(self, q_worker, q_writer, out_dict):
+    def _worker(self, q_worker, q_writer, spool):
         """The worker function, invoked in a process.
 
         Parameters
         ----------
         q_worker : multiprocessing.Queue
-            A queue of tuples containing the genome id, aa path, and marker.
+            A queue of tuples containing the genome index, id, aa path, and marker.
         q_writer : multiprocessing.Queue
             A queue consumed by the writer, to track progress.
-        out_dict : dict
-            A thread-safe managed dictionary of results.
+        spool : ResultSpool
+            The spool to write the (genome index, alignment) results to.
         """
-        job = q_worker.get(block=True, timeout=None)
-        while job is not None:
-            db_genome_id, aa_gene_path, marker_set_id = job
-            out_dict[db_genome_id] = self._run_multi_align(db_genome_id,
-                                                           aa_gene_path,
-                                                           marker_set_id)
-            q_writer.put(db_genome_id)
+        with spool.writer() as out:
             job = q_worker.get(block=True, timeout=None)
+            while job is not None:
+                gid_idx, db_genome_id, aa_gene_path, marker_set_id = job
+                aln = self._run_multi_align(db_genome_id,
+                                            aa_gene_path,
+                                            marker_set_id)
+                out.write(gid_idx, payload=aln.encode('ascii'))
+                q_writer.put(db_genome_id)
+                job = q_worker.get(block=True, timeout=None)
         return True
 
     def _writer(self, q_writer, n_genomes):
@@ -283,10 +290,11 @@ class HmmAligner(object):
                 with open(hmmalign_gene_input, 'w') as out_fh:
                     out_fh.write(">{0}\n".format(marker_info.get("gene")))
                     out_fh.write("{0}".format(marker_info.get("gene_seq")))
-                proc = subprocess.Popen(["hmmalign", "--outformat", "Pfam", marker_info.get(
-                    "marker_path"), hmmalign_gene_input], stdout=subprocess.PIPE,
-                                        stderr=subprocess.PIPE, encoding='utf-8')
-                stdout, stderr = proc.communicate()
+                with get_governor().reserve(1):
+                    proc = subprocess.Popen(["hmmalign", "--outformat", "Pfam", marker_info.get(
+                        "marker_path"), hmmalign_gene_input], stdout=subprocess.PIPE,
+                                            stderr=subprocess.PIPE, encoding='utf-8')
+                    stdout, stderr = proc.communicate()
 
                 for line in stderr.splitlines():
                     print(line)
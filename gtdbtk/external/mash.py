@@ -7,6 +7,7 @@ from collections import defaultdict
 from typing import Tuple, Dict
 from gtdbtk.biolib_lite.common import make_sure_path_exists
 from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.governor import get_governor
 from gtdbtk.tools import tqdm_log
 from gtdbtk.config.common import CONFIG
 
@@ -93,6 +94,49 @@ class Mash(object):
                 out[path_to_qry[qry_path]][path_to_ref[current_ref_path]] = hit
         return out
 
+    def run_pairwise(self, genomes, mash_d, mash_k, mash_v, mash_s,
+                     mash_max_dist=None) -> Dict[Tuple[str, str], float]:
+        """Run Mash between all pairs of a set of genomes.
+
+        Parameters
+        ----------
+        genomes : dict[str, str]
+            The set of genomes and their path.
+        mash_d : float
+            The maximum distance to report.
+        mash_k : int
+            The number of k-mers to store for each sequence.
+        mash_v : float
+            Maximum p-value to report.
+        mash_s: int
+            Maximum number of non-redundant hashes.
+        mash_max_dist : Optional[float]
+            The maximum Mash distance to consider two genomes as a candidate pair,
+            by default mash_d.
+
+        Returns
+        -------
+        dict[(genome_a, genome_b)] = dist, where genome_a < genome_b
+        """
+        name_to_gid = {os.path.basename(v): k for (k, v) in genomes.items()}
+        if len(name_to_gid) != len(genomes):
+            raise GTDBTkExit('The file name of each genome must be unique to run Mash.')
+
+        sketch = QrySketchFile(genomes, self.out_dir, self.prefix, self.cpus, mash_k, mash_s)
+        mash_dists = DistanceFile(sketch, sketch, self.out_dir, self.prefix,
+                                  self.cpus, max_d=mash_d, mash_v=mash_v)
+
+        out = dict()
+        if mash_max_dist is None:
+            mash_max_dist = mash_d
+        for qry_path, ref_hits in mash_dists.read(mash_max_dist).items():
+            gid_a = name_to_gid[os.path.basename(qry_path)]
+            for ref_name, hit in ref_hits.items():
+                gid_b = name_to_gid[ref_name]
+                if gid_a != gid_b:
+                    out[tuple(sorted((gid_a, gid_b)))] = hit[0]
+        return out
+
 
 class DistanceFile(object):
     """The resulting distance file from the mash dist command."""
@@ -133,7 +177,7 @@ class DistanceFile(object):
         args = ['mash', 'dist', '-p', self.cpus, '-d', self.max_d, '-v',
                 self.mash_v, self.ref_sketch.path, self.qry_sketch.path]
         args = list(map(str, args))
-        with open(self.path, 'w') as f_out:
+        with open(self.path, 'w') as f_out, get_governor().reserve(self.cpus):
             proc = subprocess.Popen(args, stdout=f_out,
                                     stderr=subprocess.PIPE, encoding='utf-8')
             _, stderr = proc.communicate()
@@ -229,19 +273,28 @@ class SketchFile(object):
                 for path in self.genomes.values():
                     fh.write(f'{path}\n')
 
+            # The sketch is written next to the final path and then moved into
+            # place, so that runs sharing a sketch (e.g. shards of classify_wf)
+            # never read a partially written file.
+            path_tmp = os.path.join(os.path.dirname(self.path),
+                                    f'.{os.path.basename(self.path)}.{os.getpid()}.msh')
             args = ['mash', 'sketch', '-l', '-p', self.cpus, path_genomes, '-o',
-                    self.path, '-k', self.k, '-s', self.s]
+                    path_tmp, '-k', self.k, '-s', self.s]
             args = list(map(str, args))
-            proc = subprocess.Popen(args, stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, encoding='utf-8')
-            with tqdm_log(total=len(self.genomes), unit='genome') as p_bar:
-                for line in iter(proc.stderr.readline, ''):
-                    if line.startswith('Sketching'):
-                        p_bar.update()
-            proc.wait()
-
-            if proc.returncode != 0 or not os.path.isfile(self.path):
+            with get_governor().reserve(self.cpus):
+                proc = subprocess.Popen(args, stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE, encoding='utf-8')
+                with tqdm_log(total=len(self.genomes), unit='genome') as p_bar:
+                    for line in iter(proc.stderr.readline, ''):
+                        if line.startswith('Sketching'):
+                            p_bar.update()
+                proc.wait()
+
+            if proc.returncode != 0 or not os.path.isfile(path_tmp):
+                if os.path.isfile(path_tmp):
+                    os.remove(path_tmp)
                 raise GTDBTkExit(f'Error generating Mash sketch: {proc.stderr.read()}')
+            os.replace(path_tmp, self.path)
 
 
 class QrySketchFile(SketchFile):
@@ -21,7 +21,8 @@ import os
 from gtdbtk.exceptions import GTDBTkExit
 from gtdbtk.external.pypfam.Scan.PfamScan import PfamScan
 from gtdbtk.files.marker.tophit import TopHitPfamFile
-from gtdbtk.tools import sha256, file_has_checksum, tqdm_log
+from gtdbtk.governor import get_governor
+from gtdbtk.tools import write_checksum, file_has_checksum, tqdm_log
 
 
 class PfamSearch(object):
@@ -97,18 +98,18 @@ class PfamSearch(object):
 
                 # Check if this has already been processed.
                 out_files = (output_hit_file, TopHitPfamFile.get_path(self.output_dir, genome_id))
-                if all([file_has_checksum(x) for x in out_files]):
+                if all(file_has_checksum(x) for x in out_files):
                     self.warnings.info(f'Skipped Pfam processing for: {genome_id}')
                     with n_skipped.get_lock():
                         n_skipped.value += 1
                 else:
                     pfam_scan = PfamScan(cpu=self.cpus_per_genome, fasta=gene_file, dir=self.pfam_hmm_dir)
-                    pfam_scan.search()
+                    with get_governor().reserve(self.cpus_per_genome):
+                        pfam_scan.search()
                     pfam_scan.write_results(output_hit_file, None, None, None, None)
 
                     # calculate checksum
-                    with open(output_hit_file + self.checksum_suffix, 'w') as fh:
-                        fh.write(sha256(output_hit_file))
+                    write_checksum(output_hit_file, self.checksum_suffix)
 
                     # identify top hit for each gene
                     self._topHit(output_hit_file)
@@ -132,7 +133,7 @@ class PfamSearch(object):
             Gene files in FASTA format to process.
         """
 
-        self.cpus_per_genome = max(1, int(self.threads / len(gene_files)))
+        n_workers, self.cpus_per_genome = get_governor().split(len(gene_files), self.threads)
 
         # populate worker queue with data to process
         workerQueue = mp.Queue()
@@ -142,12 +143,12 @@ class PfamSearch(object):
         for f in gene_files:
             workerQueue.put(f)
 
-        for _ in range(self.threads):
+        for _ in range(n_workers):
             workerQueue.put(None)
 
         try:
             workerProc = [mp.Process(target=self._workerThread, args=(
-                workerQueue, writerQueue, n_skipped)) for _ in range(self.threads)]
+                workerQueue, writerQueue, n_skipped)) for _ in range(n_workers)]
             writeProc = mp.Process(target=self._writerThread, args=(
                 len(gene_files), writerQueue))
 
@@ -15,17 +15,44 @@
 #                                                                             #
 ###############################################################################
 
+import json
 import logging
+import math
 import multiprocessing as mp
 import os
 import queue
 import re
 import subprocess
+from typing import Optional
 
 from tqdm import tqdm
 
+from gtdbtk.biolib_lite.seq_io import read_seq
+from gtdbtk.config.common import CONFIG
 from gtdbtk.exceptions import PplacerException, TogException
-from gtdbtk.tools import get_proc_memory_gb
+from gtdbtk.tools import get_proc_memory_gb, get_memory_limit_gb
+
+
+class PplacerPlan(object):
+    """The resources selected for a pplacer placement."""
+
+    def __init__(self, cpus: int, use_mmap: bool, n_batches: int,
+                 estimate_gb: float, limit_gb: Optional[float]):
+        self.cpus = cpus
+        self.use_mmap = use_mmap
+        self.n_batches = n_batches
+        self.estimate_gb = estimate_gb
+        self.limit_gb = limit_gb
+
+    @property
+    def fits(self) -> bool:
+        """True if the estimated memory usage is within the limit."""
+        return self.limit_gb is None or self.estimate_gb <= self.limit_gb
+
+    def __repr__(self):
+        return f'PplacerPlan(cpus={self.cpus}, use_mmap={self.use_mmap}, ' \
+               f'n_batches={self.n_batches}, estimate_gb={self.estimate_gb:.1f}, ' \
+               f'limit_gb={self.limit_gb})'
 
 
 class Pplacer(object):
@@ -49,6 +76,153 @@ class Pplacer(object):
         except:
             return "(version unavailable)"
 
+    @staticmethod
+    def get_ref_pkg_gb(ref_pkg):
+        """Returns the size (GB) of all files in a reference package."""
+        total = 0
+        for root, _dirs, files in os.walk(ref_pkg):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    continue
+        return total / 1e9
+
+    @staticmethod
+    def estimate_memory_gb(tree_gb, cpus, n_genomes, use_mmap):
+        """Estimate the peak memory (GB) of pplacer.
+
+        Parameters
+        ----------
+        tree_gb : float
+            The memory required to hold the reference tree in RAM.
+        cpus : int
+            The number of pplacer threads.
+        n_genomes : int
+            The number of genomes placed in a single run.
+        use_mmap : bool
+            True if the tree is allocated in a scratch file.
+        """
+        resident = CONFIG.PPLACER_MMAP_RESIDENT_FRACTION if use_mmap else 1.0
+        return tree_gb * resident + \
+            cpus * CONFIG.PPLACER_MEM_PER_THREAD_GB + \
+            n_genomes * CONFIG.PPLACER_MEM_PER_GENOME_GB
+
+    @staticmethod
+    def plan(ref_pkg, n_genomes, cpus, max_memory_gb=None, min_ram_gb=None,
+             force_mmap=False):
+        """Select the threads, scratch file use, and batches for a placement
+        so that the estimated memory usage is within the memory limit.
+
+        In order of preference: the tree is placed in RAM with as many of the
+        requested threads as fit, then a scratch file is used, then the query
+        genomes are split into batches which are placed one at a time.
+
+        Parameters
+        ----------
+        ref_pkg : str
+            The path to the reference package.
+        n_genomes : int
+            The number of genomes to place.
+        cpus : int
+            The maximum number of threads to use.
+        max_memory_gb : Optional[float]
+            The memory limit, or None to use the memory available.
+        min_ram_gb : Optional[float]
+            The known memory required to load the tree, if any.
+        force_mmap : bool
+            True if a scratch file must be used.
+
+        Returns
+        -------
+        PplacerPlan
+            The plan, this may not fit if no plan is within the limit.
+        """
+        if min_ram_gb is not None:
+            tree_gb = min_ram_gb
+        else:
+            tree_gb = Pplacer.get_ref_pkg_gb(ref_pkg) * CONFIG.PPLACER_MEM_PER_REFPKG_GB
+        limit_gb = max_memory_gb if max_memory_gb else get_memory_limit_gb()
+        cpus, n_genomes = max(cpus, 1), max(n_genomes, 1)
+
+        def make_plan(threads, use_mmap, n_batches):
+            batch_size = int(math.ceil(n_genomes / n_batches))
+            est = Pplacer.estimate_memory_gb(tree_gb, threads, batch_size, use_mmap)
+            return PplacerPlan(threads, use_mmap, n_batches, est, limit_gb)
+
+        mmap_options = [True] if force_mmap else [False, True]
+        for use_mmap in mmap_options:
+            for threads in range(cpus, 0, -1):
+                cur_plan = make_plan(threads, use_mmap, 1)
+                if cur_plan.fits:
+                    return cur_plan
+
+        # Split the genomes into batches, with as many threads as fit.
+        max_batches = max(1, int(math.ceil(n_genomes / CONFIG.PPLACER_MIN_BATCH_SIZE)))
+        for n_batches in range(2, max_batches + 1):
+            for threads in range(cpus, 0, -1):
+                cur_plan = make_plan(threads, True, n_batches)
+                if cur_plan.fits:
+                    return cur_plan
+        return make_plan(1, True, max_batches)
+
+    def run_batches(self, cpus, model, ref_pkg, json_out, msa_file, pplacer_out,
+                    n_batches, mmap_file=None):
+        """Place genomes into a reference tree in batches, one after another,
+        and merge the placements into a single json output file.
+
+        Args:
+            cpus (int): The number of threads to use.
+            model (str): The model to use. PROT: LG, WAG, JTT. NT: GTR.
+            ref_pkg (str): The path to the reference package.
+            json_out (str): The path to write the merged json output to.
+            msa_file (str): The path to the input MSA file.
+            pplacer_out (str): Where to write the pplacer output file.
+            n_batches (int): The number of batches to split the MSA into.
+            mmap_file (str, optional): The path to write a scratch file to.
+        """
+        if n_batches <= 1:
+            return self.run(cpus, model, ref_pkg, json_out, msa_file, pplacer_out, mmap_file)
+
+        # Split the MSA into batches of an equal number of genomes.
+        n_genomes = sum(1 for _ in read_seq(msa_file))
+        batch_size = int(math.ceil(n_genomes / n_batches))
+        batch_msa = [f'{json_out}.batch_{i}.fasta' for i in range(n_batches)]
+        fhs = [open(path, 'w') for path in batch_msa]
+        try:
+            for idx, (seq_id, seq) in enumerate(read_seq(msa_file)):
+                fhs[idx // batch_size].write(f'>{seq_id}\n{seq}\n')
+        finally:
+            for fh in fhs:
+                fh.close()
+
+        merged = None
+        try:
+            with open(pplacer_out, 'w') as fh_out:
+                for i, path in enumerate(batch_msa):
+                    if os.path.getsize(path) == 0:
+                        continue
+                    self.logger.info(f'Placing batch {i + 1} of {n_batches}.')
+                    batch_json, batch_out = f'{json_out}.batch_{i}', f'{pplacer_out}.batch_{i}'
+                    self.run(cpus, model, ref_pkg, batch_json, path, batch_out, mmap_file)
+                    with open(batch_json) as fh:
+                        data = json.load(fh)
+                    if merged is None:
+                        merged = data
+                    else:
+                        merged['placements'].extend(data['placements'])
+                    with open(batch_out) as fh:
+                        fh_out.write(fh.read())
+                    os.remove(batch_json)
+                    os.remove(batch_out)
+        finally:
+            for path in batch_msa:
+                if os.path.isfile(path):
+                    os.remove(path)
+
+        with open(json_out, 'w') as fh:
+            json.dump(merged, fh)
+
     def run(self, cpus, model, ref_pkg, json_out, msa_file, pplacer_out,
             mmap_file=None):
         """Place genomes into a reference tree.
@@ -25,7 +25,9 @@ from gtdbtk.biolib_lite.prodigal_biolib import Prodigal as BioLibProdigal
 from gtdbtk.config.output import CHECKSUM_SUFFIX
 from gtdbtk.exceptions import ProdigalException
 from gtdbtk.files.prodigal.tln_table import TlnTableFile
-from gtdbtk.tools import sha256, file_has_checksum, tqdm_log
+from gtdbtk.files.result_spool import ResultSpool
+from gtdbtk.governor import get_governor
+from gtdbtk.tools import write_checksum, file_has_checksum, tqdm_log
 
 
 class Prodigal(object):
@@ -66,6 +68,13 @@ class Prodigal(object):
         except:
             return "(version unavailable)"
 
+    def _output_paths(self, genome_id):
+        """Returns the paths of the amino acid, nucleotide and GFF files."""
+        output_dir = os.path.join(self.marker_gene_dir, genome_id)
+        return (os.path.join(output_dir, genome_id + self.protein_file_suffix),
+                os.path.join(output_dir, genome_id + self.nt_gene_file_suffix),
+                os.path.join(output_dir, genome_id + self.gff_file_suffix))
+
     def _run_prodigal(self, genome_id, fasta_path, usr_tln_table):
         """Run Prodigal.
 
@@ -84,22 +93,21 @@ class Prodigal(object):
         tln_table_file = TlnTableFile(output_dir, genome_id)
 
         # Set the paths for output files.
-        aa_gene_file = os.path.join(output_dir, genome_id + self.protein_file_suffix)
-        nt_gene_file = os.path.join(output_dir, genome_id + self.nt_gene_file_suffix)
-        gff_file = os.path.join(output_dir, genome_id + self.gff_file_suffix)
+        aa_gene_file, nt_gene_file, gff_file = self._output_paths(genome_id)
         out_files = (nt_gene_file, gff_file, tln_table_file.path, aa_gene_file)
 
         # Check if this genome has already been processed (skip).
-        if all([file_has_checksum(x) for x in out_files]):
+        if all(file_has_checksum(x) for x in out_files):
             tln_table_file.read()
             self.warnings.info(f'Skipped Prodigal processing for: {genome_id}')
             return aa_gene_file, nt_gene_file, gff_file, tln_table_file.path, tln_table_file.best_tln_table, True
 
         # Run Prodigal
         prodigal = BioLibProdigal(1, False)
-        summary_stats = prodigal.run([fasta_path], output_dir,
-                                     called_genes=False,
-                                     translation_table=usr_tln_table)
+        with get_governor().reserve(1):
+            summary_stats = prodigal.run([fasta_path], output_dir,
+                                         called_genes=False,
+                                         translation_table=usr_tln_table)
 
         # An error occurred in BioLib Prodigal.
         if not summary_stats:
@@ -125,37 +133,32 @@ class Prodigal(object):
         # Create a hash of each file
         for out_file in out_files:
             if out_file is not None:
-                with open(out_file + CHECKSUM_SUFFIX, 'w') as fh:
-                    fh.write(sha256(out_file))
+                write_checksum(out_file, CHECKSUM_SUFFIX)
 
         return aa_gene_file, nt_gene_file, gff_file, tln_table_file.path, summary_stats.best_translation_table, False
 
-    def _worker(self, out_dict, worker_queue, writer_queue, n_skipped):
-        """This worker function is invoked in a process."""
+    def _worker(self, spool, worker_queue, writer_queue, n_skipped):
+        """This worker function is invoked in a process, the (genome index,
+        translation table) of each genome is written to the spool."""
 
-        while True:
-            data = worker_queue.get(block=True, timeout=None)
-            if data is None:
-                break
+        with spool.writer() as out:
+            while True:
+                data = worker_queue.get(block=True, timeout=None)
+                if data is None:
+                    break
 
-            genome_id, file_path, usr_tln_table = data
+                genome_idx, genome_id, file_path, usr_tln_table = data
 
-            rtn_files = self._run_prodigal(genome_id, file_path, usr_tln_table)
+                rtn_files = self._run_prodigal(genome_id, file_path, usr_tln_table)
 
-            # Only proceed if an error didn't occur in BioLib Prodigal
-            if rtn_files:
-                aa_gene_file, nt_gene_file, gff_file, translation_table_file, best_translation_table, was_skipped = rtn_files
-                if was_skipped:
-                    with n_skipped.get_lock():
-                        n_skipped.value += 1
-                prodigal_infos = {"aa_gene_path": aa_gene_file,
-                                  "nt_gene_path": nt_gene_file,
-                                  "gff_path": gff_file,
-                                  "translation_table_path": translation_table_file,
-                                  "best_translation_table": best_translation_table}
-
-                out_dict[genome_id] = prodigal_infos
-            writer_queue.put(genome_id)
+                # Only proceed if an error didn't occur in BioLib Prodigal
+                if rtn_files:
+                    best_translation_table, was_skipped = rtn_files[4:]
+                    if was_skipped:
+                        with n_skipped.get_lock():
+                            n_skipped.value += 1
+                    out.write(genome_idx, best_translation_table)
+                writer_queue.put(genome_id)
 
     def _writer(self, num_items, writer_queue):
         """Store or write results of worker threads in a single thread."""
@@ -178,20 +181,21 @@ class Prodigal(object):
         worker_queue = mp.Queue()
         writer_queue = mp.Queue()
 
-        for genome_id, file_path in genomic_files.items():
-            worker_queue.put((genome_id, file_path, tln_tables.get(genome_id)))
+        genome_ids = list(genomic_files)
+        for genome_idx, genome_id in enumerate(genome_ids):
+            worker_queue.put((genome_idx, genome_id, genomic_files[genome_id],
+                              tln_tables.get(genome_id)))
 
         for _ in range(self.threads):
             worker_queue.put(None)
 
         worker_proc = []
         writer_proc = None
+        spool = ResultSpool('<ii')
         try:
-            manager = mp.Manager()
-            out_dict = manager.dict()
             n_skipped = mp.Value('i', 0)
 
-            worker_proc = [mp.Process(target=self._worker, args=(out_dict,
+            worker_proc = [mp.Process(target=self._worker, args=(spool,
                                                                  worker_queue,
                                                                  writer_queue,
                                                                  n_skipped))
@@ -217,6 +221,7 @@ class Prodigal(object):
                 p.terminate()
             if writer_proc:
                 writer_proc.terminate()
+            spool.cleanup()
             raise ProdigalException(f'An exception was caught while running Prodigal: {e}')
 
         # Report if any genomes were skipped due to having already been processed.
@@ -225,6 +230,19 @@ class Prodigal(object):
             self.logger.warning(f'Prodigal skipped {n_skipped.value} {genome_s} '
                                 f'due to pre-existing data, see warnings.log')
 
+        # Collect the output files of each genome.
+        out_dict = dict()
+        with spool:
+            for genome_idx, best_translation_table in spool:
+                gid = genome_ids[genome_idx]
+                aa_gene_file, nt_gene_file, gff_file = self._output_paths(gid)
+                out_dict[gid] = {"aa_gene_path": aa_gene_file,
+                                 "nt_gene_path": nt_gene_file,
+                                 "gff_path": gff_file,
+                                 "translation_table_path": TlnTableFile.get_path(
+                                     os.path.join(self.marker_gene_dir, gid), gid),
+                                 "best_translation_table": best_translation_table}
+
         # Report on any genomes which failed to have any genes called
         result_dict = dict()
         lq_gids = list()
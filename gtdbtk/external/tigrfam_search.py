@@ -22,8 +22,10 @@ import subprocess
 
 from gtdbtk.biolib_lite.common import make_sure_path_exists
 from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.executor import ToolExecutor, ToolJob
 from gtdbtk.files.marker.tophit import TopHitTigrFile
-from gtdbtk.tools import sha256, file_has_checksum, tqdm_log
+from gtdbtk.governor import get_governor
+from gtdbtk.tools import write_checksum, file_has_checksum, tqdm_log
 
 
 class TigrfamSearch(object):
@@ -42,6 +44,7 @@ class TigrfamSearch(object):
         self.warnings = logging.getLogger('warnings')
         self.threads = threads
         self.cpus_per_genome = 1
+        self.n_skipped = 0
         self.tigrfam_hmms = tigrfam_hmms
         self.protein_file_suffix = protein_file_suffix
         self.tigrfam_suffix = tigrfam_suffix
@@ -99,68 +102,39 @@ class TigrfamSearch(object):
         # Write the top-hit file to disk and calculate checksum.
         tophit_file.write()
 
-    def _workerThread(self, queueIn, queueOut, n_skipped):
-        """Process each data item in parallel."""
-        while True:
-            queue_next = queueIn.get(block=True, timeout=None)
-            if queue_next is None:
-                break
+    def _process_hits(self, output_hit_file, hmmsearch_out):
+        """Write the checksums and top hits of a finished hmmsearch, this is
+        run in a pool of processes."""
+        for out_file in [output_hit_file, hmmsearch_out]:
+            write_checksum(out_file, self.checksum_suffix)
+        self._topHit(output_hit_file)
 
-            genome_id, gene_file = queue_next
-            output_hit_file = os.path.join(self.output_dir, genome_id, '{}{}'.format(genome_id, self.tigrfam_suffix))
-            # output_tophit_file = os.path.join(self.output_dir, genome_id,
-            #                                   '{}{}'.format(genome_id, self.tigrfam_top_hit_suffix))
-            hmmsearch_out = os.path.join(self.output_dir, genome_id, '{}_tigrfam.out'.format(genome_id))
+    def _create_jobs(self, gene_files):
+        """Yields a hmmsearch job for each genome which has not been processed.
 
-
-            # assembly_dir, filename = os.path.split(gene_file)
-            # genome_id = filename.replace(self.protein_file_suffix, '')
-            # genome_dir = os.path.join(self.output_dir, genome_id)
-            # output_hit_file = os.path.join(genome_dir, filename.replace(self.protein_file_suffix,
-            #                                                             self.tigrfam_suffix))
-
-            # hmmsearch_out = os.path.join(genome_dir, filename.replace(self.protein_file_suffix,
-            #                                                           '_tigrfam.out'))
+        Parameters
+        ----------
+        gene_files : iterable
+            The (genome id, gene file) of each genome to process.
+        """
+        for genome_id, gene_file in gene_files:
+            genome_dir = os.path.join(self.output_dir, genome_id)
+            output_hit_file = os.path.join(genome_dir, '{}{}'.format(genome_id, self.tigrfam_suffix))
+            hmmsearch_out = os.path.join(genome_dir, '{}_tigrfam.out'.format(genome_id))
 
             # Check if this has already been processed.
             out_files = (output_hit_file, hmmsearch_out, TopHitTigrFile.get_path(self.output_dir, genome_id))
-            if all([file_has_checksum(x) for x in out_files]):
+            if all(file_has_checksum(x) for x in out_files):
                 self.warnings.info(f'Skipped TIGRFAM processing for: {genome_id}')
-                with n_skipped.get_lock():
-                    n_skipped.value += 1
-
-            else:
+                self.n_skipped += 1
+                continue
 
-                genome_dir = os.path.join(self.output_dir, genome_id)
-                hmmsearch_out = os.path.join(genome_dir, '{}_tigrfam.out'.format(genome_id))
-                make_sure_path_exists(genome_dir)
-
-                args = ['hmmsearch', '-o', hmmsearch_out, '--tblout', output_hit_file,
-                        '--noali', '--notextw', '--cut_nc', '--cpu',
-                        str(self.cpus_per_genome), self.tigrfam_hmms, gene_file]
-                p = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                stdout, stderr = p.communicate()
-
-                if p.returncode != 0:
-                    raise GTDBTkExit(f'Non-zero exit code returned when running hmsearch: {stdout}')
-
-                # calculate checksum
-                for out_file in [output_hit_file, hmmsearch_out]:
-                    checksum = sha256(out_file)
-                    with open(out_file + self.checksum_suffix, 'w') as fh:
-                        fh.write(checksum)
-
-                # identify top hit for each gene
-                self._topHit(output_hit_file)
-
-            # allow results to be processed or written to file
-            queueOut.put(gene_file)
-
-    def _writerThread(self, numDataItems, writerQueue):
-        """Store or write results of worker threads in a single thread."""
-        with tqdm_log(total=numDataItems, unit='genome') as p_bar:
-            for _ in iter(writerQueue.get, None):
-                p_bar.update()
+            make_sure_path_exists(genome_dir)
+            args = ['hmmsearch', '-o', hmmsearch_out, '--tblout', output_hit_file,
+                    '--noali', '--notextw', '--cut_nc', '--cpu',
+                    str(self.cpus_per_genome), self.tigrfam_hmms, gene_file]
+            yield ToolJob(args, cpus=self.cpus_per_genome,
+                          data=(output_hit_file, hmmsearch_out))
 
     def run(self, gene_files):
         """Annotate genes with TIGRFAM HMMs.
@@ -172,49 +146,28 @@ class TigrfamSearch(object):
         """
         if len(gene_files) == 0:
             raise GTDBTkExit('There are no genomes to process.')
-        self.cpus_per_genome = max(1, int(self.threads / len(gene_files)))
-
-        # populate worker queue with data to process
-        workerQueue = mp.Queue()
-        writerQueue = mp.Queue()
-        n_skipped = mp.Value('i', 0)
-
-        for f in gene_files:
-            workerQueue.put(f)
-
-        for _ in range(self.threads):
-            workerQueue.put(None)
-
-        try:
-            workerProc = [mp.Process(target=self._workerThread, args=(
-                workerQueue, writerQueue, n_skipped)) for _ in range(self.threads)]
-            writeProc = mp.Process(target=self._writerThread, args=(
-                len(gene_files), writerQueue))
-
-            writeProc.start()
-
-            for p in workerProc:
-                p.start()
-
-            for p in workerProc:
-                p.join()
-
-            writerQueue.put(None)
-            writeProc.join()
-
-            for proc in workerProc:
-                if proc.exitcode != 0:
-                    raise GTDBTkExit(
-                        'An error was encountered while running hmmsearch.')
-
-        except Exception:
-            for p in workerProc:
-                p.terminate()
-
-            writeProc.terminate()
-            raise
-
-        if n_skipped.value > 0:
-            genome_s = 'genome' if n_skipped.value == 1 else 'genomes'
-            self.logger.warning(f'TIGRFAM skipped {n_skipped.value:,} {genome_s} '
+        n_workers, self.cpus_per_genome = get_governor().split(len(gene_files), self.threads)
+
+        # Run hmmsearch over each genome, as each hmmsearch process finishes
+        # the top hits are identified by a pool of processes. The pool is
+        # started before any thread is.
+        self.n_skipped = 0
+        with mp.Pool(n_workers) as pool, \
+                tqdm_log(total=len(gene_files), unit='genome') as p_bar:
+            processed = list()
+            jobs = self._create_jobs(gene_files)
+            for result in ToolExecutor(max_running=n_workers).run(jobs):
+                if not result.ok:
+                    raise GTDBTkExit(f'Non-zero exit code returned when running hmsearch: '
+                                     f'{result.stderr}')
+                processed.append(pool.apply_async(self._process_hits, result.job.data))
+                p_bar.update()
+            pool.close()
+            [x.get() for x in processed]
+            pool.join()
+            p_bar.update(self.n_skipped)
+
+        if self.n_skipped > 0:
+            genome_s = 'genome' if self.n_skipped == 1 else 'genomes'
+            self.logger.warning(f'TIGRFAM skipped {self.n_skipped:,} {genome_s} '
                                 f'due to pre-existing data, see warnings.log')
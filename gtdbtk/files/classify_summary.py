@@ -15,13 +15,24 @@
 #                                                                             #
 ###############################################################################
 
+import heapq
 import logging
 import os
-from typing import Dict, List, Tuple, Optional, Union
+import tempfile
+from itertools import islice
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 from gtdbtk.biolib_lite.common import make_sure_path_exists
+from gtdbtk.config.common import CONFIG
 from gtdbtk.config.output import PATH_AR53_SUMMARY_OUT, PATH_BAC120_SUMMARY_OUT
 from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.files.columnar import detect_format, get_table_format, read_table, table_path, write_table
+from gtdbtk.files.stage_logger import StageLogger
+
+
+def _line_gid(line: str) -> str:
+    """Returns the genome id (first column) of a summary file line."""
+    return line.split('\t', 1)[0]
 
 
 class ClassifySummaryFileRow:
@@ -59,16 +70,44 @@ class ClassifySummaryFileRow:
 
 
 class ClassifySummaryFile:
-    """Store the GTDB-Tk classify summary output."""
+    """Store the GTDB-Tk classify summary output.
+
+    Rows are appended to a partial summary file (<name>.partial.tsv) as soon
+    as they are added, so only the genome ids are kept in memory and the rows
+    classified so far are on disk if the process does not finish. The final
+    (sorted) summary file is created from the partial file when written.
+    The rows of a partial file left by a run which did not finish are only
+    kept if the run is resumed with the same inputs (see resume).
+    """
 
-    __slots__ = ('logger', 'path', 'marker_set', 'rows', 'none_value')
+    __slots__ = ('logger', 'path', 'path_partial', 'marker_set', 'rows', 'none_value',
+                 '_gids', '_resume', '_recovered', '_replaced', '_n_recovered',
+                 '_partial_fh', '_written')
+
+    # Columns of repeated strings, which are dictionary encoded in columnar tables.
+    dictionary_columns = ('classification', 'fastani_taxonomy', 'closest_placement_taxonomy',
+                          'pplacer_taxonomy', 'classification_method', 'note', 'warnings')
+
+    # Columns which are not text, used to restore the types in columnar tables.
+    numeric_columns = {'fastani_reference_radius': float, 'fastani_ani': float,
+                       'fastani_af': float, 'closest_placement_radius': float,
+                       'closest_placement_ani': float, 'closest_placement_af': float,
+                       'msa_percent': float, 'translation_table': int, 'red_value': float}
 
     def __init__(self, path: str, marker_set: Optional[str] = None):
         self.logger = logging.getLogger('timestamp')
         self.path: str = path
+        self.path_partial: str = f'{os.path.splitext(path)[0]}.partial.tsv'
         self.marker_set: Optional[str] = marker_set
-        self.rows: Dict[str, ClassifySummaryFileRow] = dict()  # keyed by user_genome
+        self.rows: Dict[str, ClassifySummaryFileRow] = dict()  # keyed by user_genome, set by read
         self.none_value: str = 'N/A'
+        self._gids: Set[str] = set()
+        self._resume: Optional[Tuple[str, FrozenSet[str]]] = None
+        self._recovered: Set[str] = set()
+        self._replaced: Set[str] = set()
+        self._n_recovered: int = 0
+        self._partial_fh = None
+        self._written: bool = False
 
     @staticmethod
     def get_col_order(row: ClassifySummaryFileRow = None) -> Tuple[List[str], List[Union[str, float, int]]]:
@@ -102,15 +141,102 @@ class ClassifySummaryFile:
             data.append(col_val)
         return cols, data
 
+    def _format_row(self, row: ClassifySummaryFileRow) -> str:
+        """Format a row as a line of the summary file, None is replaced with N/A."""
+        cols, data = self.get_col_order(row)
+        buf = list()
+        for col, value in zip(cols, data):
+            # for the red_value field, we want to round the data to 5 decimals after the comma
+            # (rows read from an existing summary file hold the value as written)
+            if col == 'red_value' and isinstance(value, float):
+                value = round(value, 5)
+            buf.append(self.none_value if value is None else str(value))
+        return '\t'.join(buf) + '\n'
+
+    @property
+    def _checkpoint_key(self) -> str:
+        return f'summary/{os.path.basename(self.path)}'
+
+    def resume(self, fingerprint: str, gids: Iterable[str]):
+        """Keep the rows of a partial file left by a previous run, if it was
+        run with the same inputs. This must be called before adding rows.
+
+        Parameters
+        ----------
+        fingerprint : str
+            The fingerprint of the inputs of the run (see input_fingerprint),
+            the partial file is removed if it was written by another run.
+        gids : Iterable[str]
+            The genomes of the run, the rows of any other genomes are removed.
+        """
+        self._resume = (fingerprint, frozenset(gids))
+
+    def _recover_partial(self, header: str) -> bool:
+        """Remove the rows of the partial file which can not be resumed (and a
+        truncated last line). Returns True if the partial file is kept."""
+        if self._resume is None or not os.path.isfile(self.path_partial):
+            return False
+        fingerprint, gids = self._resume
+        if StageLogger().get_checkpoint(self._checkpoint_key, fingerprint) is None:
+            self.logger.warning(f'Ignoring the partial summary file of a previous run '
+                                f'with different inputs: {self.path_partial}')
+            return False
+
+        path_tmp = self.path_partial + '.tmp'
+        with open(self.path_partial) as fh, open(path_tmp, 'w') as fh_tmp:
+            fh_tmp.write(header)
+            if fh.readline() == header:
+                for line in fh:
+                    gid = _line_gid(line)
+                    if line.endswith('\n') and gid in gids and gid not in self._recovered:
+                        fh_tmp.write(line)
+                        self._recovered.add(gid)
+        os.replace(path_tmp, self.path_partial)
+        self._n_recovered = len(self._recovered)
+        self._gids.update(self._recovered)
+        self.logger.info(f'Resuming with {len(self._recovered):,} row(s) of the '
+                         f'summary file written by a previous run.')
+        return True
+
+    def _open_partial(self):
+        """Open the partial summary file for appending. This is truncated
+        unless it is resumed from a previous run with the same inputs."""
+        make_sure_path_exists(os.path.dirname(self.path_partial))
+        header = '\t'.join(self.get_col_order()[0]) + '\n'
+        if self._recover_partial(header):
+            self._partial_fh = open(self.path_partial, 'a')
+        else:
+            self._partial_fh = open(self.path_partial, 'w')
+            self._partial_fh.write(header)
+            self._partial_fh.flush()
+        if self._resume is not None:
+            StageLogger().add_checkpoint(self._checkpoint_key, self._resume[0],
+                                         output_files=[self.path_partial])
+
     def add_row(self, row: ClassifySummaryFileRow):
+        """Append a row to the partial summary file, this is flushed to disk
+        immediately as a complete line. A row of a genome recovered from the
+        partial file of a previous run replaces the recovered row."""
+        if self._partial_fh is None:
+            self._open_partial()
+        if row.gid in self._recovered:
+            self._recovered.remove(row.gid)
+            self._replaced.add(row.gid)
+        elif row.gid in self._gids:
+            raise GTDBTkExit(f'Attempting to add duplicate row: {row.gid}')
+        self._partial_fh.write(self._format_row(row))
+        self._partial_fh.flush()
+        self._gids.add(row.gid)
+
+    def _load_row(self, row: ClassifySummaryFileRow):
+        """Store a row read from disk."""
         if row.gid in self.rows:
             raise GTDBTkExit(f'Attempting to add duplicate row: {row.gid}')
         self.rows[row.gid] = row
+        self._gids.add(row.gid)
 
     def has_row(self) -> bool:
-        if self.rows.items():
-            return True
-        return False
+        return len(self._gids) > 0
 
     def get_gid_taxonomy(self) -> Dict[str, List[str]]:
         out = dict()
@@ -121,24 +247,107 @@ class ClassifySummaryFile:
             out[gid] = split_tax
         return out
 
+    def _sorted_runs(self, dir_tmp: str) -> List[str]:
+        """Sort the lines of the partial file in chunks, each written to a file."""
+        runs = list()
+        if not os.path.isfile(self.path_partial):
+            return runs
+        with open(self.path_partial) as fh:
+            fh.readline()
+            # Recovered rows which were added again are replaced.
+            partial_lines = (line for i, line in enumerate(fh) if line.endswith('\n') and not
+                             (i < self._n_recovered and _line_gid(line) in self._replaced))
+            while True:
+                lines = list(islice(partial_lines, CONFIG.SUMMARY_SORT_CHUNK_ROWS))
+                if not lines:
+                    break
+                lines.sort(key=_line_gid)
+                runs.append(os.path.join(dir_tmp, f'run_{len(runs)}.tsv'))
+                with open(runs[-1], 'w') as fh_run:
+                    fh_run.writelines(lines)
+        return runs
+
+    def _written_lines(self) -> Iterator[str]:
+        """Yields the rows of the summary file already written (if any) as lines."""
+        if not self._written or not os.path.isfile(self.path):
+            return
+        if detect_format(self.path) == 'tsv':
+            with open(self.path) as fh:
+                fh.readline()
+                yield from fh
+        else:
+            columns = read_table(self.path)
+            for values in zip(*columns.values()):
+                yield '\t'.join(self.none_value if x is None else str(x) for x in values) + '\n'
+
     def write(self):
-        """Writes the summary file to disk. None will be replaced with N/A"""
+        """Writes the summary file to disk. None will be replaced with N/A
+
+        The partial file is sorted in chunks which are merged into the summary
+        file, this replaces any existing file once complete.
+        """
         make_sure_path_exists(os.path.dirname(self.path))
-        with open(self.path, 'w') as fh:
-            fh.write('\t'.join(self.get_col_order()[0]) + '\n')
-            for gid, row in sorted(self.rows.items()):
-                buf = list()
-                for idx,data in enumerate(self.get_col_order(row)[1]):
-                    # for the red_value field, we want to round the data to 5 decimals after the comma if the value is not None
-                    if idx==self.get_col_order()[0].index('red_value') and data is not None:
-                        data = round(data,5)
-                    buf.append(self.none_value if data is None else str(data))
-                fh.write('\t'.join(buf) + '\n')
+        if self._partial_fh is not None:
+            self._partial_fh.close()
+            self._partial_fh = None
+
+        with tempfile.TemporaryDirectory(prefix='gtdbtk_summary_', dir=os.path.dirname(self.path)) as dir_tmp:
+            run_fhs = [open(path) for path in self._sorted_runs(dir_tmp)]
+            try:
+                lines = heapq.merge(self._written_lines(), *run_fhs, key=_line_gid)
+                path_tmp = os.path.join(dir_tmp, 'summary')
+                if get_table_format() != 'tsv':
+                    self._write_columnar(lines, path_tmp)
+                else:
+                    with open(path_tmp, 'w') as fh:
+                        fh.write('\t'.join(self.get_col_order()[0]) + '\n')
+                        fh.writelines(lines)
+            finally:
+                for fh in run_fhs:
+                    fh.close()
+            os.replace(path_tmp, self.path)
+
+        if os.path.isfile(self.path_partial):
+            os.remove(self.path_partial)
+        self._recovered, self._replaced, self._n_recovered = set(), set(), 0
+        self._written = True
+
+    def _write_columnar(self, lines: Iterable[str], path: str):
+        """Writes the summary file as a Parquet/Arrow table, N/A is written as null."""
+        cols = self.get_col_order()[0]
+        columns = {col: list() for col in cols}
+        for line in lines:
+            for col, value in zip(cols, line.rstrip('\n').split('\t')):
+                if value == self.none_value:
+                    value = None
+                elif col in self.numeric_columns:
+                    try:
+                        value = self.numeric_columns[col](value)
+                    except ValueError:
+                        pass
+                columns[col].append(value)
+        write_table(path, columns, dictionary_columns=self.dictionary_columns)
+
+    def _read_columnar(self):
+        """Read a Parquet/Arrow summary file, values are read as they are from a TSV file."""
+        columns = read_table(self.path)
+        cols_exp, _ = self.get_col_order()
+        if cols_exp != list(columns):
+            raise GTDBTkExit(f'The classify summary file columns are inconsistent: {list(columns)}')
+        for values in zip(*columns.values()):
+            data = [self.none_value if x is None else str(x) for x in values]
+            row = ClassifySummaryFileRow()
+            for slot, value in zip(ClassifySummaryFileRow.__slots__, data):
+                setattr(row, slot, value)
+            self._load_row(row)
 
     def read(self):
         """Read the summary file from disk."""
         if not os.path.isfile(self.path):
             raise GTDBTkExit(f'Error, classify summary file not found: {self.path}')
+        if detect_format(self.path) != 'tsv':
+            self._read_columnar()
+            return
         with open(self.path) as fh:
 
             # Load and verify the columns match the expected order.
@@ -171,14 +380,14 @@ class ClassifySummaryFile:
                 row.tln_table = data[17]
                 row.red_value = data[18]
                 row.warnings = data[19]
-                self.add_row(row)
+                self._load_row(row)
 
 
 class ClassifySummaryFileAR53(ClassifySummaryFile):
     """Store classify summary information for AR53 markers."""
 
     def __init__(self, out_dir: str, prefix: str):
-        path = os.path.join(out_dir, PATH_AR53_SUMMARY_OUT.format(prefix=prefix))
+        path = os.path.join(out_dir, table_path(PATH_AR53_SUMMARY_OUT.format(prefix=prefix)))
         super().__init__(path, 'ar53')
 
 
@@ -186,5 +395,5 @@ class ClassifySummaryFileBAC120(ClassifySummaryFile):
     """Store classify summary information for BAC120 markers."""
 
     def __init__(self, out_dir: str, prefix: str):
-        path = os.path.join(out_dir, PATH_BAC120_SUMMARY_OUT.format(prefix=prefix))
+        path = os.path.join(out_dir, table_path(PATH_BAC120_SUMMARY_OUT.format(prefix=prefix)))
         super().__init__(path, 'bac120')
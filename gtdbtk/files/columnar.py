@@ -0,0 +1,161 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+"""Columnar (Parquet / Arrow IPC) result tables.
+
+The large result tables are written as TSV by default. If --table_format is
+parquet or arrow they are instead written as a columnar file (with the .tsv
+extension replaced), where columns of repeated strings (e.g. taxonomy) are
+dictionary encoded. This requires the optional pyarrow package.
+
+The readers of these tables identify the format from the content of the
+file, so either format can be read regardless of the file name.
+"""
+
+import os
+import tempfile
+from typing import Collection, Dict, List, Optional
+
+from gtdbtk.exceptions import GTDBTkExit
+
+TABLE_FORMATS = ('tsv', 'parquet', 'arrow')
+_EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow'}
+_MAGIC = {b'PAR1': 'parquet', b'ARROW1': 'arrow'}
+
+_table_format = 'tsv'
+
+
+def set_table_format(fmt: str):
+    """Set the format of the result tables written by this process.
+
+    Parameters
+    ----------
+    fmt : str
+        One of TABLE_FORMATS.
+    """
+    global _table_format
+    if fmt not in TABLE_FORMATS:
+        raise GTDBTkExit(f'Unknown table format: {fmt}')
+    if fmt != 'tsv':
+        _import_pyarrow()
+    _table_format = fmt
+
+
+def get_table_format() -> str:
+    """Returns the format of the result tables written by this process."""
+    return _table_format
+
+
+def table_path(path: str, fmt: Optional[str] = None) -> str:
+    """Returns the path of a result table in a format (by default the current
+    format), i.e. the .tsv extension is replaced for columnar formats."""
+    fmt = fmt or _table_format
+    if fmt == 'tsv':
+        return path
+    root, ext = os.path.splitext(path)
+    return (root if ext == '.tsv' else path) + _EXTENSIONS[fmt]
+
+
+def _import_pyarrow():
+    """Returns the pyarrow module, which is an optional dependency."""
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise GTDBTkExit('The pyarrow package must be installed to read or write '
+                         'Parquet/Arrow tables (e.g. pip install pyarrow).')
+    return pyarrow
+
+
+def detect_format(path: str) -> str:
+    """Returns the format of a table from the start of the file."""
+    with open(path, 'rb') as fh:
+        head = fh.read(6)
+    for magic, fmt in _MAGIC.items():
+        if head.startswith(magic):
+            return fmt
+    return 'tsv'
+
+
+def _to_array(pa, values: List, dictionary: bool):
+    """Convert a column to an Arrow array, columns with mixed types (e.g.
+    numbers and text) are stored as text."""
+    try:
+        array = pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        array = pa.array([None if x is None else str(x) for x in values], type=pa.string())
+    if dictionary and pa.types.is_string(array.type):
+        array = array.dictionary_encode()
+    return array
+
+
+def write_table(path: str, columns: Dict[str, List], fmt: Optional[str] = None,
+                dictionary_columns: Collection[str] = ()):
+    """Write a table as a Parquet or Arrow IPC file.
+
+    The table is written to a temporary file which replaces the path once
+    complete, so a partially written table is never left behind.
+
+    Parameters
+    ----------
+    path : str
+        The path to write the table to.
+    columns : Dict[str, List]
+        The values of each column (in order), None is written as null.
+    fmt : Optional[str]
+        parquet or arrow, by default the current format.
+    dictionary_columns : Collection[str]
+        The columns of repeated strings to dictionary encode.
+    """
+    fmt = fmt or _table_format
+    if fmt not in _EXTENSIONS:
+        raise GTDBTkExit(f'Not a columnar table format: {fmt}')
+    pa = _import_pyarrow()
+    table = pa.table({name: _to_array(pa, values, name in dictionary_columns)
+                      for name, values in columns.items()})
+
+    fd, path_tmp = tempfile.mkstemp(prefix='.gtdbtk_table_', dir=os.path.dirname(path) or '.')
+    os.close(fd)
+    try:
+        if fmt == 'parquet':
+            pa.parquet.write_table(table, path_tmp, compression='zstd')
+        else:
+            pa.feather.write_feather(table, path_tmp, compression='zstd')
+        os.replace(path_tmp, path)
+    finally:
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+
+
+def read_table(path: str) -> Dict[str, List]:
+    """Read the columns of a Parquet or Arrow IPC file.
+
+    Returns
+    -------
+    Dict[str, List]
+        The values of each column (in order), nulls are returned as None.
+    """
+    fmt = detect_format(path)
+    pa = _import_pyarrow()
+    if fmt == 'parquet':
+        table = pa.parquet.read_table(path)
+    elif fmt == 'arrow':
+        table = pa.feather.read_table(path)
+    else:
+        raise GTDBTkExit(f'Not a Parquet or Arrow file: {path}')
+    return table.to_pydict()
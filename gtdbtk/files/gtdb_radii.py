@@ -1,5 +1,6 @@
 from gtdbtk.biolib_lite.common import canonical_gid
 from gtdbtk.config.common import CONFIG
+from gtdbtk.tools import get_reference_manifest
 
 class GTDBRadiiFile(object):
     """A wrapper for the gtdb_radii.tsv file included in the reference data."""
@@ -16,13 +17,10 @@ class GTDBRadiiFile(object):
     def _read(self):
         """Read the file and create any data."""
         self._rep_idx, self._species_idx = dict(), dict()
-        with open(self.path) as fh:
-            for line in fh.readlines():
-                species, genome, ani = line.strip().split('\t')
-                genome = canonical_gid(genome)
-                ani = float(ani)
-                self._rep_idx[genome] = {'species': species, 'ani': ani}
-                self._species_idx[species] = {'rep': genome, 'ani': ani}
+        for species, genome, ani in get_reference_manifest().radii:
+            genome = canonical_gid(genome)
+            self._rep_idx[genome] = {'species': species, 'ani': ani}
+            self._species_idx[species] = {'rep': genome, 'ani': ani}
 
     def get_species_ani(self, species):
         """Returns the ANI for a specific species.
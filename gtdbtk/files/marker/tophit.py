@@ -20,7 +20,7 @@ from typing import Tuple, Optional, Iterator
 
 from gtdbtk.biolib_lite.common import make_sure_path_exists
 from gtdbtk.config.output import TIGRFAM_TOP_HIT_SUFFIX, PFAM_TOP_HIT_SUFFIX, CHECKSUM_SUFFIX
-from gtdbtk.tools import sha256
+from gtdbtk.tools import write_checksum
 
 
 class Hit(object):
@@ -138,8 +138,7 @@ class TopHitFile(object):
                 fh.write(f'{gene_id}\t{concat_hits}\n')
 
         # Write the checksum.
-        with open(f'{self.path}{CHECKSUM_SUFFIX}', 'w') as fh:
-            fh.write(sha256(self.path))
+        write_checksum(self.path, CHECKSUM_SUFFIX)
 
     def read(self):
         """Read the contents of an existing tophit file."""
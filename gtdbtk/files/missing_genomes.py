@@ -38,6 +38,14 @@ class DisappearingGenomesFile(object):
             raise GTDBTkExit(f'Warning! Attempting to add duplicate genome: {gid}')
         self.data[gid] = tree_index
 
+    def read(self):
+        """Read the file from disk."""
+        with open(self.path) as fh:
+            fh.readline()
+            for line in fh:
+                gid, _, tree_index = line.rstrip('\n').split('\t')
+                self.add_genome(gid, tree_index)
+
     def write(self):
         """Write the file to disk, note that domain is omitted."""
         make_sure_path_exists(os.path.dirname(self.path))
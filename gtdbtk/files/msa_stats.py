@@ -0,0 +1,79 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from gtdbtk.biolib_lite.seq_io import read_seq
+from gtdbtk.tools import aa_percent_msa
+
+
+class MSAStats(object):
+    """Per-genome statistics of a user MSA, computed in a single pass.
+
+    Sequences are streamed from disk and are never all held in memory, any
+    subset of the MSA is written by streaming the file again.
+    """
+
+    def __init__(self, path: str):
+        """Read the statistics from an MSA.
+
+        Parameters
+        ----------
+        path : str
+            The path to the (optionally gzipped) MSA.
+        """
+        self.path = path
+        self._stats: Dict[str, Tuple[float, int]] = dict()
+        for gid, seq in read_seq(path):
+            self._stats[gid] = (aa_percent_msa(seq), len(seq))
+
+    def __contains__(self, gid):
+        return gid in self._stats
+
+    def __len__(self):
+        return len(self._stats)
+
+    @property
+    def genome_ids(self) -> List[str]:
+        """The genome ids in the order they appear in the MSA."""
+        return list(self._stats)
+
+    def get_aa_percent(self, gid: str) -> Optional[float]:
+        """Returns the percentage of the MSA which are amino acids, or None."""
+        stats = self._stats.get(gid)
+        return stats[0] if stats else None
+
+    def get_length(self, gid: str) -> Optional[int]:
+        """Returns the length of the aligned sequence, or None."""
+        stats = self._stats.get(gid)
+        return stats[1] if stats else None
+
+    def write_subset(self, gids: Iterable[str], path: str):
+        """Write the sequences of a subset of genomes to a new MSA.
+
+        Parameters
+        ----------
+        gids : iterable[str]
+            The genomes to write.
+        path : str
+            The path to write the MSA to.
+        """
+        keep = set(gids)
+        with open(path, 'w') as fh:
+            for gid, seq in read_seq(self.path):
+                if gid in keep:
+                    fh.write(f'>{gid}\n{seq}\n')
@@ -38,6 +38,13 @@ class PplacerClassifyFile(object):
             raise GTDBTkExit(f'Warning! Attempting to add duplicate genome: {gid}')
         self.data[gid] = tax_str
 
+    def read(self):
+        """Read the file from disk."""
+        with open(self.path) as fh:
+            for line in fh:
+                gid, tax_str = line.rstrip('\n').split('\t')
+                self.add_genome(gid, tax_str)
+
     def write(self):
         """Write the file to disk."""
         make_sure_path_exists(os.path.dirname(self.path))
@@ -0,0 +1,85 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+from typing import Dict, FrozenSet, Iterable
+
+import numpy as np
+
+from gtdbtk.files.taxonomy_index import TaxonomyIndex
+
+
+class RankAuthorityIndex(object):
+    """The taxa each class-level tree is authorised to classify to.
+
+    A class-level tree contains every genome of the classes mapped to it, so
+    a genome placed in it can only be assigned to those classes, or to the
+    taxa above them. These taxa are computed for every tree in a single pass
+    over the taxonomy index, rather than once per tree.
+    """
+
+    def __init__(self, taxonomy: TaxonomyIndex, tree_classes: Dict[str, Iterable[str]],
+                 class_idx: int = 2):
+        """Build the index.
+
+        Parameters
+        ----------
+        taxonomy : TaxonomyIndex
+            The indexed reference taxonomy.
+        tree_classes : dict[str, iterable[str]]
+            The classes mapped to each class-level tree (tree -> [c__<taxon>]).
+        class_idx : int
+            The rank index of the taxa in tree_classes.
+        """
+        self.class_idx = class_idx
+        self._authority: Dict[str, Dict[int, FrozenSet[str]]] = dict()
+
+        # Map each interned class id to the tree it is contained in.
+        trees = sorted(tree_classes)
+        class_tree = np.full(len(taxonomy.taxa), -1, dtype=np.int32)
+        for tree_idx, tree in enumerate(trees):
+            for taxon in tree_classes[tree]:
+                t = taxonomy.taxon_id(taxon)
+                if t >= 0:
+                    class_tree[t] = tree_idx
+
+        lineage = np.asarray(taxonomy.lineage)
+        genome_tree = class_tree[lineage[:, class_idx]]
+        mapped = genome_tree >= 0
+        for tree in trees:
+            self._authority[tree] = dict()
+        for rank_idx in range(class_idx + 1):
+            pairs = np.unique(np.stack([genome_tree[mapped], lineage[mapped, rank_idx]], axis=1), axis=0)
+            grouped = dict()
+            for tree_idx, t in pairs:
+                if t >= 0:
+                    grouped.setdefault(int(tree_idx), set()).add(taxonomy.taxa[t])
+            for tree_idx, tree in enumerate(trees):
+                self._authority[tree][rank_idx] = frozenset(grouped.get(tree_idx, ()))
+
+    def authorised(self, tree: str, rank_idx: int) -> FrozenSet[str]:
+        """Return the taxa at a rank which the class-level tree may classify to.
+
+        Parameters
+        ----------
+        tree : str
+            The class-level tree id.
+        rank_idx : int
+            The rank index, this must not be below the class rank.
+        """
+        if rank_idx > self.class_idx:
+            raise ValueError(f'Rank index {rank_idx} is below the indexed rank.')
+        return self._authority.get(tree, dict()).get(rank_idx, frozenset())
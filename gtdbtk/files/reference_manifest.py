@@ -0,0 +1,190 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+
+class ReferenceManifest(object):
+    """A single index of the reference genomes in the GTDB-Tk reference data.
+
+    The manifest holds, for each reference genome, the path to its FASTA
+    file, its species ANI radius and the species it represents. It is derived
+    from the taxonomy, FastANI genome list and radii files and is cached as
+    JSON. The cache is only used if the size and modification time of each of
+    these files are unchanged. Whether a genome exists on disk is not cached,
+    it is checked once per run for each genome which is requested.
+    """
+
+    VERSION = 2
+
+    def __init__(self, taxonomy_file: str, genome_list_file: str, radii_file: str,
+                 fastani_dir: str, genome_ext: str, cache_dir: Optional[str] = None):
+        """Load the manifest, from the cache if it is valid.
+
+        Parameters
+        ----------
+        taxonomy_file : str
+            The GTDB taxonomy file (genome id, taxonomy).
+        genome_list_file : str
+            The FastANI genome list (file name, directory relative to fastani_dir).
+        radii_file : str
+            The GTDB radii file (species, genome id, ANI radius).
+        fastani_dir : str
+            The directory that paths in the genome list are relative to.
+        genome_ext : str
+            The extension of the reference genome FASTA files.
+        cache_dir : Optional[str]
+            The directory to cache the manifest in, or None to not cache.
+        """
+        self.logger = logging.getLogger('timestamp')
+        self.sources = {'taxonomy': taxonomy_file,
+                        'genome_list': genome_list_file,
+                        'radii': radii_file}
+        self.fastani_dir = fastani_dir
+        self.genome_ext = genome_ext
+
+        self.path = None
+        if cache_dir is not None:
+            key = hashlib.sha1(os.path.abspath(taxonomy_file).encode()).hexdigest()[:16]
+            self.path = os.path.join(cache_dir, f'reference_manifest_{key}.json')
+
+        self.taxonomy_ids: List[str] = list()
+        self.genomes: Dict[str, str] = dict()
+        self.radii: List[Tuple[str, str, float]] = list()
+        self._exists: Dict[str, bool] = dict()
+
+        self._source_stats = self._stat_sources()
+        if not self._load():
+            self._read()
+            self._save()
+
+        self.reference_ids = self._get_reference_ids()
+        self.species_radius = self._get_species_radius()
+        self.representative = {self._strip_prefix(gid): species for species, gid, _ in self.radii}
+
+    @staticmethod
+    def _strip_prefix(gid: str) -> str:
+        if gid.startswith('GB_') or gid.startswith('RS_'):
+            return gid[3:]
+        return gid
+
+    def _stat_sources(self) -> Dict[str, List[int]]:
+        out = dict()
+        for name, path in self.sources.items():
+            st = os.stat(path)
+            out[name] = [st.st_size, st.st_mtime_ns]
+        return out
+
+    def _read(self):
+        """Read the manifest from the reference data files."""
+        with open(self.sources['taxonomy']) as fh:
+            self.taxonomy_ids = [line.split('\t')[0] for line in fh]
+
+        accession = None
+        with open(self.sources['genome_list']) as fh:
+            for line in fh:
+                full_name, path = line.strip().split()
+                if full_name.endswith(self.genome_ext):
+                    accession = full_name.split(self.genome_ext)[0]
+                self.genomes[accession] = os.path.join(self.fastani_dir, path, full_name)
+
+        with open(self.sources['radii']) as fh:
+            for line in fh:
+                species, gid, ani = line.strip().split('\t')
+                self.radii.append((species, gid, float(ani)))
+
+    def _load(self) -> bool:
+        """Load the cached manifest, returns True if it was valid."""
+        if self.path is None or not os.path.isfile(self.path):
+            return False
+        try:
+            with open(self.path) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != self.VERSION or data.get('sources') != self._source_stats:
+            return False
+        self.taxonomy_ids = data['taxonomy_ids']
+        self.genomes = data['genomes']
+        self.radii = [tuple(x) for x in data['radii']]
+        return True
+
+    def _save(self):
+        """Atomically write the manifest to the cache, if a cache is used."""
+        if self.path is None:
+            return
+        data = {'version': self.VERSION,
+                'sources': self._source_stats,
+                'taxonomy_ids': self.taxonomy_ids,
+                'genomes': self.genomes,
+                'radii': self.radii}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix='.gtdbtk_manifest_', dir=os.path.dirname(self.path))
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(data, fh)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.debug(f'Unable to cache the reference manifest: {e}')
+
+    def _get_reference_ids(self) -> FrozenSet[str]:
+        """The reference ids with and without the NCBI prefix (e.g. GB_GCA_ and GCA_)."""
+        results = set()
+        for raw_id in self.taxonomy_ids:
+            results.add(raw_id)
+            if raw_id[0:4] == 'GCF_':
+                results.add('RS_' + raw_id)
+            elif raw_id[0:4] == 'GCA_':
+                results.add('GB_' + raw_id)
+            elif raw_id[0:3] in ['RS_', 'GB_']:
+                results.add(raw_id[3:])
+        return frozenset(results)
+
+    def _get_species_radius(self) -> Dict[str, float]:
+        """The species ANI radius, keyed by the unprefixed representative id."""
+        return {self._strip_prefix(gid): ani for _, gid, ani in self.radii}
+
+    def exists(self, path: str) -> bool:
+        """True if the reference genome at this path exists.
+
+        The result is kept for the rest of the run, so each genome is only
+        checked on disk once.
+
+        Parameters
+        ----------
+        path : str
+            The path to the reference genome.
+        """
+        result = self._exists.get(path)
+        if result is None:
+            result = self._exists[path] = os.path.isfile(path)
+        return result
+
+    def get_path(self, gid: str) -> Optional[str]:
+        """Return the path to the reference genome, or None if unknown.
+
+        Parameters
+        ----------
+        gid : str
+            The reference genome id, with or without the NCBI prefix.
+        """
+        return self.genomes.get(self._strip_prefix(gid))
@@ -0,0 +1,126 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import os
+import shutil
+import struct
+import tempfile
+from typing import Iterator, Optional, Tuple
+
+
+class ResultSpoolWriter(object):
+    """Appends records to the file of a single worker process.
+
+    A worker may open a writer for each task, its records are appended to
+    the same file.
+    """
+
+    def __init__(self, spool: 'ResultSpool'):
+        self._spool = spool
+        path = os.path.join(spool.directory, f'{os.getpid()}.bin')
+        self._fh = open(path, 'ab')
+
+    def write(self, *fields, payload: Optional[bytes] = None):
+        """Append a record.
+
+        Parameters
+        ----------
+        fields
+            The values of the fixed-width fields of the record.
+        payload : Optional[bytes]
+            The variable-length data of the record, if the spool has one.
+        """
+        if self._spool.has_payload:
+            payload = payload or b''
+            self._fh.write(self._spool.record.pack(*fields, len(payload)))
+            self._fh.write(payload)
+        else:
+            self._fh.write(self._spool.record.pack(*fields))
+
+    def close(self):
+        self._fh.close()
+
+    def __enter__(self) -> 'ResultSpoolWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ResultSpool(object):
+    """Results returned from worker processes through per-worker append-only
+    files of binary records, which are read once the workers have finished.
+
+    This is used instead of a multiprocessing.Manager, which sends each
+    result through a single server process. Each record has the fixed-width
+    fields of a struct format (e.g. '<iidd'), optionally followed by a
+    variable-length payload (e.g. an aligned sequence).
+    """
+
+    def __init__(self, fmt: str, has_payload: bool = False, tmp_dir: Optional[str] = None):
+        """Create an empty spool in a new temporary directory.
+
+        Parameters
+        ----------
+        fmt : str
+            The struct format of the fixed-width fields of each record.
+        has_payload : bool
+            True if each record is followed by variable-length bytes.
+        tmp_dir : Optional[str]
+            The directory to create the spool in, by default the system tmp.
+        """
+        self.has_payload = has_payload
+        self.record = struct.Struct(fmt + 'I' if has_payload else fmt)
+        self.directory = tempfile.mkdtemp(prefix='gtdbtk_spool_', dir=tmp_dir)
+
+    def __getstate__(self):
+        # A struct.Struct can not be pickled, so it is created again.
+        return self.has_payload, self.record.format, self.directory
+
+    def __setstate__(self, state):
+        self.has_payload, fmt, self.directory = state
+        self.record = struct.Struct(fmt)
+
+    def writer(self) -> ResultSpoolWriter:
+        """Returns a writer, this must be opened by each worker process."""
+        return ResultSpoolWriter(self)
+
+    def __iter__(self) -> Iterator[Tuple]:
+        """Read all records (as tuples), with the payload (if any) last."""
+        size = self.record.size
+        for file_name in sorted(os.listdir(self.directory)):
+            with open(os.path.join(self.directory, file_name), 'rb') as fh:
+                data = fh.read()
+            if not self.has_payload:
+                yield from self.record.iter_unpack(data)
+                continue
+            offset = 0
+            while offset < len(data):
+                *fields, length = self.record.unpack_from(data, offset)
+                offset += size
+                yield (*fields, data[offset:offset + length])
+                offset += length
+
+    def cleanup(self):
+        """Remove the spool directory."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self) -> 'ResultSpool':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cleanup()
@@ -1,9 +1,55 @@
+import hashlib
 import json
 import os
-from typing import List, Optional, Dict
+import tempfile
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
 
 from pydantic import BaseModel
 
+from gtdbtk.tools import fast_file_hash
+
+
+def input_fingerprint(values: Iterable = (), stat_paths: Iterable[str] = (),
+                      hash_paths: Iterable[str] = ()) -> str:
+    """Create a fingerprint of the inputs to a unit of work.
+
+    Parameters
+    ----------
+    values : Iterable
+        JSON serialisable values (e.g. options, paths of output files).
+    stat_paths : Iterable[str]
+        Files identified by their path, size and modification time (e.g. genomes).
+    hash_paths : Iterable[str]
+        Files identified by their contents (e.g. files rewritten by each run).
+
+    Returns
+    -------
+    str
+        The SHA256 hash of the inputs.
+    """
+    data = {'values': list(values), 'stat': list(), 'hash': list()}
+    for path in stat_paths:
+        st = os.stat(path)
+        data['stat'].append([os.path.abspath(path), st.st_size, st.st_mtime_ns])
+    for path in hash_paths:
+        data['hash'].append(fast_file_hash(path))
+    return hashlib.sha256(json.dumps(data, default=str).encode()).hexdigest()
+
+
+class Checkpoint(BaseModel):
+    """A unit of work completed within a step (e.g. a class-level placement)."""
+    fingerprint: str
+    output_files: Optional[List[str]] = None
+    data: Optional[Dict] = None
+    completed_at: Optional[str] = None
+
+    def is_valid(self, fingerprint: str) -> bool:
+        """True if the inputs are unchanged and the output files still exist."""
+        if self.fingerprint != fingerprint:
+            return False
+        return all(os.path.isfile(path) for path in self.output_files or ())
+
 
 class Steps(BaseModel):
     """ Information about a specific step of GTDB-Tk"""
@@ -13,6 +59,7 @@ class Steps(BaseModel):
     ends_at: Optional[str]
     duration: Optional[str]
     status: Optional[str]
+    telemetry: Optional[Dict] = None
 
     def is_complete(self) -> bool:
         if self.status == "completed":
@@ -84,6 +131,8 @@ class InferStep(Steps):
     prot_model: Optional[str]
     no_support: Optional[bool]
     gamma: Optional[bool]
+    start_tree: Optional[str] = None
+    constraint_tree: Optional[str] = None
 
 class RootStep(Steps):
     """ Information about the Root step of GTDB-Tk"""
@@ -102,25 +151,96 @@ class DecorateStep(Steps):
     suffix: Optional[str]
     output_files: Optional[Dict]
 
+class MergeStep(Steps):
+    """ Information about the Merge step of GTDB-Tk"""
+    name: str = "merge"
+    shard_dirs: Optional[List[str]]
+    shard_steps: Optional[Dict[str, List[Dict]]] = None
+    output_files: Optional[Dict]
 
 
 class StageLogger(object):
     class __StageLogger(BaseModel):
 
-        version: Optional[str]
-        command_line: Optional[str]
-        database_version: Optional[str]
-        database_path: Optional[str]
+        version: Optional[str] = None
+        command_line: Optional[str] = None
+        database_version: Optional[str] = None
+        database_path: Optional[str] = None
         steps: List[Steps]
-        output_dir: Optional[str]
-        path: Optional[str]
+        checkpoints: Dict[str, Checkpoint] = {}
+        output_dir: Optional[str] = None
+        path: Optional[str] = None
+        # Provenance of a sharded run (--shard), checked by the merge command.
+        shard: Optional[str] = None
+        shard_inputs: Optional[str] = None
+        options: Optional[Dict] = None
 
         def __str__(self):
             return repr(self) + self.val
 
         def write(self):
-            with open(self.path, "w") as f:
-                f.write(self.json(indent=4))
+            # Written to a temporary file first, so that an interrupted run
+            # never leaves a truncated stage log.
+            fd, tmp_path = tempfile.mkstemp(prefix='.gtdbtk.json.',
+                                            dir=os.path.dirname(os.path.abspath(self.path)))
+            try:
+                with os.fdopen(fd, "w") as f:
+                    if hasattr(self, 'model_dump_json'):
+                        f.write(self.model_dump_json(indent=4))
+                    else:
+                        f.write(self.json(indent=4))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        def get_checkpoint(self, key: str, fingerprint: str) -> Optional[Checkpoint]:
+            """Returns the checkpoint of a unit of work, if it is still valid."""
+            checkpoint = self.checkpoints.get(key)
+            if checkpoint is not None and checkpoint.is_valid(fingerprint):
+                return checkpoint
+            return None
+
+        def add_checkpoint(self, key: str, fingerprint: str,
+                           output_files: Optional[List[str]] = None,
+                           data: Optional[Dict] = None, flush: bool = True) -> Checkpoint:
+            """Record that a unit of work has completed.
+
+            Parameters
+            ----------
+            key : str
+                The unique name of the unit of work, e.g. pplacer/bac120/low/1.
+            fingerprint : str
+                The fingerprint of the inputs (see input_fingerprint).
+            output_files : Optional[List[str]]
+                Files written by the unit of work, these must exist to resume.
+            data : Optional[Dict]
+                Small results which are not written elsewhere.
+            flush : bool
+                Write the stage log to disk (if it has a path).
+            """
+            checkpoint = Checkpoint(fingerprint=fingerprint, output_files=output_files,
+                                    data=data, completed_at=datetime.now().isoformat())
+            self.checkpoints[key] = checkpoint
+            if flush:
+                self.flush_checkpoints()
+            return checkpoint
+
+        def flush_checkpoints(self):
+            """Write the stage log to disk, if it has a path."""
+            if self.path is not None and os.path.isdir(os.path.dirname(os.path.abspath(self.path))):
+                self.write()
+
+        def read_checkpoints(self):
+            """Load the checkpoints of a previous run from the stage log."""
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return
+            for key, checkpoint in (data.get('checkpoints') or {}).items():
+                self.checkpoints[key] = Checkpoint(**checkpoint)
 
         def has_stage(self, stage_object: object) -> bool:
             processed_steps = [x for x in self.steps if isinstance(x, stage_object)]
@@ -161,10 +281,18 @@ class StageLogger(object):
                         step_object = ClassifyStep(**step)
                     elif step.get('name') == "infer":
                         step_object = InferStep(**step)
+                    elif step.get('name') == "root":
+                        step_object = RootStep(**step)
+                    elif step.get('name') == "decorate":
+                        step_object = DecorateStep(**step)
+                    elif step.get('name') == "merge":
+                        step_object = MergeStep(**step)
                     else:
-                        raise Exception(f"Unknown step name {step.name}")
+                        raise Exception(f"Unknown step name {step.get('name')}")
                     steps.append(step_object)
                 self.steps = steps
+                for key, checkpoint in (data.get('checkpoints') or {}).items():
+                    self.checkpoints[key] = Checkpoint(**checkpoint)
 
     instance = None
     def __new__(cls): # __new__ always a classmethod
@@ -0,0 +1,364 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from collections.abc import Mapping
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from gtdbtk.exceptions import GTDBTkExit
+
+
+class TaxonomyIndex(Mapping):
+    """An indexed, memory-mappable view of a Greengenes-style taxonomy.
+
+    Taxon names and genome ids are interned into integer ids. The lineage of
+    each genome is stored as a row of taxon ids, and two CSR (compressed
+    sparse row) indices map each taxon to its immediate named children and
+    to the genomes it contains.
+
+    The index behaves as a read-only ``d[unique_id] -> [d__<taxon>, ...]``
+    mapping, so it can be used wherever a dictionary from ``Taxonomy.read``
+    is expected.
+    """
+
+    VERSION = 1
+
+    _ARRAYS = ('lineage', 'taxon_rank', 'child_ptr', 'child_idx',
+               'genome_ptr', 'genome_idx')
+
+    def __init__(self, genome_ids: List[str], taxa: List[str], arrays: Dict[str, np.ndarray]):
+        """Create the index from already interned data, see ``build``.
+
+        Parameters
+        ----------
+        genome_ids : list[str]
+            The genome ids, in row order of the lineage array.
+        taxa : list[str]
+            The interned taxon names (including empty rank prefixes).
+        arrays : dict[str, np.ndarray]
+            The lineage, rank and CSR arrays.
+        """
+        self.genome_ids = genome_ids
+        self.taxa = taxa
+        self.lineage = arrays['lineage']
+        self.taxon_rank = arrays['taxon_rank']
+        self.child_ptr = arrays['child_ptr']
+        self.child_idx = arrays['child_idx']
+        self.genome_ptr = arrays['genome_ptr']
+        self.genome_idx = arrays['genome_idx']
+        self._genome_row = {gid: i for i, gid in enumerate(genome_ids)}
+        self._taxon_id = {taxon: i for i, taxon in enumerate(taxa)}
+        self._named = np.array([len(x) > 3 for x in taxa], dtype=bool)
+
+    # Mapping interface, equivalent to the dictionary from Taxonomy.read.
+
+    def __getitem__(self, gid: str) -> List[str]:
+        row = self.lineage[self._genome_row[gid]]
+        return [self.taxa[x] for x in row if x >= 0]
+
+    def __iter__(self):
+        return iter(self.genome_ids)
+
+    def __len__(self):
+        return len(self.genome_ids)
+
+    def __contains__(self, gid):
+        return gid in self._genome_row
+
+    def items(self):
+        """Iterate over (unique_id, lineage) pairs, converting rows in bulk."""
+        taxa = self.taxa
+        for gid, row in zip(self.genome_ids, self.lineage.tolist()):
+            yield gid, [taxa[x] for x in row if x >= 0]
+
+    def values(self):
+        for _gid, taxa in self.items():
+            yield taxa
+
+    @classmethod
+    def build(cls, taxonomy: Dict[str, List[str]]) -> 'TaxonomyIndex':
+        """Build the index from a taxonomy dictionary.
+
+        Parameters
+        ----------
+        taxonomy : d[unique_id] -> [d__<taxon>; ...; s__<taxon>]
+            Taxonomy strings indexed by unique ids.
+
+        Returns
+        -------
+        TaxonomyIndex
+            The index of the taxonomy.
+        """
+        genome_ids = list(taxonomy.keys())
+        width = max((len(x) for x in taxonomy.values()), default=0)
+
+        taxa, taxon_id = list(), dict()
+        lineage = np.full((len(genome_ids), width), -1, dtype=np.int32)
+        for row, gid in enumerate(genome_ids):
+            for col, taxon in enumerate(taxonomy[gid]):
+                idx = taxon_id.get(taxon)
+                if idx is None:
+                    idx = taxon_id[taxon] = len(taxa)
+                    taxa.append(taxon)
+                lineage[row, col] = idx
+
+        n_taxa = len(taxa)
+        named = np.array([len(x) > 3 for x in taxa], dtype=bool)
+
+        # The rank of a taxon is the first position it was seen at.
+        taxon_rank = np.full(n_taxa, -1, dtype=np.int8)
+        for col in reversed(range(width)):
+            present = lineage[:, col][lineage[:, col] >= 0]
+            taxon_rank[present] = col
+
+        # Immediate named children, i.e. adjacent named pairs in a lineage.
+        parents, children = list(), list()
+        for col in range(width - 1):
+            pair = lineage[:, col:col + 2]
+            pair = pair[(pair[:, 0] >= 0) & (pair[:, 1] >= 0)]
+            pair = pair[named[pair[:, 0]] & named[pair[:, 1]]]
+            parents.append(pair[:, 0])
+            children.append(pair[:, 1])
+        child_ptr, child_idx = cls._to_csr(np.concatenate(parents) if parents else np.empty(0, np.int32),
+                                           np.concatenate(children) if children else np.empty(0, np.int32),
+                                           n_taxa)
+
+        # Genomes contained within each taxon.
+        rows = np.repeat(np.arange(len(genome_ids), dtype=np.int32), width)
+        flat = lineage.reshape(-1)
+        keep = flat >= 0
+        genome_ptr, genome_idx = cls._to_csr(flat[keep], rows[keep], n_taxa)
+
+        return cls(genome_ids, taxa, {'lineage': lineage,
+                                      'taxon_rank': taxon_rank,
+                                      'child_ptr': child_ptr,
+                                      'child_idx': child_idx,
+                                      'genome_ptr': genome_ptr,
+                                      'genome_idx': genome_idx})
+
+    @staticmethod
+    def _to_csr(src: np.ndarray, dst: np.ndarray, n: int):
+        """Convert an edge list into (ptr, idx) arrays with unique edges."""
+        if len(src) > 0:
+            edges = np.unique(np.stack([src, dst], axis=1).astype(np.int64), axis=0)
+            src, dst = edges[:, 0], edges[:, 1]
+        ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=ptr[1:])
+        return ptr, dst.astype(np.int32)
+
+    def save(self, path: str, source_stat: Optional[os.stat_result] = None):
+        """Write the index to a directory, replacing it atomically.
+
+        Parameters
+        ----------
+        path : str
+            The directory to write the index to.
+        source_stat : Optional[os.stat_result]
+            The stat of the taxonomy file, used to validate the cache.
+        """
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix='.gtdbtk_tax_idx_', dir=parent)
+        try:
+            for name in self._ARRAYS:
+                np.save(os.path.join(tmp_dir, f'{name}.npy'), getattr(self, name))
+            with open(os.path.join(tmp_dir, 'genomes.txt'), 'w') as fh:
+                fh.write('\n'.join(self.genome_ids))
+            with open(os.path.join(tmp_dir, 'taxa.txt'), 'w') as fh:
+                fh.write('\n'.join(self.taxa))
+            meta = {'version': self.VERSION}
+            if source_stat is not None:
+                meta['size'] = source_stat.st_size
+                meta['mtime_ns'] = source_stat.st_mtime_ns
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w') as fh:
+                json.dump(meta, fh)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            os.replace(tmp_dir, path)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'TaxonomyIndex':
+        """Load an index written by ``save``.
+
+        Parameters
+        ----------
+        path : str
+            The directory containing the index.
+        mmap : bool
+            True if the arrays should be memory-mapped, False to read them.
+        """
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in cls._ARRAYS}
+        genome_ids = cls._read_lines(os.path.join(path, 'genomes.txt'))
+        taxa = cls._read_lines(os.path.join(path, 'taxa.txt'))
+        if len(genome_ids) != arrays['lineage'].shape[0] or len(taxa) != len(arrays['taxon_rank']):
+            raise GTDBTkExit(f'The taxonomy index is corrupted: {path}')
+        return cls(genome_ids, taxa, arrays)
+
+    @staticmethod
+    def _read_lines(path: str) -> List[str]:
+        with open(path) as fh:
+            content = fh.read()
+        return content.split('\n') if content else list()
+
+    @staticmethod
+    def is_valid(path: str, source_stat: os.stat_result) -> bool:
+        """True if the index at path was built from a file with this stat."""
+        try:
+            with open(os.path.join(path, 'meta.json')) as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            return False
+        return meta.get('version') == TaxonomyIndex.VERSION and \
+            meta.get('size') == source_stat.st_size and \
+            meta.get('mtime_ns') == source_stat.st_mtime_ns
+
+    @classmethod
+    def from_file(cls, taxonomy_file: str, cache_dir: Optional[str] = None) -> 'TaxonomyIndex':
+        """Load the index for a taxonomy file, building and caching it if needed.
+
+        The cache is keyed on the absolute path of the taxonomy file and is
+        invalidated if its size or modification time change. If the cache
+        directory cannot be written to, the index is only kept in memory.
+
+        Parameters
+        ----------
+        taxonomy_file : str
+            Path to a Greengenes-style taxonomy file.
+        cache_dir : Optional[str]
+            The directory to store the index in, or None to not cache.
+        """
+        from gtdbtk.biolib_lite.taxonomy import Taxonomy
+
+        logger = logging.getLogger('timestamp')
+        source_stat = os.stat(taxonomy_file)
+        path = None
+        if cache_dir is not None:
+            key = hashlib.sha1(os.path.abspath(taxonomy_file).encode()).hexdigest()[:16]
+            path = os.path.join(cache_dir, f'taxonomy_index_{key}')
+            if cls.is_valid(path, source_stat):
+                try:
+                    return cls.load(path)
+                except (OSError, ValueError, GTDBTkExit):
+                    logger.debug(f'Rebuilding the taxonomy index: {path}')
+
+        index = cls.build(Taxonomy().read(taxonomy_file))
+        if path is not None:
+            try:
+                index.save(path, source_stat)
+            except OSError as e:
+                logger.debug(f'Unable to cache the taxonomy index: {e}')
+        return index
+
+    def taxon_id(self, taxon: str) -> int:
+        """Return the interned id of a taxon, or -1 if it is not present."""
+        return self._taxon_id.get(taxon, -1)
+
+    def genomes(self, taxon: str) -> Set[str]:
+        """Return the extant genomes within a taxon."""
+        t = self.taxon_id(taxon)
+        if t < 0:
+            return set()
+        rows = self.genome_idx[self.genome_ptr[t]:self.genome_ptr[t + 1]]
+        return {self.genome_ids[x] for x in rows}
+
+    def children(self, taxon: str) -> Set[str]:
+        """Get children of taxon, see ``Taxonomy.children``."""
+        t = self.taxon_id(taxon)
+        if t < 0:
+            return set()
+        if taxon.startswith('s__'):
+            return self.genomes(taxon)
+        rows = self.genome_idx[self.genome_ptr[t]:self.genome_ptr[t + 1]]
+        block = self.lineage[rows]
+        out = set()
+        for col in np.unique(np.nonzero(block == t)[1]):
+            below = block[block[:, col] == t, col + 1:]
+            below = np.unique(below[below >= 0])
+            out.update(self.taxa[x] for x in below[self._named[below]])
+        return out
+
+    def taxon_children(self) -> Dict[str, Set[str]]:
+        """Get children taxa for each taxonomic group, see ``Taxonomy.taxon_children``."""
+        out = dict()
+        for t in np.nonzero(np.diff(self.child_ptr))[0]:
+            out[self.taxa[t]] = {self.taxa[x] for x in self.child_idx[self.child_ptr[t]:self.child_ptr[t + 1]]}
+        species_col = 6
+        if self.lineage.shape[1] > species_col:
+            for t in np.unique(self.lineage[:, species_col]):
+                if t >= 0 and self.taxa[t] != 's__':
+                    out.setdefault(self.taxa[t], set()).update(self.genomes(self.taxa[t]))
+        return out
+
+    def extant_taxa_for_rank(self, rank_index: int) -> Dict[str, Set[str]]:
+        """Get extant taxa for all named groups at the rank index, see
+        ``Taxonomy.extant_taxa_for_rank``."""
+        out = dict()
+        if rank_index >= self.lineage.shape[1]:
+            return out
+        col = np.asarray(self.lineage[:, rank_index])
+        order = np.argsort(col, kind='stable')
+        values, starts = np.unique(col[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for t, start, end in zip(values, starts, ends):
+            if t < 0 or not self._named[t]:
+                continue
+            out[self.taxa[t]] = {self.genome_ids[x] for x in order[start:end]}
+        return out
+
+    def named_lineages_at_rank(self) -> Dict[int, Set[str]]:
+        """Get named lineages at each taxonomic rank, see
+        ``Taxonomy.named_lineages_at_rank``."""
+        out = dict()
+        for col in range(self.lineage.shape[1]):
+            present = np.unique(self.lineage[:, col])
+            present = present[present >= 0]
+            present = present[self._named[present]]
+            if len(present) > 0:
+                out[col] = {self.taxa[x] for x in present}
+        return out
+
+    def taxa_above(self, taxa, rank_index: int) -> Set[str]:
+        """Return the taxa at rank_index found in lineages containing any of taxa.
+
+        Parameters
+        ----------
+        taxa : iterable
+            The named taxa to look up.
+        rank_index : int
+            The rank index of the taxa to return.
+        """
+        out = set()
+        for taxon in taxa:
+            t = self.taxon_id(taxon)
+            if t < 0:
+                continue
+            rows = self.genome_idx[self.genome_ptr[t]:self.genome_ptr[t + 1]]
+            found = np.unique(self.lineage[rows, rank_index])
+            out.update(self.taxa[x] for x in found if x >= 0)
+        return out
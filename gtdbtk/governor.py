@@ -0,0 +1,193 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+"""CPU and memory reservations shared by every third-party program launched.
+
+The governor holds one token per CPU (--cpus) and a memory budget. Every
+launch of a third-party program reserves the threads (and memory) it will
+use, and waits until they are free. Reservations are granted in the order
+they are requested, so a large job can not be starved by smaller ones.
+
+The state is held in shared memory, so the reservations of worker processes
+forked after the governor is initialised are coordinated with each other.
+"""
+
+import multiprocessing as mp
+import os
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+
+class ResourceGovernor(object):
+    """Token-based CPU slots and memory reservations."""
+
+    def __init__(self, cpus: int, memory_gb: Optional[float] = None):
+        """Create a governor.
+
+        Parameters
+        ----------
+        cpus : int
+            The total number of CPUs which may be used at once.
+        memory_gb : Optional[float]
+            The total memory which may be reserved at once, or None for no limit.
+        """
+        self.cpus = max(int(cpus), 1)
+        self.memory_gb = memory_gb
+        self._cond = mp.Condition()
+        self._free_cpus = mp.Value('i', self.cpus, lock=False)
+        self._free_memory = mp.Value('d', memory_gb or 0.0, lock=False)
+        self._next_ticket = mp.Value('q', 0, lock=False)
+        self._now_serving = mp.Value('q', 0, lock=False)
+
+    @property
+    def free_cpus(self) -> int:
+        """The number of CPUs not reserved."""
+        with self._cond:
+            return self._free_cpus.value
+
+    def split(self, n_jobs: int, cpus: Optional[int] = None,
+              max_threads: Optional[int] = None) -> Tuple[int, int]:
+        """Divide the CPUs between a number of jobs.
+
+        Parameters
+        ----------
+        n_jobs : int
+            The number of jobs to run.
+        cpus : Optional[int]
+            The CPUs to divide, by default (and at most) all CPUs.
+        max_threads : Optional[int]
+            The maximum number of threads a job can use.
+
+        Returns
+        -------
+        Tuple[int, int]
+            The number of jobs to run at once, and the threads for each job.
+        """
+        cpus = self.cpus if cpus is None else max(1, min(cpus, self.cpus))
+        n_workers = max(1, min(n_jobs, cpus))
+        threads = max(1, cpus // n_workers)
+        if max_threads is not None:
+            threads = max(1, min(threads, max_threads))
+        return n_workers, threads
+
+    def _fits(self, cpus: int, memory_gb: float) -> bool:
+        if self._free_cpus.value < cpus:
+            return False
+        return self.memory_gb is None or self._free_memory.value >= memory_gb
+
+    def acquire(self, cpus: int = 1, memory_gb: float = 0.0) -> Tuple[int, float]:
+        """Wait for, and take, CPUs and memory. These must be released.
+
+        Requests larger than the total are reduced to the total, so that
+        they can run once everything else has finished.
+
+        Parameters
+        ----------
+        cpus : int
+            The number of CPUs to reserve.
+        memory_gb : float
+            The memory to reserve.
+
+        Returns
+        -------
+        Tuple[int, float]
+            The CPUs and memory reserved.
+        """
+        cpus = min(max(int(cpus), 1), self.cpus)
+        if self.memory_gb is not None:
+            memory_gb = min(max(memory_gb, 0.0), self.memory_gb)
+        with self._cond:
+            ticket = self._next_ticket.value
+            self._next_ticket.value += 1
+            while self._now_serving.value != ticket or not self._fits(cpus, memory_gb):
+                self._cond.wait()
+            self._free_cpus.value -= cpus
+            self._free_memory.value -= memory_gb
+            self._now_serving.value += 1
+            self._cond.notify_all()
+        return cpus, memory_gb
+
+    def release(self, cpus: int, memory_gb: float = 0.0):
+        """Return CPUs and memory taken by acquire."""
+        with self._cond:
+            self._free_cpus.value += cpus
+            self._free_memory.value += memory_gb
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, cpus: int = 1, memory_gb: float = 0.0):
+        """Reserve CPUs and memory for the duration of the context.
+
+        Reservations must not be nested, as an inner request may wait on one
+        queued after the outer request.
+
+        Parameters
+        ----------
+        cpus : int
+            The number of CPUs to reserve.
+        memory_gb : float
+            The memory to reserve.
+
+        Yields
+        ------
+        int
+            The number of CPUs reserved.
+        """
+        cpus, memory_gb = self.acquire(cpus, memory_gb)
+        try:
+            yield cpus
+        finally:
+            self.release(cpus, memory_gb)
+
+
+_governor: Optional[ResourceGovernor] = None
+_keep = False
+
+
+def init_governor(cpus: int, memory_gb: Optional[float] = None) -> ResourceGovernor:
+    """Create the process-wide governor, this must be done before any worker
+    processes are started for their reservations to be shared.
+
+    Parameters
+    ----------
+    cpus : int
+        The total number of CPUs which may be used at once.
+    memory_gb : Optional[float]
+        The total memory which may be reserved at once, or None for no limit.
+    """
+    global _governor
+    if _keep and _governor is not None:
+        return _governor
+    _governor = ResourceGovernor(cpus, memory_gb)
+    return _governor
+
+
+def keep_governor():
+    """Keep the governor of this process, later calls to init_governor return
+    it unchanged. This is used by the jobs forked from gtdbtk serve, so the
+    reservations of every job are made from the CPUs of the server."""
+    global _keep
+    get_governor()
+    _keep = True
+
+
+def get_governor() -> ResourceGovernor:
+    """Returns the process-wide governor, by default limited to all CPUs."""
+    global _governor
+    if _governor is None:
+        _governor = ResourceGovernor(os.cpu_count() or 1)
+    return _governor
@@ -0,0 +1,222 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import hashlib
+import logging
+from typing import Collection, Dict, Optional, Tuple
+
+import dendropy
+import numpy as np
+
+from gtdbtk.biolib_lite.newick import parse_label
+from gtdbtk.biolib_lite.seq_io import read_seq
+from gtdbtk.config.common import CONFIG
+from gtdbtk.exceptions import GTDBTkExit
+
+
+class IncrementalInfer(object):
+    """Prepares the starting tree and constraints for an incremental FastTree
+    run, so that only the taxa which have changed since a previous tree are
+    placed and the topology is refined locally."""
+
+    def __init__(self):
+        """Initialization."""
+        self.logger = logging.getLogger('timestamp')
+
+    @staticmethod
+    def msa_digests(msa_file: str) -> Dict[str, str]:
+        """Returns the SHA1 hash of each aligned sequence in the MSA."""
+        return {seq_id: hashlib.sha1(seq.encode()).hexdigest()
+                for seq_id, seq in read_seq(msa_file)}
+
+    @staticmethod
+    def read_digests(path: str) -> Dict[str, str]:
+        """Read the sequence hashes written by write_digests."""
+        out = dict()
+        with open(path) as fh:
+            for line in fh:
+                seq_id, digest = line.rstrip('\n').split('\t')
+                out[seq_id] = digest
+        return out
+
+    @staticmethod
+    def write_digests(digests: Dict[str, str], path: str):
+        """Write the hash of each aligned sequence to disk."""
+        with open(path, 'w') as fh:
+            for seq_id, digest in sorted(digests.items()):
+                fh.write(f'{seq_id}\t{digest}\n')
+
+    @staticmethod
+    def _nearest_taxa(msa_file: str, reference_ids: Collection[str],
+                      query_ids: Collection[str]) -> Dict[str, str]:
+        """Find the reference sequence with the highest identity to each query.
+
+        Identity is calculated over the columns where neither sequence has a gap.
+        """
+        ref_ids, ref_seqs, qry_seqs = list(), list(), dict()
+        for seq_id, seq in read_seq(msa_file):
+            if seq_id in query_ids:
+                qry_seqs[seq_id] = seq.encode()
+            elif seq_id in reference_ids:
+                ref_ids.append(seq_id)
+                ref_seqs.append(seq.encode())
+        lengths = {len(seq) for seq in ref_seqs} | {len(seq) for seq in qry_seqs.values()}
+        if len(lengths) != 1:
+            raise GTDBTkExit(f'The sequences in the MSA are not aligned: {msa_file}')
+        refs = np.frombuffer(b''.join(ref_seqs), dtype=np.uint8).reshape(len(ref_seqs), -1)
+        gap = ord('-')
+
+        out = dict()
+        chunk = CONFIG.INFER_NEAREST_CHUNK_ROWS
+        for qry_id, qry_seq in qry_seqs.items():
+            qry = np.frombuffer(qry_seq, dtype=np.uint8)
+            best_idx, best_identity = 0, -1.0
+            for start in range(0, len(ref_ids), chunk):
+                cur_refs = refs[start:start + chunk]
+                shared = (cur_refs != gap) & (qry != gap)
+                n_shared = shared.sum(axis=1)
+                n_match = ((cur_refs == qry) & shared).sum(axis=1)
+                identity = np.divide(n_match, n_shared, out=np.zeros(len(cur_refs)),
+                                     where=n_shared > 0)
+                idx = int(np.argmax(identity))
+                if identity[idx] > best_identity:
+                    best_idx, best_identity = start + idx, float(identity[idx])
+            out[qry_id] = ref_ids[best_idx]
+        return out
+
+    def write_start_tree(self, previous_tree: str, msa_file: str, output_tree: str,
+                         digests: Dict[str, str],
+                         previous_digests: Optional[Dict[str, str]] = None) -> Tuple[int, int, int]:
+        """Create a starting tree for the MSA from a previous tree.
+
+        Taxa which are no longer in the MSA, or whose aligned sequence has
+        changed, are removed from the previous tree. New (and changed) taxa
+        are then added as the sister of the taxon with the most similar
+        aligned sequence.
+
+        Parameters
+        ----------
+        previous_tree : str
+            The path to the previous tree.
+        msa_file : str
+            The path to the MSA being inferred.
+        output_tree : str
+            The path to write the starting tree to.
+        digests : Dict[str, str]
+            The hash of each sequence in the MSA (see msa_digests).
+        previous_digests : Optional[Dict[str, str]]
+            The hash of each sequence used to infer the previous tree, if not
+            provided, the taxa in the previous tree are assumed to be unchanged.
+
+        Returns
+        -------
+        Tuple[int, int, int]
+            The number of taxa kept, added, and removed.
+        """
+        tree = dendropy.Tree.get_from_path(previous_tree,
+                                           schema='newick',
+                                           rooting='force-unrooted',
+                                           preserve_underscores=True)
+
+        kept, removed = set(), set()
+        for leaf in tree.leaf_node_iter():
+            label = leaf.taxon.label
+            if label in digests and (previous_digests is None or
+                                     previous_digests.get(label) == digests[label]):
+                kept.add(label)
+            else:
+                removed.add(label)
+        if len(kept) < 3:
+            raise GTDBTkExit(f'The starting tree has fewer than 3 taxa in common '
+                             f'with the MSA: {previous_tree}')
+        if removed:
+            tree.prune_taxa_with_labels(removed)
+
+        # Add each new taxon beside its nearest taxon in the previous tree.
+        added = set(digests) - kept
+        leaf_map = {leaf.taxon.label: leaf for leaf in tree.leaf_node_iter()}
+        for qry_id, ref_id in sorted(self._nearest_taxa(msa_file, kept, added).items()):
+            ref_leaf = leaf_map[ref_id]
+            parent = ref_leaf.parent_node
+            new_node = dendropy.Node()
+            parent.remove_child(ref_leaf)
+            new_node.add_child(ref_leaf)
+            new_node.add_child(dendropy.Node(taxon=tree.taxon_namespace.require_taxon(label=qry_id)))
+            parent.add_child(new_node)
+
+        tree.write_to_path(output_tree, schema='newick', suppress_rooting=True,
+                           unquoted_underscores=True, suppress_edge_lengths=True,
+                           suppress_internal_node_labels=True)
+        return len(kept), len(added), len(removed)
+
+    def write_constraints(self, constraint_tree: str, msa_ids: Collection[str],
+                          output_file: str) -> int:
+        """Write the taxonomic splits of a reference tree (e.g. the GTDB
+        reference tree) as a FastTree constraint alignment.
+
+        Only the internal nodes labelled with a taxon of CONFIG.INFER_CONSTRAINT_RANKS
+        are used, taxa which are not in the reference tree are unconstrained.
+
+        Parameters
+        ----------
+        constraint_tree : str
+            The path to the decorated reference tree.
+        msa_ids : Collection[str]
+            The ids of the sequences in the MSA.
+        output_file : str
+            The path to write the constraint alignment to.
+
+        Returns
+        -------
+        int
+            The number of splits constrained.
+        """
+        tree = dendropy.Tree.get_from_path(constraint_tree,
+                                           schema='newick',
+                                           rooting='force-rooted',
+                                           preserve_underscores=True)
+        msa_ids = set(msa_ids)
+        tree.retain_taxa_with_labels(msa_ids)
+        constrained = sorted(leaf.taxon.label for leaf in tree.leaf_node_iter())
+        row_idx = {label: idx for idx, label in enumerate(constrained)}
+
+        # Splits are unrooted, so each is identified by the side without the first taxon.
+        splits, seen = list(), set()
+        for node in tree.preorder_internal_node_iter(exclude_seed_node=True):
+            _support, taxon, _aux_info = parse_label(node.label)
+            if not taxon:
+                continue
+            if not any(t.strip().startswith(CONFIG.INFER_CONSTRAINT_RANKS) for t in taxon.split(';')):
+                continue
+            idx = {row_idx[leaf.taxon.label] for leaf in node.leaf_iter()}
+            if 0 in idx:
+                idx = set(range(len(constrained))) - idx
+            idx = frozenset(idx)
+            if 1 < len(idx) < len(constrained) - 1 and idx not in seen:
+                seen.add(idx)
+                splits.append(sorted(idx))
+
+        matrix = np.full((len(constrained), len(splits)), ord('0'), dtype=np.uint8)
+        for col, idx in enumerate(splits):
+            matrix[idx, col] = ord('1')
+        unconstrained = '-' * len(splits)
+        with open(output_file, 'w') as fh:
+            for label, row in zip(constrained, matrix):
+                fh.write(f'>{label}\n{row.tobytes().decode()}\n')
+            for label in sorted(msa_ids - set(row_idx)):
+                fh.write(f'>{label}\n{unconstrained}\n')
+        return len(splits)
@@ -16,14 +16,18 @@
 ###############################################################################
 
 import logging
+from typing import List, Tuple
 
 import dendropy
+import numpy as np
 
 from gtdbtk.biolib_lite.newick import parse_label, create_label
 from gtdbtk.biolib_lite.taxonomy import Taxonomy
 from gtdbtk.config.common import CONFIG
 from gtdbtk.exceptions import GTDBTkExit
 from gtdbtk.relative_distance import RelativeDistance
+from gtdbtk.reroot_tree import LeafIndex
+from gtdbtk.tools import get_gtdb_taxonomy_index
 
 
 class InferRanks(object):
@@ -34,21 +38,19 @@ class InferRanks(object):
 
         self.logger = logging.getLogger('timestamp')
 
+        # the reference MRCA pairs of each RED file, read once
+        self._mrca_reds = dict()
+
     def _get_ingroup_domain(self, ingroup_taxon) -> str:
         """Get domain on ingroup taxon."""
 
-        # read GTDB taxonomy in order to establish domain on ingroup taxon
-        gtdb_taxonomy = Taxonomy().read(CONFIG.TAXONOMY_FILE)
-        ingroup_domain = None
-        for taxa in gtdb_taxonomy.values():
-            if ingroup_taxon in taxa:
-                ingroup_domain = taxa[Taxonomy.DOMAIN_IDX]
-
-        if ingroup_domain is None:
+        # the indexed GTDB taxonomy maps the taxon to its genomes directly
+        domains = get_gtdb_taxonomy_index().taxa_above({ingroup_taxon}, Taxonomy.DOMAIN_IDX)
+        if len(domains) == 0:
             raise GTDBTkExit(f'Ingroup taxon {ingroup_taxon} was not found in '
                              f'the GTDB taxonomy.')
 
-        return ingroup_domain
+        return sorted(domains)[0]
 
     def _get_median_reds(self, ingroup_domain: str):
         """Get median RED values for domain of ingroup taxon."""
@@ -72,51 +74,62 @@ class InferRanks(object):
 
         return median_reds
 
-    def _find_ingroup_taxon(self, ingroup_taxon, tree):
-        """Find node of ingroup taxon in tree."""
+    def _find_ingroup_taxon(self, ingroup_taxon, leaf_index: LeafIndex) -> int:
+        """Find the preorder index of the node of the ingroup taxon in the tree."""
 
-        ingroup_node = None
-        for node in tree.postorder_node_iter():
+        ingroup_idx = None
+        for idx, node in enumerate(leaf_index.nodes):
             support, taxon, auxiliary_info = parse_label(node.label)
 
             if taxon:
                 taxa = [t.strip() for t in taxon.split(';')]
                 if ingroup_taxon in taxa:
-                    if ingroup_node is not None:
+                    if ingroup_idx is not None:
                         raise GTDBTkExit(f'Ingroup taxon {ingroup_taxon} '
                                          f'identified multiple times.')
-                    ingroup_node = node
+                    ingroup_idx = idx
 
-        if ingroup_node is None:
+        if ingroup_idx is None:
             raise GTDBTkExit(f'Ingroup taxon {ingroup_taxon} not found in tree.')
 
-        return ingroup_node
+        return ingroup_idx
 
-    def _find_ingroup_red(self, ingroup_node, ingroup_domain, tree):
-        """Find RED of the ingroup taxon."""
+    def _read_mrca_reds(self, ingroup_domain) -> Tuple[List[str], List[str], List[float]]:
+        """Read the leaf pairs defining each reference MRCA, and its RED."""
 
         red_file = CONFIG.MRCA_RED_BAC120
         if ingroup_domain == 'd__Archaea':
             red_file = CONFIG.MRCA_RED_AR53
 
-        # create map from leave labels to tree nodes
-        leaf_node_map = {}
-        for leaf in tree.leaf_node_iter():
-            leaf_node_map[leaf.taxon.label] = leaf
-
-        # find RED value of ingroup node
-        reference_nodes = set()
-        with open(red_file) as rf:
-            for line in rf:
-                label_ids, red = line.strip().split('\t')
-                labels = label_ids.split('|')
-                if len(labels) == 2:
-                    taxa = [leaf_node_map[label].taxon for label in labels]
-                    node = tree.mrca(taxa=taxa)
-                    if node == ingroup_node:
-                        return float(red)
-
-        raise GTDBTkExit(f'Could not determine RED of ingroup taxon {ingroup_node}.')
+        if red_file not in self._mrca_reds:
+            labels_a, labels_b, reds = [], [], []
+            with open(red_file) as rf:
+                for line in rf:
+                    label_ids, red = line.strip().split('\t')
+                    labels = label_ids.split('|')
+                    if len(labels) == 2:
+                        labels_a.append(labels[0])
+                        labels_b.append(labels[1])
+                        reds.append(float(red))
+            self._mrca_reds[red_file] = (labels_a, labels_b, reds)
+
+        return self._mrca_reds[red_file]
+
+    def _find_ingroup_red(self, ingroup_idx, ingroup_domain, leaf_index: LeafIndex):
+        """Find RED of the ingroup taxon."""
+
+        # resolve the MRCA of every reference pair at once
+        labels_a, labels_b, reds = self._read_mrca_reds(ingroup_domain)
+        in_tree = [i for i, (a, b) in enumerate(zip(labels_a, labels_b))
+                   if a in leaf_index.leaf_rank and b in leaf_index.leaf_rank]
+        mrca = leaf_index.mrca([labels_a[i] for i in in_tree], [labels_b[i] for i in in_tree])
+
+        # the first pair defining the ingroup node gives its RED
+        matches = np.nonzero(mrca == ingroup_idx)[0]
+        if len(matches) > 0:
+            return reds[in_tree[matches[0]]]
+
+        raise GTDBTkExit(f'Could not determine RED of ingroup taxon {leaf_index.nodes[ingroup_idx]}.')
 
     def _determine_red_ranks(self, node_red, median_reds):
         """Determine suitable taxonomic ranks for node using RED."""
@@ -163,10 +176,12 @@ class InferRanks(object):
                                            preserve_underscores=True)
 
         # find ingroup taxon
-        ingroup_node = self._find_ingroup_taxon(ingroup_taxon, tree)
+        leaf_index = LeafIndex(tree)
+        ingroup_idx = self._find_ingroup_taxon(ingroup_taxon, leaf_index)
+        ingroup_node = leaf_index.nodes[ingroup_idx]
 
         # get RED of ingroup taxon
-        ingroup_red = self._find_ingroup_red(ingroup_node, ingroup_domain, tree)
+        ingroup_red = self._find_ingroup_red(ingroup_idx, ingroup_domain, leaf_index)
         self.logger.info('RED of ingroup taxon {} = {:.3f}'.format(
             ingroup_taxon, ingroup_red))
 
@@ -25,34 +25,23 @@ import tempfile
 from datetime import datetime, timedelta
 from typing import Dict, Tuple
 
-from tqdm import tqdm
-
 from gtdbtk.config.common import CONFIG
-from gtdbtk.ani_rep import ANIRep
-from gtdbtk.ani_screen import ANIScreener
 from gtdbtk.biolib_lite.common import (check_dir_exists,
                                        check_file_exists,
                                        make_sure_path_exists,
                                        remove_extension)
 from gtdbtk.biolib_lite.execute import check_dependencies
 from gtdbtk.biolib_lite.logger import colour
-from gtdbtk.biolib_lite.taxonomy import Taxonomy
-from gtdbtk.classify import Classify
 from gtdbtk.config.output import *
-from gtdbtk.decorate import Decorate
 from gtdbtk.exceptions import *
-from gtdbtk.external.fasttree import FastTree
-from gtdbtk.files.stage_logger import ANIScreenStep, IdentifyStep, ClassifyStep, AlignStep, \
-    InferStep, RootStep, DecorateStep, StageLogger
-from gtdbtk.infer_ranks import InferRanks
-from gtdbtk.files.batchfile import Batchfile
-from gtdbtk.files.classify_summary import ClassifySummaryFileAR53, ClassifySummaryFile
-from gtdbtk.markers import Markers
-from gtdbtk.misc import Misc
-from gtdbtk.model.enum import Domain
-from gtdbtk.pipeline.export_msa import export_msa
-from gtdbtk.reroot_tree import RerootTree
-from gtdbtk.tools import symlink_f, get_reference_ids, confirm, assert_outgroup_taxon_valid
+from gtdbtk.governor import init_governor
+from gtdbtk.telemetry import Span
+from gtdbtk.tools import symlink_f, get_reference_ids, confirm, assert_outgroup_taxon_valid, \
+    get_memory_limit_gb, parse_shard, in_shard
+
+# The modules of each command (and their dependencies, e.g. numpy, dendropy
+# and pydantic) are imported by the method which runs the command, so that
+# the utility commands start quickly.
 
 
 class OptionsParser(object):
@@ -71,6 +60,8 @@ class OptionsParser(object):
         self._check_package_compatibility()
 
         self.genomes_to_process = None
+        # The (index, count) of the shard of genomes to process (--shard).
+        self.shard = None
 
         #Setup the Stage Logger File
         if output_dir is not None:
@@ -83,6 +74,7 @@ class OptionsParser(object):
 
         #setup the stage logger
         if output_dir is not None:
+            from gtdbtk.files.stage_logger import StageLogger
             self.stage_logger = StageLogger()
             self.stage_logger.version=self.version
             self.stage_logger.command_line=f'{prog_name} {" ".join(sys.argv[1:])}'
@@ -90,6 +82,9 @@ class OptionsParser(object):
             self.stage_logger.database_path=CONFIG.GENERIC_PATH
             self.stage_logger.output_dir=output_dir
             self.stage_logger.path = os.path.join(output_dir, "gtdbtk.json")
+            # Units of work completed by a previous run are resumed.
+            if os.path.isfile(self.stage_logger.path):
+                self.stage_logger.read_checkpoints()
 
     def _check_package_compatibility(self):
         """Check that GTDB-Tk is using the most up-to-date reference package."""
@@ -157,6 +152,7 @@ class OptionsParser(object):
         genomic_files : d[genome_id] -> FASTA file
             Map of genomes to their genomic FASTA files.
         """
+        from gtdbtk.files.batchfile import Batchfile
 
         genomic_files, tln_tables = dict(), dict()
         if genome_dir:
@@ -214,10 +210,71 @@ class OptionsParser(object):
                              f'same id as GTDB-Tk reference genomes, please '
                              f'rename them. See gtdb.warnings.log.')
 
+        if self.shard is not None:
+            genomic_files, tln_tables = self._select_shard(genomic_files, tln_tables)
         return genomic_files, tln_tables
 
+    def _init_shard(self, options):
+        """Process only one shard of the genomes (--shard i/N).
+
+        The shard, the options and a fingerprint of all genomes are recorded in
+        the stage log, so that the merge command can check that the shards
+        belong to the same run before combining them.
+        """
+        from gtdbtk.merge import SHARD_LOCAL_OPTIONS, read_shard_log
+
+        self.shard = parse_shard(options.shard)
+        shard = '%d/%d' % self.shard
+        if os.path.isfile(self.stage_logger.path):
+            previous_shard = read_shard_log(options.out_dir).get('shard')
+            if previous_shard != shard:
+                raise GTDBTkExit(f'The output directory contains the results of '
+                                 f'shard {previous_shard}, not {shard}: {options.out_dir}')
+        self.stage_logger.shard = shard
+        self.stage_logger.options = {k: v for k, v in sorted(vars(options).items())
+                                     if k not in SHARD_LOCAL_OPTIONS}
+
+    def _select_shard(self, genomic_files, tln_tables):
+        """Returns the genomes (and translation tables) in the current shard."""
+        from gtdbtk.files.stage_logger import input_fingerprint
+
+        shard_idx, n_shards = self.shard
+        selected = {gid: path for gid, path in genomic_files.items()
+                    if in_shard(gid, shard_idx, n_shards)}
+        if self.stage_logger.shard_inputs is None:
+            if len(selected) == 0:
+                self.logger.warning(f'None of the {len(genomic_files):,} genomes are '
+                                    f'in shard {shard_idx}/{n_shards}.')
+            else:
+                self.logger.info(f'Processing {len(selected):,} of {len(genomic_files):,} '
+                                 f'genomes in shard {shard_idx}/{n_shards}.')
+            self.stage_logger.shard_inputs = input_fingerprint(sorted(genomic_files))
+        return selected, {gid: tln for gid, tln in tln_tables.items() if gid in selected}
+
+    def _classify_empty_shard(self, options):
+        """Complete a shard which has none of the genomes, the classify step
+        is recorded with no output so that the shard can be merged."""
+        from gtdbtk.files.stage_logger import ClassifyStep
+
+        classify_step = ClassifyStep()
+        classify_step.starts_at = datetime.now()
+        classify_step.output_dir = options.out_dir
+        classify_step.genome_dir = options.genome_dir
+        classify_step.batchfile = options.batchfile
+        classify_step.output_files = {}
+        classify_step.ends_at = classify_step.starts_at
+        classify_step.duration = str(timedelta())
+        classify_step.status = 'completed'
+
+        make_sure_path_exists(options.out_dir)
+        self.stage_logger.reset_steps()
+        self.stage_logger.steps.append(classify_step)
+        self.logger.info('There are no genomes to classify in this shard.')
+
     def _read_taxonomy_files(self, options) -> Dict[str, Tuple[str, str, str, str, str, str, str]]:
         """Read and merge taxonomy files."""
+        from gtdbtk.biolib_lite.taxonomy import Taxonomy
+        from gtdbtk.files.classify_summary import ClassifySummaryFile
 
         self.logger.info('Reading GTDB taxonomy for representative genomes.')
         taxonomy = Taxonomy().read(CONFIG.TAXONOMY_FILE)
@@ -285,8 +342,12 @@ class OptionsParser(object):
         options : argparse.Namespace
             The CLI arguments input by the user.
         """
+        from gtdbtk.files.stage_logger import IdentifyStep
+        from gtdbtk.markers import Markers
+
         identify_step = IdentifyStep()
         identify_step.starts_at = datetime.now()
+        identify_span = Span(identify_step.name).start()
         identify_step.output_dir = options.out_dir
         identify_step.genes = options.genes
         identify_step.extension = options.extension
@@ -331,6 +392,7 @@ class OptionsParser(object):
         #we round the duration to the nearest second
         identify_step.duration = str(duration - timedelta(microseconds=duration.microseconds))
         identify_step.status = 'completed'
+        identify_step.telemetry = identify_span.stop().to_dict()
 
         self.stage_logger.steps.append(identify_step)
         self.logger.info('Done.')
@@ -343,9 +405,12 @@ class OptionsParser(object):
         options : argparse.Namespace
             The CLI arguments input by the user.
         """
+        from gtdbtk.files.stage_logger import AlignStep
+        from gtdbtk.markers import Markers
 
         align_step = AlignStep()
         align_step.starts_at = datetime.now()
+        align_span = Span(align_step.name).start()
         align_step.output_dir = options.out_dir
         align_step.skip_gtdb_refs = options.skip_gtdb_refs
         align_step.taxa_filter = options.taxa_filter
@@ -386,6 +451,7 @@ class OptionsParser(object):
         align_step.duration = str(duration - timedelta(microseconds=duration.microseconds))
         align_step.output_files = reports
         align_step.status = 'completed'
+        align_step.telemetry = align_span.stop().to_dict()
 
         self.stage_logger.steps.append(align_step)
 
@@ -400,9 +466,13 @@ class OptionsParser(object):
         options : argparse.Namespace
             The CLI arguments input by the user.
         """
+        from gtdbtk.external.fasttree import FastTree
+        from gtdbtk.files.stage_logger import InferStep, input_fingerprint
+        from gtdbtk.incremental_infer import IncrementalInfer
 
         infer_step = InferStep()
         infer_step.starts_at = datetime.now()
+        infer_span = Span(infer_step.name).start()
         infer_step.output_dir = options.out_dir
         infer_step.msa_file = options.msa_file
         infer_step.prot_model = options.prot_model
@@ -425,6 +495,15 @@ class OptionsParser(object):
             fasttree_log = os.path.join(options.out_dir,
                                         PATH_MARKER_FASTTREE_LOG.format(prefix=options.prefix,
                                                                         marker=options.suffix))
+            msa_digests_file = os.path.join(options.out_dir,
+                                            PATH_MARKER_MSA_DIGESTS.format(prefix=options.prefix,
+                                                                           marker=options.suffix))
+            start_tree_file = os.path.join(options.out_dir,
+                                           PATH_MARKER_START_TREE.format(prefix=options.prefix,
+                                                                         marker=options.suffix))
+            constraints_file = os.path.join(options.out_dir,
+                                            PATH_MARKER_CONSTRAINTS.format(prefix=options.prefix,
+                                                                           marker=options.suffix))
         else:
             output_tree = os.path.join(options.out_dir,
                                        PATH_UNROOTED_TREE.format(prefix=options.prefix))
@@ -432,12 +511,67 @@ class OptionsParser(object):
                                     PATH_TREE_LOG.format(prefix=options.prefix))
             fasttree_log = os.path.join(options.out_dir,
                                         PATH_FASTTREE_LOG.format(prefix=options.prefix))
+            msa_digests_file = os.path.join(options.out_dir,
+                                            PATH_MSA_DIGESTS.format(prefix=options.prefix))
+            start_tree_file = os.path.join(options.out_dir,
+                                           PATH_START_TREE.format(prefix=options.prefix))
+            constraints_file = os.path.join(options.out_dir,
+                                            PATH_CONSTRAINTS.format(prefix=options.prefix))
+
+        start_tree = getattr(options, 'start_tree', None)
+        start_msa = getattr(options, 'start_msa', None)
+        constraint_tree = getattr(options, 'constraint_tree', None)
+        infer_step.start_tree = start_tree
+        infer_step.constraint_tree = constraint_tree
+        for path in (start_tree, start_msa, constraint_tree):
+            if path:
+                check_file_exists(path)
+
+        # The tree is not inferred again if the MSA and options are unchanged.
+        msa_digests = IncrementalInfer.msa_digests(options.msa_file)
+        checkpoint_key = f'infer/{os.path.basename(output_tree)}'
+        fingerprint = input_fingerprint([options.prot_model, options.no_support, options.gamma,
+                                         output_tree, sorted(msa_digests.items())],
+                                        stat_paths=[x for x in (start_tree, start_msa, constraint_tree) if x])
+        if self.stage_logger.get_checkpoint(checkpoint_key, fingerprint):
+            self.logger.info(f'The MSA is unchanged since the previous run, using '
+                             f'the existing tree: {output_tree}')
+        else:
+            make_sure_path_exists(os.path.dirname(output_tree))
+            incremental = IncrementalInfer()
+
+            # Start from a previous tree, only placing the new or changed taxa.
+            if start_tree:
+                previous_digests = None
+                if start_msa and start_msa.endswith('.tsv'):
+                    previous_digests = IncrementalInfer.read_digests(start_msa)
+                elif start_msa:
+                    previous_digests = IncrementalInfer.msa_digests(start_msa)
+                n_kept, n_added, n_removed = incremental.write_start_tree(
+                    start_tree, options.msa_file, start_tree_file, msa_digests, previous_digests)
+                self.logger.info(f'Starting from {start_tree}: {n_kept:,} taxa kept, '
+                                 f'{n_added:,} added, and {n_removed:,} removed.')
+            else:
+                start_tree_file = None
 
-        fasttree = FastTree()
-        fasttree.run(output_tree, tree_log, fasttree_log, options.prot_model,
-                      options.no_support, options.gamma, options.msa_file,
-                      options.cpus)
-        self.logger.info(f'FastTree version: {fasttree.version}')
+            # Constrain the taxonomic splits of a reference tree.
+            if constraint_tree:
+                n_splits = incremental.write_constraints(constraint_tree, msa_digests,
+                                                         constraints_file)
+                self.logger.info(f'Constraining {n_splits:,} splits of {constraint_tree}.')
+            else:
+                constraints_file = None
+
+            fasttree = FastTree()
+            fasttree.run(output_tree, tree_log, fasttree_log, options.prot_model,
+                          options.no_support, options.gamma, options.msa_file,
+                          options.cpus, start_tree=start_tree_file,
+                          constraints=constraints_file, refine_local=start_tree_file is not None)
+            self.logger.info(f'FastTree version: {fasttree.version}')
+
+            IncrementalInfer.write_digests(msa_digests, msa_digests_file)
+            self.stage_logger.add_checkpoint(checkpoint_key, fingerprint,
+                                             output_files=[output_tree, msa_digests_file])
 
         if hasattr(options, 'subparser_name') and options.subparser_name == 'infer':
             symlink_f(output_tree[len(options.out_dir.rstrip('/')) + 1:],
@@ -449,6 +583,7 @@ class OptionsParser(object):
         #we round the duration to the nearest second
         infer_step.duration = str(duration - timedelta(microseconds=duration.microseconds))
         infer_step.status = 'completed'
+        infer_step.telemetry = infer_span.stop().to_dict()
 
         self.stage_logger.steps.append(infer_step)
 
@@ -472,6 +607,9 @@ class OptionsParser(object):
         GTDBTkTestFailure
             If the test fails.
         """
+        from tqdm import tqdm
+
+        from gtdbtk.files.classify_summary import ClassifySummaryFileAR53
 
         # Use a temporary directory if none is supplied.
         if options.out_dir:
@@ -544,9 +682,12 @@ class OptionsParser(object):
         options : argparse.Namespace
             The CLI arguments input by the user.
         """
+        from gtdbtk.classify import Classify
+        from gtdbtk.files.stage_logger import ANIScreenStep, ClassifyStep
 
         classify_step = ClassifyStep()
         classify_step.starts_at = datetime.now()
+        classify_span = Span(classify_step.name).start()
         classify_step.output_dir = options.out_dir
         classify_step.debug_option = options.debug
         classify_step.full_tree = options.full_tree
@@ -583,7 +724,8 @@ class OptionsParser(object):
                                               options.batchfile,
                                               options.extension)
 
-        classify = Classify(options.cpus, options.pplacer_cpus, options.min_af,options.skip_pplacer)
+        classify = Classify(options.cpus, options.pplacer_cpus, options.min_af,options.skip_pplacer,
+                            options.pplacer_max_memory)
         reports = classify.run(genomes=genomes,
                      align_dir=options.align_dir,
                      out_dir=options.out_dir,
@@ -609,6 +751,7 @@ class OptionsParser(object):
         #we round the duration to the nearest second
         classify_step.duration = str(duration - timedelta(microseconds=duration.microseconds))
         classify_step.status = 'completed'
+        classify_step.telemetry = classify_span.stop().to_dict()
 
         self.stage_logger.steps.append(classify_step)
 
@@ -633,9 +776,12 @@ class OptionsParser(object):
         options : argparse.Namespace
             The CLI arguments input by the user.
         """
+        from gtdbtk.ani_screen import ANIScreener
+        from gtdbtk.files.stage_logger import ANIScreenStep
 
         ani_step = ANIScreenStep()
         ani_step.starts_at = datetime.now()
+        ani_span = Span(ani_step.name).start()
         ani_step.output_dir = options.out_dir
         ani_step.mash_db = options.mash_db
         ani_step.mash_k = options.mash_k
@@ -684,6 +830,7 @@ class OptionsParser(object):
         #we round the duration to the nearest second
         ani_step.duration = str(duration - timedelta(microseconds=duration.microseconds))
         ani_step.status = 'completed'
+        ani_step.telemetry = ani_span.stop().to_dict()
         ani_step.output_files=reports
 
         self.stage_logger.steps.append(ani_step)
@@ -704,6 +851,8 @@ class OptionsParser(object):
         options : argparse.Namespace
             The CLI arguments input by the user.
         """
+        from gtdbtk.misc import Misc
+
         if options.reference_mask in ['bac', 'arc']:
             mask_type = "reference"
             mask_id = options.reference_mask
@@ -723,6 +872,9 @@ class OptionsParser(object):
         options : argparse.Namespace
             The CLI arguments input by the user.
         """
+        from gtdbtk.model.enum import Domain
+        from gtdbtk.pipeline.export_msa import export_msa
+
         # Get and validate the domain
         user_domain = getattr(options, 'domain', None)
         if user_domain == 'arc':
@@ -737,8 +889,27 @@ class OptionsParser(object):
         if not user_output:
             raise GTDBTkExit(f'You must specify a valid path: "{user_output}"')
 
+        # Get the mask, if the columns are to be masked
+        mask_file = getattr(options, 'mask_file', None)
+        if getattr(options, 'apply_reference_mask', False):
+            if mask_file is not None:
+                raise GTDBTkExit('The --mask_file and --apply_reference_mask options '
+                                 'cannot be used together.')
+            mask_file = os.path.join(CONFIG.MASK_DIR, CONFIG.MASK_AR53 if domain is Domain.ARCHAEA
+                                     else CONFIG.MASK_BAC120)
+        if mask_file is not None:
+            check_file_exists(mask_file)
+        genome_list = getattr(options, 'genome_list', None)
+        if genome_list is not None:
+            check_file_exists(genome_list)
+
         # Export the MSA
-        export_msa(domain=domain, output_file=user_output)
+        n_genomes = export_msa(domain=domain, output_file=user_output,
+                               taxa_filter=getattr(options, 'taxa_filter', None),
+                               genome_list=genome_list, mask_file=mask_file,
+                               cpus=getattr(options, 'cpus', 1))
+        if n_genomes is not None:
+            self.logger.info(f'Exported {n_genomes:,} genomes to: {user_output}')
         self.logger.info('Done.')
 
     def root(self, options: argparse.Namespace):
@@ -749,13 +920,21 @@ class OptionsParser(object):
         options : argparse.Namespace
             The CLI arguments input by the user.
         """
+        from gtdbtk.files.stage_logger import RootStep
+        from gtdbtk.reroot_tree import RerootTree
 
         root_step = RootStep()
         root_step.starts_at = datetime.now()
+        root_span = Span(root_step.name).start()
 
 
         check_file_exists(options.input_tree)
-        assert_outgroup_taxon_valid(options.outgroup_taxon)
+        # Several candidate outgroups may be given, the best is used.
+        outgroup_taxa = [x.strip() for x in options.outgroup_taxon.split(',') if x.strip()]
+        if len(outgroup_taxa) == 0:
+            assert_outgroup_taxon_valid(None)
+        for outgroup_taxon in outgroup_taxa:
+            assert_outgroup_taxon_valid(outgroup_taxon)
 
         root_step.outgroup_taxon = options.outgroup_taxon
 
@@ -767,21 +946,23 @@ class OptionsParser(object):
         taxonomy = self._read_taxonomy_files(options)
 
         self.logger.info(f'Identifying genomes from the specified outgroup: {options.outgroup_taxon}')
-        outgroup = set()
+        outgroups = {outgroup_taxon: set() for outgroup_taxon in outgroup_taxa}
         for genome_id, taxa in taxonomy.items():
-            if options.outgroup_taxon in taxa:
-                outgroup.add(genome_id)
+            for taxon in taxa:
+                if taxon in outgroups:
+                    outgroups[taxon].add(genome_id)
 
         reroot = RerootTree()
-        reports = reroot.root_with_outgroup(options.input_tree,
-                                  options.output_tree,
-                                  outgroup)
+        reports, _ = reroot.root_with_best_outgroup(options.input_tree,
+                                                    options.output_tree,
+                                                    outgroups)
 
         root_step.ends_at = datetime.now()
         duration = root_step.ends_at - root_step.starts_at
         #we round the duration to the nearest second
         root_step.duration = str(duration - timedelta(microseconds=duration.microseconds))
         root_step.status = 'completed'
+        root_step.telemetry = root_span.stop().to_dict()
 
         # if self.stage_logger exists, we add the step to the stage_logger
         if hasattr(self, 'stage_logger'):
@@ -797,9 +978,12 @@ class OptionsParser(object):
         options : argparse.Namespace
             The CLI arguments input by the user.
         """
+        from gtdbtk.decorate import Decorate
+        from gtdbtk.files.stage_logger import DecorateStep
 
         decorate_step = DecorateStep()
         decorate_step.starts_at = datetime.now()
+        decorate_span = Span(decorate_step.name).start()
 
         check_file_exists(options.input_tree)
 
@@ -845,6 +1029,7 @@ class OptionsParser(object):
         #we round the duration to the nearest second
         decorate_step.duration = str(duration - timedelta(microseconds=duration.microseconds))
         decorate_step.status = 'completed'
+        decorate_step.telemetry = decorate_span.stop().to_dict()
         decorate_step.output_files=reports
 
         if hasattr(self, 'stage_logger'):
@@ -860,13 +1045,16 @@ class OptionsParser(object):
         ReferenceFileMalformed
             If one or more reference files are malformed.
         """
+        from gtdbtk.misc import Misc
+
         self.logger.info("Running install verification")
         misc = Misc()
-        misc.check_install(options.db_version)
+        misc.check_install(options.db_version, options.cpus)
         self.logger.info('Done.')
 
     def infer_ranks(self, options):
         """Establish taxonomic ranks of internal nodes using RED."""
+        from gtdbtk.infer_ranks import InferRanks
 
         check_file_exists(options.input_tree)
 
@@ -885,6 +1073,8 @@ class OptionsParser(object):
         options : argparse.Namespace
             The CLI arguments input by the user.
         """
+        from gtdbtk.ani_rep import ANIRep
+
         make_sure_path_exists(options.out_dir)
 
         genomes, _ = self._genomes_to_process(options.genome_dir,
@@ -892,11 +1082,69 @@ class OptionsParser(object):
                                               options.extension)
 
         ani_rep = ANIRep(options.cpus)
+        if options.cluster:
+            ani_rep.run_cluster(genomes, options.no_mash, options.mash_d, options.out_dir,
+                                options.prefix, options.mash_k, options.mash_v, options.mash_s,
+                                options.min_af, options.cluster_ani, options.cluster_method)
+            self.logger.info('Done.')
+            return
         ani_rep.run(genomes, options.no_mash, options.mash_d, options.out_dir, options.prefix,
                     options.mash_k, options.mash_v, options.mash_s, options.min_af, options.mash_db)
 
         self.logger.info('Done.')
 
+    def merge(self, options):
+        """Merge the output of classify_wf run on each shard of the genomes.
+
+        Parameters
+        ----------
+        options : argparse.Namespace
+            The CLI arguments input by the user.
+        """
+        from gtdbtk.files.stage_logger import MergeStep
+        from gtdbtk.merge import ShardMerger
+
+        merge_step = MergeStep()
+        merge_step.starts_at = datetime.now()
+        merge_span = Span(merge_step.name).start()
+        merge_step.shard_dirs = options.shard_dirs
+
+        make_sure_path_exists(options.out_dir)
+
+        merger = ShardMerger(options.shard_dirs)
+        reports = merger.run(options.out_dir, options.prefix)
+
+        # The merged output has the provenance of the shards.
+        self.stage_logger.shard_inputs = merger.shard_log.get('shard_inputs')
+        self.stage_logger.options = merger.shard_log.get('options')
+
+        merge_step.ends_at = datetime.now()
+        duration = merge_step.ends_at - merge_step.starts_at
+        merge_step.duration = str(duration - timedelta(microseconds=duration.microseconds))
+        merge_step.status = 'completed'
+        merge_step.telemetry = merge_span.stop().to_dict()
+        merge_step.shard_steps = merger.shard_steps
+        merge_step.output_files = reports
+        self.stage_logger.steps.append(merge_step)
+
+        self.logger.info('Done.')
+
+    def serve(self, options):
+        """Run the classify_wf jobs sent to a Unix socket, loading the
+        reference data once for all jobs.
+
+        Parameters
+        ----------
+        options : argparse.Namespace
+            The CLI arguments input by the user.
+        """
+        from gtdbtk.serve import GTDBTkServer
+
+        server = GTDBTkServer(options.socket, options.max_jobs, options.cpus, options.mash_db)
+        server.preload()
+        server.serve_forever()
+        self.logger.info('Done.')
+
     def convert_to_itol(self, options):
         """Convert Tree to iTOL format.
 
@@ -905,6 +1153,8 @@ class OptionsParser(object):
         options : argparse.Namespace
             The CLI arguments input by the user.
         """
+        from gtdbtk.misc import Misc
+
         check_file_exists(options.input_tree)
 
         r = Misc()
@@ -919,6 +1169,8 @@ class OptionsParser(object):
         options : argparse.Namespace
             The CLI arguments input by the user.
         """
+        from gtdbtk.misc import Misc
+
         check_file_exists(options.input_tree)
 
         r = Misc()
@@ -933,6 +1185,7 @@ class OptionsParser(object):
         options : argparse.Namespace
             The CLI arguments input by the user.
         """
+        from gtdbtk.misc import Misc
 
         check_file_exists(options.input_tree)
 
@@ -947,6 +1200,7 @@ class OptionsParser(object):
             out_dir : str
                 The output directory.
         """
+        from gtdbtk.misc import Misc
 
         misc = Misc()
         misc.remove_intermediate_files(out_dir,workflow_name)
@@ -975,6 +1229,14 @@ class OptionsParser(object):
                 'You cannot use less than 1 CPU, defaulting to 1.')
             options.cpus = 1
 
+        # All third-party programs share the CPUs and memory available.
+        init_governor(getattr(options, 'cpus', 1), get_memory_limit_gb())
+
+        # Summary tables are written as TSV unless a columnar format is requested.
+        if getattr(options, 'table_format', 'tsv') != 'tsv':
+            from gtdbtk.files.columnar import set_table_format
+            set_table_format(options.table_format)
+
         if options.subparser_name == 'de_novo_wf':
             check_dependencies(['prodigal', 'hmmalign'])
             check_dependencies(['FastTree' + ('MP' if options.cpus > 1 else '')])
@@ -1085,6 +1347,15 @@ class OptionsParser(object):
             check_dependencies(['prodigal', 'hmmalign', 'pplacer', 'guppy',
                                 'fastANI'])
 
+            if options.shard:
+                self._init_shard(options)
+                genomes, _ = self._genomes_to_process(options.genome_dir,
+                                                      options.batchfile,
+                                                      options.extension)
+                if len(genomes) == 0:
+                    self._classify_empty_shard(options)
+                    return 0
+
             if options.write_single_copy_genes and not options.keep_intermediates:
                 self.logger.warning('--write_single_copy_genes flag is set to True,'
                                     ' but --keep_intermediates is set to False. '
@@ -1112,6 +1383,8 @@ class OptionsParser(object):
             if os.path.isfile(self.stage_logger.path):
                 #If the file exists, we need to check if the ani_screen step has been ran
                 #If the ani_screen step has been ran, we need to skip it.
+                from gtdbtk.classify import Classify
+                from gtdbtk.files.stage_logger import ANIScreenStep
                 self.stage_logger.read_existing_steps()
                 if self.stage_logger.has_stage(ANIScreenStep):
                     # we get the genomes already classified by the ani_screen step
@@ -1211,6 +1484,12 @@ class OptionsParser(object):
             self.infer_ranks(options)
         elif options.subparser_name == 'ani_rep':
             self.ani_rep(options)
+        elif options.subparser_name == 'merge':
+            self.merge(options)
+        elif options.subparser_name == 'serve':
+            check_dependencies(['prodigal', 'hmmalign', 'pplacer', 'guppy',
+                                'fastANI'])
+            self.serve(options)
         elif options.subparser_name == 'remove_labels':
             self.remove_labels(options)
         elif options.subparser_name == 'convert_to_itol':
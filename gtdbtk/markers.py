@@ -40,7 +40,9 @@ from gtdbtk.files.marker.tophit import TopHitPfamFile, TopHitTigrFile
 from gtdbtk.files.marker_info import MarkerInfoFileAR53, MarkerInfoFileBAC120
 from gtdbtk.files.prodigal.tln_table import TlnTableFile
 from gtdbtk.files.prodigal.tln_table_summary import TlnTableSummaryFile
+from gtdbtk.files.stage_logger import StageLogger, input_fingerprint
 from gtdbtk.pipeline import align
+from gtdbtk.telemetry import span
 from gtdbtk.tools import merge_two_dicts, symlink_f, tqdm_log
 from gtdbtk.trim_msa import TrimMSA
 
@@ -192,6 +194,18 @@ class Markers(object):
             out_dir, PATH_FAILS.format(prefix=prefix))
         reports.setdefault('all',[]).append(self.failed_genomes)
 
+        # The results of a previous run are only resumed for unchanged genomes.
+        stage_logger = StageLogger()
+        fingerprints = dict()
+        for gid, gpath in genomes.items():
+            fingerprints[gid] = input_fingerprint([(tln_tables or {}).get(gid), genes],
+                                                  stat_paths=[gpath])
+            checkpoint = stage_logger.checkpoints.get(f'identify/{gid}')
+            if checkpoint is not None and checkpoint.fingerprint != fingerprints[gid]:
+                self.logger.info(f'Genome {gid} has changed since the previous run, '
+                                 f'its markers will be identified again.')
+                shutil.rmtree(os.path.join(self.marker_gene_dir, gid), ignore_errors=True)
+
         if not genes:
             prodigal = Prodigal(self.cpus,
                                 self.failed_genomes,
@@ -202,7 +216,8 @@ class Markers(object):
                                 force)
             self.logger.log(
                 CONFIG.LOG_TASK, f'Running Prodigal {prodigal.version} to identify genes.')
-            genome_dictionary = prodigal.run(genomes, tln_tables)
+            with span('prodigal', genomes=len(genomes)):
+                genome_dictionary = prodigal.run(genomes, tln_tables)
 
         else:
             self.logger.info(
@@ -233,7 +248,8 @@ class Markers(object):
                                     self.tigrfam_top_hit_suffix,
                                     self.checksum_suffix,
                                     self.marker_gene_dir)
-        tigr_search.run(gene_files)
+        with span('hmmsearch', db='tigrfam', genomes=len(gene_files)):
+            tigr_search.run(gene_files)
 
         self.logger.log(CONFIG.LOG_TASK, 'Identifying Pfam protein families.')
         pfam_search = PfamSearch(self.cpus,
@@ -243,7 +259,8 @@ class Markers(object):
                                  self.pfam_top_hit_suffix,
                                  self.checksum_suffix,
                                  self.marker_gene_dir)
-        pfam_search.run(gene_files)
+        with span('pfam_search', genomes=len(gene_files)):
+            pfam_search.run(gene_files)
         self.logger.info(
             f'Annotations done using HMMER {tigr_search.version}.')
 
@@ -252,6 +269,15 @@ class Markers(object):
         reports = self._report_identified_marker_genes(genome_dictionary, out_dir, prefix,
                                              write_single_copy_genes,reports)
 
+        # Record the genomes which have been processed, so they can be resumed.
+        for gid, info in genome_dictionary.items():
+            stage_logger.add_checkpoint(f'identify/{gid}', fingerprints[gid],
+                                        output_files=[info['aa_gene_path'],
+                                                      TopHitTigrFile.get_path(self.marker_gene_dir, gid),
+                                                      TopHitPfamFile.get_path(self.marker_gene_dir, gid)],
+                                        flush=False)
+        stage_logger.flush_checkpoints()
+
         return reports
 
     def _path_to_identify_data(self, identity_dir, warn=True):
@@ -357,7 +383,7 @@ class Markers(object):
             for aa_char, aa_count in zip(masked_seq_unique[0], masked_seq_unique[1]):
                 masked_seq_counts[aa_char.decode('utf-8')] = aa_count
 
-            masked_seq = list_masked_seq.tostring().decode('utf-8')
+            masked_seq = list_masked_seq.tobytes().decode('utf-8')
 
             valid_bases = list_masked_seq.shape[0] - \
                 masked_seq_counts['.'] - masked_seq_counts['-']
@@ -579,8 +605,9 @@ class Markers(object):
             gtdb_msa_mask = os.path.join(CONFIG.MASK_DIR, mask_file)
 
             # Generate the user MSA.
-            user_msa = align.align_marker_set(
-                cur_genome_files, marker_info_file, copy_number_f, self.cpus)
+            with span('hmmalign', marker_set=marker_set_id, genomes=len(cur_genome_files)):
+                user_msa = align.align_marker_set(
+                    cur_genome_files, marker_info_file, copy_number_f, self.cpus)
 
 
             # tmp_gids = bac_gids.difference(set(user_msa.keys()))
@@ -0,0 +1,193 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import json
+import logging
+import os
+from typing import Dict, List, Tuple
+
+from gtdbtk.config.output import PATH_AR53_SUMMARY_OUT, PATH_BAC120_SUMMARY_OUT
+from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.files.classify_summary import ClassifySummaryFile, ClassifySummaryFileAR53, \
+    ClassifySummaryFileBAC120
+from gtdbtk.files.columnar import TABLE_FORMATS, table_path
+from gtdbtk.files.missing_genomes import DisappearingGenomesFile, DisappearingGenomesFileAR53, \
+    DisappearingGenomesFileBAC120
+from gtdbtk.files.pplacer_classification import PplacerClassifyFile, PplacerClassifyFileAR53, \
+    PplacerClassifyFileBAC120
+from gtdbtk.tools import parse_shard, symlink_f
+
+# Options which may differ between the shards of a run, as they only affect
+# where (or how quickly) the output is written, not what is written.
+SHARD_LOCAL_OPTIONS = frozenset({'out_dir', 'shard', 'genome_dir', 'batchfile', 'mash_db',
+                                 'cpus', 'pplacer_cpus', 'pplacer_max_memory', 'scratch_dir',
+                                 'tmpdir', 'debug', 'keep_intermediates',
+                                 'write_single_copy_genes'})
+
+# The stage log entries which must be the same for every shard.
+_SHARED_KEYS = ('version', 'database_version', 'shard_inputs')
+
+_MARKER_SETS = (('bac120', PATH_BAC120_SUMMARY_OUT, ClassifySummaryFileBAC120,
+                 PplacerClassifyFileBAC120, DisappearingGenomesFileBAC120),
+                ('ar53', PATH_AR53_SUMMARY_OUT, ClassifySummaryFileAR53,
+                 PplacerClassifyFileAR53, DisappearingGenomesFileAR53))
+
+
+def read_shard_log(shard_dir: str) -> Dict:
+    """Returns the stage log (gtdbtk.json) of an output directory."""
+    path = os.path.join(shard_dir, 'gtdbtk.json')
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError) as e:
+        raise GTDBTkExit(f'Unable to read the stage log {path}: {e}')
+
+
+class ShardMerger(object):
+    """Combine the output of classify_wf run on each shard of the genomes.
+
+    The shards are validated before anything is written: each shard must have
+    completed the classify step, every shard from 1 to N must be present once,
+    and the GTDB-Tk version, reference data, options and input genomes must be
+    the same for all shards. A shard with none of the genomes completes the
+    classify step without writing a summary, and is merged as empty.
+    """
+
+    def __init__(self, shard_dirs: List[str]):
+        self.logger = logging.getLogger('timestamp')
+        self.shards = self._validate(shard_dirs)
+        self.shard_log = self.shards[0][1]
+
+    @staticmethod
+    def _validate(shard_dirs: List[str]) -> List[Tuple[str, Dict]]:
+        """Returns the directory and stage log of each shard, in shard order."""
+        shards = dict()
+        first_dir, first_log, n_shards = None, None, None
+        for shard_dir in shard_dirs:
+            log = read_shard_log(shard_dir)
+            if log.get('shard') is None:
+                raise GTDBTkExit(f'The output was not created by classify_wf '
+                                 f'with --shard: {shard_dir}')
+            shard_idx, cur_n_shards = parse_shard(log['shard'])
+            if not any(step.get('name') == 'classify' and step.get('status') == 'completed'
+                       for step in log.get('steps') or ()):
+                raise GTDBTkExit(f'The classify step of shard {log["shard"]} has '
+                                 f'not completed: {shard_dir}')
+
+            if first_log is None:
+                first_dir, first_log, n_shards = shard_dir, log, cur_n_shards
+            elif cur_n_shards != n_shards:
+                raise GTDBTkExit(f'The genomes of {shard_dir} were split into '
+                                 f'{cur_n_shards} shards, not {n_shards}.')
+            if shard_idx in shards:
+                raise GTDBTkExit(f'Shard {log["shard"]} is in both {shards[shard_idx][0]} '
+                                 f'and {shard_dir}.')
+            for key in _SHARED_KEYS:
+                if log.get(key) != first_log.get(key):
+                    raise GTDBTkExit(f'The {key} of {shard_dir} ({log.get(key)}) differs '
+                                     f'from {first_dir} ({first_log.get(key)}).')
+            options, first_options = log.get('options') or {}, first_log.get('options') or {}
+            differs = sorted(k for k in set(options) | set(first_options)
+                             if options.get(k) != first_options.get(k))
+            if differs:
+                raise GTDBTkExit(f'The options of {shard_dir} differ from {first_dir}: '
+                                 f'{", ".join(differs)}')
+            shards[shard_idx] = (shard_dir, log)
+
+        missing = sorted(set(range(1, n_shards + 1)) - set(shards))
+        if missing:
+            raise GTDBTkExit(f'The output of {len(missing)} of {n_shards} shards is missing: '
+                             f'{", ".join(f"{i}/{n_shards}" for i in missing)}')
+        return [shards[i] for i in sorted(shards)]
+
+    @property
+    def shard_steps(self) -> Dict[str, List[Dict]]:
+        """The steps run by each shard, from their stage logs."""
+        return {log['shard']: log.get('steps') or [] for _, log in self.shards}
+
+    def _shard_summary(self, shard_dir: str, path: str) -> str:
+        """Returns the path of the summary table of a shard, in whichever
+        format it was written, or None if it has no genomes of the domain."""
+        for fmt in TABLE_FORMATS:
+            cur_path = os.path.join(shard_dir, table_path(path, fmt))
+            if os.path.isfile(cur_path):
+                return cur_path
+        return None
+
+    def run(self, out_dir: str, prefix: str) -> Dict[str, List[str]]:
+        """Merge the summaries and classification files of each shard.
+
+        Parameters
+        ----------
+        out_dir : str
+            The directory to write the merged output to.
+        prefix : str
+            The prefix of the merged output files.
+
+        Returns
+        -------
+        Dict[str, List[str]]
+            The merged files written for each marker set.
+        """
+        if os.path.realpath(out_dir) in {os.path.realpath(d) for d, _ in self.shards}:
+            raise GTDBTkExit(f'The output directory cannot be one of the shards: {out_dir}')
+        shard_prefix = self.shard_log['options'].get('prefix', prefix)
+        output_files = dict()
+        for marker_set_id, path_summary, summary_cls, pplacer_cls, disappearing_cls in _MARKER_SETS:
+            summary_file = summary_cls(out_dir, prefix)
+            pplacer_file = pplacer_cls(out_dir, prefix)
+            disappearing_file = disappearing_cls(out_dir, prefix)
+
+            for shard_dir, _ in self.shards:
+                path = self._shard_summary(shard_dir, path_summary.format(prefix=shard_prefix))
+                if path is not None:
+                    shard_summary = ClassifySummaryFile(path)
+                    shard_summary.read()
+                    for gid in sorted(shard_summary.rows):
+                        summary_file.add_row(shard_summary.rows[gid])
+
+                path = pplacer_cls(shard_dir, shard_prefix).path
+                if os.path.isfile(path):
+                    shard_pplacer = PplacerClassifyFile(path)
+                    shard_pplacer.read()
+                    for gid, tax_str in shard_pplacer.data.items():
+                        pplacer_file.add_genome(gid, tax_str)
+
+                path = disappearing_cls(shard_dir, shard_prefix).path
+                if os.path.isfile(path):
+                    shard_disappearing = DisappearingGenomesFile(path, disappearing_file.domain)
+                    shard_disappearing.read()
+                    for gid, tree_index in shard_disappearing.data.items():
+                        disappearing_file.add_genome(gid, tree_index)
+
+            if not summary_file.has_row():
+                continue
+            summary_file.write()
+            symlink_f(table_path(path_summary.format(prefix=prefix)),
+                      os.path.join(out_dir, os.path.basename(table_path(path_summary.format(prefix=prefix)))))
+            output_files[marker_set_id] = [summary_file.path]
+            self.logger.info(f'Merged the {marker_set_id} summary of {len(self.shards)} '
+                             f'shards: {summary_file.path}')
+
+            if len(pplacer_file.data) > 0:
+                pplacer_file.write()
+                output_files[marker_set_id].append(pplacer_file.path)
+            if len(disappearing_file.data) > 0:
+                disappearing_file.data = dict(sorted(disappearing_file.data.items()))
+                disappearing_file.write()
+                output_files[marker_set_id].append(disappearing_file.path)
+        return output_files
@@ -20,9 +20,6 @@ import os
 
 import shutil
 
-import dendropy
-
-from gtdbtk.biolib_lite.taxonomy import Taxonomy
 from gtdbtk.config.common import CONFIG
 from gtdbtk.biolib_lite.execute import check_dependencies
 from gtdbtk.biolib_lite.logger import colour
@@ -30,7 +27,7 @@ from gtdbtk.biolib_lite.newick import parse_label
 from gtdbtk.biolib_lite.seq_io import read_fasta
 from gtdbtk.config.output import DIR_CLASSIFY_INTERMEDIATE, DIR_ALIGN_INTERMEDIATE, DIR_IDENTIFY_INTERMEDIATE
 from gtdbtk.exceptions import GTDBTkException, GTDBTkExit
-from gtdbtk.tools import sha1_dir
+from gtdbtk.tools import sha1_dir, sha1_dirs
 
 
 class Misc(object):
@@ -119,6 +116,8 @@ class Misc(object):
             The path to the output Newick tree.
         """
 
+        import dendropy
+
         self.logger.info("Removing labels from tree {}".format(input_file))
         intree= dendropy.Tree.get_from_path(input_file,
                                            schema='newick',
@@ -142,6 +141,8 @@ class Misc(object):
             The path to the output Newick tree.
         """
 
+        import dendropy
+
         self.logger.info("Convert GTDB-Tk tree to iTOL format")
         intree= dendropy.Tree.get_from_path(input_file,
                                            schema='newick',
@@ -170,6 +171,9 @@ class Misc(object):
             The path to the output Newick tree.
         """
 
+        import dendropy
+        from gtdbtk.biolib_lite.taxonomy import Taxonomy
+
         self.logger.info("Convert GTDB-Tk tree...")
         intree= dendropy.Tree.get_from_path(input_file,
                                            schema='newick',
@@ -237,9 +241,16 @@ class Misc(object):
                 shutil.rmtree(intermediate_infer)
         self.logger.info('Intermediate files removed.')
 
-    def check_install(self,db_version):
+    def check_install(self, db_version, cpus=1):
         """Check that all reference files exist.
 
+        Parameters
+        ----------
+        db_version : int
+            The version of the reference package.
+        cpus : int
+            The number of directories to hash in parallel.
+
         Returns
         -------
         bool
@@ -270,10 +281,15 @@ class Misc(object):
         self.logger.info(f'Checking integrity of reference package: {CONFIG.GENERIC_PATH}')
         ref_hashes = CONFIG.get_REF_HASHES(db_version)
 
+        if cpus > 1:
+            user_hashes = sha1_dirs(list(ref_hashes), cpus, CONFIG.CACHE_DIR)
         for obj_path, expected_hash in ref_hashes.items():
             base_name = obj_path[:-1] if obj_path.endswith('/') else obj_path
             base_name = base_name.split('/')[-1]
-            user_hash = sha1_dir(obj_path, progress=True)
+            if cpus > 1:
+                user_hash = user_hashes[obj_path]
+            else:
+                user_hash = sha1_dir(obj_path, progress=True, cache_dir=CONFIG.CACHE_DIR)
 
             if user_hash != expected_hash:
                 self.logger.info("         |-- {:16} {}".format(
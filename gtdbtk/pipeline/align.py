@@ -1,12 +1,12 @@
 import logging
 import multiprocessing as mp
 import os
-import subprocess
 import tempfile
 from collections import defaultdict
 
 from gtdbtk.config.common import CONFIG
 from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.executor import ToolExecutor, ToolJob
 from gtdbtk.external.hmm_aligner import HmmAligner
 from gtdbtk.files.marker.copy_number import CopyNumberFile
 from gtdbtk.files.marker.tophit import TopHitPfamFile, TopHitTigrFile
@@ -135,33 +135,28 @@ def read_hmmalign_output(output, expected_gids):
     return out
 
 
-def run_hmm_align_worker(job):
-    """A worker process for running hmmalign.
+def parse_hmm_align_result(result):
+    """Extracts the aligned sequences from a finished hmmalign job.
 
     Parameters
     ----------
-    job : Tuple[str, str, str, frozenset]
-        The marker id, hmm marker path, called genes path, expected gids.
+    result : ToolResult
+        The hmmalign job, with the marker id and expected gids as the data.
 
     Returns
     -------
     List[Tuple[str, str, str]]
         A list containing the (genome id, marker id, sequence).
     """
-    marker_id, marker_path, marker_fa, expected_gids = job
-
-    # Run the process and capture stdout.
-    args = ["hmmalign", "--outformat", "Pfam", marker_path, marker_fa]
-    proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding='utf-8')
-    stdout, stderr = proc.communicate()
+    marker_id, expected_gids = result.job.data
 
     # Exit if an error was raised.
-    if proc.returncode != 0:
-        arg_str = ' '.join(args)
+    if not result.ok:
+        arg_str = ' '.join(result.job.args)
         raise GTDBTkExit(f'hmmalign returned a non-zero exit code: {arg_str}')
 
     # Process the output and return the sequences.
-    seqs = read_hmmalign_output(stdout, expected_gids)
+    seqs = read_hmmalign_output(result.stdout, expected_gids)
     return [(gid, marker_id, seq) for gid, seq in seqs.items()]
 
 
@@ -231,16 +226,15 @@ def align_marker_set(gid_dict, marker_info_file: MarkerInfoFile, copy_number_fil
         # Run hmmalign on all of the markers (in order of largest)
         hmmer_v = HmmAligner.get_version()
         logger.log(CONFIG.LOG_TASK, f'Aligning {len(marker_paths)} identified markers using hmmalign {hmmer_v}.')
-        queue = list()
+        jobs = list()
         for marker_id, marker_path in sorted(marker_paths.items(),
                                              key=lambda z: -marker_info_file.markers[z[0]]['size']):
-            queue.append((marker_id,
-                          marker_info_file.markers[marker_id]['path'],
-                          marker_path,
-                          frozenset(single_copy_hits[marker_id])))
-        with mp.Pool(processes=cpus) as pool:
-            results = list(tqdm_log(pool.imap_unordered(run_hmm_align_worker, queue),
-                                    total=len(queue), unit='marker'))
+            args = ['hmmalign', '--outformat', 'Pfam',
+                    marker_info_file.markers[marker_id]['path'], marker_path]
+            jobs.append(ToolJob(args, data=(marker_id, frozenset(single_copy_hits[marker_id]))))
+        results = [parse_hmm_align_result(result) for result in
+                   tqdm_log(ToolExecutor(max_running=cpus).run(jobs),
+                            total=len(jobs), unit='marker')]
 
     # Create the concatenated alignment.
     return create_concat_alignment(results, marker_info_file)
@@ -1,17 +1,105 @@
+import gzip
 import os
+import shutil
+import subprocess
+from contextlib import contextmanager
 from shutil import copyfile
+from typing import Optional, Set
+
+import numpy as np
 
 from gtdbtk.biolib_lite.common import make_sure_path_exists
+from gtdbtk.biolib_lite.seq_io import read_fasta_seq
 from gtdbtk.config.common import CONFIG
 from gtdbtk.exceptions import GTDBTkExit
 from gtdbtk.model.enum import Domain
+from gtdbtk.tools import get_gtdb_taxonomy_index
+
+
+def read_mask(mask_file: str) -> np.ndarray:
+    """Reads a mask of 0/1 characters, one per column of the MSA.
+
+    :param mask_file: The path to the mask.
+    :return: True for each column which is kept.
+    """
+    with open(mask_file) as fh:
+        mask_str = fh.readline().strip()
+    return np.frombuffer(mask_str.encode('ascii'), dtype='S1') == b'1'
+
+
+def read_genome_list(genome_list: str) -> Set[str]:
+    """Reads the genome ids in the first column of a file, one per line.
+
+    :param genome_list: The path to the genome list.
+    :return: The genome ids.
+    """
+    gids = set()
+    with open(genome_list) as fh:
+        for line in fh:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                gids.add(line.split('\t')[0])
+    if len(gids) == 0:
+        raise GTDBTkExit(f'No genome ids were found in the genome list: {genome_list}')
+    return gids
+
 
+def genomes_in_taxa(taxa_filter: str) -> Set[str]:
+    """Returns the reference genomes within any of the comma separated taxa.
 
-def export_msa(domain: Domain, output_file: str):
+    :param taxa_filter: A comma separated list of GTDB taxa.
+    :return: The genome ids.
+    """
+    taxonomy = get_gtdb_taxonomy_index()
+    gids = set()
+    for taxon in taxa_filter.split(','):
+        taxon = taxon.strip()
+        cur_gids = taxonomy.genomes(taxon)
+        if len(cur_gids) == 0:
+            raise GTDBTkExit(f'Taxon {taxon} was not found in the GTDB taxonomy.')
+        gids.update(cur_gids)
+    return gids
+
+
+@contextmanager
+def _open_output(output_file: str, cpus: int):
+    """Opens the output for writing bytes, gzip compressed if the path ends
+    with .gz. If pigz is available, it is used to compress with multiple CPUs.
+    """
+    if not output_file.endswith('.gz'):
+        with open(output_file, 'wb') as fh:
+            yield fh
+    elif cpus > 1 and shutil.which('pigz'):
+        with open(output_file, 'wb') as fh:
+            proc = subprocess.Popen(['pigz', '-p', str(cpus), '-c'],
+                                    stdin=subprocess.PIPE, stdout=fh)
+            try:
+                yield proc.stdin
+            finally:
+                proc.stdin.close()
+                if proc.wait() != 0:
+                    raise GTDBTkExit(f'pigz failed to compress the MSA: {output_file}')
+    else:
+        with gzip.open(output_file, 'wb', compresslevel=6) as fh:
+            yield fh
+
+
+def export_msa(domain: Domain, output_file: str, taxa_filter: Optional[str] = None,
+               genome_list: Optional[str] = None, mask_file: Optional[str] = None,
+               cpus: int = 1) -> Optional[int]:
     """Exports the GTDB MSA to the specified path.
 
+    Sequences are streamed one at a time, so filtering and masking the MSA
+    uses memory proportional to a single sequence. If no filters are given
+    and the output is not compressed, the MSA is copied as-is.
+
     :param domain: The domain used to determine the marker set.
-    :param output_file: The path to write the MSA.
+    :param output_file: The path to write the MSA, gzip compressed if it ends with .gz.
+    :param taxa_filter: Only export genomes within these comma separated taxa.
+    :param genome_list: Only export the genomes listed in this file.
+    :param mask_file: Only export the columns set to 1 in this mask.
+    :param cpus: The number of CPUs used to compress the output.
+    :return: The number of genomes exported, or None if the MSA was copied.
     """
     if domain is Domain.ARCHAEA:
         file_to_export = CONFIG.CONCAT_AR53
@@ -21,4 +109,31 @@ def export_msa(domain: Domain, output_file: str):
         raise GTDBTkExit(f'Unknown domain: "{domain}"')
 
     make_sure_path_exists(os.path.dirname(output_file))
-    copyfile(file_to_export, output_file)
+    if taxa_filter is None and genome_list is None and mask_file is None \
+            and not output_file.endswith('.gz'):
+        copyfile(file_to_export, output_file)
+        return None
+
+    # A genome must pass each of the filters given.
+    keep = None
+    if taxa_filter is not None:
+        keep = genomes_in_taxa(taxa_filter)
+    if genome_list is not None:
+        listed = read_genome_list(genome_list)
+        keep = listed if keep is None else keep & listed
+    mask = read_mask(mask_file) if mask_file is not None else None
+
+    n_written = 0
+    with _open_output(output_file, cpus) as fh:
+        for gid, seq in read_fasta_seq(file_to_export):
+            if keep is not None and gid not in keep:
+                continue
+            seq = seq.encode('ascii')
+            if mask is not None:
+                if len(mask) != len(seq):
+                    raise GTDBTkExit(f'Mask ({len(mask)}) and alignment ({len(seq)}) '
+                                     f'length do not match.')
+                seq = np.frombuffer(seq, dtype='S1')[mask].tobytes()
+            fh.write(b'>' + gid.encode('ascii') + b'\n' + seq + b'\n')
+            n_written += 1
+    return n_written
@@ -66,7 +66,7 @@ class RelativeDistance(object):
                 node.mean_dist = 0.0
                 node.num_taxa = 1
             else:
-                node.num_taxa = sum([1 for _ in node.leaf_iter()])
+                node.num_taxa = sum([c.num_taxa for c in node.child_node_iter()])
                 for c in node.child_node_iter():
                     num_tips = c.num_taxa
                     avg_div += (float(c.num_taxa) / node.num_taxa) * \
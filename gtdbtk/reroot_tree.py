@@ -16,13 +16,187 @@
 ###############################################################################
 
 import logging
-import random
-from typing import Set
+from typing import Dict, List, Optional, Set
 
 import dendropy
+import numpy as np
 
 from gtdbtk.exceptions import GTDBTkExit
 
+# The number of outgroups placed at the same time, which bounds the memory used.
+_PLACE_CHUNK = 64
+
+
+class OutgroupPlacement(object):
+    """The best edge to root a tree on for an outgroup."""
+
+    def __init__(self, outgroup: str, n_outgroup: int, node_idx: int, clade_size: int):
+        self.outgroup = outgroup
+        self.n_outgroup = n_outgroup  # the number of outgroup taxa in the tree
+        self.node_idx = node_idx  # the preorder index of the node below the edge
+        self.clade_size = clade_size  # the leaves on the outgroup side of the edge
+
+    @property
+    def intruders(self) -> int:
+        """The number of ingroup taxa on the outgroup side of the edge."""
+        return self.clade_size - self.n_outgroup
+
+    @property
+    def monophyletic(self) -> bool:
+        return self.intruders == 0
+
+
+class LeafIndex(object):
+    """The leaves of a tree numbered in preorder.
+
+    The leaves below each node are then a contiguous range of leaf numbers,
+    so the number of outgroup taxa on either side of every edge is found with
+    a single cumulative sum, rather than by rerooting the tree and finding the
+    MRCA of the outgroup. The MRCA of two leaves is the shallowest MRCA of
+    any two adjacent leaves between them, which is found with a sparse table.
+    """
+
+    def __init__(self, tree: dendropy.Tree):
+        self.nodes: List[dendropy.Node] = list(tree.preorder_node_iter())
+        self.leaf_rank: Dict[str, int] = dict()
+
+        n_nodes = len(self.nodes)
+        node_idx = {node: i for i, node in enumerate(self.nodes)}
+        self.parent = parent = np.full(n_nodes, -1, dtype=np.int64)
+        self.depth = np.zeros(n_nodes, dtype=np.int64)
+        self.start = np.zeros(n_nodes, dtype=np.int64)
+        self.end = np.zeros(n_nodes, dtype=np.int64)
+        for i, node in enumerate(self.nodes):
+            self.start[i] = len(self.leaf_rank)
+            if node.parent_node is not None:
+                parent[i] = node_idx[node.parent_node]
+                self.depth[i] = self.depth[parent[i]] + 1
+            if node.is_leaf():
+                self.leaf_rank[node.taxon.label] = len(self.leaf_rank)
+                self.end[i] = self.start[i] + 1
+
+        # Children follow their parent in preorder, so each range is complete
+        # before it is used to extend the range of the parent.
+        for i in range(n_nodes - 1, 0, -1):
+            if self.end[i] > self.end[parent[i]]:
+                self.end[parent[i]] = self.end[i]
+        self.n_leaves = len(self.leaf_rank)
+        self._mrca_table = None
+
+    def _build_mrca_table(self) -> List[np.ndarray]:
+        """Level k of the table holds the shallowest MRCA of each run of
+        2**k adjacent leaf pairs."""
+        # The first node in preorder starting at leaf r is the highest node
+        # on the path to that leaf, so its parent is the MRCA of leaves r-1, r.
+        starts, first = np.unique(self.start, return_index=True)
+        first_at = np.zeros(self.n_leaves, dtype=np.int64)
+        first_at[starts[starts < self.n_leaves]] = first[starts < self.n_leaves]
+        table = [self.parent[first_at[1:]]]
+        width = 1
+        while 2 * width <= len(table[0]):
+            prev = table[-1]
+            left, right = prev[:-width], prev[width:]
+            table.append(np.where(self.depth[left] <= self.depth[right], left, right))
+            width *= 2
+        return table
+
+    def mrca(self, labels_a: List[str], labels_b: List[str]) -> np.ndarray:
+        """Find the MRCA of each pair of leaves.
+
+        Parameters
+        ----------
+        labels_a : List[str]
+            The label of the first leaf of each pair.
+        labels_b : List[str]
+            The label of the second leaf of each pair.
+
+        Returns
+        -------
+        np.ndarray
+            The preorder index of the MRCA of each pair.
+        """
+        rank_a = np.array([self.leaf_rank[x] for x in labels_a], dtype=np.int64)
+        rank_b = np.array([self.leaf_rank[x] for x in labels_b], dtype=np.int64)
+        lo, hi = np.minimum(rank_a, rank_b), np.maximum(rank_a, rank_b)
+
+        # The MRCA of a leaf with itself is the leaf.
+        leaves = np.zeros(self.n_leaves, dtype=np.int64)
+        is_leaf = self.end - self.start == 1
+        leaves[self.start[is_leaf]] = np.nonzero(is_leaf)[0]
+        out = leaves[lo]
+
+        pairs = np.nonzero(lo < hi)[0]
+        if len(pairs) > 0:
+            if self._mrca_table is None:
+                self._mrca_table = self._build_mrca_table()
+            # Adjacent pairs lo..hi-1 are covered by two overlapping runs.
+            n_adjacent = hi[pairs] - lo[pairs]
+            level = np.floor(np.log2(n_adjacent)).astype(np.int64)
+            for k in np.unique(level):
+                cur = pairs[level == k]
+                left = self._mrca_table[k][lo[cur]]
+                right = self._mrca_table[k][hi[cur] - (1 << k)]
+                out[cur] = np.where(self.depth[left] <= self.depth[right], left, right)
+        return out
+
+    def place(self, outgroups: Dict[str, Set[str]]) -> Dict[str, Optional[OutgroupPlacement]]:
+        """Find the best root edge for each outgroup.
+
+        This is the edge which separates all of the outgroup taxa from the
+        fewest ingroup taxa, i.e. the outgroup side is the smallest lineage
+        containing the outgroup. If the outgroup is monophyletic this is the
+        edge above the outgroup clade.
+
+        Parameters
+        ----------
+        outgroups : Dict[str, Set[str]]
+            The labels of the taxa in each outgroup.
+
+        Returns
+        -------
+        Dict[str, Optional[OutgroupPlacement]]
+            The placement of each outgroup, None if no taxa are in the tree.
+        """
+        names = list(outgroups)
+        sizes = (self.end - self.start)[1:]  # the root has no edge
+        placements = dict()
+        for chunk_start in range(0, len(names), _PLACE_CHUNK):
+            chunk = names[chunk_start:chunk_start + _PLACE_CHUNK]
+
+            # present[r + 1, j] is 1 if the leaf of rank r is in outgroup j.
+            present = np.zeros((self.n_leaves + 1, len(chunk)), dtype=np.int32)
+            for j, name in enumerate(chunk):
+                ranks = [self.leaf_rank[x] for x in outgroups[name] if x in self.leaf_rank]
+                present[np.array(ranks, dtype=np.int64) + 1, j] = 1
+            cumsum = np.cumsum(present, axis=0)
+            n_outgroup = cumsum[-1]
+            below = cumsum[self.end[1:]] - cumsum[self.start[1:]]
+
+            # Either side of an edge can hold the outgroup.
+            no_side = self.n_leaves + 1
+            size_below = np.where(below == n_outgroup, sizes[:, None], no_side)
+            size_above = np.where(below == 0, self.n_leaves - sizes[:, None], no_side)
+            clade_size = np.minimum(size_below, size_above)
+            best = np.argmin(clade_size, axis=0)
+
+            for j, name in enumerate(chunk):
+                if n_outgroup[j] == 0:
+                    placements[name] = None
+                else:
+                    placements[name] = OutgroupPlacement(name, int(n_outgroup[j]), int(best[j]) + 1,
+                                                         int(clade_size[best[j], j]))
+        return placements
+
+
+def reroot_on_edge(tree: dendropy.Tree, node: dendropy.Node):
+    """Reroot a tree at the midpoint of the edge above a node."""
+    if node.edge_length is None:
+        tree.reroot_at_edge(node.edge)
+    else:
+        tree.reroot_at_edge(node.edge,
+                            length1=0.5 * node.edge_length,
+                            length2=0.5 * node.edge_length)
+
 
 class RerootTree(object):
     """Reroot tree."""
@@ -44,80 +218,80 @@ class RerootTree(object):
         outgroup
           Labels of taxa in outgroup.
         """
+        reports, _ = self.root_with_best_outgroup(input_tree, output_tree, {'outgroup': set(outgroup)})
+        return reports
+
+    def root_with_best_outgroup(self, input_tree: str, output_tree: str,
+                                outgroups: Dict[str, Set[str]]):
+        """Reroot the tree using the best of the candidate outgroups.
+
+        All candidates are placed in a single pass over the tree. The best is
+        the one whose root edge includes the fewest ingroup taxa on the
+        outgroup side (none if monophyletic), then the one with the most taxa
+        in the tree, then the first given.
+
+        Parameters
+        ----------
+        input_tree
+          File containing Newick tree to rerooted.
+        output_tree
+          Name of file for rerooted tree.
+        outgroups
+          Labels of taxa in each candidate outgroup.
 
+        Returns
+        -------
+        Tuple[Dict[str, List[str]], str]
+            The files written and the name of the outgroup used.
+        """
         tree = dendropy.Tree.get_from_path(input_tree,
                                            schema='newick',
                                            rooting='force-rooted',
                                            preserve_underscores=True)
 
-        outgroup = set(outgroup)
-        outgroup_in_tree = set()
-        ingroup_leaves = set()
-        for n in tree.leaf_node_iter():
-            if n.taxon.label in outgroup:
-                outgroup_in_tree.add(n.taxon)
-            else:
-                ingroup_leaves.add(n)
-
-        self.logger.info(f'Identified {len(outgroup_in_tree):,} outgroup taxa in the tree.')
-        self.logger.info(f'Identified {len(ingroup_leaves):,} ingroup taxa in the tree.')
+        leaf_index = LeafIndex(tree)
+        placements = leaf_index.place(outgroups)
+        if len(outgroups) > 1:
+            for name, placement in placements.items():
+                if placement is None:
+                    self.logger.info(f'Outgroup {name}: no taxa in the tree.')
+                else:
+                    self.logger.info(f'Outgroup {name}: {placement.n_outgroup:,} taxa, '
+                                     f'{placement.intruders:,} ingroup taxa in the outgroup lineage.')
 
-        if len(outgroup_in_tree) == 0:
+        order = {name: i for i, name in enumerate(outgroups)}
+        candidates = sorted((x for x in placements.values() if x is not None),
+                            key=lambda x: (x.intruders, -x.n_outgroup, order[x.outgroup]))
+        if len(candidates) == 0:
             self.logger.error('No outgroup taxa identified in the tree.')
             raise GTDBTkExit('Tree was not rerooted.')
+        best = candidates[0]
+        if len(outgroups) > 1:
+            self.logger.info(f'Selected outgroup: {best.outgroup}')
+
+        self.logger.info(f'Identified {best.n_outgroup:,} outgroup taxa in the tree.')
+        self.logger.info(f'Identified {leaf_index.n_leaves - best.n_outgroup:,} ingroup taxa in the tree.')
 
-        # Since finding the MRCA is a rooted tree operation,
-        # the tree is first rerooted on an ingroup taxa. This
-        # ensures the MRCA of the outgroup can be identified
-        # so long as the outgroup is monophyletic. If the
-        # outgroup is polyphyletic trying to root on it
-        # is ill defined. To try and pick a "good" root for
-        # polyphyletic outgroups, random ingroup taxa are
-        # selected until two of them give the same size
-        # lineage. This will, likely, be the smallest
-        # bipartition possible for the given outgroup though
-        # this is not guaranteed.
-        mrca = tree.mrca(taxa=outgroup_in_tree)
-        mrca_leaves = len(mrca.leaf_nodes())
-        while True:
-            rnd_ingroup = random.sample(ingroup_leaves, 1)[0]
-            tree.reroot_at_edge(rnd_ingroup.edge,
-                                length1=0.5 * rnd_ingroup.edge_length,
-                                length2=0.5 * rnd_ingroup.edge_length)
-
-            mrca = tree.mrca(taxa=outgroup_in_tree)
-            if len(mrca.leaf_nodes()) == mrca_leaves:
-                break
-
-            mrca_leaves = len(mrca.leaf_nodes())
-
-        if len(mrca.leaf_nodes()) != len(outgroup_in_tree):
+        if not best.monophyletic:
             self.logger.info('Outgroup is not monophyletic. Tree will be '
                              'rerooted at the MRCA of the outgroup.')
             self.logger.info(f'The outgroup consisted of '
-                             f'{len(outgroup_in_tree):,} taxa, while the MRCA '
-                             f'has {len(mrca.leaf_nodes()):,} leaf nodes.')
-            if len(mrca.leaf_nodes()) == len(tree.leaf_nodes()):
-                self.logger.warning('The MRCA spans all taxa in the tree.')
-                self.logger.warning('This indicating the selected outgroup is '
-                                    'likely polyphyletic in the current tree.')
-                self.logger.warning('Polyphyletic outgroups are not suitable '
-                                    'for rooting. Try another outgroup.')
+                             f'{best.n_outgroup:,} taxa, while the MRCA '
+                             f'has {best.clade_size:,} leaf nodes.')
         else:
             self.logger.info('Outgroup is monophyletic.')
 
-        if mrca.edge_length is None:
+        node = leaf_index.nodes[best.node_idx]
+        if node.parent_node is tree.seed_node and len(tree.seed_node.child_nodes()) == 2:
             self.logger.info('Tree appears to already be rooted on this outgroup.')
         else:
             self.logger.info('Rerooting tree.')
-            tree.reroot_at_edge(mrca.edge,
-                                length1=0.5 * mrca.edge_length,
-                                length2=0.5 * mrca.edge_length)
-            tree.write_to_path(output_tree, schema='newick',
-                               suppress_rooting=True, unquoted_underscores=True)
-            self.logger.info(f'Rerooted tree written to: {output_tree}')
-
-        return {'all':[output_tree]}
+            reroot_on_edge(tree, node)
+        tree.write_to_path(output_tree, schema='newick',
+                           suppress_rooting=True, unquoted_underscores=True)
+        self.logger.info(f'Rerooted tree written to: {output_tree}')
+
+        return {'all': [output_tree]}, best.outgroup
 
     def midpoint(self, input_tree, output_tree):
         """Reroot tree bat midpoint.
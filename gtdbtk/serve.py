@@ -0,0 +1,440 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+"""Keep the GTDB-Tk reference data loaded and run classify_wf jobs.
+
+The server listens on a Unix socket, each request is a single line of JSON
+which is answered with a single line of JSON:
+
+    {"command": "submit", "cwd": "/data", "args": ["classify_wf", "--genome_dir", "genomes", "--out_dir", "out"]}
+    {"command": "status"}
+    {"command": "status", "job_id": 1}
+    {"command": "shutdown"}
+
+The reference data (metadata, taxonomy, reference genomes and radii) are
+loaded once by the server. Each job runs in a process forked from a launcher,
+a single-threaded process forked from the server before it starts any threads,
+so it starts with this data already in memory. At most --max_jobs jobs run at
+the same time, each with at most --cpus CPUs. The third-party programs of all
+jobs share one set of --cpus CPUs (see gtdbtk.governor), so the server never
+runs more than --cpus of their threads at once. Jobs without --mash_db or
+--skip_ani_screen use the Mash sketch of the server (--mash_db).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from datetime import datetime
+from multiprocessing.connection import Connection
+from typing import Dict, List, Optional, Tuple
+
+from gtdbtk.biolib_lite.taxonomy import Taxonomy
+from gtdbtk.cli import get_main_parser
+from gtdbtk.config.common import CONFIG
+from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.governor import get_governor, keep_governor
+from gtdbtk.tools import get_gtdb_taxonomy_index, get_reference_manifest
+
+# Options whose values are paths, these are made absolute using the cwd of the request.
+_PATH_OPTIONS = ('--genome_dir', '--batchfile', '--out_dir', '--mash_db', '--tmpdir', '--scratch_dir')
+
+_MAX_REQUEST_BYTES = 1048576
+
+
+def _absolute_paths(argv: List[str], cwd: str) -> List[str]:
+    """Returns the arguments with any relative paths made relative to cwd."""
+    out, args = list(), iter(argv)
+    for arg in args:
+        opt, eq, value = arg.partition('=')
+        if eq and opt in _PATH_OPTIONS:
+            arg = f'{opt}={os.path.join(cwd, os.path.expanduser(value))}'
+        elif arg in _PATH_OPTIONS:
+            out.append(arg)
+            arg = next(args, None)
+            if arg is None:
+                break
+            arg = os.path.join(cwd, os.path.expanduser(arg))
+        out.append(arg)
+    return out
+
+
+def send_request(socket_path: str, request: Dict, timeout: float = 60) -> Dict:
+    """Send a request to a server and return the response.
+
+    Parameters
+    ----------
+    socket_path : str
+        The path to the Unix socket of the server.
+    request : Dict
+        The request, e.g. {'command': 'status'}.
+    timeout : float
+        The number of seconds to wait for a response.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(request) + '\n').encode())
+        with sock.makefile('rb') as fh:
+            return json.loads(fh.readline())
+
+
+class Job(object):
+    """A classify_wf job submitted to the server."""
+
+    def __init__(self, job_id: int, argv: List[str], cwd: str, out_dir: str):
+        self.job_id = job_id
+        self.argv = argv
+        self.cwd = cwd
+        self.out_dir = out_dir
+        self.state = 'queued'
+        self.submitted_at = datetime.now().isoformat(timespec='seconds')
+        self.started_at = None
+        self.ended_at = None
+        self.exit_code = None
+
+    def progress(self) -> Optional[str]:
+        """Returns the last line written to the log of the job."""
+        try:
+            with open(os.path.join(self.out_dir, 'gtdbtk.log'), 'rb') as fh:
+                fh.seek(max(0, os.fstat(fh.fileno()).st_size - 4096))
+                lines = fh.read().decode(errors='replace').splitlines()
+        except OSError:
+            return None
+        return lines[-1] if lines else None
+
+    def to_dict(self) -> Dict:
+        return {'job_id': self.job_id, 'state': self.state, 'args': self.argv,
+                'cwd': self.cwd, 'out_dir': self.out_dir,
+                'submitted_at': self.submitted_at, 'started_at': self.started_at,
+                'ended_at': self.ended_at, 'exit_code': self.exit_code,
+                'progress': self.progress()}
+
+
+class GTDBTkServer(object):
+    """Run classify_wf jobs sent to a Unix socket, with the reference data loaded once."""
+
+    def __init__(self, socket_path: str, max_jobs: int = 1, cpus: int = 1,
+                 mash_db: Optional[str] = None):
+        """Initialise the server.
+
+        Parameters
+        ----------
+        socket_path : str
+            The path of the Unix socket to listen on.
+        max_jobs : int
+            The maximum number of jobs to run at the same time.
+        cpus : int
+            The maximum number of CPUs used by each job.
+        mash_db : Optional[str]
+            The Mash reference sketch used by jobs which do not specify one.
+        """
+        self.logger = logging.getLogger('timestamp')
+        self.socket_path = socket_path
+        self.max_jobs = max(1, max_jobs)
+        self.cpus = max(1, cpus)
+        self.mash_db = None
+        if mash_db:
+            # A trailing separator is kept, as it marks a directory to create.
+            self.mash_db = os.path.abspath(mash_db) + ('/' if mash_db.endswith('/') else '')
+        self.jobs: Dict[int, Job] = dict()
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._parse_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sock = None
+        self._ctx = multiprocessing.get_context('fork')
+
+    def preload(self):
+        """Load the reference data used by every job."""
+        self.logger.info('Loading the GTDB-Tk reference data.')
+        self.logger.info(f'Using GTDB-Tk reference data version {CONFIG.VERSION_DATA}')
+        get_reference_manifest()
+        get_gtdb_taxonomy_index()
+        for canonical_ids in (False, True):
+            Taxonomy().keep_resident(CONFIG.TAXONOMY_FILE, canonical_ids)
+
+        # The modules (and dependencies) imported by classify_wf.
+        import gtdbtk.ani_screen  # noqa: F401
+        import gtdbtk.classify  # noqa: F401
+        import gtdbtk.files.stage_logger  # noqa: F401
+        import gtdbtk.markers  # noqa: F401
+
+    def _bind(self):
+        """Listen on the socket, replacing the socket of a server which has exited."""
+        if os.path.exists(self.socket_path):
+            try:
+                send_request(self.socket_path, {'command': 'status'}, timeout=5)
+            except (OSError, ValueError):
+                os.remove(self.socket_path)
+            else:
+                raise GTDBTkExit(f'A server is already listening on: {self.socket_path}')
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Only the user running the server can submit jobs.
+        umask = os.umask(0o177)
+        try:
+            self._sock.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        self._sock.listen()
+        self._sock.settimeout(1)
+
+    def serve_forever(self):
+        """Accept requests until a shutdown request (or an interrupt) is
+        received, running jobs are completed before returning.
+
+        This must be called before any other threads are started, as the
+        launcher which forks the jobs is forked from this process.
+        """
+        self._bind()
+
+        # Forking a multi-threaded process may copy a lock held by another
+        # thread, so the jobs are forked by a (single-threaded) launcher. It
+        # is started before the threads, with the governor shared by the jobs.
+        get_governor()
+        pipes = [self._ctx.Pipe() for _ in range(self.max_jobs)]
+        launcher = self._ctx.Process(target=self._launcher, args=(pipes,), name='gtdbtk-launcher')
+        launcher.start()
+        for _, launcher_conn in pipes:
+            launcher_conn.close()
+
+        workers = [threading.Thread(target=self._worker, args=(conn,), daemon=True) for conn, _ in pipes]
+        for worker in workers:
+            worker.start()
+        self.logger.info(f'Listening for jobs on: {self.socket_path}')
+
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn, _ = self._sock.accept()
+                except socket.timeout:
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            self._stop.set()
+            self._sock.close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            while True:
+                try:
+                    self._queue.get_nowait().state = 'cancelled'
+                except queue.Empty:
+                    break
+            for _ in workers:
+                self._queue.put(None)
+            self.logger.info('Waiting for running jobs to complete.')
+            for worker in workers:
+                worker.join()
+            for conn, _ in pipes:
+                conn.close()
+            launcher.join()
+
+    def _handle(self, conn: socket.socket):
+        """Answer a single request."""
+        with conn:
+            conn.settimeout(60)
+            try:
+                with conn.makefile('rb') as fh:
+                    request = json.loads(fh.readline(_MAX_REQUEST_BYTES))
+                if not isinstance(request, dict):
+                    raise GTDBTkExit('The request must be a JSON object.')
+                response = self.handle_request(request)
+            except (ValueError, GTDBTkExit) as e:
+                response = {'ok': False, 'error': str(e)}
+            try:
+                conn.sendall((json.dumps(response) + '\n').encode())
+            except OSError:
+                pass
+
+    def handle_request(self, request: Dict) -> Dict:
+        """Returns the response to a request."""
+        command = request.get('command')
+        if command == 'submit':
+            job = self.submit(request.get('args'), request.get('cwd'))
+            return {'ok': True, 'job': job.to_dict()}
+        elif command == 'status':
+            with self._lock:
+                jobs = list(self.jobs.values())
+            if request.get('job_id') is None:
+                return {'ok': True, 'jobs': [job.to_dict() for job in jobs]}
+            job = self.jobs.get(request['job_id'])
+            if job is None:
+                raise GTDBTkExit(f'Unknown job: {request["job_id"]}')
+            return {'ok': True, 'job': job.to_dict()}
+        elif command == 'shutdown':
+            self.logger.info('Shutdown requested.')
+            self._stop.set()
+            return {'ok': True}
+        raise GTDBTkExit(f'Unknown command: {command}')
+
+    def _parse(self, argv: List[str]) -> argparse.Namespace:
+        """Parse the arguments of a job, raising GTDBTkExit if invalid."""
+        stderr, tempdir = io.StringIO(), tempfile.tempdir
+        with self._parse_lock:
+            try:
+                with contextlib.redirect_stderr(stderr):
+                    return get_main_parser().parse_args(argv)
+            except (SystemExit, argparse.ArgumentTypeError) as e:
+                lines = stderr.getvalue().strip().splitlines()
+                raise GTDBTkExit(f'Invalid arguments: {lines[-1] if lines else e}')
+            finally:
+                # The arguments are parsed again by the job (e.g. --tmpdir).
+                tempfile.tempdir = tempdir
+
+    def submit(self, argv: List[str], cwd: Optional[str] = None) -> Job:
+        """Queue a classify_wf job.
+
+        Parameters
+        ----------
+        argv : List[str]
+            The command line arguments, starting with classify_wf.
+        cwd : Optional[str]
+            The directory which relative paths are relative to.
+        """
+        if not isinstance(argv, list) or not all(isinstance(x, str) for x in argv) \
+                or argv[:1] != ['classify_wf']:
+            raise GTDBTkExit('Only classify_wf jobs can be submitted, e.g. '
+                             '{"command": "submit", "args": ["classify_wf", ...]}')
+        if cwd is None or not os.path.isabs(cwd):
+            raise GTDBTkExit('The request must include the absolute path of the working directory (cwd).')
+
+        argv = _absolute_paths(argv, cwd)
+        if self.mash_db and not any(x.split('=')[0] in ('--mash_db', '--skip_ani_screen') for x in argv):
+            argv += ['--mash_db', self.mash_db]
+        args = self._parse(argv)
+        if args.cpus > self.cpus:
+            argv += ['--cpus', str(self.cpus)]
+
+        with self._lock:
+            if self._stop.is_set():
+                raise GTDBTkExit('The server is shutting down.')
+            out_dir = os.path.realpath(args.out_dir)
+            if any(job.out_dir == out_dir and job.state in ('queued', 'running')
+                   for job in self.jobs.values()):
+                raise GTDBTkExit(f'A job is already writing to: {args.out_dir}')
+            job = Job(len(self.jobs) + 1, argv, cwd, out_dir)
+            self.jobs[job.job_id] = job
+        self._queue.put(job)
+        self.logger.info(f'Job {job.job_id} queued: {" ".join(argv)}')
+        return job
+
+    def _worker(self, conn: Connection):
+        """Run queued jobs, one at a time, until stopped. Each job is sent to
+        the launcher, which replies with its exit code."""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                job.state = 'running'
+                job.started_at = datetime.now().isoformat(timespec='seconds')
+            self.logger.info(f'Job {job.job_id} started.')
+
+            try:
+                conn.send(job)
+                exit_code = conn.recv()
+            except (EOFError, OSError):
+                self.logger.error('The job launcher has exited.')
+                exit_code = None
+
+            with self._lock:
+                job.exit_code = exit_code
+                job.state = 'completed' if exit_code == 0 else 'failed'
+                job.ended_at = datetime.now().isoformat(timespec='seconds')
+            self.logger.info(f'Job {job.job_id} {job.state}.')
+
+    def _launcher(self, pipes: List[Tuple[Connection, Connection]]):
+        """Fork a process for each job sent by a worker, and reply with its
+        exit code once it has finished. Runs until every worker has closed
+        its connection and the jobs have finished."""
+        # An interrupt stops the server, which waits for the running jobs.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        self._sock.close()
+        conns = list()
+        for worker_conn, conn in pipes:
+            worker_conn.close()
+            conns.append(conn)
+
+        running = dict()
+        while conns or running:
+            if conns:
+                ready = multiprocessing.connection.wait(conns, timeout=0.1)
+            else:
+                ready = list()
+                time.sleep(0.1)
+            for conn in ready:
+                try:
+                    job = conn.recv()
+                except EOFError:
+                    conns.remove(conn)
+                    continue
+                pid = os.fork()
+                if pid == 0:
+                    for cur_conn in conns:
+                        cur_conn.close()
+                    self._fork_job(job)
+                running[pid] = conn
+
+            while running:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+                if pid == 0:
+                    break
+                try:
+                    running.pop(pid).send(os.waitstatus_to_exitcode(status))
+                except OSError:
+                    pass
+
+    def _fork_job(self, job: Job):
+        """Run a job in the process forked by the launcher, this never returns."""
+        exit_code = 1
+        try:
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            self._run_job(job)
+            exit_code = 0
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+    def _run_job(self, job: Job):
+        """Run a job, with the CPUs of the governor shared by all jobs."""
+        os.chdir(job.cwd)
+        sys.argv = ['gtdbtk'] + job.argv
+        for name in ('timestamp', 'no_timestamp', 'warnings'):
+            logging.getLogger(name).handlers.clear()
+        keep_governor()
+
+        from gtdbtk.__main__ import run
+        run(get_main_parser().parse_args(job.argv), silent=True)
@@ -21,13 +21,13 @@ import logging
 from gtdbtk.config.common import CONFIG
 from gtdbtk.biolib_lite.common import make_sure_path_exists
 from gtdbtk.biolib_lite.newick import parse_label
-from gtdbtk.biolib_lite.seq_io import read_fasta
+from gtdbtk.biolib_lite.seq_io import read_seq
 from gtdbtk.config.output import *
 from gtdbtk.exceptions import GenomeMarkerSetUnknown, GTDBTkExit
 from gtdbtk.files.classify_summary import ClassifySummaryFileRow
 from gtdbtk.files.pplacer_classification import PplacerHighClassifyRow, PplacerHighClassifyFile
 from gtdbtk.files.tree_mapping import GenomeMappingFileRow
-from gtdbtk.tools import TreeTraversal, standardise_taxonomy, aa_percent_msa
+from gtdbtk.tools import TreeTraversal, standardise_taxonomy
 
 class Split(object):
     """Determine taxonomic classification of genomes by ML placement using the Split Methods."""
@@ -72,7 +72,7 @@ class Split(object):
         red_bac_dict = CONFIG.RED_DIST_BAC_DICT
 
         # We get the pplacer taxonomy for comparison
-        user_genome_ids = set(read_fasta(user_msa_file).keys())
+        user_genome_ids = {seq_id for seq_id, _seq in read_seq(user_msa_file)}
         for leaf in tree.leaf_node_iter():
 
             is_on_terminal_branch = False
@@ -339,7 +339,7 @@ class Split(object):
         return ';'.join(term_branch_taxonomy[1:self.order_rank.index(closest_rank) + 1])
 
     def map_high_taxonomy(self,high_classification, mapping_dict, summary_file,
-                          tree_mapping_file,msa_dict,trans_table_dict,percent_multihit_dict,bac_ar_diff,warning_counter):
+                          tree_mapping_file,msa_stats,trans_table_dict,percent_multihit_dict,bac_ar_diff,warning_counter):
         mapped_rank = {}
         counter = 0
         high_taxonomy_used = {}
@@ -367,7 +367,7 @@ class Split(object):
                     summary_row.pplacer_tax = v.get('pplacer_tax')
                     summary_row.red_value = v.get('rel_dist')
                     summary_row.note = 'classification based on placement in backbone tree'
-                    summary_row.msa_percent = aa_percent_msa(msa_dict.get(summary_row.gid))
+                    summary_row.msa_percent = msa_stats.get_aa_percent(summary_row.gid)
                     summary_row.tln_table = trans_table_dict.get(summary_row.gid)
 
                     warnings = []
@@ -0,0 +1,215 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+"""Lightweight resource accounting for the stages of GTDB-Tk.
+
+Spans record the wall time, CPU time, peak memory and I/O of a block of
+code, including that of any child processes which have exited (e.g.
+pplacer, hmmsearch, and multiprocessing workers). Spans started within
+another span are nested, giving a timing tree for each stage.
+
+    with span('pplacer', tree='bac120'):
+        ...
+"""
+
+import json
+import os
+import resource
+import threading
+import time
+from functools import wraps
+from typing import Dict, List, Optional
+
+_local = threading.local()
+_lock = threading.Lock()
+_events: List[Dict] = list()
+_epoch = time.perf_counter()
+
+
+def _read_proc_io() -> Dict[str, int]:
+    """Returns the bytes read and written by this process (Linux only)."""
+    out = dict()
+    try:
+        with open('/proc/self/io') as fh:
+            for line in fh:
+                key, value = line.split(':')
+                if key in ('read_bytes', 'write_bytes'):
+                    out[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return out
+
+
+def _sample() -> Dict[str, float]:
+    """Returns the current resource usage of this process and its children."""
+    self_ru = resource.getrusage(resource.RUSAGE_SELF)
+    child_ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    out = {'wall': time.perf_counter(),
+           'cpu': self_ru.ru_utime + self_ru.ru_stime,
+           'children_cpu': child_ru.ru_utime + child_ru.ru_stime,
+           'max_rss_kb': self_ru.ru_maxrss,
+           'children_max_rss_kb': child_ru.ru_maxrss,
+           'children_read_bytes': child_ru.ru_inblock * 512,
+           'children_write_bytes': child_ru.ru_oublock * 512}
+    out.update(_read_proc_io())
+    return out
+
+
+def _stack() -> List['Span']:
+    if not hasattr(_local, 'stack'):
+        _local.stack = list()
+    return _local.stack
+
+
+class Span(object):
+    """The resource usage of a named block of code."""
+
+    def __init__(self, name: str, **attrs):
+        """Create a span, this is not measured until it is started.
+
+        Parameters
+        ----------
+        name : str
+            The name of the span, e.g. the stage or program.
+        attrs
+            Any attributes to record (e.g. the tree being placed into).
+        """
+        self.name = name
+        self.attrs = attrs
+        self.children: List[Span] = list()
+        self.parent: Optional[Span] = None
+        self._start: Optional[Dict[str, float]] = None
+        self._end: Optional[Dict[str, float]] = None
+
+    def start(self) -> 'Span':
+        """Start measuring, nested under the current span (if any)."""
+        stack = _stack()
+        if stack:
+            self.parent = stack[-1]
+            self.parent.children.append(self)
+        stack.append(self)
+        self._start = _sample()
+        return self
+
+    def stop(self) -> 'Span':
+        """Stop measuring, and record the span in the trace."""
+        self._end = _sample()
+        stack = _stack()
+        if self in stack:
+            # Remove this span and any that were not stopped within it.
+            del stack[stack.index(self):]
+        with _lock:
+            _events.append({'name': self.name,
+                            'ph': 'X',
+                            'ts': round((self._start['wall'] - _epoch) * 1e6),
+                            'dur': round((self._end['wall'] - self._start['wall']) * 1e6),
+                            'pid': os.getpid(),
+                            'tid': threading.get_ident(),
+                            'args': self.metrics()})
+        return self
+
+    def __enter__(self) -> 'Span':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.stop()
+
+    def _delta(self, key: str) -> Optional[float]:
+        if key not in self._start or key not in self._end:
+            return None
+        return self._end[key] - self._start[key]
+
+    def metrics(self) -> Dict[str, object]:
+        """Returns the resource usage of this span.
+
+        Peak memory is the high water mark of the process (or the largest
+        child process) at the end of the span, not only within it.
+        """
+        if self._start is None or self._end is None:
+            return dict(self.attrs)
+        out = dict(self.attrs)
+        out['wall_s'] = round(self._delta('wall'), 3)
+        out['cpu_s'] = round(self._delta('cpu'), 3)
+        out['children_cpu_s'] = round(self._delta('children_cpu'), 3)
+        out['max_rss_gb'] = round(self._end['max_rss_kb'] / 1e6, 3)
+        out['children_max_rss_gb'] = round(self._end['children_max_rss_kb'] / 1e6, 3)
+        for key in ('read_bytes', 'write_bytes', 'children_read_bytes', 'children_write_bytes'):
+            value = self._delta(key)
+            if value is not None:
+                out[key] = int(value)
+        return out
+
+    def to_dict(self) -> Dict[str, object]:
+        """Returns the timing tree rooted at this span."""
+        out = {'name': self.name}
+        out.update(self.metrics())
+        if self.children:
+            out['spans'] = [x.to_dict() for x in self.children]
+        return out
+
+
+def span(name: str, **attrs) -> Span:
+    """Create a span to be used as a context manager.
+
+    Parameters
+    ----------
+    name : str
+        The name of the span.
+    attrs
+        Any attributes to record.
+    """
+    return Span(name, **attrs)
+
+
+def traced(name: str):
+    """Decorate a function so each call is recorded as a span.
+
+    Parameters
+    ----------
+    name : str
+        The name of the span.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def write_chrome_trace(path: str):
+    """Write all completed spans as a Chrome trace (chrome://tracing).
+
+    Parameters
+    ----------
+    path : str
+        The path to write the trace to.
+    """
+    with _lock:
+        events = list(_events)
+    with open(path, 'w') as fh:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, fh)
+
+
+def reset():
+    """Discard all completed spans."""
+    with _lock:
+        _events.clear()
+    _stack().clear()
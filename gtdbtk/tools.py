@@ -5,19 +5,26 @@ from typing import Optional
 
 import math
 import os
+import queue
 import random
 import re
+import tempfile
+import threading
 import time
-import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from itertools import islice
 
-import dendropy
-from tqdm import tqdm
-
 from gtdbtk.config.common import CONFIG
 from gtdbtk.config.output import CHECKSUM_SUFFIX
 from gtdbtk.exceptions import GTDBTkExit
 
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
 order_rank = ["d__", "p__", "c__", "o__", 'f__', 'g__', 's__']
 ##################################################
 ############MISC UTILITIES########################
@@ -33,16 +40,35 @@ def get_reference_ids():
     frozenset
         An immutable set with short and long accessions (e.g. GB_GCA_ and GCA_).
     """
-    results = set()
-    with open(CONFIG.TAXONOMY_FILE) as tf:
-        for line in tf:
-            raw_id = line.split('\t')[0]
-            results.add(raw_id)
-            if raw_id[0:4] in ['GCF_', 'GCA_']:
-                results.add(add_ncbi_prefix(raw_id))
-            elif raw_id[0:3] in ['RS_', 'GB_']:
-                results.add(raw_id[3:])
-    return frozenset(results)
+    return get_reference_manifest().reference_ids
+
+
+@lru_cache(maxsize=1)
+def get_reference_manifest():
+    """Load the manifest of reference genomes, this is only read once.
+
+    Returns
+    -------
+    ReferenceManifest
+        The reference genome paths, radii, and representatives.
+    """
+    from gtdbtk.files.reference_manifest import ReferenceManifest
+    return ReferenceManifest(CONFIG.TAXONOMY_FILE, CONFIG.FASTANI_GENOME_LIST,
+                             CONFIG.RADII_FILE, CONFIG.FASTANI_DIR,
+                             CONFIG.FASTANI_GENOMES_EXT, CONFIG.CACHE_DIR)
+
+
+@lru_cache(maxsize=1)
+def get_gtdb_taxonomy_index():
+    """Load the indexed GTDB taxonomy, building the cached index on first use.
+
+    Returns
+    -------
+    TaxonomyIndex
+        A read-only mapping of genome id to taxonomy, with indexed lookups.
+    """
+    from gtdbtk.files.taxonomy_index import TaxonomyIndex
+    return TaxonomyIndex.from_file(CONFIG.TAXONOMY_FILE, CONFIG.CACHE_DIR)
 
 def get_ref_genomes():
     """Returns a dictionary of genome accession to genome path.
@@ -52,17 +78,16 @@ def get_ref_genomes():
     dict[str, str]
         Dict[genome_id] = fasta_path
     """
-    ref_genomes = dict()
-    with open(CONFIG.FASTANI_GENOME_LIST) as g_path_file:
-        for line in g_path_file:
-            (full_name, path) = line.strip().split()
-            if full_name.endswith(CONFIG.FASTANI_GENOMES_EXT):
-                accession = full_name.split(CONFIG.FASTANI_GENOMES_EXT)[0]
-            ref_genomes[accession] = os.path.join(CONFIG.FASTANI_DIR, path, full_name)
-    return ref_genomes
+    return dict(get_reference_manifest().genomes)
+
+# All single bytes which are not ASCII letters, removed when counting amino acids.
+_NON_ALPHA_BYTES = bytes(c for c in range(256) if not (65 <= c <= 90 or 97 <= c <= 122))
 
 def aa_percent_msa(aa_string):
-        aa_len = sum([1 for c in aa_string if c.isalpha()])
+        if aa_string.isascii():
+            aa_len = len(aa_string.encode('ascii').translate(None, _NON_ALPHA_BYTES))
+        else:
+            aa_len = sum([1 for c in aa_string if c.isalpha()])
         aa_perc = float(aa_len) / len(aa_string)
         return round(aa_perc * 100, 2)
 
@@ -129,6 +154,35 @@ def splitchunks_list(l, n):
         yield l[i:i + chunksize]
 
 
+def parse_shard(shard):
+    """Parse a shard of the form i/N, where 1 <= i <= N.
+
+    Parameters
+    ----------
+    shard : str
+        The shard, e.g. 2/10.
+
+    Returns
+    -------
+    Tuple[int, int]
+        The (1-based) index of the shard and the number of shards.
+    """
+    hit = re.match(r'^(\d+)/(\d+)$', shard.strip())
+    if not hit or not 1 <= int(hit.group(1)) <= int(hit.group(2)):
+        raise GTDBTkExit(f'The shard must be of the form i/N (e.g. 2/10) '
+                         f'where 1 <= i <= N: {shard}')
+    return int(hit.group(1)), int(hit.group(2))
+
+
+def in_shard(gid, shard_idx, n_shards):
+    """True if a genome belongs to a shard.
+
+    Genomes are assigned by the CRC32 of their id, so each genome is in the
+    same shard regardless of the order of the input or the machine.
+    """
+    return zlib.crc32(gid.encode()) % n_shards == shard_idx - 1
+
+
 def generateTempTableName():
     rng = random.SystemRandom()
     suffix = ''
@@ -151,15 +205,73 @@ def confirm(msg):
     return False
 
 
-def sha1_dir(path, progress):
+def _read_ahead(paths, block_size=1048576, max_blocks=64):
+    """Read the contents of files in order, in a background thread.
+
+    Parameters
+    ----------
+    paths : list[str]
+        The files to read.
+    block_size : int
+        The number of bytes per block.
+    max_blocks : int
+        The maximum number of blocks read ahead of the consumer.
+
+    Yields
+    ------
+    Tuple[int, bytes]
+        The index of the file in paths, and the next block of the file.
+    """
+    blocks = queue.Queue(maxsize=max_blocks)
+
+    def reader():
+        try:
+            for idx, path in enumerate(paths):
+                with open(path, 'rb') as fh:
+                    for buf in iter(lambda: fh.read(block_size), b''):
+                        blocks.put((idx, buf))
+            blocks.put(None)
+        except BaseException as e:
+            blocks.put(e)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    while True:
+        item = blocks.get()
+        if item is None:
+            break
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+    thread.join()
+
+
+def _dir_listing(path):
+    """Returns the sorted files within a path, and their size and mtime."""
+    files = list()
+    for root, dirs, names in os.walk(path):
+        for name in names:
+            path_file = os.path.join(root, name)
+            st = os.stat(path_file)
+            files.append((path_file, st.st_size, st.st_mtime_ns))
+    return sorted(files)
+
+
+def sha1_dir(path, progress, cache_dir=None):
     """Recursively add files found within the path and output a SHA1 hash.
 
+    The hash is computed over the contents of the files, in sorted order. If
+    a cache directory is given, the hash is only re-computed if the size or
+    modification time of any file has changed since it was cached.
+
     Parameters
     ----------
     path : str
         The path to traverse.
     progress : bool
         True if progress should be displayed to stdout, False otherwise.
+    cache_dir : Optional[str]
+        The directory to cache the hash in.
 
     Returns
     -------
@@ -170,43 +282,79 @@ def sha1_dir(path, progress):
         print('\r[{}]'.format(path), end='', flush=True)
 
     # Generate a queue of files to process
-    queue = list()
-    for root, dirs, files in os.walk(path):
-        for file in files:
-            path_file = os.path.join(root, file)
-            queue.append(path_file)
-    queue = sorted(queue)
+    listing = _dir_listing(path)
+    queue_files = [x[0] for x in listing]
+
+    # Use the cached hash if no file has changed
+    cache_path, cache_files = None, [[os.path.relpath(f, path), size, mtime] for f, size, mtime in listing]
+    if cache_dir is not None:
+        key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+        cache_path = os.path.join(cache_dir, f'sha1_dir_{key}.json')
+        try:
+            with open(cache_path) as fh:
+                cached = json.load(fh)
+            if cached['files'] == cache_files:
+                return cached['hash']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
 
     # Setup the hasher
-    block_size = 65536
     hasher = hashlib.sha1()
 
-    # Process the queue and obtain a single hash
-    for idx, cur_path in enumerate(queue):
-
-        if progress:
+    # Process the queue and obtain a single hash, files are read ahead of
+    # the hasher in a background thread.
+    last_idx = -1
+    for idx, buf in _read_ahead(queue_files):
+        if progress and idx != last_idx:
             print('\r[{}] - {}/{} files ({}%)'.format(path,
                                                       idx,
-                                                      len(queue),
-                                                      round(100 * (idx / len(queue)), 2)),
+                                                      len(queue_files),
+                                                      round(100 * (idx / len(queue_files)), 2)),
                   end='', flush=True)
-
-        # Add the hash of the file
-        with open(cur_path, 'rb') as fh:
-            buf = fh.read(block_size)
-            while len(buf) > 0:
-                hasher.update(buf)
-                buf = fh.read(block_size)
+            last_idx = idx
+        hasher.update(buf)
 
     if progress:
         print('\r' + ' ' * 100, end='', flush=True)
         print('\r', end='', flush=True)
 
-    return hasher.hexdigest()
+    digest = hasher.hexdigest()
+    if cache_path is not None:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix='.gtdbtk_sha1_', dir=cache_dir)
+            with os.fdopen(fd, 'w') as fh:
+                json.dump({'path': os.path.abspath(path), 'files': cache_files, 'hash': digest}, fh)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+    return digest
 
 
-def sha256(input_file):
-    """Determine SHA256 hash for file.
+def sha1_dirs(paths, cpus=1, cache_dir=None):
+    """Compute the SHA1 hash of multiple directories in parallel.
+
+    Parameters
+    ----------
+    paths : list[str]
+        The paths to traverse.
+    cpus : int
+        The maximum number of directories to hash at once.
+    cache_dir : Optional[str]
+        The directory to cache the hashes in.
+
+    Returns
+    -------
+    dict[str, str]
+        The SHA1 hash of each path.
+    """
+    with ThreadPoolExecutor(max_workers=max(cpus, 1)) as executor:
+        futures = {path: executor.submit(sha1_dir, path, False, cache_dir) for path in paths}
+        return {path: future.result() for path, future in futures.items()}
+
+
+def sha1_file(input_file):
+    """Determine the SHA1 hash for a file.
 
     Parameters
     ----------
@@ -215,7 +363,7 @@ def sha256(input_file):
     Returns
     -------
     str
-        SHA256 hash.
+        SHA1 hash.
     """
     block_size = 65536
     hasher = hashlib.sha1()
@@ -227,15 +375,80 @@ def sha256(input_file):
     return hasher.hexdigest()
 
 
-def file_has_checksum(file_path, checksum_suffix=CHECKSUM_SUFFIX):
+def sha256(input_file):
+    """Deprecated, this computes the SHA1 hash of a file (see sha1_file)."""
+    return sha1_file(input_file)
+
+
+def fast_file_hash(input_file, algorithm=None):
+    """Determine a non-cryptographic hash of the file contents.
+
+    Parameters
+    ----------
+    input_file : str
+        Name of file.
+    algorithm : Optional[str]
+        xxh3 (requires the xxhash package) or crc32, by default xxh3 if
+        available.
+
+    Returns
+    -------
+    Tuple[str, str]
+        The algorithm used and the hash.
+    """
+    if algorithm is None:
+        algorithm = 'xxh3' if xxhash is not None else 'crc32'
+    block_size = 1048576
+    with open(input_file, 'rb') as afile:
+        if algorithm == 'xxh3':
+            hasher = xxhash.xxh3_128()
+            for buf in iter(lambda: afile.read(block_size), b''):
+                hasher.update(buf)
+            return algorithm, hasher.hexdigest()
+        elif algorithm == 'crc32':
+            crc = 0
+            for buf in iter(lambda: afile.read(block_size), b''):
+                crc = zlib.crc32(buf, crc)
+            return algorithm, f'{crc:08x}'
+    raise ValueError(f'Unknown hash algorithm: {algorithm}')
+
+
+def write_checksum(file_path, checksum_suffix=CHECKSUM_SUFFIX):
+    """Write a checksum file recording the hash, size, modification time and
+    inode of a file, so that unchanged files can be checked without reading
+    them (see file_has_checksum).
+
+    Parameters
+    ----------
+    file_path : str
+        Name of the file to create a checksum for.
+    checksum_suffix : str
+        Suffix used to denote the file checksum.
+    """
+    algorithm, digest = fast_file_hash(file_path)
+    st = os.stat(file_path)
+    data = {'algorithm': algorithm, 'hash': digest, 'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns, 'inode': st.st_ino}
+    with open(file_path + checksum_suffix, 'w') as fh:
+        json.dump(data, fh)
+
+
+def file_has_checksum(file_path, checksum_suffix=CHECKSUM_SUFFIX, verify=False):
     """Check that the file contents match the checksum.
 
+    A file is accepted without reading it if its size, modification time and
+    inode are those recorded in the checksum, otherwise the contents are
+    hashed. Checksum files of a single SHA1 hash (older versions) are verified
+    by hashing the contents.
+
     Parameters
     ----------
     file_path : str
         Name of the file to check.
     checksum_suffix : str
         Suffix used to denote the file checksum.
+    verify : bool
+        Always hash the file contents, even if the file is unchanged.
 
     Returns
     -------
@@ -245,10 +458,24 @@ def file_has_checksum(file_path, checksum_suffix=CHECKSUM_SUFFIX):
 
     """
     check_path = file_path + checksum_suffix
-    if os.path.isfile(file_path) and os.path.isfile(check_path):
-        with open(check_path, 'r') as check_f:
-            return sha256(file_path) == check_f.read()
-    return False
+    if not os.path.isfile(file_path) or not os.path.isfile(check_path):
+        return False
+    with open(check_path, 'r') as check_f:
+        content = check_f.read()
+    if not content.startswith('{'):
+        return sha1_file(file_path) == content
+    try:
+        data = json.loads(content)
+        st = os.stat(file_path)
+        if st.st_size != data['size']:
+            return False
+        if not verify and st.st_mtime_ns == data['mtime_ns'] and st.st_ino == data['inode']:
+            return True
+        if data['algorithm'] == 'xxh3' and xxhash is None:
+            return False
+        return fast_file_hash(file_path, data['algorithm'])[1] == data['hash']
+    except (KeyError, TypeError, ValueError, OSError):
+        return False
 
 
 def symlink_f(src, dst, force=True):
@@ -278,6 +505,31 @@ def get_memory_gb():
         return None
 
 
+def get_memory_limit_gb():
+    """Returns the memory (GB) available to this process, taking into account
+    the available system memory and any cgroup (v1 or v2) memory limit.
+
+    Returns
+    -------
+    Optional[float]
+        The available memory in GB, or None if it could not be determined.
+    """
+    limits = list()
+    mem_gb = get_memory_gb()
+    if mem_gb is not None and 'MemAvailable' in mem_gb:
+        limits.append(mem_gb['MemAvailable'])
+    for path in ('/sys/fs/cgroup/memory.max',
+                 '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as fh:
+                value = fh.read().strip()
+            if value.isdigit() and int(value) < 2 ** 60:
+                limits.append(round(int(value) / 1e9, 2))
+        except OSError:
+            continue
+    return min(limits) if limits else None
+
+
 def get_proc_memory_gb(pid):
     virt, res = None, None
     try:
@@ -289,9 +541,54 @@ def get_proc_memory_gb(pid):
         return virt, res
 
 
-def get_gtdbtk_latest_version():
-    if not CONFIG.GTDBTK_VER_CHECK:
-        return None
+def has_network_route():
+    """Returns False if there is certainly no route to the internet, i.e. no
+    default IPv4 or IPv6 route (Linux only, otherwise True is returned)."""
+    tables = (('/proc/net/route', lambda x: x[1] == '00000000' and x[0] != 'lo'),
+              ('/proc/net/ipv6_route', lambda x: x[0] == '0' * 32 and x[1] == '00' and x[-1] != 'lo'))
+    found_table = False
+    for path, is_default in tables:
+        try:
+            with open(path) as fh:
+                found_table = True
+                for line in fh:
+                    cols = line.split()
+                    if len(cols) > 2 and is_default(cols):
+                        return True
+        except OSError:
+            continue
+    return not found_table
+
+
+def _read_latest_version_cache(path):
+    """Returns (True, version) if the cached latest version has not expired,
+    the version is None if the last request failed."""
+    try:
+        with open(path) as fh:
+            cached = json.load(fh)
+        ttl = CONFIG.GTDBTK_VER_CACHE_TTL if cached['version'] else CONFIG.GTDBTK_VER_RETRY_TTL
+        if 0 <= time.time() - cached['checked'] < ttl:
+            return True, cached['version']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return False, None
+
+
+def _write_latest_version_cache(path, version):
+    """Write the latest version (or None if the request failed) to the cache."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.latest_version_', dir=os.path.dirname(path))
+        with os.fdopen(fd, 'w') as fh:
+            json.dump({'version': version, 'checked': time.time()}, fh)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def _fetch_gtdbtk_latest_version():
+    """Request the latest version of GTDB-Tk from PyPI, or None on failure."""
+    import urllib.request
     try:
         resp = json.loads(urllib.request.urlopen('https://pypi.org/pypi/gtdbtk/json',
                                                  timeout=CONFIG.GTDBTK_VER_TIMEOUT).read().decode('utf-8'))
@@ -300,6 +597,45 @@ def get_gtdbtk_latest_version():
         return None
 
 
+def get_gtdbtk_latest_version(deadline=None):
+    """Returns the latest version of GTDB-Tk on PyPI, if it can be found quickly.
+
+    The version is cached for CONFIG.GTDBTK_VER_CACHE_TTL seconds. Otherwise,
+    it is requested in a background thread which is waited on for at most the
+    deadline, and not at all if there is no network route.
+
+    Parameters
+    ----------
+    deadline : Optional[float]
+        The maximum seconds to wait, by default CONFIG.GTDBTK_VER_DEADLINE.
+
+    Returns
+    -------
+    Optional[str]
+        The latest version, or None if it could not be determined in time.
+    """
+    if not CONFIG.GTDBTK_VER_CHECK:
+        return None
+    cache_path = os.path.join(CONFIG.CACHE_DIR, 'latest_version.json')
+    is_cached, version = _read_latest_version_cache(cache_path)
+    if is_cached:
+        return version
+    if not has_network_route():
+        return None
+
+    result = dict()
+
+    def request():
+        result['version'] = _fetch_gtdbtk_latest_version()
+        _write_latest_version_cache(cache_path, result['version'])
+
+    # A daemon thread, so a request that exceeds the deadline can not delay exit.
+    thread = threading.Thread(target=request, daemon=True)
+    thread.start()
+    thread.join(CONFIG.GTDBTK_VER_DEADLINE if deadline is None else deadline)
+    return result.get('version')
+
+
 class TreeTraversal(object):
     """Efficiently calculates leaf nodes of a given node without re-computing
     any information.
@@ -435,6 +771,7 @@ class tqdm_log(object):
         self.args = merged
 
         # Instantiate tqdm
+        from tqdm import tqdm
         self.tqdm = tqdm(iterable, **merged)
 
     def log(self):
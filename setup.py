@@ -45,6 +45,7 @@ setup(
             'gtdbtk = gtdbtk.__main__:main'
         ]
     },
+    extras_require={'columnar': ['pyarrow']},
     install_requires=["dendropy>=4.1.0", 'numpy>=1.9.0', 'tqdm>=4.35.0', 'pydantic'],
     license=meta['license'],
     long_description=readme(),
@@ -15,10 +15,12 @@
 #                                                                             #
 ###############################################################################
 
+import json
 import os
 import shutil
 import tempfile
 import unittest
+from unittest import mock
 
 import dendropy
 
@@ -27,6 +29,7 @@ from gtdbtk.biolib_lite.taxonomy import Taxonomy
 from gtdbtk.classify import Classify
 from gtdbtk.config.output import *
 from gtdbtk.files.pplacer_classification import PplacerClassifyFileAR53
+from gtdbtk.files.stage_logger import StageLogger
 
 
 class TestClassify(unittest.TestCase):
@@ -137,5 +140,54 @@ class TestClassify(unittest.TestCase):
         self.assertTrue(sum(egs2) / len(egs2) < 0.1)
 
 
+class TestFastANIBatches(unittest.TestCase):
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        StageLogger.instance = None
+        StageLogger().path = os.path.join(self.out_dir, 'gtdbtk.json')
+        self.classify = Classify.__new__(Classify)
+        self.classify.cpus = 1
+        self.d_paths = dict()
+        for gid in ('q1', 'q2', 'r1'):
+            self.d_paths[gid] = os.path.join(self.out_dir, f'{gid}.fna')
+            with open(self.d_paths[gid], 'w') as fh:
+                fh.write(f'>{gid}\nACGT\n')
+
+    def tearDown(self):
+        StageLogger.instance = None
+        shutil.rmtree(self.out_dir)
+
+    def test_run_fastani_batches(self):
+        d_compare = {'q1': {'r1'}, 'q2': {'r1'}}
+        fastani = mock.Mock()
+        fastani.run.side_effect = lambda batch, paths: {
+            gid: {'r1': {'ani': 99.0, 'af': 0.9}} for gid in batch}
+        expected = {'q1': {'r1': {'ani': 99.0, 'af': 0.9}},
+                    'q2': {'r1': {'ani': 99.0, 'af': 0.9}}}
+
+        with mock.patch.object(CONFIG, 'FASTANI_CHECKPOINT_GENOMES', 1):
+            out = self.classify._run_fastani_batches(fastani, d_compare, self.d_paths,
+                                                     'full', self.out_dir, 'gtdbtk')
+            self.assertEqual(expected, out)
+            self.assertEqual(2, fastani.run.call_count)
+
+            # Only the path of each batch is kept in the stage log.
+            with open(os.path.join(self.out_dir, 'gtdbtk.json')) as fh:
+                checkpoints = json.load(fh)['checkpoints']
+            path_q1 = os.path.join(self.out_dir, PATH_FASTANI_BATCH.format(
+                prefix='gtdbtk', unit='full', gid='q1'))
+            self.assertEqual([path_q1], checkpoints['fastani/full/q1']['output_files'])
+            self.assertIsNone(checkpoints['fastani/full/q1']['data'])
+
+            # Resumed batches are read from their file, a missing file is rerun.
+            os.remove(path_q1)
+            out = self.classify._run_fastani_batches(fastani, d_compare, self.d_paths,
+                                                     'full', self.out_dir, 'gtdbtk')
+            self.assertEqual(expected, out)
+            self.assertEqual(3, fastani.run.call_count)
+            self.assertEqual({'q1': {'r1'}}, fastani.run.call_args[0][0])
+
+
 if __name__ == '__main__':
     unittest.main()
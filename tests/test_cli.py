@@ -63,6 +63,7 @@ class TestCli(unittest.TestCase):
         self.options.scratch_dir = None
         self.options.keep_ref_red = None
         self.options.pplacer_cpus = None
+        self.options.pplacer_max_memory = None
         self.options.min_af = None
 
         # infer options
@@ -0,0 +1,71 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from gtdbtk.ani_cluster import ANIClusterFile, ANIGraph
+
+
+def _hit(ani, af):
+    return {'ani': ani, 'af': af}
+
+
+class TestANICluster(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+
+        # A chain of linked genomes: a - b - c - d, and e which is not linked.
+        self.genome_ids = ['a', 'b', 'c', 'd', 'e']
+        self.results = {'a': {'b': _hit(97.0, 0.8), 'c': _hit(94.0, 0.8)},
+                        'c': {'b': _hit(96.0, 0.7), 'd': _hit(98.0, 0.9)},
+                        'd': {'c': _hit(98.5, 0.85), 'e': _hit(99.0, 0.2)}}
+        self.graph = ANIGraph.from_results(self.genome_ids, self.results,
+                                           {('a', 'b'): 0.01})
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_tmp)
+
+    def test_from_results(self):
+        self.assertEqual(5, self.graph.n_edges)
+        self.assertEqual([0, 0, 1, 2, 3], self.graph.row.tolist())
+        self.assertEqual([1, 2, 2, 3, 4], self.graph.col.tolist())
+        self.assertEqual((98.5, 0.9), self.graph.get_edge(3, 2))
+        self.assertIsNone(self.graph.get_edge(0, 3))
+        self.assertEqual(0.01, self.graph.mash_dist[0])
+
+    def test_cluster_greedy(self):
+        rep = self.graph.cluster(95.0, 0.5, 'greedy')
+        self.assertEqual([1, 1, 1, 3, 4], rep.tolist())
+
+    def test_cluster_single(self):
+        rep = self.graph.cluster(95.0, 0.5, 'single')
+        self.assertEqual([1, 1, 1, 1, 4], rep.tolist())
+
+    def test_cluster_file(self):
+        rep = self.graph.cluster(95.0, 0.5, 'single')
+        cluster_file = ANIClusterFile(self.dir_tmp, 'prefix', self.graph, rep)
+        cluster_file.write()
+        with open(os.path.join(self.dir_tmp, 'prefix.ani_clusters.tsv')) as fh:
+            rows = [line.rstrip('\n').split('\t') for line in fh.readlines()[1:]]
+        self.assertEqual(['b', '0', 'b', '4', '100.0', '1.0'], rows[0])
+        self.assertEqual(['a', '0', 'b', '4', '97.0', '0.8'], rows[1])
+        self.assertEqual(['d', '0', 'b', '4', 'N/A', 'N/A'], rows[3])
+        self.assertEqual(['e', '1', 'e', '1', '100.0', '1.0'], rows[4])
@@ -20,6 +20,7 @@ import shutil
 import tempfile
 import unittest
 
+from gtdbtk.biolib_lite import taxonomy
 from gtdbtk.biolib_lite.taxonomy import Taxonomy
 from gtdbtk.exceptions import GTDBTkExit
 
@@ -72,3 +73,22 @@ class TestTaxonomy(unittest.TestCase):
                 f.write(f'{k},{";".join(v)}\n')
         t = Taxonomy()
         self.assertRaises(GTDBTkExit, t.read, path_tax)
+
+    def test_keep_resident(self):
+        path_tax = os.path.join(self.dir_tmp, 'tax_file.tsv')
+        with open(path_tax, 'w') as f:
+            f.write('1\td__D;p__P;c__C;o__O;f__F;g__G;s__S1\n')
+        t = Taxonomy()
+        t.keep_resident(path_tax)
+        try:
+            # Reads return a copy of the resident taxonomy.
+            result = t.read(path_tax)
+            result['1'][6] = 's__S2'
+            self.assertEqual('s__S1', t.read(path_tax)['1'][6])
+
+            # The file is read again once it has changed.
+            with open(path_tax, 'a') as f:
+                f.write('2\td__D;p__P;c__C;o__O;f__F;g__G;s__S2\n')
+            self.assertEqual(['1', '2'], sorted(t.read(path_tax)))
+        finally:
+            taxonomy._resident.clear()
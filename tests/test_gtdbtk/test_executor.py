@@ -0,0 +1,99 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.executor import ToolExecutor, ToolJob
+from gtdbtk.governor import ResourceGovernor
+
+
+class TestToolExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_tmp)
+
+    def test_run(self):
+        gov = ResourceGovernor(4)
+        jobs = [ToolJob(['sh', '-c', f'echo out{i}; echo err{i} >&2; exit {i % 2}'], data=i)
+                for i in range(6)]
+        results = {r.job.data: r for r in ToolExecutor(governor=gov).run(jobs)}
+        self.assertEqual(set(range(6)), set(results))
+        for i, result in results.items():
+            self.assertEqual(f'out{i}\n', result.stdout)
+            self.assertEqual(f'err{i}\n', result.stderr)
+            self.assertEqual(i % 2 == 0, result.ok)
+        self.assertRaises(GTDBTkExit, results[1].check)
+        self.assertEqual(4, gov.free_cpus)
+
+    def test_stdout_path(self):
+        path = os.path.join(self.dir_tmp, 'out.txt')
+        job = ToolJob(['echo', 'hello'], stdout_path=path)
+        result, = ToolExecutor(governor=ResourceGovernor(1)).run([job])
+        self.assertIsNone(result.check().stdout)
+        with open(path) as fh:
+            self.assertEqual('hello\n', fh.read())
+
+    def test_timeout(self):
+        job = ToolJob(['sleep', '10'], timeout=0.2)
+        start = time.perf_counter()
+        result, = ToolExecutor(governor=ResourceGovernor(1)).run([job])
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertTrue(result.timed_out)
+        self.assertRaises(GTDBTkExit, result.check)
+
+    def test_missing_program(self):
+        job = ToolJob([os.path.join(self.dir_tmp, 'missing')])
+        with self.assertRaises(GTDBTkExit):
+            list(ToolExecutor(governor=ResourceGovernor(1)).run([job]))
+
+    def test_on_line(self):
+        lines = list()
+        job = ToolJob(['sh', '-c', 'echo a; echo b >&2; echo c'])
+        executor = ToolExecutor(governor=ResourceGovernor(1),
+                                on_line=lambda j, name, line: lines.append((name, line)))
+        list(executor.run([job]))
+        self.assertEqual([('stdout', 'a\n'), ('stdout', 'c\n')],
+                         [x for x in lines if x[0] == 'stdout'])
+        self.assertIn(('stderr', 'b\n'), lines)
+
+    def test_governor_limits_running(self):
+        gov = ResourceGovernor(4)
+        jobs = [ToolJob(['sh', '-c', 'date +%s.%N; sleep 0.2; date +%s.%N'], cpus=2)
+                for _ in range(4)]
+        spans = [tuple(map(float, r.check().stdout.split()))
+                 for r in ToolExecutor(max_running=4, governor=gov).run(jobs)]
+        peak = max(sum(1 for s, e in spans if s <= t < e) for t, _ in spans)
+        self.assertEqual(2, peak)
+        self.assertEqual(4, gov.free_cpus)
+
+    def test_close_kills_running(self):
+        gov = ResourceGovernor(2)
+        jobs = [ToolJob(['sleep', '0']), ToolJob(['sleep', '30']), ToolJob(['sleep', '30'])]
+        start = time.perf_counter()
+        results = ToolExecutor(governor=gov).run(jobs)
+        next(results)
+        results.close()
+        self.assertLess(time.perf_counter() - start, 10)
+        self.assertEqual(2, gov.free_cpus)
@@ -0,0 +1,85 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from gtdbtk.biolib_lite.seq_io import read_fasta
+from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.files.taxonomy_index import TaxonomyIndex
+from gtdbtk.model.enum import Domain
+from gtdbtk.pipeline.export_msa import export_msa
+
+
+class TestExportMSA(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        self.msa = {'G1': 'ABCDEF', 'G2': 'GHIJKL', 'G3': 'MNOPQR'}
+        self.msa_file = os.path.join(self.dir_tmp, 'bac120.faa')
+        with open(self.msa_file, 'w') as fh:
+            for gid, seq in self.msa.items():
+                fh.write(f'>{gid}\n{seq}\n')
+        self.mask_file = os.path.join(self.dir_tmp, 'mask.txt')
+        with open(self.mask_file, 'w') as fh:
+            fh.write('101001\n')
+        self.genome_list = os.path.join(self.dir_tmp, 'genomes.txt')
+        with open(self.genome_list, 'w') as fh:
+            fh.write('G1\nG3\n')
+
+        ranks = ['d__Bacteria', 'p__A', 'c__A', 'o__A', 'f__A', 'g__A', 's__A a']
+        taxonomy = TaxonomyIndex.build({'G1': ranks, 'G2': ranks,
+                                        'G3': ranks[:1] + ['p__B', 'c__B', 'o__B', 'f__B', 'g__B', 's__B b']})
+        self.patches = [mock.patch('gtdbtk.pipeline.export_msa.CONFIG',
+                                   SimpleNamespace(CONCAT_BAC120=self.msa_file)),
+                        mock.patch('gtdbtk.pipeline.export_msa.get_gtdb_taxonomy_index',
+                                   return_value=taxonomy)]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.dir_tmp)
+
+    def test_export_msa(self):
+        path = os.path.join(self.dir_tmp, 'out', 'msa.faa')
+        self.assertIsNone(export_msa(Domain.BACTERIA, path))
+        self.assertEqual(self.msa, read_fasta(path))
+
+        self.assertEqual(2, export_msa(Domain.BACTERIA, path, taxa_filter='p__A'))
+        self.assertEqual({'G1': 'ABCDEF', 'G2': 'GHIJKL'}, read_fasta(path))
+
+        # Each of the filters must pass.
+        self.assertEqual(1, export_msa(Domain.BACTERIA, path, taxa_filter='p__A',
+                                       genome_list=self.genome_list, mask_file=self.mask_file))
+        self.assertEqual({'G1': 'ACF'}, read_fasta(path))
+
+        self.assertRaises(GTDBTkExit, export_msa, Domain.BACTERIA, path, taxa_filter='p__C')
+
+    def test_export_msa_gzip(self):
+        path = os.path.join(self.dir_tmp, 'msa.faa.gz')
+        for cpus in (1, 2):
+            self.assertEqual(2, export_msa(Domain.BACTERIA, path, genome_list=self.genome_list,
+                                           cpus=cpus))
+            with gzip.open(path, 'rt') as fh:
+                self.assertEqual('>G1\nABCDEF\n>G3\nMNOPQR\n', fh.read())
@@ -20,6 +20,7 @@ import tempfile
 import unittest
 import json
 from gtdbtk.external.fastani import FastANI
+from gtdbtk.files.result_spool import ResultSpool
 from gtdbtk.config.common import CONFIG
 
 class TestFastANI(unittest.TestCase):
@@ -93,3 +94,16 @@ class TestFastANI(unittest.TestCase):
         open(path_f3, 'w').close()
         result_f3 = fa.parse_output_file(path_f3)
         self.assertEqual(result_f3, {})
+
+    def test_parse_result_spool(self):
+        """Test that the largest ANI / AF of the forward and reverse pass is kept"""
+        fa = FastANI(self.cpus, force_single=True)
+        gids = ['q1', 'r1', 'r2']
+        with ResultSpool('<iiidd') as spool:
+            with spool.writer() as out:
+                out.write(0, 0, 1, 90.5, 0.5)
+                out.write(0, 1, 0, 91.0, 0.25)
+                out.write(0, 0, 2, 80.0, 0.1)
+            result = fa._parse_result_spool(spool, gids)
+        self.assertDictEqual({'q1': {'r1': {'ani': 91.0, 'af': 0.5},
+                                     'r2': {'ani': 80.0, 'af': 0.1}}}, result)
@@ -14,14 +14,26 @@
 #    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
 #                                                                             #
 ###############################################################################
+import gzip
 import os
 import shutil
+import sys
 import tempfile
 import unittest
+from unittest import mock
 
 from gtdbtk.config.common import CONFIG
+from gtdbtk.exceptions import FastTreeException
 from gtdbtk.external.fasttree import FastTree
 
+# Writes the number of sequences read (from the MSA path, or stdin) as a tree.
+FAKE_FASTTREE = """#!{python}
+import sys
+args = sys.argv[1:]
+fh = sys.stdin if args[-2] == '-log' else open(args[-1])
+print('(%d);' % sum(1 for line in fh if line.startswith('>')))
+"""
+
 
 class TestFastTree(unittest.TestCase):
 
@@ -60,3 +72,38 @@ class TestFastTree(unittest.TestCase):
         cpus = self.cpus
         ft.run(output_tree, tree_log, fasttree_log, prot_model, no_support, gamma, msa_file, cpus)
         self.assertTrue(os.path.isfile(output_tree))
+
+    def _run_fake(self, msa_file):
+        bin_dir = os.path.join(self.dir_tmp, 'bin')
+        os.makedirs(bin_dir, exist_ok=True)
+        with open(os.path.join(bin_dir, 'FastTree'), 'w') as fh:
+            fh.write(FAKE_FASTTREE.format(python=sys.executable))
+        os.chmod(os.path.join(bin_dir, 'FastTree'), 0o755)
+        output_tree = os.path.join(self.dir_tmp, 'output.tree')
+        path = bin_dir + os.pathsep + os.environ.get('PATH', '')
+        with mock.patch.dict(os.environ, {'PATH': path}):
+            FastTree().run(output_tree, os.path.join(self.dir_tmp, 'tree.log'),
+                           os.path.join(self.dir_tmp, 'fasttree.log'), 'WAG', False,
+                           False, msa_file, 1)
+        with open(output_tree) as fh:
+            return fh.read().strip()
+
+    def test_run_gzip_streamed(self):
+        """The gzipped MSA is streamed to FastTree without a temporary copy"""
+        msa_gz = os.path.join(self.dir_tmp, 'msa.faa.gz')
+        with open(self.test_msa, 'rb') as f_in, gzip.open(msa_gz, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        expected = self._run_fake(self.test_msa)
+        self.assertEqual(expected, self._run_fake(msa_gz))
+        with mock.patch.object(FastTree, '_get_decompress_cmd', return_value=None):
+            self.assertEqual(expected, self._run_fake(msa_gz))
+
+    def test_run_gzip_truncated(self):
+        msa_gz = os.path.join(self.dir_tmp, 'msa.faa.gz')
+        with open(self.test_msa, 'rb') as f_in, gzip.open(msa_gz, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        with open(msa_gz, 'rb+') as fh:
+            fh.truncate(os.path.getsize(msa_gz) // 2)
+        self.assertRaises(FastTreeException, self._run_fake, msa_gz)
+        with mock.patch.object(FastTree, '_get_decompress_cmd', return_value=None):
+            self.assertRaises(FastTreeException, self._run_fake, msa_gz)
@@ -0,0 +1,73 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from gtdbtk.external.pplacer import Pplacer
+
+
+class TestPplacerPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        self.ref_pkg = os.path.join(self.dir_tmp, 'ref.refpkg')
+        os.makedirs(self.ref_pkg)
+        with open(os.path.join(self.ref_pkg, 'tree.tre'), 'w') as fh:
+            fh.write('x' * 10000)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_tmp)
+
+    def test_in_ram(self):
+        plan = Pplacer.plan(self.ref_pkg, 10, 8, max_memory_gb=100, min_ram_gb=40)
+        self.assertEqual((8, False, 1), (plan.cpus, plan.use_mmap, plan.n_batches))
+
+        # Fewer threads are used before falling back to a scratch file.
+        plan = Pplacer.plan(self.ref_pkg, 10, 8, max_memory_gb=42, min_ram_gb=40)
+        self.assertEqual((3, False, 1), (plan.cpus, plan.use_mmap, plan.n_batches))
+        self.assertTrue(plan.fits)
+
+    def test_mmap(self):
+        plan = Pplacer.plan(self.ref_pkg, 10, 8, max_memory_gb=15, min_ram_gb=40)
+        self.assertEqual((8, True, 1), (plan.cpus, plan.use_mmap, plan.n_batches))
+
+        plan = Pplacer.plan(self.ref_pkg, 10, 8, max_memory_gb=100, min_ram_gb=40, force_mmap=True)
+        self.assertTrue(plan.use_mmap)
+
+    def test_batches(self):
+        plan = Pplacer.plan(self.ref_pkg, 5000, 8, max_memory_gb=10, min_ram_gb=40)
+        self.assertTrue(plan.use_mmap)
+        self.assertGreater(plan.n_batches, 1)
+        self.assertTrue(plan.fits)
+
+        # The most conservative plan is returned if nothing fits.
+        plan = Pplacer.plan(self.ref_pkg, 5000, 8, max_memory_gb=1, min_ram_gb=40)
+        self.assertFalse(plan.fits)
+        self.assertEqual((1, True, 50), (plan.cpus, plan.use_mmap, plan.n_batches))
+
+    def test_ref_pkg_size(self):
+        self.assertAlmostEqual(1e-5, Pplacer.get_ref_pkg_gb(self.ref_pkg))
+        plan = Pplacer.plan(self.ref_pkg, 10, 4, max_memory_gb=100)
+        self.assertEqual((4, False, 1), (plan.cpus, plan.use_mmap, plan.n_batches))
+
+        # The memory per GB of reference package can be set by the user.
+        with mock.patch.dict(os.environ, {'GTDBTK_PPLACER_MEM_PER_REFPKG_GB': '4e6'}):
+            plan = Pplacer.plan(self.ref_pkg, 10, 4, max_memory_gb=15)
+        self.assertEqual((4, True, 1), (plan.cpus, plan.use_mmap, plan.n_batches))
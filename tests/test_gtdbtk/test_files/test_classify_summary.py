@@ -0,0 +1,146 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from gtdbtk.config.common import CONFIG
+from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.files.classify_summary import ClassifySummaryFile, ClassifySummaryFileRow
+from gtdbtk.files.stage_logger import StageLogger
+
+
+def _row(gid, red_value=None, tax='p__NEW'):
+    row = ClassifySummaryFileRow()
+    row.gid = gid
+    row.classification = f'd__Bacteria;{tax};c__;o__;f__;g__;s__'
+    row.red_value = red_value
+    return row
+
+
+def _gids(path):
+    with open(path) as fh:
+        return [line.split('\t')[0] for line in fh.readlines()[1:]]
+
+
+class TestClassifySummaryFile(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        self.path = os.path.join(self.dir_tmp, 'classify', 'gtdbtk.bac120.summary.tsv')
+        StageLogger.instance = None
+        StageLogger().path = os.path.join(self.dir_tmp, 'gtdbtk.json')
+
+    def tearDown(self):
+        StageLogger.instance = None
+        shutil.rmtree(self.dir_tmp)
+
+    def test_add_row_streams_to_partial(self):
+        summary_file = ClassifySummaryFile(self.path)
+        summary_file.add_row(_row('genome_2', 0.123456789))
+        summary_file.add_row(_row('genome_1'))
+
+        # Rows are on disk as they are added, in the order they were added.
+        self.assertEqual(os.path.join(self.dir_tmp, 'classify', 'gtdbtk.bac120.summary.partial.tsv'),
+                         summary_file.path_partial)
+        self.assertEqual(['genome_2', 'genome_1'], _gids(summary_file.path_partial))
+        self.assertFalse(os.path.isfile(self.path))
+        self.assertTrue(summary_file.has_row())
+        self.assertRaises(GTDBTkExit, summary_file.add_row, _row('genome_1'))
+
+    def _interrupted_run(self, fingerprint, gids, rows):
+        summary_file = ClassifySummaryFile(self.path)
+        summary_file.resume(fingerprint, gids)
+        for row in rows:
+            summary_file.add_row(row)
+        summary_file._partial_fh.write('genome_9\td__Bac')
+        summary_file._partial_fh.close()
+
+    def _classifications(self):
+        summary_file = ClassifySummaryFile(self.path)
+        summary_file.read()
+        return {gid: row.classification.split(';')[1] for gid, row in summary_file.rows.items()}
+
+    def test_add_row_resumes_partial(self):
+        gids = ['genome_1', 'genome_2', 'genome_3']
+        self._interrupted_run('fp', gids, [_row('genome_2'), _row('genome_1', tax='p__OLD')])
+
+        # The rows of the run which did not finish are kept, a truncated row is
+        # removed and a genome classified again replaces the recovered row.
+        summary_file = ClassifySummaryFile(self.path)
+        summary_file.resume('fp', gids)
+        summary_file.add_row(_row('genome_1', tax='p__NEW'))
+        summary_file.add_row(_row('genome_3'))
+        self.assertEqual(['genome_2', 'genome_1', 'genome_1', 'genome_3'], _gids(summary_file.path_partial))
+        self.assertRaises(GTDBTkExit, summary_file.add_row, _row('genome_1'))
+        summary_file.write()
+        self.assertEqual(['genome_1', 'genome_2', 'genome_3'], _gids(self.path))
+        self.assertEqual('p__NEW', self._classifications()['genome_1'])
+        self.assertEqual(['gtdbtk.bac120.summary.tsv'], os.listdir(os.path.dirname(self.path)))
+
+    def test_add_row_resumes_partial_of_genomes(self):
+        self._interrupted_run('fp', ['old_genome', 'genome_1'],
+                              [_row('old_genome'), _row('genome_1', tax='p__OLD')])
+
+        # Only the rows of the genomes being classified are resumed.
+        summary_file = ClassifySummaryFile(self.path)
+        summary_file.resume('fp', ['genome_1', 'genome_2'])
+        summary_file.add_row(_row('genome_2'))
+        summary_file.write()
+        self.assertEqual({'genome_1': 'p__OLD', 'genome_2': 'p__NEW'}, self._classifications())
+
+    def test_add_row_ignores_partial_of_other_run(self):
+        self._interrupted_run('fp_old', ['old_genome', 'genome_1'],
+                              [_row('old_genome'), _row('genome_1', tax='p__OLD')])
+
+        # A run with different inputs starts again, as does a run which is not resumed.
+        for fingerprint in ('fp_new', None):
+            summary_file = ClassifySummaryFile(self.path)
+            if fingerprint is not None:
+                summary_file.resume(fingerprint, ['genome_1', 'genome_2'])
+            summary_file.add_row(_row('genome_1', tax='p__NEW'))
+            summary_file.add_row(_row('genome_2'))
+            self.assertEqual(['genome_1', 'genome_2'], _gids(summary_file.path_partial))
+            summary_file._partial_fh.close()
+        summary_file.write()
+        self.assertEqual({'genome_1': 'p__NEW', 'genome_2': 'p__NEW'}, self._classifications())
+
+    def test_write_merges_sorted_chunks(self):
+        summary_file = ClassifySummaryFile(self.path)
+        gids = [f'genome_{i}' for i in (5, 3, 9, 1, 7, 2, 8)]
+        with mock.patch.object(CONFIG, 'SUMMARY_SORT_CHUNK_ROWS', 2):
+            for gid in gids[:4]:
+                summary_file.add_row(_row(gid, 0.5))
+            summary_file.write()
+            self.assertEqual(sorted(gids[:4]), _gids(self.path))
+            self.assertFalse(os.path.isfile(summary_file.path_partial))
+
+            # Rows added after writing are merged with those already written.
+            for gid in gids[4:]:
+                summary_file.add_row(_row(gid))
+            summary_file.write()
+        self.assertEqual(sorted(gids), _gids(self.path))
+        self.assertEqual(['gtdbtk.bac120.summary.tsv'], os.listdir(os.path.dirname(self.path)))
+
+        summary_file = ClassifySummaryFile(self.path)
+        summary_file.read()
+        self.assertEqual(sorted(gids), sorted(summary_file.rows))
+        self.assertEqual('0.5', summary_file.rows['genome_5'].red_value)
+        self.assertEqual('N/A', summary_file.rows['genome_7'].red_value)
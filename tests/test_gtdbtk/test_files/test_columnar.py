@@ -0,0 +1,101 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from gtdbtk.ani_rep import ANISummaryFile
+from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.files.classify_summary import ClassifySummaryFile, ClassifySummaryFileRow
+from gtdbtk.files.columnar import detect_format, get_table_format, set_table_format, table_path
+
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+class TestColumnar(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+
+    def tearDown(self):
+        set_table_format('tsv')
+        shutil.rmtree(self.dir_tmp)
+
+    def test_table_path(self):
+        self.assertEqual('a/x.summary.tsv', table_path('a/x.summary.tsv', 'tsv'))
+        self.assertEqual('a/x.summary.parquet', table_path('a/x.summary.tsv', 'parquet'))
+        self.assertEqual('a/x.summary.arrow', table_path('a/x.summary.tsv', 'arrow'))
+        self.assertEqual('a/x.txt.arrow', table_path('a/x.txt', 'arrow'))
+
+    def test_detect_format(self):
+        path = os.path.join(self.dir_tmp, 'table')
+        for content, fmt in ((b'PAR1\x15\x04', 'parquet'), (b'ARROW1\x00\x00', 'arrow'),
+                             (b'user_genome\tclassification\n', 'tsv')):
+            with open(path, 'wb') as fh:
+                fh.write(content)
+            self.assertEqual(fmt, detect_format(path))
+
+    def test_set_table_format_requires_pyarrow(self):
+        with mock.patch.dict(sys.modules, {'pyarrow': None}):
+            self.assertRaises(GTDBTkExit, set_table_format, 'parquet')
+        self.assertEqual('tsv', get_table_format())
+        self.assertRaises(GTDBTkExit, set_table_format, 'csv')
+
+    @unittest.skipUnless(HAS_PYARROW, 'pyarrow is not installed')
+    def test_classify_summary_round_trip(self):
+        rows = dict()
+        for fmt in ('tsv', 'parquet', 'arrow'):
+            set_table_format(fmt)
+            summary_file = ClassifySummaryFile(table_path(os.path.join(self.dir_tmp, 'summary.tsv')))
+            row = ClassifySummaryFileRow()
+            row.gid = 'genome_1'
+            row.classification = 'd__Bacteria;p__;c__;o__;f__;g__;s__'
+            row.red_value = 0.123456789
+            row.tln_table = 11
+            summary_file.add_row(row)
+            summary_file.write()
+            self.assertEqual(fmt, detect_format(summary_file.path))
+
+            summary_file = ClassifySummaryFile(summary_file.path)
+            summary_file.read()
+            rows[fmt] = [getattr(summary_file.rows['genome_1'], x) for x in ClassifySummaryFileRow.__slots__]
+        self.assertEqual(rows['tsv'], rows['parquet'])
+        self.assertEqual(rows['tsv'], rows['arrow'])
+
+    def test_ani_summary_read_columnar(self):
+        summary_file = ANISummaryFile(os.path.join(self.dir_tmp, 'ani_summary.parquet'))
+        columns = {'user_genome': ['genome_1'], 'reference_genome': ['GCA_000001.1'],
+                   'fastani_ani': [99.5], 'fastani_af': [0.9], 'reference_taxonomy': ['d__Bacteria']}
+        expected = {'genome_1': {'GCA_000001.1': {'ani': 99.5, 'af': 0.9, 'taxonomy': 'd__Bacteria',
+                                                  'other_refs': ''}}}
+
+        # Files written by ani_rep (without other references) and ani_screen are read.
+        with mock.patch('gtdbtk.ani_rep.read_table', return_value=columns):
+            self.assertEqual(expected, summary_file._read_columnar())
+        other_refs_col = ANISummaryFile.get_col_order(True)[-1]
+        expected['genome_1']['GCA_000001.1']['other_refs'] = 'GCA_000002.1'
+        with mock.patch('gtdbtk.ani_rep.read_table', return_value={**columns, other_refs_col: ['GCA_000002.1']}):
+            self.assertEqual(expected, summary_file._read_columnar())
+
+        with mock.patch('gtdbtk.ani_rep.read_table', return_value={'user_genome': ['genome_1']}):
+            with self.assertRaisesRegex(GTDBTkExit, 'ANI summary'):
+                summary_file._read_columnar()
@@ -0,0 +1,56 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from gtdbtk.biolib_lite.seq_io import read_fasta
+from gtdbtk.files.msa_stats import MSAStats
+
+
+class TestMSAStats(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        self.seqs = {'genome_c': 'AC--', 'genome_a': 'ACDE', 'genome_b': '----'}
+        self.path = os.path.join(self.dir_tmp, 'msa.fasta.gz')
+        with gzip.open(self.path, 'wt') as fh:
+            for gid, seq in self.seqs.items():
+                fh.write(f'>{gid}\n{seq[0:2]}\n{seq[2:]}\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_tmp)
+
+    def test_stats(self):
+        stats = MSAStats(self.path)
+        self.assertEqual(['genome_c', 'genome_a', 'genome_b'], stats.genome_ids)
+        self.assertEqual(3, len(stats))
+        self.assertIn('genome_a', stats)
+        self.assertEqual(50.0, stats.get_aa_percent('genome_c'))
+        self.assertEqual(100.0, stats.get_aa_percent('genome_a'))
+        self.assertEqual(0.0, stats.get_aa_percent('genome_b'))
+        self.assertEqual(4, stats.get_length('genome_a'))
+        self.assertIsNone(stats.get_aa_percent('missing'))
+
+    def test_write_subset(self):
+        stats = MSAStats(self.path)
+        path_out = os.path.join(self.dir_tmp, 'subset.fasta')
+        stats.write_subset(['genome_a', 'genome_b'], path_out)
+        self.assertDictEqual({'genome_a': 'ACDE', 'genome_b': '----'}, read_fasta(path_out))
@@ -0,0 +1,47 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import unittest
+
+from gtdbtk.files.rank_authority import RankAuthorityIndex
+from gtdbtk.files.taxonomy_index import TaxonomyIndex
+
+
+class TestRankAuthorityIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.taxonomy = {
+            'G1': ['d__B', 'p__P1', 'c__C1', 'o__O1', 'f__F1', 'g__G1', 's__G1 a'],
+            'G2': ['d__B', 'p__P1', 'c__C2', 'o__O2', 'f__F2', 'g__G2', 's__G2 a'],
+            'G3': ['d__B', 'p__P2', 'c__C3', 'o__O3', 'f__F3', 'g__G3', 's__G3 a'],
+            'G4': ['d__B', 'p__P3', 'c__C4', 'o__O4', 'f__F4', 'g__G4', 's__G4 a'],
+        }
+        self.tree_classes = {'1': ['c__C1', 'c__C3'], '2': ['c__C2'], '3': ['c__C4']}
+        self.index = RankAuthorityIndex(TaxonomyIndex.build(self.taxonomy), self.tree_classes)
+
+    def _scan(self, classes, rank_idx):
+        """The full taxonomy scan previously done by Classify.get_authorised_rank."""
+        return {v[rank_idx] for v in self.taxonomy.values() if v[2] in classes}
+
+    def test_authorised(self):
+        for tree, classes in self.tree_classes.items():
+            for rank_idx in range(3):
+                self.assertSetEqual(self._scan(classes, rank_idx), set(self.index.authorised(tree, rank_idx)))
+        self.assertSetEqual(set(), set(self.index.authorised('missing', 1)))
+
+    def test_authorised_below_class(self):
+        self.assertRaises(ValueError, self.index.authorised, '1', 3)
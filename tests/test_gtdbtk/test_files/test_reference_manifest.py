@@ -0,0 +1,85 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from gtdbtk.files.reference_manifest import ReferenceManifest
+
+
+class TestReferenceManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        self.fastani_dir = os.path.join(self.dir_tmp, 'fastani')
+        self.cache_dir = os.path.join(self.dir_tmp, 'cache')
+
+        self.path_tax = os.path.join(self.dir_tmp, 'tax.tsv')
+        with open(self.path_tax, 'w') as fh:
+            fh.write('RS_GCF_000001.1\td__D;p__P;c__C;o__O;f__F;g__G;s__G a\n')
+            fh.write('GB_GCA_000002.1\td__D;p__P;c__C;o__O;f__F;g__G;s__G b\n')
+
+        self.path_list = os.path.join(self.dir_tmp, 'genome_paths.tsv')
+        with open(self.path_list, 'w') as fh:
+            fh.write('GCF_000001.1_genomic.fna.gz database/GCF/000/000/001/\n')
+            fh.write('GCA_000002.1_genomic.fna.gz database/GCA/000/000/002/\n')
+
+        self.path_radii = os.path.join(self.dir_tmp, 'radii.tsv')
+        with open(self.path_radii, 'w') as fh:
+            fh.write('s__G a\tRS_GCF_000001.1\t95.0\n')
+            fh.write('s__G b\tGB_GCA_000002.1\t96.5\n')
+
+        # Only the first genome exists on disk.
+        self.path_g1 = os.path.join(self.fastani_dir, 'database/GCF/000/000/001/GCF_000001.1_genomic.fna.gz')
+        os.makedirs(os.path.dirname(self.path_g1))
+        open(self.path_g1, 'w').close()
+        self.path_g2 = os.path.join(self.fastani_dir, 'database/GCA/000/000/002/GCA_000002.1_genomic.fna.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_tmp)
+
+    def _manifest(self):
+        return ReferenceManifest(self.path_tax, self.path_list, self.path_radii,
+                                 self.fastani_dir, '_genomic.fna.gz', self.cache_dir)
+
+    def test_manifest(self):
+        manifest = self._manifest()
+        self.assertEqual(frozenset({'RS_GCF_000001.1', 'GCF_000001.1',
+                                    'GB_GCA_000002.1', 'GCA_000002.1'}), manifest.reference_ids)
+        self.assertDictEqual({'GCF_000001.1': 95.0, 'GCA_000002.1': 96.5}, manifest.species_radius)
+        self.assertEqual('s__G b', manifest.representative['GCA_000002.1'])
+        self.assertEqual(os.path.normpath(self.path_g1), os.path.normpath(manifest.get_path('RS_GCF_000001.1')))
+        self.assertTrue(manifest.exists(self.path_g1))
+        self.assertFalse(manifest.exists(self.path_g2))
+
+    def test_cache(self):
+        self._manifest().exists(self.path_g1)
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))
+
+        # Whether a genome exists is checked again on each run.
+        os.makedirs(os.path.dirname(self.path_g2))
+        open(self.path_g2, 'w').close()
+        self.assertTrue(self._manifest().exists(self.path_g2))
+        os.remove(self.path_g1)
+        self.assertFalse(self._manifest().exists(self.path_g1))
+
+        # Changing a source file invalidates the cache.
+        with open(self.path_radii, 'a') as fh:
+            fh.write('s__G c\tRS_GCF_000003.1\t97.0\n')
+        self.assertEqual(97.0, self._manifest().species_radius['GCF_000003.1'])
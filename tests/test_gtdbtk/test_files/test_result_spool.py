@@ -0,0 +1,66 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import multiprocessing as mp
+import os
+import unittest
+
+from gtdbtk.files.result_spool import ResultSpool
+
+
+def _write_records(spool, worker_idx, n_records):
+    with spool.writer() as out:
+        for idx in range(n_records):
+            if spool.has_payload:
+                out.write(worker_idx, payload=f'{worker_idx}:{idx}'.encode() * idx)
+            else:
+                out.write(worker_idx, idx, idx / 10)
+
+
+class TestResultSpool(unittest.TestCase):
+
+    def test_fixed_width_records(self):
+        with ResultSpool('<iid') as spool:
+            procs = [mp.Process(target=_write_records, args=(spool, i, 100)) for i in range(4)]
+            [p.start() for p in procs]
+            [p.join() for p in procs]
+            records = sorted(spool)
+            self.assertEqual(4, len(os.listdir(spool.directory)))
+        self.assertFalse(os.path.exists(spool.directory))
+        self.assertListEqual(sorted((w, i, i / 10) for w in range(4) for i in range(100)), records)
+
+    def test_payload_records(self):
+        with ResultSpool('<i', has_payload=True) as spool:
+            procs = [mp.Process(target=_write_records, args=(spool, i, 20)) for i in range(3)]
+            [p.start() for p in procs]
+            [p.join() for p in procs]
+            records = sorted(spool)
+        expected = sorted((w, f'{w}:{i}'.encode() * i) for w in range(3) for i in range(20))
+        self.assertListEqual(expected, records)
+
+    def test_empty(self):
+        with ResultSpool('<i') as spool:
+            self.assertListEqual([], list(spool))
+
+    def test_pool_tasks(self):
+        # Each task opens a writer, which appends to the file of its process.
+        with ResultSpool('<iid') as spool:
+            with mp.get_context('spawn').Pool(2) as pool:
+                pool.starmap(_write_records, [(spool, i, 10) for i in range(6)])
+            records = sorted(spool)
+            self.assertLessEqual(len(os.listdir(spool.directory)), 2)
+        self.assertListEqual(sorted((w, i, i / 10) for w in range(6) for i in range(10)), records)
@@ -0,0 +1,99 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from gtdbtk.files.stage_logger import StageLogger, input_fingerprint
+
+
+class TestStageLogger(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        self.path_out = os.path.join(self.dir_tmp, 'out.txt')
+        with open(self.path_out, 'w') as fh:
+            fh.write('result\n')
+        StageLogger.instance = None
+
+    def tearDown(self):
+        StageLogger.instance = None
+        shutil.rmtree(self.dir_tmp)
+
+    def _new_logger(self):
+        StageLogger.instance = None
+        stage_logger = StageLogger()
+        stage_logger.path = os.path.join(self.dir_tmp, 'gtdbtk.json')
+        return stage_logger
+
+    def test_input_fingerprint(self):
+        fp = input_fingerprint(['a', 1], stat_paths=[self.path_out], hash_paths=[self.path_out])
+        self.assertEqual(fp, input_fingerprint(['a', 1], stat_paths=[self.path_out],
+                                               hash_paths=[self.path_out]))
+        self.assertNotEqual(fp, input_fingerprint(['a', 2], stat_paths=[self.path_out],
+                                                  hash_paths=[self.path_out]))
+
+        # A rewritten file is identified by its contents, not its modification time.
+        fp_hash = input_fingerprint(hash_paths=[self.path_out])
+        with open(self.path_out, 'w') as fh:
+            fh.write('result\n')
+        os.utime(self.path_out, ns=(1, 1))
+        self.assertEqual(fp_hash, input_fingerprint(hash_paths=[self.path_out]))
+        with open(self.path_out, 'w') as fh:
+            fh.write('changed\n')
+        self.assertNotEqual(fp_hash, input_fingerprint(hash_paths=[self.path_out]))
+
+    def test_checkpoints_are_resumed(self):
+        stage_logger = self._new_logger()
+        stage_logger.add_checkpoint('fastani/full/g1', 'fp1', output_files=[self.path_out],
+                                    data={'g1': {'r1': {'ani': 99.0, 'af': 0.9}}})
+        # The stage log is replaced atomically, no temporary files remain.
+        self.assertEqual(['gtdbtk.json', 'out.txt'], sorted(os.listdir(self.dir_tmp)))
+
+        resumed = self._new_logger()
+        resumed.read_checkpoints()
+        checkpoint = resumed.get_checkpoint('fastani/full/g1', 'fp1')
+        self.assertEqual({'g1': {'r1': {'ani': 99.0, 'af': 0.9}}}, checkpoint.data)
+        self.assertIsNone(resumed.get_checkpoint('fastani/full/g1', 'fp2'))
+        self.assertIsNone(resumed.get_checkpoint('fastani/full/g2', 'fp1'))
+
+        # The checkpoint is not valid once an output file is removed.
+        os.remove(self.path_out)
+        self.assertIsNone(resumed.get_checkpoint('fastani/full/g1', 'fp1'))
+
+    def test_checkpoints_not_flushed(self):
+        stage_logger = self._new_logger()
+        stage_logger.add_checkpoint('identify/g1', 'fp1', flush=False)
+        self.assertFalse(os.path.isfile(stage_logger.path))
+        stage_logger.flush_checkpoints()
+        with open(stage_logger.path) as fh:
+            self.assertIn('identify/g1', json.load(fh)['checkpoints'])
+
+    def test_read_existing_steps(self):
+        with open(os.path.join(self.dir_tmp, 'gtdbtk.json'), 'w') as fh:
+            json.dump({'steps': [{'name': 'root', 'output_dir': None, 'starts_at': None,
+                                  'ends_at': None, 'duration': None, 'status': 'completed',
+                                  'input_tree': None, 'gtdbtk_classification_file': None,
+                                  'custom_taxonomy_file': None, 'outgroup_taxon': None}],
+                       'checkpoints': {'red/bac120/low/1': {'fingerprint': 'fp'}}}, fh)
+        stage_logger = self._new_logger()
+        stage_logger.read_existing_steps()
+        self.assertTrue(stage_logger.steps[0].is_complete())
+        self.assertIsNotNone(stage_logger.get_checkpoint('red/bac120/low/1', 'fp'))
@@ -0,0 +1,78 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from gtdbtk.biolib_lite.taxonomy import Taxonomy
+from gtdbtk.files.taxonomy_index import TaxonomyIndex
+
+
+class TestTaxonomyIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        self.taxonomy = {
+            'G1': ['d__D1', 'p__P1', 'c__C1', 'o__O1', 'f__F1', 'g__G1', 's__G1 sp1'],
+            'G2': ['d__D1', 'p__P1', 'c__C1', 'o__O1', 'f__F1', 'g__G1', 's__G1 sp1'],
+            'G3': ['d__D1', 'p__P1', 'c__C2', 'o__O2', 'f__F2', 'g__G2', 's__G2 sp1'],
+            'G4': ['d__D1', 'p__P2', 'c__C3', 'o__', 'f__', 'g__', 's__'],
+            'G5': ['d__D2', 'p__P3', 'c__C4', 'o__O3', 'f__F3', 'g__G3', 's__G3 sp1'],
+        }
+        self.path_tax = os.path.join(self.dir_tmp, 'tax.tsv')
+        Taxonomy().write(self.taxonomy, self.path_tax)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_tmp)
+
+    def test_mapping(self):
+        index = TaxonomyIndex.build(self.taxonomy)
+        self.assertDictEqual(self.taxonomy, dict(index))
+        self.assertDictEqual(self.taxonomy, dict(index.items()))
+        self.assertEqual(self.taxonomy['G4'], index.get('G4'))
+        self.assertIsNone(index.get('G6'))
+
+    def test_lookups_match_taxonomy(self):
+        index = TaxonomyIndex.build(self.taxonomy)
+        tax = Taxonomy()
+        self.assertDictEqual(tax.taxon_children(self.taxonomy), tax.taxon_children(index))
+        self.assertDictEqual(tax.named_lineages_at_rank(self.taxonomy), tax.named_lineages_at_rank(index))
+        self.assertDictEqual(tax.extant_taxa(self.taxonomy), tax.extant_taxa(index))
+        for taxon in ('d__D1', 'p__P1', 'c__C3', 's__G1 sp1', 'x__missing'):
+            self.assertSetEqual(tax.children(taxon, self.taxonomy), tax.children(taxon, index))
+
+    def test_taxa_above(self):
+        index = TaxonomyIndex.build(self.taxonomy)
+        self.assertSetEqual({'p__P1'}, index.taxa_above(['c__C1', 'c__C2'], 1))
+        self.assertSetEqual({'p__P2', 'p__P3'}, index.taxa_above(['c__C3', 'c__C4'], 1))
+
+    def test_from_file_cache(self):
+        cache_dir = os.path.join(self.dir_tmp, 'cache')
+        index = TaxonomyIndex.from_file(self.path_tax, cache_dir)
+        self.assertDictEqual(self.taxonomy, dict(index))
+        self.assertEqual(1, len(os.listdir(cache_dir)))
+
+        cached = TaxonomyIndex.from_file(self.path_tax, cache_dir)
+        self.assertDictEqual(self.taxonomy, dict(cached))
+
+        # Changing the taxonomy file must invalidate the cache.
+        self.taxonomy['G6'] = ['d__D3', 'p__P4', 'c__C5', 'o__', 'f__', 'g__', 's__']
+        Taxonomy().write(self.taxonomy, self.path_tax)
+        rebuilt = TaxonomyIndex.from_file(self.path_tax, cache_dir)
+        self.assertDictEqual(self.taxonomy, dict(rebuilt))
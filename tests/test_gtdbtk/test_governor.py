@@ -0,0 +1,125 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import multiprocessing as mp
+import threading
+import time
+import unittest
+
+from gtdbtk import governor
+from gtdbtk.governor import ResourceGovernor, get_governor, init_governor, keep_governor
+
+
+def _reserve_and_record(gov, cpus, active, peak, memory_gb=0.0):
+    with gov.reserve(cpus, memory_gb):
+        with active.get_lock():
+            active.value += cpus
+            peak.value = max(peak.value, active.value)
+        time.sleep(0.05)
+        with active.get_lock():
+            active.value -= cpus
+
+
+class TestResourceGovernor(unittest.TestCase):
+
+    def tearDown(self):
+        governor._governor = None
+        governor._keep = False
+
+    def test_split(self):
+        gov = ResourceGovernor(8)
+        self.assertEqual((1, 8), gov.split(1))
+        self.assertEqual((4, 2), gov.split(4))
+        self.assertEqual((8, 1), gov.split(100))
+        self.assertEqual((2, 2), gov.split(2, cpus=4))
+        self.assertEqual((2, 4), gov.split(2, cpus=64))
+        self.assertEqual((1, 3), gov.split(1, max_threads=3))
+
+    def test_reserve_clips_to_total(self):
+        gov = ResourceGovernor(2, memory_gb=4)
+        with gov.reserve(16, memory_gb=100) as cpus:
+            self.assertEqual(2, cpus)
+            self.assertEqual(0, gov.free_cpus)
+        self.assertEqual(2, gov.free_cpus)
+
+    def test_reserve_limits_threads(self):
+        gov = ResourceGovernor(3)
+        active, peak = mp.Value('i', 0), mp.Value('i', 0)
+        threads = [threading.Thread(target=_reserve_and_record, args=(gov, 2, active, peak))
+                   for _ in range(4)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        self.assertEqual(2, peak.value)
+        self.assertEqual(3, gov.free_cpus)
+
+    def test_reserve_limits_processes(self):
+        gov = ResourceGovernor(2)
+        active, peak = mp.Value('i', 0), mp.Value('i', 0)
+        ctx = mp.get_context('fork')
+        procs = [ctx.Process(target=_reserve_and_record, args=(gov, 1, active, peak))
+                 for _ in range(6)]
+        [p.start() for p in procs]
+        [p.join() for p in procs]
+        self.assertEqual(2, peak.value)
+        self.assertEqual(2, gov.free_cpus)
+
+    def test_reserve_memory(self):
+        gov = ResourceGovernor(8, memory_gb=10)
+        active, peak = mp.Value('i', 0), mp.Value('i', 0)
+
+        threads = [threading.Thread(target=_reserve_and_record, args=(gov, 1, active, peak, 6))
+                   for _ in range(3)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        self.assertEqual(1, peak.value)
+
+    def test_reserve_is_fifo(self):
+        gov = ResourceGovernor(4)
+        order = list()
+
+        def job(name, cpus):
+            with gov.reserve(cpus):
+                order.append(name)
+
+        with gov.reserve(3):
+            # A large job arrives first, it must not be overtaken by a small
+            # job which could run in the single CPU that is free.
+            large = threading.Thread(target=job, args=('large', 4))
+            large.start()
+            while gov._next_ticket.value < 2:
+                time.sleep(0.01)
+            small = threading.Thread(target=job, args=('small', 1))
+            small.start()
+            time.sleep(0.1)
+            self.assertEqual([], order)
+        large.join()
+        small.join()
+        self.assertEqual(['large', 'small'], order)
+
+    def test_get_governor(self):
+        self.assertIs(get_governor(), get_governor())
+        gov = init_governor(3, 1.5)
+        self.assertIs(gov, get_governor())
+        self.assertEqual(3, gov.cpus)
+        self.assertEqual(1.5, gov.memory_gb)
+
+    def test_keep_governor(self):
+        gov = init_governor(4)
+        keep_governor()
+        # A job forked from the server keeps the governor of the server.
+        self.assertIs(gov, init_governor(2, 1.5))
+        self.assertEqual(4, get_governor().cpus)
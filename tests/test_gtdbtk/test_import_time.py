@@ -0,0 +1,61 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import json
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+# The modules which must not be imported until a command needs them.
+HEAVY_MODULES = ('numpy', 'dendropy', 'pydantic', 'tqdm', 'urllib.request',
+                 'gtdbtk.external.pypfam', 'gtdbtk.classify', 'gtdbtk.markers',
+                 'gtdbtk.ani_rep', 'gtdbtk.files.stage_logger')
+
+# The maximum time (seconds) to import the CLI and command dispatcher, this is
+# only checked if set, as it depends on the machine (e.g. GTDBTK_IMPORT_BUDGET_S=1).
+IMPORT_BUDGET_S = os.environ.get('GTDBTK_IMPORT_BUDGET_S')
+
+
+def _run(code, *args):
+    proc = subprocess.run([sys.executable, *args, '-c', code], capture_output=True,
+                          encoding='utf-8', check=True)
+    return proc
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_cli_imports_no_heavy_modules(self):
+        code = ('import json, sys\n'
+                'import gtdbtk.__main__, gtdbtk.main, gtdbtk.misc\n'
+                'from gtdbtk.cli import get_main_parser\n'
+                'get_main_parser()\n'
+                f'print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))')
+        loaded = json.loads(_run(code).stdout)
+        self.assertEqual([], loaded)
+
+    @unittest.skipUnless(IMPORT_BUDGET_S, 'GTDBTK_IMPORT_BUDGET_S is not set')
+    def test_import_budget(self):
+        stderr = _run('import gtdbtk.__main__, gtdbtk.main', '-X', 'importtime').stderr
+        total_us = 0
+        for line in stderr.splitlines():
+            hit = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\S+)$', line)
+            if hit and hit.group(2) in ('gtdbtk.__main__', 'gtdbtk.main'):
+                total_us += int(hit.group(1))
+        self.assertGreater(total_us, 0)
+        self.assertLess(total_us / 1e6, float(IMPORT_BUDGET_S))
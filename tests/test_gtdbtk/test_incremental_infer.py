@@ -0,0 +1,94 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import dendropy
+
+from gtdbtk.biolib_lite.seq_io import read_fasta
+from gtdbtk.incremental_infer import IncrementalInfer
+
+MSA = {'a': 'AAAAAAAAAA',
+       'b': 'AAAAAAAACC',
+       'c': 'CCCCCCCCCC',
+       'd': 'CCCCCCCCGG',
+       'e': 'GGGGGGGGGG'}
+
+
+class TestIncrementalInfer(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_tmp)
+
+    def _write(self, name, content):
+        path = os.path.join(self.dir_tmp, name)
+        with open(path, 'w') as fh:
+            fh.write(content)
+        return path
+
+    def _write_msa(self, name, msa):
+        return self._write(name, ''.join(f'>{k}\n{v}\n' for k, v in msa.items()))
+
+    def _sister(self, tree_path, label):
+        tree = dendropy.Tree.get_from_path(tree_path, schema='newick', preserve_underscores=True)
+        node = tree.find_node_with_taxon_label(label)
+        return {n.taxon.label for n in node.sister_nodes() if n.is_leaf()}
+
+    def test_digests(self):
+        msa_file = self._write_msa('msa.faa', MSA)
+        digests = IncrementalInfer.msa_digests(msa_file)
+        self.assertEqual(set(MSA), set(digests))
+        path = os.path.join(self.dir_tmp, 'digests.tsv')
+        IncrementalInfer.write_digests(digests, path)
+        self.assertEqual(digests, IncrementalInfer.read_digests(path))
+
+    def test_write_start_tree(self):
+        previous = {k: v for k, v in MSA.items() if k != 'b'}
+        previous['x'] = 'TTTTTTTTTT'
+        previous_digests = IncrementalInfer.msa_digests(self._write_msa('prev.faa', previous))
+        previous_tree = self._write('prev.tree', '((a,x),(c,(d,e)));')
+
+        # b is new, d has changed (and is now closest to e), x was removed.
+        msa = dict(MSA, d='GGGGGGGGCC')
+        msa_file = self._write_msa('msa.faa', msa)
+        digests = IncrementalInfer.msa_digests(msa_file)
+        start_tree = os.path.join(self.dir_tmp, 'start.tree')
+        result = IncrementalInfer().write_start_tree(previous_tree, msa_file, start_tree,
+                                                     digests, previous_digests)
+        self.assertEqual((3, 2, 2), result)
+
+        tree = dendropy.Tree.get_from_path(start_tree, schema='newick')
+        self.assertEqual(set(msa), {x.taxon.label for x in tree.leaf_node_iter()})
+        self.assertEqual({'a'}, self._sister(start_tree, 'b'))
+        self.assertEqual({'e'}, self._sister(start_tree, 'd'))
+
+    def test_write_constraints(self):
+        tree = self._write('ref.tree', "((a,b)'p__A',(c,(d,r)'g__D')'p__C');")
+        path = os.path.join(self.dir_tmp, 'constraints.fasta')
+        n_splits = IncrementalInfer().write_constraints(tree, MSA, path)
+        self.assertEqual(1, n_splits)
+        rows = read_fasta(path)
+        self.assertEqual(set(MSA), set(rows))
+        self.assertEqual(rows['a'], rows['b'])
+        self.assertNotEqual(rows['a'], rows['c'])
+        self.assertEqual('-', rows['e'])
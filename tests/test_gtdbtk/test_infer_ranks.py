@@ -0,0 +1,60 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import dendropy
+
+from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.infer_ranks import InferRanks
+from gtdbtk.reroot_tree import LeafIndex
+
+
+class TestInferRanks(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        red_file = os.path.join(self.dir_tmp, 'red_bac120.tsv')
+        with open(red_file, 'w') as fh:
+            fh.write('A|B\t0.2\n')
+            fh.write('D\t1.0\n')
+            fh.write('X|D\t0.9\n')
+            fh.write('D|E\t0.7\n')
+            fh.write('C|B\t0.6\n')
+        self.config = SimpleNamespace(MRCA_RED_BAC120=red_file, MRCA_RED_AR53=None)
+        self.tree = dendropy.Tree.get(data="((A,(B,C)'0.9:c__C1')'p__P1',(D,E)'p__P2');",
+                                      schema='newick', rooting='force-rooted',
+                                      preserve_underscores=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_tmp)
+
+    def test_find_ingroup_red(self):
+        infer_ranks = InferRanks()
+        leaf_index = LeafIndex(self.tree)
+        with mock.patch('gtdbtk.infer_ranks.CONFIG', self.config):
+            for taxon, red in (('p__P2', 0.7), ('c__C1', 0.6), ('p__P1', 0.2)):
+                ingroup_idx = infer_ranks._find_ingroup_taxon(taxon, leaf_index)
+                self.assertEqual(red, infer_ranks._find_ingroup_red(ingroup_idx, 'd__Bacteria',
+                                                                    leaf_index))
+            self.assertRaises(GTDBTkExit, infer_ranks._find_ingroup_red, 0, 'd__Bacteria', leaf_index)
+        self.assertRaises(GTDBTkExit, infer_ranks._find_ingroup_taxon, 'p__P3', leaf_index)
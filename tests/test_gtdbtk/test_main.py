@@ -186,6 +186,30 @@ class TestOptionsParser(unittest.TestCase):
         finally:
             shutil.rmtree(tmp_genome_dir)
 
+    def test__select_shard__empty(self):
+        """ Test that a shard with none of the genomes is completed without output. """
+        from gtdbtk.files.stage_logger import StageLogger
+        from gtdbtk.merge import read_shard_log
+
+        StageLogger.instance = None
+        try:
+            options_parser = self.options_parser
+            options_parser.stage_logger = StageLogger()
+            options_parser.stage_logger.path = os.path.join(self.dir_tmp, 'gtdbtk.json')
+            options_parser.shard = (1, 3)
+            genomes = {'genome_1': 'genome_1.fna', 'genome_2': 'genome_2.fna'}
+            self.assertEqual(({}, {}), options_parser._select_shard(genomes, {'genome_1': 11}))
+            self.assertIsNotNone(options_parser.stage_logger.shard_inputs)
+
+            options = argparse.Namespace(out_dir=self.dir_tmp, genome_dir=None, batchfile='batchfile.txt')
+            options_parser._classify_empty_shard(options)
+            options_parser.stage_logger.write()
+            steps = read_shard_log(self.dir_tmp)['steps']
+            self.assertEqual([('classify', 'completed', {})],
+                             [(x['name'], x['status'], x['output_files']) for x in steps])
+        finally:
+            StageLogger.instance = None
+
     def test_identify__genome_dir_raises_io_exception(self):
         """ Test that the identify method raises an exception on invalid genome_dir """
         options = argparse.ArgumentParser()
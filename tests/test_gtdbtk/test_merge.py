@@ -0,0 +1,107 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.files.classify_summary import ClassifySummaryFileBAC120, ClassifySummaryFileRow
+from gtdbtk.files.pplacer_classification import PplacerClassifyFileBAC120
+from gtdbtk.merge import ShardMerger
+from gtdbtk.tools import in_shard
+
+
+class TestShardMerger(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        self.gids = [f'genome_{i}' for i in range(10)]
+        self.shard_dirs = [self._make_shard(i, 2) for i in (1, 2)]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_tmp)
+
+    def _make_shard(self, shard_idx, n_shards, **log):
+        shard_dir = os.path.join(self.dir_tmp, f'shard_{shard_idx}_{n_shards}')
+        summary_file = ClassifySummaryFileBAC120(shard_dir, 'gtdbtk')
+        pplacer_file = PplacerClassifyFileBAC120(shard_dir, 'gtdbtk')
+        for gid in self.gids:
+            if in_shard(gid, shard_idx, n_shards):
+                row = ClassifySummaryFileRow()
+                row.gid = gid
+                row.classification = 'd__Bacteria;p__;c__;o__;f__;g__;s__'
+                row.red_value = 0.5
+                summary_file.add_row(row)
+                pplacer_file.add_genome(gid, row.classification)
+        # A shard with none of the genomes has no output.
+        if summary_file.has_row():
+            summary_file.write()
+            pplacer_file.write()
+
+        os.makedirs(shard_dir, exist_ok=True)
+        data = {'version': '2.3.2', 'database_version': 'r220',
+                'shard': f'{shard_idx}/{n_shards}', 'shard_inputs': 'abc',
+                'options': {'prefix': 'gtdbtk', 'min_af': 0.5},
+                'steps': [{'name': 'classify', 'status': 'completed'}]}
+        data.update(log)
+        with open(os.path.join(shard_dir, 'gtdbtk.json'), 'w') as fh:
+            json.dump(data, fh)
+        return shard_dir
+
+    def test_run(self):
+        out_dir = os.path.join(self.dir_tmp, 'merged')
+        merger = ShardMerger(list(reversed(self.shard_dirs)))
+        self.assertEqual(['1/2', '2/2'], list(merger.shard_steps))
+        output_files = merger.run(out_dir, 'merged')
+
+        summary_file = ClassifySummaryFileBAC120(out_dir, 'merged')
+        pplacer_file = PplacerClassifyFileBAC120(out_dir, 'merged')
+        self.assertEqual({'bac120': [summary_file.path, pplacer_file.path]}, output_files)
+        with open(summary_file.path) as fh:
+            rows = [line.split('\t') for line in fh.readlines()[1:]]
+        self.assertEqual(sorted(self.gids), [row[0] for row in rows])
+        self.assertEqual({'0.5'}, {row[summary_file.get_col_order()[0].index('red_value')] for row in rows})
+        self.assertTrue(os.path.islink(os.path.join(out_dir, 'merged.bac120.summary.tsv')))
+
+        pplacer_file.read()
+        self.assertEqual(sorted(self.gids), list(pplacer_file.data))
+
+    def test_run_empty_shard(self):
+        out_dir = os.path.join(self.dir_tmp, 'merged')
+        self.gids = ['genome_1', 'genome_2']
+        shard_dirs = [self._make_shard(i, 3) for i in (1, 2, 3)]
+        self.assertFalse(os.path.isfile(ClassifySummaryFileBAC120(shard_dirs[0], 'gtdbtk').path))
+
+        output_files = ShardMerger(shard_dirs).run(out_dir, 'merged')
+        summary_file = ClassifySummaryFileBAC120(out_dir, 'merged')
+        self.assertEqual(summary_file.path, output_files['bac120'][0])
+        summary_file.read()
+        self.assertEqual(self.gids, sorted(summary_file.rows))
+
+    def test_validate(self):
+        self.assertRaises(GTDBTkExit, ShardMerger, self.shard_dirs[:1])
+        self.assertRaises(GTDBTkExit, ShardMerger, self.shard_dirs + [self.shard_dirs[0]])
+        for log in ({'database_version': 'r214'}, {'shard_inputs': 'def'},
+                    {'options': {'prefix': 'gtdbtk', 'min_af': 0.65}},
+                    {'steps': [{'name': 'classify', 'status': None}]}):
+            shutil.rmtree(self.shard_dirs[1])
+            self._make_shard(2, 2, **log)
+            self.assertRaises(GTDBTkExit, ShardMerger, self.shard_dirs)
+        self.assertRaises(GTDBTkExit, ShardMerger, [self.shard_dirs[0], self._make_shard(2, 3)])
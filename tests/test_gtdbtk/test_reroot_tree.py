@@ -0,0 +1,127 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import dendropy
+from dendropy.simulate import treesim
+
+from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.reroot_tree import LeafIndex, RerootTree
+
+
+def _tree(newick):
+    return dendropy.Tree.get(data=newick, schema='newick', rooting='force-rooted',
+                             preserve_underscores=True)
+
+
+def _root_clades(path):
+    """Returns the leaves either side of the root of a tree."""
+    tree = dendropy.Tree.get_from_path(path, schema='newick', rooting='force-rooted',
+                                       preserve_underscores=True)
+    return sorted(sorted(leaf.taxon.label for leaf in child.leaf_iter())
+                  for child in tree.seed_node.child_node_iter())
+
+
+class TestRerootTree(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_tmp)
+
+    def test_leaf_index(self):
+        leaf_index = LeafIndex(_tree('((A,(B,C)n3)n2,(D,E)n6)n1;'))
+        self.assertEqual({'A': 0, 'B': 1, 'C': 2, 'D': 3, 'E': 4}, leaf_index.leaf_rank)
+        ranges = {node.label or node.taxon.label: (int(s), int(e)) for node, s, e
+                  in zip(leaf_index.nodes, leaf_index.start, leaf_index.end)}
+        self.assertEqual((0, 5), ranges['n1'])
+        self.assertEqual((0, 3), ranges['n2'])
+        self.assertEqual((1, 3), ranges['n3'])
+        self.assertEqual((3, 5), ranges['n6'])
+        self.assertEqual((4, 5), ranges['E'])
+
+    def test_place(self):
+        leaf_index = LeafIndex(_tree('((A,(B,C)n3)n2,(D,E)n6)n1;'))
+        placements = leaf_index.place({'clade': {'B', 'C'}, 'around_root': {'A', 'D', 'E'},
+                                       'poly': {'B', 'D'}, 'missing': {'X'}})
+        self.assertEqual('n3', leaf_index.nodes[placements['clade'].node_idx].label)
+        self.assertTrue(placements['clade'].monophyletic)
+
+        # The outgroup spans the current root, it is the other side of the edge.
+        self.assertEqual('n3', leaf_index.nodes[placements['around_root'].node_idx].label)
+        self.assertEqual(3, placements['around_root'].clade_size)
+        self.assertTrue(placements['around_root'].monophyletic)
+
+        self.assertEqual(2, placements['poly'].intruders)
+        self.assertIsNone(placements['missing'])
+
+    def test_place_matches_bipartitions(self):
+        rng = random.Random(7)
+        tree = treesim.birth_death_tree(birth_rate=1.0, death_rate=0.5, num_extant_tips=60, rng=rng)
+        labels = [leaf.taxon.label for leaf in tree.leaf_node_iter()]
+        leaf_index = LeafIndex(tree)
+
+        outgroups = {i: set(rng.sample(labels, rng.randint(1, 10))) for i in range(100)}
+        placements = leaf_index.place(outgroups)
+        for i, outgroup in outgroups.items():
+            # The smallest side of any edge which contains the outgroup.
+            expected = len(labels)
+            for node in leaf_index.nodes[1:]:
+                below = {leaf.taxon.label for leaf in node.leaf_iter()}
+                for side in (below, set(labels) - below):
+                    if outgroup <= side:
+                        expected = min(expected, len(side))
+            self.assertEqual(expected, placements[i].clade_size)
+
+    def test_mrca(self):
+        rng = random.Random(11)
+        tree = treesim.birth_death_tree(birth_rate=1.0, death_rate=0.5, num_extant_tips=80, rng=rng)
+        labels = [leaf.taxon.label for leaf in tree.leaf_node_iter()]
+        leaf_index = LeafIndex(tree)
+
+        pairs = [rng.sample(labels, 2) for _ in range(200)]
+        mrca = leaf_index.mrca([a for a, _ in pairs], [b for _, b in pairs])
+        for (a, b), node_idx in zip(pairs, mrca):
+            self.assertIs(tree.mrca(taxon_labels=[a, b]), leaf_index.nodes[node_idx])
+
+        # The MRCA of a leaf with itself is the leaf.
+        node_idx = leaf_index.mrca([labels[3]], [labels[3]])[0]
+        self.assertEqual(labels[3], leaf_index.nodes[node_idx].taxon.label)
+
+    def test_root_with_best_outgroup(self):
+        path_in = os.path.join(self.dir_tmp, 'in.tree')
+        path_out = os.path.join(self.dir_tmp, 'out.tree')
+        _tree('((A:1,(B:1,C:1):1):1,((D:1,E:1):1,F:1):1);').write_to_path(path_in, schema='newick')
+
+        reroot = RerootTree()
+        reports, outgroup = reroot.root_with_best_outgroup(
+            path_in, path_out, {'p__Poly': {'A', 'D'}, 'p__Mono': {'D', 'E'}, 'p__None': {'X'}})
+        self.assertEqual('p__Mono', outgroup)
+        self.assertEqual({'all': [path_out]}, reports)
+        self.assertEqual([['A', 'B', 'C', 'F'], ['D', 'E']], _root_clades(path_out))
+
+        # A tree already rooted on the outgroup is written unchanged.
+        reroot.root_with_outgroup(path_in, path_out, {'A', 'B', 'C'})
+        self.assertEqual([['A', 'B', 'C'], ['D', 'E', 'F']], _root_clades(path_out))
+
+        self.assertRaises(GTDBTkExit, reroot.root_with_outgroup, path_in, path_out, {'X'})
@@ -0,0 +1,126 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from gtdbtk.exceptions import GTDBTkExit
+from gtdbtk.serve import GTDBTkServer, _absolute_paths, send_request
+
+
+def _fake_job(self, job):
+    os.makedirs(job.out_dir, exist_ok=True)
+    with open(os.path.join(job.out_dir, 'gtdbtk.log'), 'w') as fh:
+        fh.write('started\n' + ' '.join(job.argv) + '\n')
+
+
+class TestGTDBTkServer(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        self.socket_path = os.path.join(self.dir_tmp, 'gtdbtk.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_tmp)
+
+    def test_absolute_paths(self):
+        argv = ['classify_wf', '--genome_dir', 'genomes', '--out_dir=/abs/out',
+                '--mash_db=db/', '--cpus', '2', '--batchfile']
+        self.assertEqual(['classify_wf', '--genome_dir', '/data/genomes', '--out_dir=/abs/out',
+                          '--mash_db=/data/db/', '--cpus', '2', '--batchfile'],
+                         _absolute_paths(argv, '/data'))
+
+    def test_submit(self):
+        server = GTDBTkServer(self.socket_path, cpus=4, mash_db='mash/')
+        job = server.submit(['classify_wf', '--genome_dir', 'genomes', '--out_dir', 'out',
+                             '--cpus', '8'], self.dir_tmp)
+        self.assertEqual('queued', job.state)
+        self.assertEqual(os.path.join(os.path.realpath(self.dir_tmp), 'out'), job.out_dir)
+        self.assertEqual(['--mash_db', os.path.abspath('mash') + '/', '--cpus', '4'], job.argv[-4:])
+
+        # Invalid jobs are rejected, as are jobs writing to the same directory.
+        for argv, cwd in ((['classify_wf', '--genome_dir', 'g', '--out_dir', 'out'], self.dir_tmp),
+                          (['identify', '--genome_dir', 'g', '--out_dir', 'x'], self.dir_tmp),
+                          (['classify_wf', '--genome_dir', 'g'], self.dir_tmp),
+                          (['classify_wf', '--genome_dir', 'g', '--out_dir', 'x'], 'relative')):
+            self.assertRaises(GTDBTkExit, server.submit, argv, cwd)
+        self.assertRaises(GTDBTkExit, server.handle_request, {'command': 'status', 'job_id': 2})
+
+    @mock.patch.object(GTDBTkServer, '_run_job', _fake_job)
+    def test_serve_forever(self):
+        server = GTDBTkServer(self.socket_path, max_jobs=2)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            for _ in range(100):
+                if os.path.exists(self.socket_path):
+                    break
+                time.sleep(0.05)
+            response = send_request(self.socket_path, {
+                'command': 'submit', 'cwd': self.dir_tmp,
+                'args': ['classify_wf', '--genome_dir', 'g', '--out_dir', 'out', '--skip_ani_screen']})
+            self.assertTrue(response['ok'])
+            job_id = response['job']['job_id']
+
+            for _ in range(100):
+                job = send_request(self.socket_path, {'command': 'status', 'job_id': job_id})['job']
+                if job['state'] not in ('queued', 'running'):
+                    break
+                time.sleep(0.05)
+            self.assertEqual('completed', job['state'])
+            self.assertEqual(0, job['exit_code'])
+            self.assertTrue(job['progress'].startswith('classify_wf'))
+
+            response = send_request(self.socket_path, {'command': 'unknown'})
+            self.assertFalse(response['ok'])
+        finally:
+            send_request(self.socket_path, {'command': 'shutdown'})
+            thread.join()
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_run_job(self):
+        """A job is run by a process forked from the launcher, the exit code
+        and log of the job are reported."""
+        server = GTDBTkServer(self.socket_path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            for _ in range(100):
+                if os.path.exists(self.socket_path):
+                    break
+                time.sleep(0.05)
+            response = send_request(self.socket_path, {
+                'command': 'submit', 'cwd': self.dir_tmp,
+                'args': ['classify_wf', '--genome_dir', 'missing', '--out_dir', 'out', '--skip_ani_screen']})
+            job_id = response['job']['job_id']
+
+            for _ in range(600):
+                job = send_request(self.socket_path, {'command': 'status', 'job_id': job_id})['job']
+                if job['state'] not in ('queued', 'running'):
+                    break
+                time.sleep(0.05)
+            self.assertEqual('failed', job['state'])
+            self.assertEqual(1, job['exit_code'])
+            self.assertIn('Controlled exit', job['progress'])
+        finally:
+            send_request(self.socket_path, {'command': 'shutdown'})
+            thread.join()
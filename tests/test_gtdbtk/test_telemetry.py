@@ -0,0 +1,70 @@
+###############################################################################
+#                                                                             #
+#    This program is free software: you can redistribute it and/or modify     #
+#    it under the terms of the GNU General Public License as published by     #
+#    the Free Software Foundation, either version 3 of the License, or        #
+#    (at your option) any later version.                                      #
+#                                                                             #
+#    This program is distributed in the hope that it will be useful,          #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of           #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the            #
+#    GNU General Public License for more details.                             #
+#                                                                             #
+#    You should have received a copy of the GNU General Public License        #
+#    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
+#                                                                             #
+###############################################################################
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from gtdbtk import telemetry
+from gtdbtk.telemetry import Span, span
+
+
+class TestTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        telemetry.reset()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_tmp)
+        telemetry.reset()
+
+    def test_nested_spans(self):
+        stage = Span('classify').start()
+        with span('pplacer', tree='bac120'):
+            subprocess.run([sys.executable, '-c', 'sum(range(10 ** 6))'], check=True)
+        with span('red'):
+            pass
+        stage.stop()
+
+        tree = stage.to_dict()
+        self.assertEqual('classify', tree['name'])
+        self.assertEqual(['pplacer', 'red'], [x['name'] for x in tree['spans']])
+        pplacer = tree['spans'][0]
+        self.assertEqual('bac120', pplacer['tree'])
+        self.assertGreater(pplacer['children_cpu_s'], 0)
+        self.assertGreaterEqual(tree['wall_s'], pplacer['wall_s'])
+
+        # Spans after the stage are not nested in it.
+        with span('decorate') as other:
+            pass
+        self.assertIsNone(other.parent)
+
+    def test_chrome_trace(self):
+        with span('identify'):
+            with span('prodigal'):
+                pass
+        path = os.path.join(self.dir_tmp, 'trace.json')
+        telemetry.write_chrome_trace(path)
+        with open(path) as fh:
+            events = json.load(fh)['traceEvents']
+        self.assertEqual(['prodigal', 'identify'], [x['name'] for x in events])
+        self.assertTrue(all(x['ph'] == 'X' and x['dur'] >= 0 for x in events))
@@ -14,16 +14,21 @@
 #    along with this program. If not, see <http://www.gnu.org/licenses/>.     #
 #                                                                             #
 ###############################################################################
+import hashlib
 import os
 import random
 import shutil
 import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
 
 import numpy as np
 from dendropy.simulate import treesim
 
 from gtdbtk import tools
+from gtdbtk.exceptions import GTDBTkExit
 from gtdbtk.tools import TreeTraversal, calculate_patristic_distance
 
 
@@ -48,6 +53,20 @@ class TestTools(unittest.TestCase):
         my_gen = tools.splitchunks_list(test_list, 2)
         self.assertEqual(len(next(my_gen)), 3)
 
+    def test_parse_shard(self):
+        self.assertEqual((2, 10), tools.parse_shard('2/10'))
+        self.assertEqual((1, 1), tools.parse_shard(' 1/1 '))
+        for shard in ('0/10', '11/10', '2', '2/0', 'a/b', '-1/2'):
+            self.assertRaises(GTDBTkExit, tools.parse_shard, shard)
+
+    def test_in_shard(self):
+        gids = [f'genome_{i}' for i in range(100)]
+        shards = [[gid for gid in gids if tools.in_shard(gid, i, 4)] for i in range(1, 5)]
+        # Each genome is in exactly one shard, regardless of the input order.
+        self.assertEqual(sorted(gids), sorted(sum(shards, [])))
+        self.assertTrue(all(len(shard) > 0 for shard in shards))
+        self.assertEqual(shards[0], [gid for gid in reversed(gids) if tools.in_shard(gid, 1, 4)][::-1])
+
     def test_generateTempTableName(self):
         self.assertEqual(len(tools.generateTempTableName()), 24)
 
@@ -102,6 +121,99 @@ class TestTools(unittest.TestCase):
         finally:
             shutil.rmtree(dir_tmp)
 
+    def test_write_checksum(self):
+        """Test that a checksum sidecar accepts unchanged files only"""
+        dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        try:
+            path_file = os.path.join(dir_tmp, 'file.txt')
+            with open(path_file, 'w') as f:
+                f.write('This is a test!\nFoo\n')
+            tools.write_checksum(path_file, '.sha256')
+            self.assertTrue(tools.file_has_checksum(path_file, '.sha256'))
+            self.assertTrue(tools.file_has_checksum(path_file, '.sha256', verify=True))
+
+            # Same size, different contents and modification time.
+            with open(path_file, 'w') as f:
+                f.write('This is a test!\nBar\n')
+            os.utime(path_file, ns=(0, 0))
+            self.assertFalse(tools.file_has_checksum(path_file, '.sha256'))
+
+            with open(path_file, 'w') as f:
+                f.write('Truncated\n')
+            self.assertFalse(tools.file_has_checksum(path_file, '.sha256'))
+        finally:
+            shutil.rmtree(dir_tmp)
+
+    def test_sha1_dir(self):
+        """Test that directory hashes are cached and computed in parallel"""
+        dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        try:
+            dir_a, dir_b = os.path.join(dir_tmp, 'a'), os.path.join(dir_tmp, 'b')
+            cache_dir = os.path.join(dir_tmp, 'cache')
+            os.makedirs(os.path.join(dir_a, 'sub'))
+            os.makedirs(dir_b)
+            contents = {os.path.join(dir_a, 'z.txt'): b'last',
+                        os.path.join(dir_a, 'sub', 'x.txt'): b'first' * 100000,
+                        os.path.join(dir_b, 'y.txt'): b'other'}
+            for path, content in contents.items():
+                with open(path, 'wb') as f:
+                    f.write(content)
+            expected = hashlib.sha1(b'first' * 100000 + b'last').hexdigest()
+
+            self.assertEqual(expected, tools.sha1_dir(dir_a, False))
+            self.assertEqual(expected, tools.sha1_dir(dir_a, False, cache_dir))
+            self.assertDictEqual({dir_a: expected, dir_b: hashlib.sha1(b'other').hexdigest()},
+                                 tools.sha1_dirs([dir_a, dir_b], 2, cache_dir))
+
+            # The cached hash is not used if a file has changed.
+            path_z = os.path.join(dir_a, 'z.txt')
+            with open(path_z, 'wb') as f:
+                f.write(b'LAST')
+            os.utime(path_z, ns=(0, 0))
+            self.assertEqual(hashlib.sha1(b'first' * 100000 + b'LAST').hexdigest(),
+                             tools.sha1_dir(dir_a, False, cache_dir))
+        finally:
+            shutil.rmtree(dir_tmp)
+
+    def test_get_gtdbtk_latest_version(self):
+        """Test that the latest version is cached, and not waited on for long"""
+        dir_tmp = tempfile.mkdtemp(prefix='gtdbtk_tmp_')
+        fetch = mock.Mock(return_value='9.9.9')
+        try:
+            with mock.patch.dict(os.environ, {'GTDBTK_CACHE_PATH': dir_tmp}), \
+                    mock.patch.object(tools, 'has_network_route', return_value=True), \
+                    mock.patch.object(tools, '_fetch_gtdbtk_latest_version', fetch):
+                self.assertEqual('9.9.9', tools.get_gtdbtk_latest_version())
+                self.assertEqual('9.9.9', tools.get_gtdbtk_latest_version())
+                self.assertEqual(1, fetch.call_count)
+
+                # An expired version is requested again, but not waited on.
+                cache_path = os.path.join(dir_tmp, 'latest_version.json')
+                os.remove(cache_path)
+                release = threading.Event()
+                fetch.side_effect = lambda: release.wait(5) and None
+                start = time.time()
+                self.assertIsNone(tools.get_gtdbtk_latest_version(deadline=0.05))
+                self.assertLess(time.time() - start, 0.5)
+
+                # Let the background request finish before the cache is removed.
+                release.set()
+                for _ in range(100):
+                    if os.path.exists(cache_path):
+                        break
+                    time.sleep(0.05)
+                self.assertTrue(os.path.exists(cache_path))
+
+            # Without a network route, no request is made.
+            fetch.reset_mock()
+            with mock.patch.dict(os.environ, {'GTDBTK_CACHE_PATH': os.path.join(dir_tmp, 'offline')}), \
+                    mock.patch.object(tools, 'has_network_route', return_value=False), \
+                    mock.patch.object(tools, '_fetch_gtdbtk_latest_version', fetch):
+                self.assertIsNone(tools.get_gtdbtk_latest_version())
+            fetch.assert_not_called()
+        finally:
+            shutil.rmtree(dir_tmp)
+
     def test_get_leaf_nodes(self):
         tree = treesim.birth_death_tree(birth_rate=1.0, death_rate=0.5, num_extant_tips=500)
 